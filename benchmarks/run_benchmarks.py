@@ -0,0 +1,279 @@
+"""
+Benchmarks the deployment, feature workspace and git sync paths against the local simulator.
+
+    python benchmarks/run_benchmarks.py --sizes 9,100,500 --latency 0.02 --operation-seconds 0.5
+
+For each template size a fresh simulated tenant is started and these scenarios run in order:
+
+  deploy        what deploy_infra_from_yaml_template does, on an empty tenant
+  redeploy      the same template again, when everything already exists
+  feature       what create_feature_workspaces does: claim pool workspaces for a branch
+  sync          what sync_dev_workspaces_from_main does, after a new commit on main
+
+The report shows wall time, API calls, calls per workspace and the busiest endpoints.
+With --output the results are saved as JSON; with --baseline they are compared to an
+earlier run and the exit code is 1 when calls increased or wall time regressed.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+
+import yaml
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT_DIR))
+
+from simulator import FabricSimulator, SimulatorSettings
+
+
+SCENARIOS = ("deploy", "redeploy", "feature", "sync")
+STAGES = ("dev", "test", "prod")
+WORKSPACE_TYPES = ("processing", "datastores", "consumption")
+SECURITY_GROUPS = {name: str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{name}.benchmark"))
+                   for name in ("SG_AV_Analysts", "SG_AV_Engineers", "SG_AV_Consumers")}
+FEATURE_BRANCH = "feature-benchmark"
+
+
+def build_template(workspace_count: int, solution_version: str = "av01") -> dict:
+    """
+    Scales the v01 template to `workspace_count` workspaces by repeating its 9-workspace,
+    6-capacity block. The first block has the real template's names.
+    """
+    capacities, workspaces = [], []
+    for block in range(math.ceil(workspace_count / 9)):
+        suffix = f"{block:03d}" if block else ""
+        for stage in STAGES:
+            for kind in ("engineering", "consumption"):
+                capacities.append({"name": f"fc{solution_version}{stage}{kind}{suffix}"})
+        for stage in STAGES:
+            for workspace_type in WORKSPACE_TYPES:
+                if len(workspaces) == workspace_count:
+                    break
+                kind = "consumption" if workspace_type == "consumption" and stage != "dev" else "engineering"
+                permissions = [{"group": "SG_AV_Engineers", "role": "Admin"}]
+                if stage == "prod" and workspace_type != "processing":
+                    permissions.append({"group": "SG_AV_Analysts", "role": "Contributor"})
+                workspace = {"name": f"{solution_version}-{stage}-{workspace_type}{'-' + suffix if suffix else ''}",
+                             "capacity": f"fc{solution_version}{stage}{kind}{suffix}", "permissions": permissions}
+                if stage == "dev":
+                    workspace["connect_to_git_folder"] = f"solution/{workspace_type}/"
+                workspaces.append(workspace)
+
+    return {
+        "solution_version": solution_version,
+        "azure": {
+            "subscription_id": "${AZURE_SUBSCRIPTION_ID}",
+            "tenant_id": "${AZURE_TENANT_ID}",
+            "security_groups": SECURITY_GROUPS,
+            "capacity_defaults": {"resource_group": "rg-benchmark", "region": "australiaeast", "sku": "F2",
+                                  "capacity_admins": "${SPN_OBJECT_ID}"},
+        },
+        "github": {"organization": "contoso", "repository": "fabric-benchmark", "branch": "main",
+                   "provider": "GitHub"},
+        "capacities": capacities,
+        "workspaces": workspaces,
+    }
+
+
+def benchmark_environment(simulator: FabricSimulator) -> dict[str, str]:
+    return {
+        **simulator.environment(),
+        "AZURE_SUBSCRIPTION_ID": "00000000-0000-0000-0000-000000000001",
+        "AZURE_TENANT_ID": "00000000-0000-0000-0000-000000000002",
+        "SPN_CLIENT_ID": "00000000-0000-0000-0000-000000000003",
+        "SPN_CLIENT_SECRET": "benchmark-secret",
+        "SPN_OBJECT_ID": "00000000-0000-0000-0000-000000000004",
+        "GITHUB_PAT": "benchmark-pat",
+    }
+
+
+def reset_process_state() -> None:
+    """Forgets the tokens, rate limits, pooled connections and connection listing of the previous tenant."""
+    from config.fabric_core.credentials import reset_token_provider
+    from config.fabric_core.transport import get_connection_pool
+    from config.fabric_core.throttling import reset_rate_limiter
+    from config.fabric_core.git_integration import get_connection_registry
+
+    reset_token_provider()
+    reset_rate_limiter()
+    get_connection_pool().close()
+    get_connection_registry().invalidate()
+
+
+def deploy(config: dict, args) -> int:
+    from config.fabric_core import load_inventory, deploy_from_config
+
+    inventory = load_inventory(config["azure"]["capacity_defaults"]["resource_group"])
+    results = deploy_from_config(config, max_workers=args.max_workers, inventory=inventory)
+    return sum(result.status != "succeeded" for result in results.values())
+
+
+def prepare_feature(config: dict, args, simulator: FabricSimulator) -> None:
+    from config.fabric_core import WorkspacePool
+
+    WorkspacePool(config["solution_version"], config["azure"]["security_groups"], config["github"],
+                  size=args.pool_size, max_workers=args.max_workers).refill(WORKSPACE_TYPES)
+
+
+def feature(config: dict, args) -> int:
+    from config.fabric_core import WorkspacePool
+
+    pool = WorkspacePool(config["solution_version"], config["azure"]["security_groups"], config["github"],
+                         size=args.pool_size, max_workers=args.max_workers)
+    results, refill_thread = pool.claim(FEATURE_BRANCH, WORKSPACE_TYPES)
+    if refill_thread:
+        refill_thread.join()
+    return sum(1 for result in results if result.error)
+
+
+def prepare_sync(config: dict, args, simulator: FabricSimulator) -> None:
+    simulator.push_commit(config["github"]["branch"])
+
+
+def sync(config: dict, args) -> int:
+    from config.fabric_core import load_inventory, find_workspaces_on_branch, sync_workspaces_from_git
+
+    inventory = load_inventory(config["azure"]["capacity_defaults"]["resource_group"], connections=False)
+    candidates = {name: workspace["id"] for name, workspace in inventory.list_workspaces().items()}
+    workspaces = find_workspaces_on_branch(candidates, config["github"]["branch"], max_workers=args.max_workers)
+    results = sync_workspaces_from_git(workspaces, max_workers=args.max_workers)
+    return sum(result.status == "failed" for result in results.values())
+
+
+SCENARIO_STEPS = {
+    "deploy": (None, deploy),
+    "redeploy": (None, deploy),
+    "feature": (prepare_feature, feature),
+    "sync": (prepare_sync, sync),
+}
+
+
+def run_size(workspace_count: int, args, log) -> list[dict]:
+    """Runs the selected scenarios against a fresh simulated tenant with a template of `workspace_count` workspaces."""
+    from config.fabric_core import load_config_from_file
+
+    settings = SimulatorSettings(latency=args.latency, jitter=args.jitter, operation_seconds=args.operation_seconds,
+                                 retry_after=args.retry_after, throttle_rate=args.throttle_rate,
+                                 rate_limit=args.rate_limit, rate_burst=args.rate_burst,
+                                 page_size=args.page_size, seed=args.seed)
+    runs = []
+    with FabricSimulator(settings) as simulator, tempfile.TemporaryDirectory() as temp_dir:
+        os.environ.update(benchmark_environment(simulator))
+        reset_process_state()
+        template_path = Path(temp_dir) / f"benchmark_{workspace_count}.yaml"
+        template_path.write_text(yaml.safe_dump(build_template(workspace_count), sort_keys=False), encoding="utf-8")
+        config = load_config_from_file(template_path, use_cache=False)
+
+        for scenario in args.scenarios:
+            prepare, run = SCENARIO_STEPS[scenario]
+            with contextlib.redirect_stdout(log):
+                if prepare:
+                    prepare(config, args, simulator)
+                simulator.reset_counters()
+                started = time.perf_counter()
+                try:
+                    failed = run(config, args)
+                except Exception as e:
+                    print(f"✗ {scenario} raised {type(e).__name__}: {e}")
+                    failed = -1
+                wall = time.perf_counter() - started
+            with simulator.lock:
+                endpoints = dict(simulator.calls.most_common())
+                throttled = simulator.throttled
+            runs.append({"workspaces": workspace_count, "capacities": len(config["capacities"]),
+                         "scenario": scenario, "wall_seconds": round(wall, 3), "calls": sum(endpoints.values()),
+                         "throttled": throttled, "failed": failed, "endpoints": endpoints})
+    return runs
+
+
+def print_report(runs: list[dict], top: int) -> None:
+    for workspace_count in sorted({run["workspaces"] for run in runs}):
+        size_runs = [run for run in runs if run["workspaces"] == workspace_count]
+        print(f"===== {workspace_count} workspaces, {size_runs[0]['capacities']} capacities =====")
+        print(f"  {'scenario':<10} {'wall':>8} {'calls':>7} {'calls/ws':>9} {'429s':>6} {'failed':>7}")
+        for run in size_runs:
+            print(f"  {run['scenario']:<10} {run['wall_seconds']:>7.2f}s {run['calls']:>7} "
+                  f"{run['calls'] / workspace_count:>9.2f} {run['throttled']:>6} {run['failed']:>7}")
+        for run in size_runs:
+            if top and run["endpoints"]:
+                print(f"  Busiest endpoints ({run['scenario']}):")
+                for endpoint, count in list(run["endpoints"].items())[:top]:
+                    print(f"    {count:>6}  {endpoint}")
+
+
+def compare_to_baseline(runs: list[dict], baseline_path: str, tolerance: float, call_tolerance: float) -> bool:
+    """
+    Prints the change against a saved run. Returns True if anything regressed.
+    Poll counts depend on timing, so call counts get a small tolerance too.
+    """
+    baseline = {(run["workspaces"], run["scenario"]): run
+                for run in json.loads(Path(baseline_path).read_text(encoding="utf-8"))["runs"]}
+    regressed = False
+    print(f"===== Compared to {baseline_path} =====")
+    for run in runs:
+        before = baseline.get((run["workspaces"], run["scenario"]))
+        if before is None:
+            continue
+        more_calls = run["calls"] > before["calls"] * (1 + call_tolerance)
+        slower = run["wall_seconds"] > before["wall_seconds"] * (1 + tolerance)
+        symbol = "✗" if more_calls or slower else "✓"
+        regressed = regressed or more_calls or slower
+        print(f"{symbol} {run['workspaces']:>4} workspaces {run['scenario']:<10} calls {before['calls']} -> {run['calls']}, "
+              f"wall {before['wall_seconds']:.2f}s -> {run['wall_seconds']:.2f}s")
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark fabric_core against a local Fabric/ARM simulator")
+    parser.add_argument("--sizes", default="9,100,500", help="Comma-separated workspace counts")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated subset of {SCENARIOS}")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds per response")
+    parser.add_argument("--operation-seconds", type=float, default=0.5, help="Duration of 202 operations")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After of 202s (default: operation duration)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="Requests per second the simulated ARM and Fabric APIs each accept before answering 429")
+    parser.add_argument("--rate-burst", type=float, default=20.0)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-workers", type=int, default=int(os.getenv("DEPLOY_MAX_WORKERS", "8")))
+    parser.add_argument("--pool-size", type=int, default=1, help="Feature workspace pool size per type")
+    parser.add_argument("--top", type=int, default=5, help="Busiest endpoints to list per scenario")
+    parser.add_argument("--log", default=os.devnull, help="File for the output of the benchmarked code")
+    parser.add_argument("--output", help="Save the results as JSON")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed wall time increase over the baseline")
+    parser.add_argument("--call-tolerance", type=float, default=0.05, help="Allowed API call increase over the baseline")
+    args = parser.parse_args()
+    args.scenarios = [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    os.environ.pop("FABRIC_CORE_TOKEN_CACHE", None)
+    runs = []
+    with open(args.log, "a", encoding="utf-8") as log:
+        for workspace_count in [int(size) for size in args.sizes.split(",")]:
+            runs.extend(run_size(workspace_count, args, log))
+
+    print_report(runs, args.top)
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "log")}
+        Path(args.output).write_text(json.dumps({"settings": settings, "runs": runs}, indent=2), encoding="utf-8")
+        print(f"✓ Results saved to {args.output}")
+    if args.baseline and compare_to_baseline(runs, args.baseline, args.tolerance, args.call_tolerance):
+        return 1
+    return int(any(run["failed"] for run in runs))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
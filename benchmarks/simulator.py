@@ -0,0 +1,521 @@
+"""
+Local simulator of the Fabric REST API, the Azure Resource Manager capacity API and the
+Entra ID token endpoint, for benchmarking fabric_core without a tenant.
+
+One HTTP server answers all three: point FABRIC_API_BASE_URL at `<url>/v1` and
+AZURE_MANAGEMENT_BASE_URL / AZURE_AUTHORITY_HOST at `<url>`. State is kept in memory.
+Every response can be delayed (latency), long-running calls answer 202 and finish after
+`operation_seconds`, a fraction of requests can be throttled with 429 + Retry-After, and
+list endpoints are paginated the way the real services do (continuationToken / nextLink).
+Calls are counted per endpoint template.
+"""
+
+import sys
+import json
+import math
+import time
+import uuid
+import heapq
+import random
+import threading
+from pathlib import Path
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, quote
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT_DIR))
+
+from config.fabric_core.tracing import endpoint_template
+
+
+@dataclass
+class SimulatorSettings:
+    latency: float = 0.0  # seconds added to every response
+    jitter: float = 0.0  # up to this many extra seconds, uniformly random
+    operation_seconds: float = 1.0  # how long a 202 operation (and capacity provisioning) runs
+    retry_after: float|None = None  # Retry-After sent with 202s; defaults to operation_seconds
+    throttle_rate: float = 0.0  # fraction of requests answered with 429
+    throttle_retry_after: float = 1.0
+    rate_limit: float = 0.0  # sustained requests per second each of ARM and Fabric accept (0: unlimited)
+    rate_burst: float = 20.0
+    page_size: int = 100
+    job_seconds: float = 2.0  # how long an item job instance runs
+    seed: int = 0
+
+
+class FabricSimulator:
+    """
+    In-memory tenant behind a threading HTTP server.
+    Use as a context manager, or call start() and stop().
+    """
+
+    def __init__(self, settings: SimulatorSettings|None = None, host: str = "127.0.0.1", port: int = 0):
+        self.settings = settings or SimulatorSettings()
+        self.random = random.Random(self.settings.seed)
+        self.lock = threading.RLock()
+        self.calls = Counter()  # "METHOD template" -> count
+        self.throttled = 0
+
+        self.capacities = {}  # name -> ARM capacity document
+        self.fabric_capacity_ids = {}  # name -> Fabric capacity id
+        self.workspaces = {}  # id -> workspace document
+        self.role_assignments = {}  # workspace id -> {role assignment id: document}
+        self.connections = {}  # id -> connection document
+        self.git = {}  # workspace id -> {"details", "initialized", "head"}
+        self.items = {}  # workspace id -> {item id: item document with its "definition"}
+        self.job_instances = {}  # job instance id -> {"document", "ends_at", "final_status"}
+        self.job_outcomes = {}  # item id -> (seconds, final status), overriding job_seconds and Completed
+        self.branch_heads = {}  # branch -> commit hash
+        self.operations = {}  # id -> {"ready_at", "status", "result"}
+        self._pending = []  # heap of (ready_at, operation id, effect)
+        self._buckets = {}  # "arm" | "fabric" -> (tokens, updated)
+
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.simulator = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environment(self) -> dict[str, str]:
+        """Environment that points fabric_core's HTTP transport at this simulator."""
+        return {
+            "FABRIC_CORE_TRANSPORT": "http",
+            "FABRIC_API_BASE_URL": f"{self.url}/v1",
+            "AZURE_MANAGEMENT_BASE_URL": self.url,
+            "AZURE_AUTHORITY_HOST": self.url,
+        }
+
+    def start(self) -> "FabricSimulator":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fabric-simulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FabricSimulator":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def reset_counters(self) -> None:
+        with self.lock:
+            self.calls.clear()
+            self.throttled = 0
+
+    def push_commit(self, branch: str = "main") -> str:
+        """Moves a branch to a new commit, so every workspace connected to it is behind."""
+        with self.lock:
+            self.branch_heads[branch] = uuid.uuid4().hex + uuid.uuid4().hex[:8]
+            return self.branch_heads[branch]
+
+    def head_of(self, branch: str) -> str:
+        with self.lock:
+            return self.branch_heads.setdefault(branch, uuid.uuid4().hex + uuid.uuid4().hex[:8])
+
+    # ----- long-running operations -----
+
+    def start_operation(self, effect=None, result: dict|None = None) -> str:
+        """Registers an operation that succeeds (and applies `effect`) after operation_seconds."""
+        operation_id = str(uuid.uuid4())
+        ready_at = time.monotonic() + self.settings.operation_seconds
+        self.operations[operation_id] = {"ready_at": ready_at, "status": "Running", "result": result or {}}
+        heapq.heappush(self._pending, (ready_at, operation_id, effect))
+        return operation_id
+
+    def settle(self) -> None:
+        """Completes every operation whose time has come."""
+        now = time.monotonic()
+        while self._pending and self._pending[0][0] <= now:
+            _, operation_id, effect = heapq.heappop(self._pending)
+            if effect:
+                effect()
+            self.operations[operation_id]["status"] = "Succeeded"
+
+    def retry_after_header(self) -> dict:
+        retry_after = self.settings.retry_after
+        retry_after = self.settings.operation_seconds if retry_after is None else retry_after
+        return {"Retry-After": f"{retry_after:g}"}
+
+    def operation_headers(self, location: str, header: str = "Location") -> dict:
+        return {header: location, **self.retry_after_header()}
+
+    def take_token(self, service: str) -> int:
+        """Spends one request of the service's rate limit. Returns the Retry-After (seconds) if none is left."""
+        rate = self.settings.rate_limit
+        if not rate:
+            return 0
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(service, (self.settings.rate_burst, now))
+        tokens = min(self.settings.rate_burst, tokens + (now - updated) * rate)
+        if tokens < 1:
+            self._buckets[service] = (tokens, now)
+            return max(1, math.ceil((1 - tokens) / rate))
+        self._buckets[service] = (tokens - 1, now)
+        return 0
+
+    # ----- pagination -----
+
+    def fabric_page(self, url: str, query: dict, items: list[dict]) -> dict:
+        start = int(query.get("continuationToken", ["0"])[0])
+        end = start + self.settings.page_size
+        page = {"value": items[start:end]}
+        if end < len(items):
+            page["continuationToken"] = str(end)
+            page["continuationUri"] = f"{self.url}{url}?continuationToken={quote(str(end))}"
+        return page
+
+    def arm_page(self, path: str, query: dict, items: list[dict]) -> dict:
+        start = int(query.get("$skiptoken", ["0"])[0])
+        end = start + self.settings.page_size
+        page = {"value": items[start:end]}
+        if end < len(items):
+            page["nextLink"] = f"{self.url}{path}?api-version=2023-11-01&$skiptoken={end}"
+        return page
+
+    # ----- request dispatch -----
+
+    def handle(self, method: str, raw_path: str, body: dict) -> tuple[int, dict|None, dict]:
+        """Returns (status, JSON body, headers) for a request."""
+        parts = urlsplit(raw_path)
+        path, query = parts.path, parse_qs(parts.query)
+        segments = [segment for segment in path.split("/") if segment]
+
+        if len(segments) == 4 and segments[1:] == ["oauth2", "v2.0", "token"]:
+            return 200, {"token_type": "Bearer", "expires_in": 3600,
+                         "access_token": f"simulated-{uuid.uuid4().hex}"}, {}
+
+        template = f"{method} {endpoint_template(path).removeprefix('/v1')}"
+        with self.lock:
+            self.calls[template] += 1
+            if self.settings.throttle_rate and self.random.random() < self.settings.throttle_rate:
+                self.throttled += 1
+                return 429, {"errorCode": "RequestBlocked", "message": "Too many requests"}, {
+                    "Retry-After": f"{self.settings.throttle_retry_after:g}"}
+            retry_after = self.take_token("arm" if segments[:1] == ["subscriptions"] else "fabric")
+            if retry_after:
+                self.throttled += 1
+                return 429, {"errorCode": "RequestBlocked", "message": "Rate limit exceeded"}, {
+                    "Retry-After": str(retry_after)}
+            self.settle()
+            if segments[:1] == ["subscriptions"]:
+                return self.handle_arm(method, path, query, segments, body)
+            if segments[:1] == ["v1"]:
+                return self.handle_fabric(method, path, query, segments[1:], body)
+        return 404, {"errorCode": "NotFound"}, {}
+
+    def handle_arm(self, method, path, query, segments, body):
+        # /subscriptions/{sub}/resourceGroups/{rg}/providers/Microsoft.Fabric/capacities[/{name}[/{action}]]
+        if len(segments) >= 5 and segments[4] == "operations":
+            operation = self.operations.get(segments[5])
+            if operation is None:
+                return 404, {"error": {"code": "NotFound"}}, {}
+            return 200, {"status": "InProgress" if operation["status"] == "Running" else "Succeeded"}, {}
+        if len(segments) == 7 and method == "GET":
+            capacities = [capacity for capacity in self.capacities.values() if capacity["_resource_group"] == segments[3]]
+            return 200, self.arm_page(path, query, [_public(capacity) for capacity in capacities]), {}
+
+        name = segments[7] if len(segments) > 7 else None
+        action = segments[8] if len(segments) > 8 else None
+        capacity = self.capacities.get(name)
+        operation_base = f"{self.url}/subscriptions/{segments[1]}/providers/Microsoft.Fabric/operations"
+
+        if action in ("suspend", "resume"):
+            if capacity is None:
+                return 404, {"error": {"code": "ResourceNotFound"}}, {}
+            transient, final = ("Pausing", "Paused") if action == "suspend" else ("Resuming", "Active")
+            capacity["properties"]["state"] = transient
+            operation_id = self.start_operation(lambda: capacity["properties"].update(state=final))
+            return 202, None, self.operation_headers(f"{operation_base}/{operation_id}")
+
+        if method == "GET":
+            if capacity is None:
+                return 404, {"error": {"code": "ResourceNotFound"}}, {}
+            return 200, _public(capacity), {}
+
+        if method == "PUT":
+            created = capacity is None
+            capacity = {
+                "id": path, "name": name, "type": "Microsoft.Fabric/capacities",
+                "location": body.get("location"), "sku": body.get("sku"), "_resource_group": segments[3],
+                "properties": {"provisioningState": "Provisioning", "state": "Provisioning",
+                               "administration": (body.get("properties") or {}).get("administration")},
+            }
+            self.capacities[name] = capacity
+            self.fabric_capacity_ids.setdefault(name, str(uuid.uuid4()))
+            operation_id = self.start_operation(
+                lambda: capacity["properties"].update(provisioningState="Succeeded", state="Active"))
+            return (201 if created else 200), _public(capacity), self.operation_headers(
+                f"{operation_base}/{operation_id}", "Azure-AsyncOperation")
+
+        if method == "PATCH":
+            if capacity is None:
+                return 404, {"error": {"code": "ResourceNotFound"}}, {}
+            capacity["properties"]["provisioningState"] = "Updating"
+            update = {"sku": body["sku"]} if body.get("sku") else {}
+
+            def apply_update():
+                capacity.update(update)
+                capacity["properties"]["provisioningState"] = "Succeeded"
+                if body.get("properties"):
+                    capacity["properties"].update(body["properties"])
+
+            operation_id = self.start_operation(apply_update)
+            return 202, None, self.operation_headers(f"{operation_base}/{operation_id}", "Azure-AsyncOperation")
+
+        if method == "DELETE":
+            if capacity is None:
+                return 204, None, {}
+            capacity["properties"]["provisioningState"] = "Deleting"
+            operation_id = self.start_operation(lambda: self.capacities.pop(name, None))
+            return 202, None, self.operation_headers(f"{operation_base}/{operation_id}", "Azure-AsyncOperation")
+        return 405, None, {}
+
+    def handle_fabric(self, method, path, query, segments, body):
+        resource = segments[0] if segments else None
+
+        if resource == "operations" and len(segments) == 2:
+            operation = self.operations.get(segments[1])
+            if operation is None:
+                return 404, {"errorCode": "OperationNotFound"}, {}
+            document = {"status": operation["status"], **(operation["result"] if operation["status"] == "Succeeded" else {})}
+            return 200, document, {} if operation["status"] == "Succeeded" else self.retry_after_header()
+
+        if resource == "capacities" and method == "GET":
+            items = [{"id": self.fabric_capacity_ids[name], "displayName": name, "sku": (capacity.get("sku") or {}).get("name"),
+                      "region": capacity.get("location"),
+                      "state": "Active" if capacity["properties"]["state"] == "Active" else "Inactive"}
+                     for name, capacity in self.capacities.items()
+                     if capacity["properties"]["provisioningState"] != "Provisioning"]
+            return 200, self.fabric_page(path, query, items), {}
+
+        if resource == "connections":
+            if method == "GET":
+                return 200, self.fabric_page(path, query, list(self.connections.values())), {}
+            connection_id = str(uuid.uuid4())
+            parameters = {parameter.get("name"): parameter.get("value")
+                          for parameter in (body.get("connectionDetails") or {}).get("parameters", [])}
+            self.connections[connection_id] = {
+                "id": connection_id, "displayName": body.get("displayName"),
+                "connectivityType": body.get("connectivityType"),
+                "connectionDetails": {"type": (body.get("connectionDetails") or {}).get("type"),
+                                      "path": parameters.get("url")},
+            }
+            return 201, self.connections[connection_id], {}
+
+        if resource == "workspaces" and len(segments) == 1:
+            if method == "GET":
+                return 200, self.fabric_page(path, query, list(self.workspaces.values())), {}
+            if any(workspace["displayName"] == body.get("displayName") for workspace in self.workspaces.values()):
+                return 409, {"errorCode": "WorkspaceNameAlreadyExists"}, {}
+            workspace_id = str(uuid.uuid4())
+            self.workspaces[workspace_id] = {"id": workspace_id, "displayName": body.get("displayName"),
+                                             "description": body.get("description", ""), "type": "Workspace",
+                                             "capacityId": body.get("capacityId")}
+            self.role_assignments[workspace_id] = {}
+            return 201, self.workspaces[workspace_id], {}
+
+        if resource == "workspaces":
+            return self.handle_workspace(method, path, query, segments[1], segments[2:], body)
+        return 404, {"errorCode": "EntityNotFound"}, {}
+
+    def handle_workspace(self, method, path, query, workspace_id, segments, body):
+        workspace = self.workspaces.get(workspace_id)
+        if workspace is None:
+            return 404, {"errorCode": "WorkspaceNotFound"}, {}
+        operation_base = f"{self.url}/v1/operations"
+
+        if not segments:
+            if method == "GET":
+                return 200, workspace, {}
+            if method == "PATCH":
+                workspace.update({key: body[key] for key in ("displayName", "description") if key in body})
+                return 200, workspace, {}
+            if method == "DELETE":
+                del self.workspaces[workspace_id]
+                self.role_assignments.pop(workspace_id, None)
+                self.git.pop(workspace_id, None)
+                self.items.pop(workspace_id, None)
+                return 200, None, {}
+
+        if segments == ["assignToCapacity"]:
+            workspace["capacityId"] = body.get("capacityId")
+            return 202, None, {}
+
+        if segments[0] == "roleAssignments":
+            assignments = self.role_assignments.setdefault(workspace_id, {})
+            if len(segments) == 1 and method == "GET":
+                return 200, self.fabric_page(path, query, list(assignments.values())), {}
+            if len(segments) == 1:
+                principal_id = (body.get("principal") or {}).get("id")
+                if any(assignment["principal"]["id"] == principal_id for assignment in assignments.values()):
+                    return 409, {"errorCode": "PrincipalAlreadyHasWorkspaceRolePermissions"}, {}
+                assignment_id = principal_id or str(uuid.uuid4())
+                assignments[assignment_id] = {"id": assignment_id, "principal": body.get("principal"),
+                                              "role": body.get("role")}
+                return 201, assignments[assignment_id], {}
+            assignment = assignments.get(segments[1])
+            if assignment is None:
+                return 404, {"errorCode": "WorkspaceRoleAssignmentNotFound"}, {}
+            if method == "PATCH":
+                assignment["role"] = body.get("role")
+                return 200, assignment, {}
+            del assignments[segments[1]]
+            return 200, None, {}
+
+        if segments[0] == "items":
+            return self.handle_items(method, path, query, workspace_id, segments[1:], body, operation_base)
+        if segments[0] == "git":
+            return self.handle_git(method, workspace_id, segments[1], body, operation_base)
+        return 404, {"errorCode": "EntityNotFound"}, {}
+
+    def handle_items(self, method, path, query, workspace_id, segments, body, operation_base):
+        items = self.items.setdefault(workspace_id, {})
+        if not segments and method == "GET":
+            listed = [{key: value for key, value in item.items() if key != "definition"} for item in items.values()]
+            return 200, self.fabric_page(path, query, listed), {}
+        if not segments:
+            if any(item["displayName"] == body.get("displayName") and item["type"] == body.get("type")
+                   for item in items.values()):
+                return 409, {"errorCode": "ItemDisplayNameAlreadyInUse"}, {}
+            item_id = str(uuid.uuid4())
+            item = {"id": item_id, "displayName": body.get("displayName"), "type": body.get("type"),
+                    "description": body.get("description", ""), "workspaceId": workspace_id,
+                    "definition": body.get("definition")}
+            operation_id = self.start_operation(lambda: items.update({item_id: item}))
+            return 202, None, self.operation_headers(f"{operation_base}/{operation_id}")
+
+        item = items.get(segments[0])
+        if item is None:
+            return 404, {"errorCode": "ItemNotFound"}, {}
+        if segments[1:3] == ["jobs", "instances"]:
+            return self.handle_job(method, path, query, workspace_id, item, segments[3:])
+        if segments[1:] == ["updateDefinition"]:
+            operation_id = self.start_operation(lambda: item.update(definition=body.get("definition")))
+            return 202, None, self.operation_headers(f"{operation_base}/{operation_id}")
+        if method == "PATCH":
+            item.update({key: body[key] for key in ("displayName", "description") if key in body})
+            return 200, {key: value for key, value in item.items() if key != "definition"}, {}
+        if method == "DELETE":
+            del items[segments[0]]
+            return 200, None, {}
+        return 200, {key: value for key, value in item.items() if key != "definition"}, {}
+
+    def handle_job(self, method, path, query, workspace_id, item, segments):
+        now = time.monotonic()
+        if not segments and method == "POST":
+            capacity_id = self.workspaces[workspace_id].get("capacityId")
+            name = next((name for name, fabric_id in self.fabric_capacity_ids.items() if fabric_id == capacity_id), None)
+            if name is None or self.capacities[name]["properties"]["state"] != "Active":
+                return 400, {"errorCode": "CapacityNotActive"}, {}
+            seconds, final_status = self.job_outcomes.get(item["id"], (self.settings.job_seconds, "Completed"))
+            instance_id = str(uuid.uuid4())
+            self.job_instances[instance_id] = {
+                "document": {"id": instance_id, "itemId": item["id"], "jobType": query.get("jobType", [None])[0],
+                             "invokeType": "Manual", "status": "NotStarted", "failureReason": None},
+                "ends_at": now + seconds, "final_status": final_status}
+            return 202, None, {"Location": f"{self.url}{path}/{instance_id}", **self.retry_after_header()}
+
+        instance = self.job_instances.get(segments[0]) if segments else None
+        if instance is None:
+            return 404, {"errorCode": "ItemJobInstanceNotFound"}, {}
+        document = instance["document"]
+        if segments[1:] == ["cancel"]:
+            if document["status"] in ("NotStarted", "InProgress"):
+                document["status"], instance["ends_at"] = "Cancelled", now
+            return 202, None, {}
+        if document["status"] in ("NotStarted", "InProgress"):
+            if now >= instance["ends_at"]:
+                document["status"] = instance["final_status"]
+                if document["status"] == "Failed":
+                    document["failureReason"] = {"errorCode": "ActivityFailed", "message": "Simulated failure"}
+            else:
+                document["status"] = "InProgress"
+        headers = self.retry_after_header() if document["status"] == "InProgress" else {}
+        return 200, document, headers
+
+    def handle_git(self, method, workspace_id, action, body, operation_base):
+        connection = self.git.get(workspace_id)
+
+        if action == "connect":
+            if connection:
+                return 409, {"errorCode": "WorkspaceAlreadyConnectedToGit"}, {}
+            self.git[workspace_id] = {"details": body.get("gitProviderDetails"), "initialized": False, "head": None}
+            return 200, None, {}
+        if action == "connection":
+            if not connection:
+                return 200, {"gitConnectionState": "NotConnected"}, {}
+            state = "ConnectedAndInitialized" if connection["initialized"] else "Connected"
+            return 200, {"gitConnectionState": state, "gitProviderDetails": connection["details"]}, {}
+        if connection is None:
+            return 400, {"errorCode": "WorkspaceNotConnectedToGit"}, {}
+        if action == "disconnect":
+            del self.git[workspace_id]
+            return 200, None, {}
+
+        remote = self.head_of(connection["details"].get("branchName"))
+        if action == "initializeConnection":
+            operation_id = self.start_operation(lambda: connection.update(initialized=True),
+                                                {"requiredAction": "UpdateFromGit", "remoteCommitHash": remote})
+            return 202, None, self.operation_headers(f"{operation_base}/{operation_id}")
+        if not connection["initialized"]:
+            return 400, {"errorCode": "WorkspaceGitConnectionNotInitialized"}, {}
+        if action == "status":
+            return 200, {"workspaceHead": connection["head"], "remoteCommitHash": remote, "changes": []}, {}
+        if action == "updateFromGit":
+            if body.get("remoteCommitHash") != remote:
+                return 400, {"errorCode": "RemoteCommitHashMismatch"}, {}
+            operation_id = self.start_operation(lambda: connection.update(head=remote))
+            return 202, None, self.operation_headers(f"{operation_base}/{operation_id}")
+        return 404, {"errorCode": "EntityNotFound"}, {}
+
+
+def _public(capacity: dict) -> dict:
+    return {key: value for key, value in capacity.items() if not key.startswith("_")}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real services
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _respond(self) -> None:
+        simulator = self.server.simulator
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw and self.headers.get("Content-Type") == "application/json" else {}
+        except json.JSONDecodeError:
+            body = {}
+
+        settings = simulator.settings
+        delay = settings.latency + (simulator.random.uniform(0, settings.jitter) if settings.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        is_token_request = self.path.endswith("/oauth2/v2.0/token")
+        if not is_token_request and not (self.headers.get("Authorization") or "").startswith("Bearer "):
+            status, document, headers = 401, {"errorCode": "TokenNotProvided"}, {}
+        else:
+            status, document, headers = simulator.handle(self.command, self.path, body or {})
+
+        payload = json.dumps(document).encode() if document is not None else b""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if payload:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
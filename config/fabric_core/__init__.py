@@ -1,34 +1,82 @@
 """
 Fabric Core - Reusable modules for Microsoft Fabric CLI operations.
+
+Submodules are imported on first use (`from config.fabric_core import login` only
+imports `login.py` and what it needs), so importing the package has no side effects
+and thin entry points such as the daemon client start quickly.
+
+Asyncio counterparts of the provisioning functions live in `config.fabric_core.aio`
+under the same names (`from config.fabric_core import aio; await aio.create_workspace(...)`).
 """
 
-from .utils import *
-from .login import login
-from .load_config import load_config_from_file
-from .capacities import (check_capacity_exists, get_capacity_status, 
-                         wait_for_capacity_ready, create_capacity, suspend_capacity)
-from .workspaces import (get_workspace_id, workspace_exists, create_workspace, assign_permissions)
-
-from .git_integration import (get_or_create_git_connection, update_workspace_from_git, connect_workspace_to_git)
-
-__all__ = [
-    "load_local_env_file",
-    "set_stdout_encoding_to_utf_8",
-    "get_fab_cli_executable_path",
-    "run_fabric_cli_command",
-    "call_azure_fabric_rest_api",
-    "login",
-    "load_config_from_file",
-    "check_capacity_exists",
-    "get_capacity_status",
-    "wait_for_capacity_ready",
-    "create_capacity", 
-    "suspend_capacity",
-    "get_workspace_id", 
-    "workspace_exists", 
-    "create_workspace", 
-    "assign_permissions",
-    "get_or_create_git_connection", 
-    "update_workspace_from_git", 
-    "connect_workspace_to_git"
-]
\ No newline at end of file
+from importlib import import_module
+
+
+_EXPORTS = {
+    ".utils": ["load_local_env_file", "set_stdout_encoding_to_utf_8", "get_fab_cli_executable_path",
+               "run_fabric_cli_command", "call_azure_fabric_rest_api", "get_subscription_id", "fetch_page",
+               "iter_paged_items", "list_all_items", "find_item"],
+    ".login": ["login", "ensure_logged_in"],
+    ".throttling": ["TokenBucket", "FamilyLimiter", "RateLimiter", "get_rate_limiter", "reset_rate_limiter",
+                    "get_api_family", "send_with_retries"],
+    ".credentials": ["TokenProvider", "get_token_provider", "reset_token_provider"],
+    ".load_config": ["ConfigError", "SolutionConfig", "WorkspaceConfig", "CapacityConfig", "PermissionConfig",
+                     "GithubConfig", "JobConfig", "load_solution_config", "load_config_from_file"],
+    ".tracing": ["enable_tracing", "get_tracer", "span", "print_trace_report", "export_otlp_json", "profiling"],
+    ".operations": ["PollResult", "OperationFailedError", "OperationTimeoutError", "OperationPoller",
+                    "get_operation_poller", "wait_for_operation", "wait_until", "poll_until_all"],
+    ".capacities": ["check_capacity_exists", "get_capacity_status", "check_capacity_ready", "wait_for_capacity_ready",
+                    "wait_for_capacities_ready", "get_capacity_admins", "build_capacity_request_body",
+                    "create_capacity", "update_capacity", "delete_capacity", "get_desired_sku", "suspend_capacity",
+                    "resume_capacity"],
+    ".autoscaler": ["MetricSample", "AutoscalePolicy", "CapacityAutoscaler", "SimulatedMetricsFeed", "FileMetricsFeed",
+                    "decide"],
+    ".capacity_scheduler": ["Clock", "WarmupHistory", "CapacityWindow", "plan_resume_times", "run_resume_schedule",
+                            "suspend_capacities", "suspend_when_done", "parse_window_start"],
+    ".workspaces": ["find_workspace", "get_workspace_id", "workspace_exists", "create_workspace",
+                    "create_workspace_over_rest", "wait_for_workspace_id", "assign_permissions",
+                    "list_role_assignments", "add_role_assignment", "update_role_assignment", "delete_role_assignment",
+                    "assign_workspace_to_capacity", "get_workspace", "rename_workspace", "delete_workspace"],
+    ".role_assignments": ["RoleAssignmentChange", "WorkspaceReconciliation", "diff_role_assignments",
+                          "reconcile_role_assignments", "print_reconciliation_summary"],
+    ".git_integration": ["ConnectionRegistry", "get_connection_registry", "get_or_create_git_connection",
+                         "update_workspace_from_git", "connect_workspace_to_git", "get_git_connection",
+                         "get_git_status", "initialize_git_connection", "build_update_from_git_request",
+                         "disconnect_workspace_from_git"],
+    ".git_sync": ["SyncResult", "find_workspaces_on_branch", "sync_workspaces_from_git", "print_sync_report"],
+    ".inventory": ["Inventory", "load_inventory"],
+    ".workspace_pool": ["WorkspacePool", "ClaimResult", "get_feature_capacity", "get_feature_workspace_name",
+                        "list_github_branches", "list_merged_branches"],
+    ".task_graph": ["Task", "TaskResult", "run_task_graph"],
+    ".journal": ["DeploymentJournal", "JournalState", "read_journal", "get_journal_path"],
+    ".deployment": ["build_deployment_graph", "deploy_from_config", "print_deployment_summary"],
+    ".plan": ["PlannedAction", "LiveState", "fetch_live_state", "build_plan", "plan_from_config", "print_plan",
+              "apply_plan"],
+    ".item_deployment": ["ItemDeploymentResult", "read_local_items", "plan_item_changes", "select_item_workspaces",
+                         "deploy_items", "print_item_deployment_report"],
+    ".teardown": ["build_teardown_graph", "build_template_teardown", "build_branch_teardown", "print_teardown_plan",
+                  "run_teardown"],
+    ".jobs": ["JobSpec", "JobRun", "JobRunReport", "resolve_jobs", "run_jobs", "print_job_run_report"],
+    ".audit": ["take_snapshot", "crawl_tenant_state", "store_snapshot", "open_audit_db", "snapshot_at",
+               "who_had_role", "changes_between", "audit_drift"],
+    ".multi_version": ["VersionResult", "expand_templates", "prepare_shared_state", "run_version", "deploy_versions",
+                       "print_version_report"],
+    ".daemon": ["DaemonClient", "serve_daemon", "get_socket_path"],
+}
+
+_MODULE_OF = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_MODULE_OF)
+
+
+def __getattr__(name: str):
+    module = _MODULE_OF.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
@@ -0,0 +1,852 @@
+"""
+Asyncio counterparts of the provisioning functions, so one event loop can drive hundreds of
+concurrent capacity, workspace and git operations.
+
+Requests go over non-blocking keep-alive connections (asyncio streams, pooled per host and
+event loop) and through the same process-wide rate limiter families as the blocking
+functions. Waiting for a slot, a Retry-After or the next poll of an operation awaits
+`asyncio.sleep` instead of holding a thread. Requests are built and responses parsed by the
+same helpers as the blocking functions, and responses come back in the same
+`{status_code, text, headers}` shape. Without service principal credentials, requests run
+`fab api` as an asyncio subprocess.
+
+    from config.fabric_core import aio
+
+    async def provision(workspace_configs):
+        try:
+            return await asyncio.gather(*(aio.create_workspace(config) for config in workspace_configs))
+        finally:
+            await aio.close()
+"""
+
+import os
+import ssl
+import json
+import time
+import asyncio
+import weakref
+import subprocess
+from urllib.parse import urlsplit
+from typing import Any, AsyncIterator, Awaitable, Callable, Sequence
+
+from .utils import (load_local_env_file, use_http_transport, build_fab_api_command, get_fab_cli_executable_path,
+                    read_page, can_fall_back_to_cli)
+from .transport import build_request_url, build_request, build_response, RequestNotSentError
+from .credentials import get_token_provider
+from .tracing import span, current_span, endpoint_template
+from .throttling import (IDEMPOTENT_METHODS, RETRYABLE_STATUS_CODES, FamilyLimiter, get_api_family, get_rate_limiter,
+                         backoff_delay, _read_status)
+from .operations import (PollResult, OperationFailedError, OperationTimeoutError, operation_listener, parse_response,
+                         get_operation_url, get_retry_after, next_delay, read_operation_poll)
+from .capacities import (get_capacity_endpoint, read_capacity_status, read_capacity_readiness,
+                         build_capacity_request_body, build_capacity_update_body)
+from .workspaces import build_role_assignment_request
+from .role_assignments import ADD, CHANGE, RoleAssignmentChange, diff_role_assignments
+from .git_integration import (build_git_connect_request, is_git_connection_uninitialized,
+                              read_update_from_git_request, get_or_create_git_connection as _get_or_create_git_connection)
+
+
+SLOT_WAIT_SECONDS = 0.5  # slots freed by threads do not wake the loop: look again after this long
+
+_STALE_CONNECTION_ERRORS = (asyncio.IncompleteReadError, ConnectionResetError, BrokenPipeError)
+
+
+class AsyncConnectionPool:
+    """Keep-alive connections (stream reader and writer pairs) of one event loop, keyed by scheme, host and port."""
+
+    def __init__(self, max_idle_per_host: int = 64, timeout: float = 60):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self._idle = {}
+        self._ssl_context = None
+
+    async def acquire(self, scheme: str, netloc: str) -> tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        """Returns (reader, writer, reused): an idle connection, or a new one."""
+        idle = self._idle.get((scheme, netloc))
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+
+        parts = urlsplit(f"{scheme}://{netloc}")
+        context = None
+        if scheme == "https":
+            context = self._ssl_context = self._ssl_context or ssl.create_default_context()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(parts.hostname, parts.port or (443 if scheme == "https" else 80), ssl=context),
+                self.timeout)
+        except OSError as e:  # includes connect timeouts and TLS errors
+            raise RequestNotSentError(f"Failed to connect to {netloc}. {e}") from e
+        return reader, writer, False
+
+    def release(self, scheme: str, netloc: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        idle = self._idle.setdefault((scheme, netloc), [])
+        if len(idle) < self.max_idle_per_host:
+            idle.append((reader, writer))
+            return
+        writer.close()
+
+    def close(self) -> None:
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle.clear()
+
+
+class AsyncClient:
+    """The connection pool, token locks and rate limit wake-ups of one event loop."""
+
+    def __init__(self):
+        self.pool = AsyncConnectionPool(timeout=float(os.getenv("FABRIC_CORE_HTTP_TIMEOUT", "60")))
+        self._slot_freed = {}  # family -> asyncio.Condition
+        self._token_locks = {}  # audience -> asyncio.Lock
+
+    def _condition(self, family: str) -> asyncio.Condition:
+        condition = self._slot_freed.get(family)
+        if condition is None:
+            condition = self._slot_freed[family] = asyncio.Condition()
+        return condition
+
+    async def acquire(self, limiter: FamilyLimiter) -> float:
+        """Waits for a slot of the family, the end of any pause and a token. Returns the seconds waited."""
+        started = time.monotonic()
+        condition = self._condition(limiter.family)
+        while True:
+            async with condition:
+                acquired, wait = limiter.try_acquire()
+                if not acquired and not wait:
+                    try:
+                        await asyncio.wait_for(condition.wait(), SLOT_WAIT_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+            if wait:
+                await asyncio.sleep(wait)
+            if acquired:
+                return time.monotonic() - started
+
+    async def release(self, limiter: FamilyLimiter, throttled: bool = False, retry_after: float|None = None) -> None:
+        limiter.release(throttled, retry_after)
+        condition = self._condition(limiter.family)
+        async with condition:
+            condition.notify_all()
+
+    async def get_token(self, audience: str|None = None) -> str:
+        """
+        Returns a cached token, or acquires one in a thread (once per audience, however many tasks ask).
+        Raises RequestNotSentError when no token can be acquired.
+        """
+        provider = get_token_provider()
+        token = provider.get_cached_token(audience)
+        if token:
+            return token
+        lock = self._token_locks.setdefault(audience or "fabric", asyncio.Lock())
+        async with lock:
+            try:
+                return provider.get_cached_token(audience) or await asyncio.to_thread(provider.get_token, audience)
+            except Exception as e:
+                raise RequestNotSentError(f"Failed to get a token for {audience or 'fabric'}. {e}") from e
+
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> AsyncClient:
+    """Returns the client of the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncClient()
+    return client
+
+
+async def close() -> None:
+    """Closes the pooled connections of the running event loop; call before the loop ends."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        client.pool.close()
+
+
+async def _read_response(reader: asyncio.StreamReader) -> tuple[int, dict, bytes, bool]:
+    """Reads one HTTP/1.1 response. Returns (status, headers, body, keep_alive)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("Connection closed by the server")
+    version, status = status_line.decode("latin-1").split(" ", 2)[:2]
+    status = int(status)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";", 1)[0], 16)
+            if size == 0:
+                while await reader.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    elif status in (204, 304) or status < 200:
+        body = b""
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return status, headers, body, keep_alive
+
+
+async def send_http_request(method: str, url: str, body: bytes|None = None,
+                            headers: dict|None = None) -> tuple[int, dict, bytes]:
+    """
+    Sends a request over a pooled connection of the running loop and returns (status, headers, body).
+    When an idempotent request fails on a keep-alive connection the server has since closed,
+    it is sent again once on a new connection; other requests may have reached the server,
+    so their errors are raised. Failures to connect raise RequestNotSentError.
+    """
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    lines = [f"{method.upper()} {path} HTTP/1.1", f"Host: {parts.netloc}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    if body is not None:
+        lines.append(f"Content-Length: {len(body)}")
+    request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b"")
+
+    pool = get_async_client().pool
+    for attempt in range(2):
+        reader, writer, reused = await pool.acquire(parts.scheme, parts.netloc)
+        try:
+            writer.write(request)
+            await writer.drain()
+            status, response_headers, payload, keep_alive = await asyncio.wait_for(_read_response(reader),
+                                                                                   pool.timeout)
+        except _STALE_CONNECTION_ERRORS:
+            writer.close()
+            if attempt == 1 or not reused or method.upper() not in IDEMPOTENT_METHODS:
+                raise
+            current_span().add("http.retries")
+            continue
+        except BaseException:
+            writer.close()
+            raise
+
+        if keep_alive:
+            pool.release(parts.scheme, parts.netloc, reader, writer)
+        else:
+            writer.close()
+        return status, response_headers, payload
+
+
+async def call_rest_api_over_http(api_endpoint: str, method: str = "get",
+                                  request_body: dict|None = None, audience: str|None = None,
+                                  params: dict|None = None) -> subprocess.CompletedProcess:
+    """Calls a Fabric or Azure REST API endpoint without blocking the loop; same result as the blocking call."""
+    url = build_request_url(api_endpoint, audience, params)
+    client = get_async_client()
+    current = current_span()
+    started = time.perf_counter()
+    headers, body = build_request(method, request_body, await client.get_token(audience))
+    current.set(**{"http.token_seconds": time.perf_counter() - started})
+
+    started = time.perf_counter()
+    status, response_headers, payload = await send_http_request(method, url, body=body, headers=headers)
+    if status == 401:
+        # The token was revoked or the credentials were rotated: retry once with a fresh one.
+        current.add("http.retries")
+        get_token_provider().invalidate(audience or "fabric")
+        headers["Authorization"] = f"Bearer {await client.get_token(audience)}"
+        status, response_headers, payload = await send_http_request(method, url, body=body, headers=headers)
+    current.set(**{"http.server_seconds": time.perf_counter() - started})
+    return build_response(method, url, status, response_headers, payload)
+
+
+async def run_fabric_cli_command(cmd: list[str]) -> subprocess.CompletedProcess:
+    """Runs a Fabric CLI command as an asyncio subprocess and returns the completed process."""
+    full_cmd = [get_fab_cli_executable_path(), *cmd]
+    name = f"fab {cmd[0]} {endpoint_template(cmd[1])}" if cmd[:1] == ["api"] and len(cmd) > 1 else f"fab {cmd[0]}"
+    with span(name, kind="cli", **{"process.command": cmd[0] if cmd else ""}) as current:
+        process = await asyncio.create_subprocess_exec(*full_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            stdout, stderr = await process.communicate()
+        except BaseException:
+            process.kill()
+            raise
+        current.set(**{"process.exit_code": process.returncode})
+    return subprocess.CompletedProcess(full_cmd, process.returncode, stdout.decode("utf-8", errors="replace"),
+                                       stderr.decode("utf-8", errors="replace"))
+
+
+async def send_with_retries(send: Callable[[], Awaitable], family: str, method: str = "get",
+                            idempotent: bool|None = None, max_attempts: int|None = None):
+    """
+    Sends a request through its family limiter, retrying throttled requests (and, for
+    idempotent ones, server errors) until `max_attempts`. Returns the last response.
+    """
+    limiter = get_rate_limiter().get(family)
+    client = get_async_client()
+    idempotent = method.upper() in IDEMPOTENT_METHODS if idempotent is None else idempotent
+    max_attempts = max_attempts or int(os.getenv("FABRIC_CORE_MAX_ATTEMPTS", "6"))
+    current = current_span()
+
+    for attempt in range(max_attempts):
+        waited = await client.acquire(limiter)
+        if waited > 0.001:
+            current.add("throttle.wait_seconds", waited)
+        try:
+            result = await send()
+        except BaseException:
+            limiter.release()  # waiting tasks find the free slot on their next look
+            raise
+        status_code, retry_after = _read_status(result)
+        throttled = status_code == 429
+        await client.release(limiter, throttled, retry_after)
+
+        retryable = throttled or (idempotent and status_code in RETRYABLE_STATUS_CODES)
+        if not retryable or attempt == max_attempts - 1:
+            return result
+        current.add("http.retries")
+        if throttled:
+            current.add("http.throttled")
+        else:
+            # the limiter only pauses for 429s, so server errors wait here
+            await asyncio.sleep(retry_after if retry_after is not None else backoff_delay(attempt, 1, 30))
+    return result
+
+
+async def _call_azure_fabric_rest_api(api_endpoint: str, method: str, request_body: dict|None, audience: str|None,
+                                      params: dict|None, idempotent: bool|None = None) -> subprocess.CompletedProcess:
+    if use_http_transport():
+        try:
+            current_span().set(**{"fabric.transport": "http"})
+            return await call_rest_api_over_http(api_endpoint, method, request_body, audience, params)
+        except Exception as e:
+            if not can_fall_back_to_cli(e, method, idempotent):
+                raise RuntimeError(f"Failed to run function call_azure_fabric_rest_api over http. {e}") from e
+            print(f"⚠ HTTP transport failed, falling back to Fabric CLI. {e}")
+            from .login import ensure_logged_in
+            await asyncio.to_thread(ensure_logged_in, True)  # the CLI login was skipped for the HTTP transport
+
+    current_span().set(**{"fabric.transport": "cli"})
+    result = await run_fabric_cli_command(build_fab_api_command(api_endpoint, method, request_body, audience, params))
+    if result.returncode == 0:
+        return result
+    raise RuntimeError(f"Failed to run function call_azure_fabric_rest_api. output: {result.stderr}, "
+                       f"return_code: {result.returncode}")
+
+
+async def call_azure_fabric_rest_api(api_endpoint: str, method: str = "get",
+                                     request_body: dict|None = None, audience: str|None = None,
+                                     params: dict|None = None, idempotent: bool|None = None) -> subprocess.CompletedProcess:
+    """
+    Calls a Microsoft Azure and Fabric REST API endpoint, like the blocking
+    `call_azure_fabric_rest_api`: same rate limiter families, retries and result.
+    """
+    load_local_env_file()
+    template = endpoint_template(api_endpoint)
+    with span(f"{method.upper()} {template}", kind="client",
+              **{"http.request.method": method.upper(), "url.template": template,
+                 "fabric.audience": audience or "fabric"}) as current:
+        result = await send_with_retries(
+            lambda: _call_azure_fabric_rest_api(api_endpoint, method, request_body, audience, params, idempotent),
+            get_api_family(api_endpoint, method, audience), method, idempotent)
+        if current.recording:
+            try:
+                current.set(**{"http.response.status_code": json.loads(result.stdout or "{}").get("status_code", 0)})
+            except ValueError:
+                pass
+        return result
+
+
+async def fetch_page(api_endpoint: str, audience: str|None = None,
+                     first_endpoint: str|None = None) -> tuple[list[dict], str|None]:
+    """Fetches one page of a list endpoint and returns (items, next_endpoint)."""
+    response = await call_azure_fabric_rest_api(api_endpoint, audience=audience)
+    return read_page(json.loads(response.stdout or "{}"), api_endpoint, first_endpoint)
+
+
+async def iter_paged_items(api_endpoint: str, audience: str|None = None) -> AsyncIterator[dict]:
+    """Lazily yields the items of a Fabric or ARM list endpoint across all pages."""
+    next_endpoint = api_endpoint
+    while next_endpoint:
+        items, next_endpoint = await fetch_page(next_endpoint, audience, api_endpoint)
+        for item in items:
+            yield item
+
+
+async def list_all_items(api_endpoint: str, audience: str|None = None) -> list[dict]:
+    """Returns the items of a list endpoint across all pages."""
+    return [item async for item in iter_paged_items(api_endpoint, audience)]
+
+
+async def find_item(api_endpoint: str, predicate: Callable[[dict], bool], audience: str|None = None) -> dict|None:
+    """Returns the first item of a list endpoint matching `predicate`, fetching only the pages needed."""
+    async for item in iter_paged_items(api_endpoint, audience):
+        if predicate(item):
+            return item
+    return None
+
+
+# Long-running operations
+
+async def check_operation(operation_url: str, audience: str|None = None) -> PollResult:
+    """Polls an operation URL once."""
+    return read_operation_poll(parse_response(await call_azure_fabric_rest_api(operation_url, audience=audience)))
+
+
+async def poll_until_all(checks: dict[str, Callable[[], Awaitable[PollResult]]], timeout: float = 600,
+                         initial_delay: float = 2.0, max_delay: float = 30.0,
+                         first_delay: float|None = 0, raise_on_error: bool = True) -> dict[str, Any]:
+    """
+    Polls many operations concurrently until all are done, each on its own schedule
+    (Retry-After or backoff). Returns {key: value}; with raise_on_error=False failed or
+    timed out operations map to their exception instead of raising.
+    """
+    deadline = time.monotonic() + timeout
+
+    async def poll(key: str, current) -> Any:
+        delay = first_delay if first_delay is not None else initial_delay
+        attempt = 0
+        while True:
+            if time.monotonic() + delay > deadline:
+                raise OperationTimeoutError(f"Operation {key} did not finish within {timeout} seconds")
+            await asyncio.sleep(delay)
+            current.add("poll.iterations")
+            result = await checks[key]()
+            if result.done:
+                return result.value
+            delay = next_delay(result, attempt, initial_delay, max_delay)
+            attempt += 1
+
+    with span("poll", kind="poll", **{"poll.operations": len(checks)}) as current:
+        keys = list(checks)
+        tasks = [asyncio.ensure_future(poll(key, current)) for key in keys]
+        try:
+            values = await asyncio.gather(*tasks, return_exceptions=not raise_on_error)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+    return dict(zip(keys, values))
+
+
+async def wait_for_operation(response_or_result, audience: str|None = None, timeout: float = 600,
+                             initial_delay: float = 2.0, max_delay: float = 30.0) -> dict:
+    """
+    Waits for the operation started by a 202 response to finish and returns the final document.
+    Responses that are already final (no operation URL) are returned as they are.
+    """
+    result = response_or_result if isinstance(response_or_result, dict) else parse_response(response_or_result)
+    operation_url = get_operation_url(result)
+    if result.get("status_code") != 202 or not operation_url:
+        return result.get("text") if isinstance(result.get("text"), dict) else {}
+
+    listener = operation_listener.get()
+    if listener is not None:
+        listener(operation_url, audience)
+    outcome = await poll_until_all({operation_url: lambda: check_operation(operation_url, audience)},
+                                   timeout=timeout, initial_delay=initial_delay, max_delay=max_delay,
+                                   first_delay=get_retry_after(result))
+    return outcome[operation_url]
+
+
+async def wait_until(check: Callable[[], Awaitable[PollResult]], timeout: float = 600, initial_delay: float = 2.0,
+                     max_delay: float = 30.0) -> Any:
+    """Polls a single condition with backoff until it reports done."""
+    return (await poll_until_all({"condition": check}, timeout=timeout, initial_delay=initial_delay,
+                                 max_delay=max_delay, first_delay=0))["condition"]
+
+
+# Capacities
+
+async def check_capacity_exists(capacity_name: str, resource_group: str) -> bool:
+    """Check if a Fabric capacity exists in Azure."""
+    response = await call_azure_fabric_rest_api(get_capacity_endpoint(capacity_name, resource_group), audience="azure")
+    return json.loads(response.stdout or "{}").get("status_code", 0) == 200
+
+
+async def get_capacity_status(capacity_name: str, resource_group: str) -> tuple[str|None, str|None]:
+    """Return (provisioning_state, state) from ARM. Raises if the ARM call does not return 200."""
+    response = await call_azure_fabric_rest_api(get_capacity_endpoint(capacity_name, resource_group), audience="azure")
+    return read_capacity_status(json.loads(response.stdout or "{}"))
+
+
+async def check_capacity_ready(capacity_name: str, resource_group: str) -> PollResult:
+    """Polls the capacity once."""
+    return read_capacity_readiness(capacity_name, *await get_capacity_status(capacity_name, resource_group))
+
+
+async def wait_for_capacities_ready(capacity_names: list[str], resource_group: str, max_wait_seconds: int = 600,
+                                    poll_seconds: int = 15) -> dict[str, bool]:
+    """Polls several capacities concurrently until each one is ready. Returns {capacity_name: ready}."""
+    outcome = await poll_until_all(
+        {name: lambda name=name: check_capacity_ready(name, resource_group) for name in capacity_names},
+        timeout=max_wait_seconds, initial_delay=2, max_delay=poll_seconds, raise_on_error=False,
+    )
+
+    ready = {}
+    for name in capacity_names:
+        ready[name] = outcome.get(name) is True
+        if not ready[name]:
+            print(f"✗ {name} not ready after {max_wait_seconds} seconds: {outcome.get(name)}")
+    return ready
+
+
+async def wait_for_capacity_ready(capacity_name: str, resource_group: str, max_wait_seconds: int = 600,
+                                  poll_seconds: int = 15) -> bool:
+    """Poll until capacity is ready. Returns True if ready, False otherwise."""
+    return (await wait_for_capacities_ready([capacity_name], resource_group, max_wait_seconds,
+                                            poll_seconds))[capacity_name]
+
+
+async def create_capacity(capacity_config: dict, resource_group: str, defaults: dict, inventory=None) -> None:
+    """
+    Create a Fabric capacity if it does not already exist.
+    With an inventory snapshot, existence is looked up locally instead of through ARM.
+    Raises when the capacity does not become ready, so nothing is deployed onto it.
+    """
+    capacity_name = capacity_config["name"]
+
+    exists = (inventory.has_capacity(capacity_name) if inventory is not None
+              else await check_capacity_exists(capacity_name, resource_group))
+    if exists:
+        print(f"✓ {capacity_name} exists")
+        if inventory is not None and inventory.get_capacity_status(capacity_name)[0] in ("Provisioning", "Updating"):
+            if not await wait_for_capacity_ready(capacity_name, resource_group):
+                raise RuntimeError(f"Capacity {capacity_name} exists but did not become ready")
+        return
+
+    response = await call_azure_fabric_rest_api(get_capacity_endpoint(capacity_name, resource_group), method="put",
+                                                request_body=build_capacity_request_body(capacity_config, defaults),
+                                                audience="azure")
+    result = json.loads(response.stdout or "{}")
+    if result.get("status_code", 0) not in [200, 201, 202]:
+        raise RuntimeError(f"Failed to create capacity {capacity_name}: {result}")
+
+    print(f"✓ Created {capacity_name}")
+    await wait_for_operation(result, audience="azure")
+    if not await wait_for_capacity_ready(capacity_name, resource_group):
+        raise RuntimeError(f"Capacity {capacity_name} was created but did not become ready")
+    if inventory is not None:
+        inventory.record_capacity(capacity_name, result.get("text", {}) or {})
+
+
+async def update_capacity(capacity_name: str, resource_group: str, sku: str|None = None,
+                          admin_members: list[str]|None = None) -> None:
+    """
+    Update the SKU and/or administrators of an existing capacity and wait for the update to finish.
+    Raises when the capacity does not become ready again.
+    """
+    response = await call_azure_fabric_rest_api(get_capacity_endpoint(capacity_name, resource_group), method="patch",
+                                                request_body=build_capacity_update_body(sku, admin_members),
+                                                audience="azure")
+    result = json.loads(response.stdout or "{}")
+    if result.get("status_code", 0) not in [200, 202]:
+        raise RuntimeError(f"Failed to update capacity {capacity_name}: {result}")
+
+    await wait_for_operation(result, audience="azure")
+    if not await wait_for_capacity_ready(capacity_name, resource_group):
+        raise RuntimeError(f"Capacity {capacity_name} was updated but did not become ready")
+    print(f"✓ Updated {capacity_name}")
+
+
+async def delete_capacity(capacity_name: str, resource_group: str, wait: bool = True) -> None:
+    """Delete a Fabric capacity and (with `wait`) follow the delete operation. A missing capacity counts as deleted."""
+    response = await call_azure_fabric_rest_api(get_capacity_endpoint(capacity_name, resource_group), method="delete",
+                                                audience="azure")
+    result = json.loads(response.stdout or "{}")
+    status_code = result.get("status_code", 0)
+
+    if status_code == 204:
+        print(f"✓ {capacity_name} does not exist")
+        return
+    if status_code not in [200, 202]:
+        raise RuntimeError(f"Failed to delete capacity {capacity_name}: {result}")
+    if wait:
+        await wait_for_operation(result, audience="azure")
+    print(f"✓ Deleted {capacity_name}")
+
+
+async def _run_capacity_action(capacity_name: str, resource_group: str, action: str, max_attempts: int = 5,
+                               wait: bool = True) -> bool:
+    label = "Suspended" if action == "suspend" else "Resumed"
+    for attempt in range(max_attempts):
+        response = await call_azure_fabric_rest_api(get_capacity_endpoint(capacity_name, resource_group, action),
+                                                    method="post", audience="azure", idempotent=True)
+        result = json.loads(response.stdout or "{}")
+        if result.get("status_code", 0) in [200, 202]:
+            if wait:
+                try:
+                    await wait_for_operation(result, audience="azure")
+                except (OperationFailedError, OperationTimeoutError) as e:
+                    print(f"✗ {action.capitalize()} of {capacity_name} did not complete: {e}")
+                    return False
+                print(f"✓ {label} {capacity_name}")
+            else:
+                print(f"✓ Requested {action} of {capacity_name}")
+            return True
+        if attempt < max_attempts - 1:
+            retry_after = get_retry_after(result)
+            await asyncio.sleep(retry_after if retry_after is not None else backoff_delay(attempt, 5, 60))
+
+    print(f"✗ Failed to {action} {capacity_name}")
+    return False
+
+
+async def suspend_capacity(capacity_name: str, resource_group: str, max_attempts: int = 5, wait: bool = True) -> bool:
+    """Suspend a Fabric capacity to stop billing, waiting for the suspend operation to finish."""
+    return await _run_capacity_action(capacity_name, resource_group, "suspend", max_attempts, wait)
+
+
+async def resume_capacity(capacity_name: str, resource_group: str, max_attempts: int = 5, wait: bool = True) -> bool:
+    """Resume a paused Fabric capacity."""
+    return await _run_capacity_action(capacity_name, resource_group, "resume", max_attempts, wait)
+
+
+# Workspaces
+
+async def find_workspace(workspace_name: str) -> dict|None:
+    """Looks a workspace up by displayName, fetching only the pages needed."""
+    return await find_item("workspaces", lambda item: item.get("displayName") == workspace_name)
+
+
+async def get_workspace_id(workspace_name: str) -> str|None:
+    """Get the UUID of a workspace by name."""
+    return ((await find_workspace(workspace_name)) or {}).get("id")
+
+
+async def _get_fabric_capacity_id(capacity_name: str, inventory=None) -> str|None:
+    if inventory is None:
+        capacity = await find_item("capacities", lambda item: item.get("displayName") == capacity_name)
+        return (capacity or {}).get("id")
+    capacity_id = inventory.get_fabric_capacity_id(capacity_name, refresh=False)
+    if capacity_id is not None:
+        return capacity_id
+    # a miss refreshes the inventory's capacity list, which is blocking
+    return await asyncio.to_thread(inventory.get_fabric_capacity_id, capacity_name)
+
+
+async def create_workspace(workspace_config: dict, inventory=None) -> str|None:
+    """
+    Creates a Fabric workspace on its capacity unless it exists, and returns its id.
+    With an inventory snapshot, existing workspaces are resolved locally and new ones are recorded.
+    """
+    workspace_name = workspace_config["name"]
+    if inventory is not None:
+        workspace_id = inventory.get_workspace_id(workspace_name)
+    else:
+        workspace_id = await get_workspace_id(workspace_name)
+    if workspace_id:
+        print(f"✓ {workspace_name} exists")
+        return workspace_id
+
+    capacity_id = await _get_fabric_capacity_id(workspace_config["capacity"], inventory)
+    if not capacity_id:
+        raise RuntimeError(f"Capacity {workspace_config['capacity']} of {workspace_name} not found")
+
+    response = await call_azure_fabric_rest_api("workspaces", method="post",
+                                                request_body={"displayName": workspace_name, "capacityId": capacity_id})
+    response_json = json.loads(response.stdout or "{}")
+    error_text = response_json.get("text")
+    if response_json.get("status_code") in [200, 201]:
+        workspace_id = (error_text or {}).get("id")
+    elif isinstance(error_text, dict) and error_text.get("errorCode") == "WorkspaceNameAlreadyExists":
+        workspace_id = await get_workspace_id(workspace_name)
+    else:
+        raise RuntimeError(f"Failed to create workspace {workspace_name}: {response_json}")
+    print(f"✓ Created {workspace_name}")
+
+    if workspace_id and inventory is not None:
+        inventory.record_workspace(workspace_name, workspace_id)
+    return workspace_id
+
+
+async def list_role_assignments(workspace_id: str) -> list[dict]:
+    """Returns all role assignments of a workspace."""
+    return await list_all_items(f"workspaces/{workspace_id}/roleAssignments")
+
+
+async def add_role_assignment(workspace_id: str, group_id: str, role: str) -> None:
+    """Grants a security group a role on a workspace."""
+    response = await call_azure_fabric_rest_api(f"workspaces/{workspace_id}/roleAssignments", method="post",
+                                                request_body=build_role_assignment_request(group_id, role))
+    response_json = json.loads(response.stdout)
+    if response_json.get("status_code") not in [200, 201]:
+        raise RuntimeError(f"Failed to assign {role} to {group_id}: {response_json}")
+
+
+async def update_role_assignment(workspace_id: str, role_assignment_id: str, role: str) -> None:
+    """Changes the role of an existing workspace role assignment."""
+    response = await call_azure_fabric_rest_api(f"workspaces/{workspace_id}/roleAssignments/{role_assignment_id}",
+                                                method="patch", request_body={"role": role})
+    response_json = json.loads(response.stdout)
+    if response_json.get("status_code") != 200:
+        raise RuntimeError(f"Failed to change role assignment {role_assignment_id} to {role}: {response_json}")
+
+
+async def delete_role_assignment(workspace_id: str, role_assignment_id: str) -> None:
+    """Removes a role assignment from a workspace."""
+    response = await call_azure_fabric_rest_api(f"workspaces/{workspace_id}/roleAssignments/{role_assignment_id}",
+                                                method="delete")
+    response_json = json.loads(response.stdout)
+    if response_json.get("status_code") not in [200, 204]:
+        raise RuntimeError(f"Failed to delete role assignment {role_assignment_id}: {response_json}")
+
+
+async def apply_role_assignment_change(change: RoleAssignmentChange) -> None:
+    if change.operation == ADD:
+        await add_role_assignment(change.workspace_id, change.principal_id, change.role)
+    elif change.operation == CHANGE:
+        await update_role_assignment(change.workspace_id, change.role_assignment_id, change.role)
+    else:
+        await delete_role_assignment(change.workspace_id, change.role_assignment_id)
+
+
+async def assign_permissions(workspace_id: str, permissions: Sequence[dict], security_groups: dict,
+                             workspace_name: str|None = None) -> None:
+    """
+    Assigns the workspace roles of `permissions`: reads the existing role assignments once
+    and adds the missing ones or changes wrong roles, concurrently. Raises ValueError for a
+    group missing from `security_groups`, like the blocking `assign_permissions`.
+    """
+    changes = diff_role_assignments(workspace_name or workspace_id, workspace_id,
+                                    await list_role_assignments(workspace_id), permissions, security_groups,
+                                    prune=False)
+    await asyncio.gather(*(apply_role_assignment_change(change) for change in changes))
+    for change in changes:
+        print(f"  ✓ {change.describe()}")
+    if not changes:
+        print("  ✓ Permissions already up to date")
+
+
+async def delete_workspace(workspace_id: str, workspace_name: str) -> bool:
+    """Deletes a workspace."""
+    response = await call_azure_fabric_rest_api(f"workspaces/{workspace_id}", method="delete")
+    response_json = json.loads(response.stdout)
+    if response_json.get("status_code") in [200, 204]:
+        print(f"✓ Deleted {workspace_name}")
+        return True
+    print(f"✗ Failed to delete {workspace_name}: {response_json}")
+    return False
+
+
+# Git integration
+
+async def get_or_create_git_connection(git_config: dict) -> str|None:
+    """
+    Returns the id of the GitHub connection, creating it if needed. Runs in a thread on the
+    process-wide connection registry, so concurrent callers never create duplicates.
+    """
+    return await asyncio.to_thread(_get_or_create_git_connection, git_config)
+
+
+async def connect_workspace_to_git(workspace_id: str, workspace_name: str, directory_name: str, git_config: dict,
+                                   connection_id: str) -> bool:
+    """Connects a workspace to a folder of the GitHub repo."""
+    response = await call_azure_fabric_rest_api(
+        f"workspaces/{workspace_id}/git/connect", method="post",
+        request_body=build_git_connect_request(directory_name, git_config, connection_id))
+    if json.loads(response.stdout).get("status_code") in [200, 201]:
+        print(f"✓ Connected {workspace_name} to Git: {directory_name}")
+        return True
+    return False
+
+
+async def get_git_status(workspace_id: str) -> dict:
+    """
+    Returns the `{status_code, text}` git status of a workspace.
+    An uninitialized git connection is initialized first.
+    """
+    status_response = await call_azure_fabric_rest_api(f"workspaces/{workspace_id}/git/status")
+    if not status_response.stdout.strip():
+        return {}
+    status_json = json.loads(status_response.stdout)
+
+    if is_git_connection_uninitialized(status_json):
+        print("  → Initializing Git connection")
+        init_response = await call_azure_fabric_rest_api(f"workspaces/{workspace_id}/git/initializeConnection",
+                                                         method="post")
+        await wait_for_operation(init_response)
+        status_response = await call_azure_fabric_rest_api(f"workspaces/{workspace_id}/git/status")
+        status_json = json.loads(status_response.stdout)
+    return status_json
+
+
+async def initialize_git_connection(workspace_id: str, strategy: str = "PreferRemote") -> dict:
+    """Initializes a freshly connected workspace and waits for the operation. Returns the final document."""
+    response = await call_azure_fabric_rest_api(f"workspaces/{workspace_id}/git/initializeConnection", method="post",
+                                                request_body={"initializationStrategy": strategy})
+    response_json = json.loads(response.stdout or "{}")
+    if response_json.get("status_code") not in [200, 202]:
+        raise RuntimeError(f"Failed to initialize git connection of {workspace_id}: {response_json}")
+    return await wait_for_operation(response_json)
+
+
+async def update_workspace_from_git(workspace_id: str, workspace_name: str, wait: bool = True) -> bool:
+    """
+    Update workspace content from Git (pull from Git).
+    With `wait`, the long-running update operation is followed until it finishes.
+    """
+    try:
+        status_json = await get_git_status(workspace_id)
+    except json.JSONDecodeError:
+        print("  ⚠ Failed to parse Git status")
+        return False
+    except (OperationFailedError, OperationTimeoutError) as e:
+        print(f"  ⚠ Failed to initialize Git connection: {e}")
+        return False
+
+    update_request = read_update_from_git_request(status_json)
+    if update_request is None:
+        return False
+
+    update_response = await call_azure_fabric_rest_api(f"workspaces/{workspace_id}/git/updateFromGit",
+                                                       method="post", request_body=update_request)
+    if not update_response.stdout.strip():
+        return True  # Empty response is acceptable
+
+    try:
+        response_json = json.loads(update_response.stdout)
+        if response_json.get("status_code") in [200, 201, 202]:
+            if wait:
+                await wait_for_operation(response_json)
+            print(f"  ✓ Updated {workspace_name} from Git")
+            return True
+    except json.JSONDecodeError:
+        pass
+    except (OperationFailedError, OperationTimeoutError) as e:
+        print(f"  ⚠ Update from Git failed: {e}")
+        return False
+
+    print("  ⚠ Update from Git may have failed")
+    return False
+
+
+async def get_git_connection(workspace_id: str) -> dict:
+    """Returns the git connection of a workspace: gitConnectionState and gitProviderDetails."""
+    response = await call_azure_fabric_rest_api(f"workspaces/{workspace_id}/git/connection")
+    response_json = json.loads(response.stdout)
+    if response_json.get("status_code") != 200:
+        raise RuntimeError(f"Failed to get git connection of {workspace_id}: {response_json}")
+    return response_json.get("text", {}) or {}
+
+
+async def disconnect_workspace_from_git(workspace_id: str, workspace_name: str) -> bool:
+    """Disconnects a workspace from its git repo."""
+    response = await call_azure_fabric_rest_api(f"workspaces/{workspace_id}/git/disconnect", method="post")
+    if json.loads(response.stdout).get("status_code") == 200:
+        print(f"✓ Disconnected {workspace_name} from Git")
+        return True
+    return False
@@ -0,0 +1,375 @@
+"""
+Audit snapshots of the tenant state a template describes, kept in a local SQLite store.
+
+A snapshot crawls, in parallel, every capacity (state, SKU, admins), workspace
+(capacity, role assignments) and git binding (branch, directory, head commit) of the
+template. Only what changed since the previous snapshot is written: every row carries
+the snapshot it appeared in (`valid_from`) and the snapshot it disappeared or changed
+in (`valid_to`, NULL while current). "Who had Admin on prod-consumption last Tuesday"
+and drift checks are then indexed local queries instead of live API calls.
+
+The store lives in FABRIC_CORE_AUDIT_DB (default `.fabric_core/audit.sqlite`).
+"""
+
+import os
+import json
+import sqlite3
+from pathlib import Path
+from dataclasses import dataclass, field
+from datetime import datetime, time as dt_time, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+from .inventory import Inventory, load_inventory
+from .utils import call_azure_fabric_rest_api
+from .workspaces import list_role_assignments
+from .git_integration import get_git_connection
+
+
+DEFAULT_AUDIT_DB = Path(".fabric_core") / "audit.sqlite"
+
+# table -> (key columns, value columns); a row changes when any value column changes
+TABLES = {
+    "capacities": (("name",), ("state", "sku", "region", "admins")),
+    "workspaces": (("name",), ("workspace_id", "capacity")),
+    "role_assignments": (("workspace", "principal_id"), ("principal_type", "principal_name", "role")),
+    "git_bindings": (("workspace",), ("state", "repository", "branch", "directory", "head")),
+}
+# the column naming the template resource a row belongs to
+SCOPE_COLUMN = {"capacities": "name", "workspaces": "name", "role_assignments": "workspace", "git_bindings": "workspace"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    taken_at TEXT NOT NULL,
+    solution_version TEXT,
+    template TEXT,
+    changes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_snapshots_taken_at ON snapshots (taken_at);
+"""
+
+
+@dataclass
+class Crawl:
+    """
+    What one crawl saw: rows per table, the capacity and workspace names it covered, and
+    the workspaces whose role assignments or git binding could not be read.
+    """
+    capacities: set[str] = field(default_factory=set)
+    workspaces: set[str] = field(default_factory=set)
+    rows: dict[str, list[dict]] = field(default_factory=lambda: {table: [] for table in TABLES})
+    unreadable: dict[str, set[str]] = field(default_factory=lambda: {table: set() for table in TABLES})
+    errors: list[str] = field(default_factory=list)
+
+
+def get_audit_db_path(path: str|Path|None = None) -> Path:
+    return Path(path or os.getenv("FABRIC_CORE_AUDIT_DB") or DEFAULT_AUDIT_DB)
+
+
+def open_audit_db(path: str|Path|None = None) -> sqlite3.Connection:
+    """Opens (and if needed creates) the audit store."""
+    path = get_audit_db_path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    for table, (keys, values) in TABLES.items():
+        columns = ", ".join(f"{column} TEXT" for column in (*keys, *values))
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns}, "
+                           f"valid_from INTEGER NOT NULL, valid_to INTEGER)")
+        connection.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_key ON {table} ({', '.join(keys)}, valid_from)")
+        connection.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_current ON {table} (valid_to)")
+    connection.execute("CREATE INDEX IF NOT EXISTS ix_role_assignments_principal "
+                       "ON role_assignments (principal_id, valid_from)")
+    return connection
+
+
+def _read_git_head(workspace_id: str) -> str|None:
+    """Reads the workspace head of an initialized git connection (without initializing anything)."""
+    response = json.loads(call_azure_fabric_rest_api(f"workspaces/{workspace_id}/git/status").stdout or "{}")
+    if response.get("status_code") != 200:
+        return None
+    return (response.get("text") or {}).get("workspaceHead")
+
+
+def crawl_tenant_state(config: dict, inventory: Inventory|None = None, max_workers: int = 8) -> Crawl:
+    """
+    Reads the capacities and workspaces of a template, and per workspace (concurrently)
+    its role assignments and git binding.
+    """
+    if inventory is None:
+        inventory = load_inventory(config["azure"]["capacity_defaults"]["resource_group"], connections=False)
+    inventory.refresh_fabric_capacities()
+    group_names = {group_id: name for name, group_id in config["azure"].get("security_groups", {}).items()}
+    crawl = Crawl({capacity["name"] for capacity in config.get("capacities", [])},
+                  {workspace["name"] for workspace in config.get("workspaces", [])})
+
+    for capacity in config.get("capacities", []):
+        live = inventory.get_capacity(capacity["name"])
+        if live is None:
+            continue
+        properties = live.get("properties") or {}
+        crawl.rows["capacities"].append({
+            "name": capacity["name"], "state": properties.get("state"), "sku": (live.get("sku") or {}).get("name"),
+            "region": live.get("location"),
+            "admins": ",".join(sorted((properties.get("administration") or {}).get("members") or [])),
+        })
+
+    existing = []
+    for workspace in config.get("workspaces", []):
+        workspace_id = inventory.get_workspace_id(workspace["name"])
+        if workspace_id:
+            capacity_id = inventory.get_workspace(workspace["name"]).get("capacityId")
+            crawl.rows["workspaces"].append({"name": workspace["name"], "workspace_id": workspace_id,
+                                             "capacity": inventory.get_fabric_capacity_name(capacity_id)})
+            existing.append((workspace["name"], workspace_id))
+
+    def read(name: str, workspace_id: str) -> None:
+        try:
+            for assignment in list_role_assignments(workspace_id):
+                principal = assignment.get("principal") or {}
+                crawl.rows["role_assignments"].append({
+                    "workspace": name, "principal_id": principal.get("id"), "principal_type": principal.get("type"),
+                    "principal_name": group_names.get(principal.get("id")) or principal.get("displayName"),
+                    "role": assignment.get("role"),
+                })
+        except Exception as e:
+            crawl.unreadable["role_assignments"].add(name)
+            crawl.errors.append(f"{name} role assignments: {e}")
+
+        try:
+            connection = get_git_connection(workspace_id)
+            state = connection.get("gitConnectionState")
+            if state and state != "NotConnected":
+                details = connection.get("gitProviderDetails") or {}
+                crawl.rows["git_bindings"].append({
+                    "workspace": name, "state": state,
+                    "repository": f"{details.get('ownerName')}/{details.get('repositoryName')}",
+                    "branch": details.get("branchName"), "directory": details.get("directoryName"),
+                    "head": _read_git_head(workspace_id) if state == "ConnectedAndInitialized" else None,
+                })
+        except Exception as e:
+            crawl.unreadable["git_bindings"].add(name)
+            crawl.errors.append(f"{name} git binding: {e}")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        list(pool.map(lambda item: read(*item), existing))
+    return crawl
+
+
+def store_snapshot(connection: sqlite3.Connection, crawl: Crawl, solution_version: str|None = None,
+                   template: str|None = None, taken_at: datetime|None = None) -> tuple[int, int]:
+    """
+    Records a crawl as a new snapshot, writing only rows that appeared, changed or disappeared.
+    Rows of other templates and of workspaces that could not be read are left as they were.
+    Returns (snapshot id, changes).
+    """
+    taken_at = (taken_at or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    with connection:
+        snapshot_id = connection.execute(
+            "INSERT INTO snapshots (taken_at, solution_version, template) VALUES (?, ?, ?)",
+            (taken_at.strftime("%Y-%m-%dT%H:%M:%SZ"), solution_version, template)).lastrowid
+        changes = 0
+        for table, (keys, values) in TABLES.items():
+            current = {tuple(row[key] for key in keys): row for row in connection.execute(
+                f"SELECT rowid, * FROM {table} WHERE valid_to IS NULL")}
+            seen = {tuple(row[key] for key in keys): row for row in crawl.rows[table]}
+            scope = SCOPE_COLUMN[table]
+            covered = crawl.capacities if table == "capacities" else crawl.workspaces
+
+            for key, row in current.items():
+                if row[scope] not in covered or row[scope] in crawl.unreadable[table]:
+                    continue
+                new = seen.get(key)
+                if new is None or any(_text(new[column]) != row[column] for column in values):
+                    connection.execute(f"UPDATE {table} SET valid_to = ? WHERE rowid = ?", (snapshot_id, row["rowid"]))
+                    changes += 1
+            for key, row in seen.items():
+                old = current.get(key)
+                if old is None or any(_text(row[column]) != old[column] for column in values):
+                    columns = (*keys, *values)
+                    connection.execute(
+                        f"INSERT INTO {table} ({', '.join(columns)}, valid_from) "
+                        f"VALUES ({', '.join('?' * len(columns))}, ?)",
+                        (*(_text(row[column]) for column in columns), snapshot_id))
+                    changes += 1 if old is None else 0
+        connection.execute("UPDATE snapshots SET changes = ? WHERE id = ?", (changes, snapshot_id))
+    return snapshot_id, changes
+
+
+def _text(value) -> str|None:
+    return None if value is None else str(value)
+
+
+def take_snapshot(config: dict, db_path: str|Path|None = None, inventory: Inventory|None = None,
+                  max_workers: int = 8, template: str|None = None) -> tuple[int, int]:
+    """Crawls the template's resources and stores the delta. Returns (snapshot id, changes)."""
+    crawl = crawl_tenant_state(config, inventory, max_workers)
+    for error in crawl.errors:
+        print(f"⚠ Could not read {error}")
+    connection = open_audit_db(db_path)
+    try:
+        snapshot_id, changes = store_snapshot(connection, crawl, config.get("solution_version"), template)
+    finally:
+        connection.close()
+    print(f"✓ Snapshot {snapshot_id}: {changes} changes since the previous snapshot")
+    return snapshot_id, changes
+
+
+def parse_point_in_time(value: str|datetime|None) -> datetime:
+    """
+    Parses an ISO date or timestamp as UTC. A bare date means the end of that day, so
+    "2026-03-10" answers "who had access on the 10th".
+    """
+    if value is None:
+        return datetime.now(timezone.utc)
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if len(value) == 10:
+            parsed = datetime.combine(parsed.date(), dt_time.max)
+        value = parsed
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def snapshot_at(connection: sqlite3.Connection, at: str|datetime|None = None) -> sqlite3.Row|None:
+    """Returns the last snapshot taken at or before `at` (default: the latest)."""
+    taken_at = parse_point_in_time(at).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return connection.execute("SELECT * FROM snapshots WHERE taken_at <= ? ORDER BY taken_at DESC, id DESC LIMIT 1",
+                              (taken_at,)).fetchone()
+
+
+def rows_at(connection: sqlite3.Connection, table: str, snapshot_id: int, where: str = "",
+            parameters: tuple = ()) -> list[dict]:
+    """Returns the rows of `table` as they were in snapshot `snapshot_id`."""
+    keys, values = TABLES[table]
+    query = (f"SELECT {', '.join((*keys, *values))} FROM {table} "
+             f"WHERE valid_from <= ? AND (valid_to IS NULL OR valid_to > ?)")
+    if where:
+        query += f" AND {where}"
+    rows = connection.execute(f"{query} ORDER BY {', '.join(keys)}", (snapshot_id, snapshot_id, *parameters))
+    return [dict(row) for row in rows]
+
+
+def who_had_role(connection: sqlite3.Connection, workspace: str, role: str|None = None,
+                 at: str|datetime|None = None) -> list[dict]:
+    """
+    Returns the principals with `role` (any role if None) on `workspace` at a point in time.
+    The workspace may be given without its solution version prefix, e.g. `prod-consumption`.
+    """
+    snapshot = snapshot_at(connection, at)
+    if snapshot is None:
+        return []
+    where = "(workspace = ? OR workspace LIKE '%-' || ?)"
+    parameters = (workspace, workspace)
+    if role:
+        where += " AND role = ?"
+        parameters += (role,)
+    return rows_at(connection, "role_assignments", snapshot["id"], where, parameters)
+
+
+def changes_between(connection: sqlite3.Connection, since: str|datetime,
+                    until: str|datetime|None = None) -> list[dict]:
+    """
+    Lists what changed after the snapshot in effect at `since` up to `until`, as
+    {snapshot, taken_at, table, key, change, before, after} in snapshot order.
+    """
+    first, last = snapshot_at(connection, since), snapshot_at(connection, until)
+    if last is None:
+        return []
+    start = first["id"] if first else 0
+    changes = []
+    for table, (keys, values) in TABLES.items():
+        columns = ", ".join((*keys, *values))
+        rows = connection.execute(
+            f"SELECT {columns}, valid_from, valid_to FROM {table} "
+            f"WHERE (valid_from > ? AND valid_from <= ?) OR (valid_to > ? AND valid_to <= ?)",
+            (start, last["id"], start, last["id"])).fetchall()
+        events = {}  # (snapshot, key) -> [before, after]
+        for row in rows:
+            key = tuple(row[column] for column in keys)
+            state = {column: row[column] for column in values}
+            if start < row["valid_from"] <= last["id"]:
+                events.setdefault((row["valid_from"], key), [None, None])[1] = state
+            if row["valid_to"] is not None and start < row["valid_to"] <= last["id"]:
+                events.setdefault((row["valid_to"], key), [None, None])[0] = state
+        for (snapshot_id, key), (before, after) in events.items():
+            change = "added" if before is None else "removed" if after is None else "changed"
+            changes.append({"snapshot": snapshot_id, "table": table, "key": "/".join(str(part) for part in key),
+                            "change": change, "before": before, "after": after})
+    taken_at = dict(connection.execute("SELECT id, taken_at FROM snapshots"))
+    for change in changes:
+        change["taken_at"] = taken_at.get(change["snapshot"])
+    return sorted(changes, key=lambda change: (change["snapshot"], change["table"], change["key"]))
+
+
+def audit_drift(connection: sqlite3.Connection, config: dict, at: str|datetime|None = None) -> list[str]:
+    """
+    Compares a snapshot (default: the latest) with the template, without calling any API.
+    Returns one line per difference.
+    """
+    from .capacities import get_capacity_admins, get_desired_sku
+
+    snapshot = snapshot_at(connection, at)
+    if snapshot is None:
+        return ["No snapshot recorded yet"]
+    snapshot_id = snapshot["id"]
+    defaults = config["azure"]["capacity_defaults"]
+    security_groups = config["azure"].get("security_groups", {})
+    capacities = {row["name"]: row for row in rows_at(connection, "capacities", snapshot_id)}
+    workspaces = {row["name"]: row for row in rows_at(connection, "workspaces", snapshot_id)}
+    bindings = {row["workspace"]: row for row in rows_at(connection, "git_bindings", snapshot_id)}
+    assignments = {}
+    for row in rows_at(connection, "role_assignments", snapshot_id):
+        assignments.setdefault(row["workspace"], {})[row["principal_id"]] = row["role"]
+
+    drift = []
+    for capacity in config.get("capacities", []):
+        name = capacity["name"]
+        live = capacities.get(name)
+        if live is None:
+            drift.append(f"capacity {name}: missing")
+            continue
+        sku = get_desired_sku(capacity, defaults, live["sku"])
+        if live["sku"] != sku:
+            drift.append(f"capacity {name}: sku {live['sku']} (template {sku})")
+        admins = ",".join(sorted(get_capacity_admins(capacity, defaults)))
+        if live["admins"] != admins:
+            drift.append(f"capacity {name}: admins {live['admins'] or '-'} (template {admins or '-'})")
+
+    for workspace in config.get("workspaces", []):
+        name = workspace["name"]
+        live = workspaces.get(name)
+        if live is None:
+            drift.append(f"workspace {name}: missing")
+            continue
+        if live["capacity"] != workspace.get("capacity"):
+            drift.append(f"workspace {name}: capacity {live['capacity']} (template {workspace.get('capacity')})")
+
+        live_roles = assignments.get(name, {})
+        for permission in workspace.get("permissions", []):
+            group_id = security_groups.get(permission.get("group"))
+            if live_roles.get(group_id) != permission.get("role"):
+                drift.append(f"workspace {name}: {permission.get('group')} has "
+                             f"{live_roles.get(group_id) or 'no role'} (template {permission.get('role')})")
+
+        directory = workspace.get("connect_to_git_folder")
+        binding = bindings.get(name)
+        if directory and binding is None:
+            drift.append(f"workspace {name}: not connected to git (template {directory})")
+        elif directory:
+            branch = config["github"].get("branch")
+            if binding["branch"] != branch:
+                drift.append(f"workspace {name}: git branch {binding['branch']} (template {branch})")
+            if (binding["directory"] or "").strip("/") != directory.strip("/"):
+                drift.append(f"workspace {name}: git directory {binding['directory']} (template {directory})")
+    return drift
+
+
+def print_changes(changes: list[dict]) -> None:
+    symbols = {"added": "+", "removed": "-", "changed": "~"}
+    for change in changes:
+        before, after = change["before"] or {}, change["after"] or {}
+        fields = ", ".join(f"{column}: {before.get(column)} -> {after.get(column)}"
+                           for column in (after or before) if before.get(column) != after.get(column))
+        print(f"{symbols[change['change']]} {change['taken_at']} {change['table']} {change['key']}"
+              f"{': ' + fields if change['change'] == 'changed' else ''}")
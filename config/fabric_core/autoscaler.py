@@ -0,0 +1,236 @@
+"""
+Utilization-driven SKU autoscaling for capacities with an `autoscale` block in the template.
+
+On every interval the autoscaler samples each capacity's utilization (percent of its
+capacity units used, plus whether it is throttling) from a metrics feed and applies a
+hysteresis policy:
+
+- scale up one SKU after `up_samples` busy samples in a row (utilization at or above
+  `scale_up_at`, or throttling),
+- scale down one SKU after `down_samples` idle samples in a row (at or below
+  `scale_down_at`), and only if the utilization would still stay below `scale_up_at`
+  on half the capacity units,
+- never outside min_sku..max_sku, and not again until `cooldown_minutes` after a change.
+
+SKU changes are PATCHed through `update_capacity`, which waits for the operation and raises
+unless the capacity becomes ready again; such a change counts as failed (no new SKU, no
+cooldown, no history entry) and is retried on a later sample. Metrics come from a feed: `FileMetricsFeed` reads samples written by
+an exporter (e.g. a notebook reading the Fabric Capacity Metrics app), `SimulatedMetricsFeed`
+replays a series for tests. Time comes from a `Clock`, as in the capacity scheduler.
+"""
+
+import json
+from pathlib import Path
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+from .inventory import Inventory
+from .capacities import FABRIC_SKUS, update_capacity
+from .capacity_scheduler import Clock
+
+
+@dataclass
+class MetricSample:
+    utilization: float  # percent of the capacity units used over the sampling window
+    throttled: bool = False
+    timestamp: float|None = None
+
+
+@dataclass
+class AutoscalePolicy:
+    capacity_name: str
+    min_sku: str
+    max_sku: str
+    cooldown_seconds: float = 900
+    scale_up_at: float = 80
+    scale_down_at: float = 30
+    up_samples: int = 3
+    down_samples: int = 12
+
+    @classmethod
+    def from_config(cls, capacity_config: dict, defaults: dict) -> "AutoscalePolicy|None":
+        """Builds the policy of a capacity from its `autoscale` block over the defaults' one."""
+        autoscale = {**(defaults.get("autoscale") or {}), **(capacity_config.get("autoscale") or {})}
+        if not autoscale:
+            return None
+        sku = capacity_config.get("sku", defaults.get("sku"))
+        return cls(capacity_config["name"], autoscale.get("min_sku", sku), autoscale.get("max_sku", sku),
+                   float(autoscale.get("cooldown_minutes", 15)) * 60, float(autoscale.get("scale_up_at", 80)),
+                   float(autoscale.get("scale_down_at", 30)), int(autoscale.get("up_samples", 3)),
+                   int(autoscale.get("down_samples", 12)))
+
+
+@dataclass
+class CapacityScaleState:
+    sku: str|None = None
+    busy_streak: int = 0
+    idle_streak: int = 0
+    last_change_at: float|None = None
+    history: list[tuple[float, str, str]] = field(default_factory=list)  # (time, from sku, to sku)
+
+
+def decide(policy: AutoscalePolicy, state: CapacityScaleState, sample: MetricSample|None, now: float) -> str|None:
+    """Updates the streaks with a sample and returns the SKU to scale to, or None to stay."""
+    if state.sku not in FABRIC_SKUS:
+        return None
+    index = FABRIC_SKUS.index(state.sku)
+    low, high = FABRIC_SKUS.index(policy.min_sku), FABRIC_SKUS.index(policy.max_sku)
+    if index < low or index > high:
+        return FABRIC_SKUS[min(max(index, low), high)]
+    if sample is None:
+        return None
+
+    if sample.throttled or sample.utilization >= policy.scale_up_at:
+        state.busy_streak, state.idle_streak = state.busy_streak + 1, 0
+    elif sample.utilization <= policy.scale_down_at:
+        state.busy_streak, state.idle_streak = 0, state.idle_streak + 1
+    else:
+        state.busy_streak = state.idle_streak = 0
+
+    if state.last_change_at is not None and now - state.last_change_at < policy.cooldown_seconds:
+        return None
+    if state.busy_streak >= policy.up_samples and index < high:
+        return FABRIC_SKUS[index + 1]
+    # half the capacity units doubles the utilization: only step down if that stays below the busy mark
+    if (state.idle_streak >= policy.down_samples and index > low
+            and sample.utilization * 2 < policy.scale_up_at and not sample.throttled):
+        return FABRIC_SKUS[index - 1]
+    return None
+
+
+class SimulatedMetricsFeed:
+    """Replays {capacity_name: [utilization or (utilization, throttled), ...]}, one value per sample."""
+
+    def __init__(self, series: dict[str, list]):
+        self.series = {name: list(values) for name, values in series.items()}
+
+    def sample(self, capacity_name: str) -> MetricSample|None:
+        values = self.series.get(capacity_name)
+        if not values:
+            return None
+        value = values.pop(0)
+        return MetricSample(*value) if isinstance(value, (tuple, list)) else MetricSample(value)
+
+
+class FileMetricsFeed:
+    """
+    Reads the latest sample per capacity from a JSON file written by an exporter:
+    {"<capacity>": {"utilization": 73.5, "throttled": false, "timestamp": 1760000000}}.
+    Each sample counts once: a sample whose timestamp has not advanced since the last read
+    (the exporter writes less often than the autoscaler samples) is skipped, as are samples
+    without a timestamp and samples older than `max_age_seconds`.
+    """
+
+    def __init__(self, path: str|Path, clock: Clock|None = None, max_age_seconds: float = 900):
+        self.path = Path(path)
+        self.clock = clock or Clock()
+        self.max_age_seconds = max_age_seconds
+        self._last_timestamps = {}  # capacity name -> timestamp of the last sample returned
+
+    def sample(self, capacity_name: str) -> MetricSample|None:
+        try:
+            document = json.loads(self.path.read_text()).get(capacity_name)
+        except (OSError, ValueError):
+            return None
+        if not document or not isinstance(document.get("timestamp"), (int, float)):
+            return None
+        sample = MetricSample(float(document.get("utilization", 0)), bool(document.get("throttled", False)),
+                              float(document["timestamp"]))
+        if self.clock.now() - sample.timestamp > self.max_age_seconds:
+            return None
+        last_timestamp = self._last_timestamps.get(capacity_name)
+        if last_timestamp is not None and sample.timestamp <= last_timestamp:
+            return None
+        self._last_timestamps[capacity_name] = sample.timestamp
+        return sample
+
+
+class CapacityAutoscaler:
+    """Samples every autoscaled capacity of a template on an interval and changes SKUs per its policy."""
+
+    def __init__(self, policies: list[AutoscalePolicy], resource_group: str, feed, inventory: Inventory|None = None,
+                 clock: Clock|None = None, interval_seconds: float = 60, dry_run: bool = False, max_workers: int = 6):
+        self.policies = {policy.capacity_name: policy for policy in policies}
+        self.resource_group = resource_group
+        self.feed = feed
+        self.inventory = inventory or Inventory()
+        self.clock = clock or Clock()
+        self.interval_seconds = interval_seconds
+        self.dry_run = dry_run
+        self.max_workers = max_workers
+        self.states = {name: CapacityScaleState() for name in self.policies}
+
+    @classmethod
+    def from_config(cls, config: dict, feed, **kwargs) -> "CapacityAutoscaler":
+        defaults = config["azure"]["capacity_defaults"]
+        policies = [policy for policy in (AutoscalePolicy.from_config(capacity, defaults)
+                                          for capacity in config.get("capacities", [])) if policy]
+        return cls(policies, defaults["resource_group"], feed, **kwargs)
+
+    def refresh(self) -> None:
+        """Reads the current SKU and state of every capacity with one ARM list call."""
+        self.inventory.refresh_capacities(self.resource_group)
+        capacities = self.inventory.list_capacities()
+        for name, state in self.states.items():
+            capacity = capacities.get(name) or {}
+            state.sku = (capacity.get("sku") or {}).get("name")
+            if (capacity.get("properties") or {}).get("state") != "Active":
+                state.sku = None  # paused or missing: nothing to scale
+
+    def step(self) -> dict[str, tuple[str, str]]:
+        """Takes one sample per capacity and applies the resulting SKU changes concurrently. Returns the changes."""
+        now = self.clock.now()
+        changes = {}
+        for name, policy in self.policies.items():
+            state = self.states[name]
+            if state.sku is None:
+                continue
+            sample = self.feed.sample(name)
+            target = decide(policy, state, sample, now)
+            if target and target != state.sku:
+                utilization = f"{sample.utilization:.0f}%{', throttling' if sample.throttled else ''}" if sample else "-"
+                print(f"{'↑' if FABRIC_SKUS.index(target) > FABRIC_SKUS.index(state.sku) else '↓'} {name}: "
+                      f"{state.sku} -> {target} (utilization {utilization})")
+                changes[name] = (state.sku, target)
+
+        def apply(item) -> tuple[str, bool]:
+            name, (old, new) = item
+            if self.dry_run:
+                return name, True
+            try:
+                update_capacity(name, self.resource_group, sku=new)
+                return name, True
+            except Exception as e:
+                print(f"✗ Could not scale {name} to {new}: {e}")
+                return name, False
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            applied = dict(pool.map(apply, changes.items()))
+        for name, (old, new) in list(changes.items()):
+            state = self.states[name]
+            if not applied[name]:
+                del changes[name]
+                continue
+            state.sku, state.last_change_at = new, self.clock.now()
+            state.busy_streak = state.idle_streak = 0
+            state.history.append((state.last_change_at, old, new))
+        return changes
+
+    def run(self, iterations: int|None = None, refresh_every: int = 10) -> dict[str, CapacityScaleState]:
+        """
+        Samples every `interval_seconds` (forever, or `iterations` times). The SKUs are re-read
+        from ARM every `refresh_every` samples, so manual changes and suspends are noticed.
+        """
+        if not self.policies:
+            print("⚠ No capacity in the template has an autoscale block")
+            return self.states
+        count = 0
+        while iterations is None or count < iterations:
+            if count % max(1, refresh_every) == 0:
+                self.refresh()
+            started = self.clock.now()
+            self.step()
+            count += 1
+            if iterations is None or count < iterations:
+                self.clock.sleep(self.interval_seconds - (self.clock.now() - started))
+        return self.states
@@ -2,22 +2,25 @@
 Functions related to creating and managing Fabric capacities.
 """
 
-import os
 import json
 import time
 
-from .utils import call_azure_fabric_rest_api, load_local_env_file
+from .utils import call_azure_fabric_rest_api, get_subscription_id
+from .operations import (PollResult, OperationFailedError, OperationTimeoutError, backoff_delay,
+                         get_retry_after, poll_until_all, wait_for_operation)
 
-load_local_env_file()
 
-subscription_id = os.getenv("AZURE_SUBSCRIPTION_ID")
+def get_capacity_endpoint(capacity_name: str, resource_group: str, action: str|None = None) -> str:
+    """Returns the ARM endpoint of a capacity, or of one of its actions (suspend, resume)."""
+    path = f"{capacity_name}/{action}" if action else capacity_name
+    return (f"/subscriptions/{get_subscription_id()}/resourceGroups/{resource_group}/providers/"
+            f"Microsoft.Fabric/capacities/{path}?api-version=2023-11-01")
 
 
 def check_capacity_exists(capacity_name: str, resource_group: str) -> bool:
     """Check if a Fabric capacity exists in Azure."""
     response = call_azure_fabric_rest_api(
-        f"/subscriptions/{subscription_id}/resourceGroups/{resource_group}/providers/"
-        f"Microsoft.Fabric/capacities/{capacity_name}?api-version=2023-11-01",
+        get_capacity_endpoint(capacity_name, resource_group),
         audience="azure",
     )
     result = json.loads(response.stdout or "{}")
@@ -31,11 +34,14 @@ def get_capacity_status(capacity_name: str, resource_group: str) -> tuple[str |
     Raises if the ARM call does not return 200.
     """
     response = call_azure_fabric_rest_api(
-        f"/subscriptions/{subscription_id}/resourceGroups/{resource_group}/providers/"
-        f"Microsoft.Fabric/capacities/{capacity_name}?api-version=2023-11-01",
+        get_capacity_endpoint(capacity_name, resource_group),
         audience="azure",
     )
-    result = json.loads(response.stdout or "{}")
+    return read_capacity_status(json.loads(response.stdout or "{}"))
+
+
+def read_capacity_status(result: dict) -> tuple[str | None, str | None]:
+    """Returns (provisioning_state, state) of an ARM capacity response; raises unless it is a 200."""
     status_code = result.get("status_code", 0)
 
     if status_code != 200:
@@ -50,6 +56,27 @@ def get_capacity_status(capacity_name: str, resource_group: str) -> tuple[str |
     return provisioning_state, state
 
 
+def check_capacity_ready(capacity_name: str, resource_group: str) -> PollResult:
+    """
+    Polls the capacity once.
+    Ready means provisioningState == 'Succeeded' and if state exists, state is 'Active' or 'Paused'.
+    """
+    return read_capacity_readiness(capacity_name, *get_capacity_status(capacity_name, resource_group))
+
+
+def read_capacity_readiness(capacity_name: str, prov_state: str|None, state: str|None) -> PollResult:
+    """Turns the states of a capacity into a poll result, printing its progress."""
+    if prov_state == "Succeeded" and state in [None, "Active", "Paused"]:
+        print(f"✓ {capacity_name} is ready (provisioningState={prov_state}, state={state})")
+        return PollResult(True, True)
+
+    if prov_state == "Failed":
+        raise OperationFailedError(f"Provisioning of {capacity_name} failed (state={state})")
+
+    print(f"... waiting for {capacity_name} (provisioningState={prov_state}, state={state})")
+    return PollResult(False)
+
+
 def wait_for_capacity_ready(
     capacity_name: str,
     resource_group: str,
@@ -57,53 +84,112 @@ def wait_for_capacity_ready(
     poll_seconds: int = 15,
 ) -> bool:
     """
-    Poll until capacity is ready.
-    Ready means provisioningState == 'Succeeded' and if state exists, state is 'Active' or 'Paused'.
+    Poll until capacity is ready, backing off from 2 seconds up to `poll_seconds` between polls.
     Returns True if ready, False otherwise.
     """
-    waited = 0
-    while waited < max_wait_seconds:
-        prov_state, state = get_capacity_status(capacity_name, resource_group)
-
-        if prov_state == "Succeeded":
-            if state in ["Active", "Paused"]:
-                print(f"✓ {capacity_name} is ready (provisioningState={prov_state}, state={state})")
-                return True
-
-        print(f"... waiting for {capacity_name} (provisioningState={prov_state}, state={state})")
-        time.sleep(poll_seconds)
-        waited += poll_seconds
-
-    print(f"✗ {capacity_name} not ready after {max_wait_seconds} seconds")
-    return False
+    return wait_for_capacities_ready([capacity_name], resource_group, max_wait_seconds, poll_seconds)[capacity_name]
 
 
-def create_capacity(capacity_config: dict, resource_group: str, defaults: dict) -> None:
+def wait_for_capacities_ready(
+    capacity_names: list[str],
+    resource_group: str,
+    max_wait_seconds: int = 600,
+    poll_seconds: int = 15,
+) -> dict[str, bool]:
     """
-    Create a Fabric capacity if it does not already exist.
+    Poll several capacities from a single loop until each one is ready.
+    Returns {capacity_name: ready}.
     """
-    capacity_name = capacity_config["name"]
+    outcome = poll_until_all(
+        {name: lambda name=name: check_capacity_ready(name, resource_group) for name in capacity_names},
+        timeout=max_wait_seconds, initial_delay=2, max_delay=poll_seconds, raise_on_error=False,
+    )
+
+    ready = {}
+    for name in capacity_names:
+        ready[name] = outcome.get(name) is True
+        if not ready[name]:
+            print(f"✗ {name} not ready after {max_wait_seconds} seconds: {outcome.get(name)}")
+    return ready
 
-    if check_capacity_exists(capacity_name, resource_group):
-        print(f"✓ {capacity_name} exists")
-        return
 
+def get_capacity_admins(capacity_config: dict, defaults: dict) -> list[str]:
+    """Returns the capacity admins from the capacity config or the defaults, as a list."""
     admin_members = capacity_config.get("admin_members", defaults.get("capacity_admins", ""))
-    admin_members = admin_members if isinstance(admin_members, list) else [
+    return admin_members if isinstance(admin_members, list) else [
         admin_id.strip()
         for admin_id in admin_members.split(",")
         if admin_id.strip()
     ]
 
-    request_body = {
+
+FABRIC_SKUS = ("F2", "F4", "F8", "F16", "F32", "F64", "F128", "F256", "F512", "F1024", "F2048")
+
+
+def get_autoscale_range(capacity_config: dict, defaults: dict) -> tuple[str, str]|None:
+    """Returns (min_sku, max_sku) of a capacity's `autoscale` block (over the defaults' one), or None."""
+    autoscale = {**(defaults.get("autoscale") or {}), **(capacity_config.get("autoscale") or {})}
+    if not autoscale:
+        return None
+    sku = capacity_config.get("sku", defaults.get("sku"))
+    return autoscale.get("min_sku", sku), autoscale.get("max_sku", sku)
+
+
+def get_desired_sku(capacity_config: dict, defaults: dict, live_sku: str|None = None) -> str:
+    """
+    The SKU a capacity should have. With autoscale, any live SKU within min_sku..max_sku is
+    what the autoscaler chose and is kept; otherwise it is the template's SKU.
+    """
+    sku = capacity_config.get("sku", defaults.get("sku"))
+    sku_range = get_autoscale_range(capacity_config, defaults)
+    if sku_range and live_sku in FABRIC_SKUS:
+        low, high = (FABRIC_SKUS.index(bound) for bound in sku_range)
+        if low <= FABRIC_SKUS.index(live_sku) <= high:
+            return live_sku
+    return sku
+
+
+def build_capacity_request_body(capacity_config: dict, defaults: dict) -> dict:
+    """Builds the ARM request body for a capacity from its config and the capacity defaults."""
+    return {
         "location": capacity_config.get("region", defaults.get("region")),
         "sku": {"name": capacity_config.get("sku", defaults.get("sku")), "tier": "Fabric"},
-        "properties": {"administration": {"members": admin_members}},
+        "properties": {"administration": {"members": get_capacity_admins(capacity_config, defaults)}},
     }
 
+
+def build_capacity_update_body(sku: str|None = None, admin_members: list[str]|None = None) -> dict:
+    """Builds the ARM PATCH body that changes the SKU and/or administrators of a capacity."""
+    request_body = {}
+    if sku:
+        request_body["sku"] = {"name": sku, "tier": "Fabric"}
+    if admin_members is not None:
+        request_body["properties"] = {"administration": {"members": admin_members}}
+    return request_body
+
+
+def create_capacity(capacity_config: dict, resource_group: str, defaults: dict, inventory=None) -> None:
+    """
+    Create a Fabric capacity if it does not already exist.
+    With an inventory snapshot, existence is looked up locally instead of through ARM.
+    Raises when the capacity does not become ready, so nothing is deployed onto it.
+    """
+    capacity_name = capacity_config["name"]
+
+    exists = (inventory.has_capacity(capacity_name) if inventory is not None
+              else check_capacity_exists(capacity_name, resource_group))
+    if exists:
+        print(f"✓ {capacity_name} exists")
+        # e.g. created by a run that was interrupted before the capacity was ready
+        if inventory is not None and inventory.get_capacity_status(capacity_name)[0] in ("Provisioning", "Updating"):
+            if not wait_for_capacity_ready(capacity_name, resource_group):
+                raise RuntimeError(f"Capacity {capacity_name} exists but did not become ready")
+        return
+
+    request_body = build_capacity_request_body(capacity_config, defaults)
+
     response = call_azure_fabric_rest_api(
-        f"/subscriptions/{subscription_id}/resourceGroups/{resource_group}/providers/"
-        f"Microsoft.Fabric/capacities/{capacity_name}?api-version=2023-11-01",
+        get_capacity_endpoint(capacity_name, resource_group),
         method="put",
         request_body=request_body,
         audience="azure",
@@ -111,28 +197,113 @@ def create_capacity(capacity_config: dict, resource_group: str, defaults: dict)
     result = json.loads(response.stdout or "{}")
     status_code = result.get("status_code", 0)
 
-    if status_code in [200, 201]:
+    if status_code in [200, 201, 202]:
         print(f"✓ Created {capacity_name}")
-        wait_for_capacity_ready(capacity_name, resource_group)
+        wait_for_operation(result, audience="azure")
+        if not wait_for_capacity_ready(capacity_name, resource_group):
+            raise RuntimeError(f"Capacity {capacity_name} was created but did not become ready")
+        if inventory is not None:
+            inventory.record_capacity(capacity_name, result.get("text", {}) or {})
     else:
         raise RuntimeError(f"Failed to create capacity {capacity_name}: {result}")
 
 
-def suspend_capacity(capacity_name: str, resource_group: str) -> bool:
-    """Suspend a Fabric capacity to stop billing."""
-    for _ in range(5):
+def update_capacity(capacity_name: str, resource_group: str, sku: str|None = None,
+                    admin_members: list[str]|None = None) -> None:
+    """
+    Update the SKU and/or administrators of an existing capacity and wait for the update to finish.
+    Raises when the capacity does not become ready again, so the change is not reported as done.
+    """
+    request_body = build_capacity_update_body(sku, admin_members)
+
+    response = call_azure_fabric_rest_api(
+        get_capacity_endpoint(capacity_name, resource_group),
+        method="patch",
+        request_body=request_body,
+        audience="azure",
+    )
+    result = json.loads(response.stdout or "{}")
+    status_code = result.get("status_code", 0)
+
+    if status_code not in [200, 202]:
+        raise RuntimeError(f"Failed to update capacity {capacity_name}: {result}")
+
+    wait_for_operation(result, audience="azure")
+    if not wait_for_capacity_ready(capacity_name, resource_group):
+        raise RuntimeError(f"Capacity {capacity_name} was updated but did not become ready")
+    print(f"✓ Updated {capacity_name}")
+
+
+def delete_capacity(capacity_name: str, resource_group: str, wait: bool = True) -> None:
+    """
+    Delete a Fabric capacity and (with `wait`) follow the delete operation until it finishes.
+    A capacity that does not exist counts as deleted.
+    """
+    response = call_azure_fabric_rest_api(
+        get_capacity_endpoint(capacity_name, resource_group),
+        method="delete",
+        audience="azure",
+    )
+    result = json.loads(response.stdout or "{}")
+    status_code = result.get("status_code", 0)
+
+    if status_code == 204:
+        print(f"✓ {capacity_name} does not exist")
+        return
+    if status_code not in [200, 202]:
+        raise RuntimeError(f"Failed to delete capacity {capacity_name}: {result}")
+    if wait:
+        wait_for_operation(result, audience="azure")
+    print(f"✓ Deleted {capacity_name}")
+
+
+def _run_capacity_action(capacity_name: str, resource_group: str, action: str, max_attempts: int = 5,
+                         wait: bool = True) -> bool:
+    """
+    POSTs a suspend/resume action, retrying with backoff (or the Retry-After the service
+    asks for), and with `wait` follows the resulting operation until it finishes.
+    """
+    label = "Suspended" if action == "suspend" else "Resumed"
+    for attempt in range(max_attempts):
         response = call_azure_fabric_rest_api(
-            f"/subscriptions/{subscription_id}/resourceGroups/{resource_group}/providers/"
-            f"Microsoft.Fabric/capacities/{capacity_name}/suspend?api-version=2023-11-01",
+            get_capacity_endpoint(capacity_name, resource_group, action),
             method="post",
             audience="azure",
+            idempotent=True,
         )
         result = json.loads(response.stdout or "{}")
         status_code = result.get("status_code", 0)
         if status_code in [200, 202]:
-            print(f"✓ Suspended {capacity_name}")
+            if wait:
+                try:
+                    wait_for_operation(result, audience="azure")
+                except (OperationFailedError, OperationTimeoutError) as e:
+                    print(f"✗ {action.capitalize()} of {capacity_name} did not complete: {e}")
+                    return False
+                print(f"✓ {label} {capacity_name}")
+            else:
+                print(f"✓ Requested {action} of {capacity_name}")
             return True
-        time.sleep(60)
+        if attempt < max_attempts - 1:
+            retry_after = get_retry_after(result)
+            time.sleep(retry_after if retry_after is not None else backoff_delay(attempt, 5, 60))
 
-    print(f"✗ Failed to suspend {capacity_name}")
+    print(f"✗ Failed to {action} {capacity_name}")
     return False
+
+
+def suspend_capacity(capacity_name: str, resource_group: str, max_attempts: int = 5, wait: bool = True) -> bool:
+    """
+    Suspend a Fabric capacity to stop billing.
+    Retries with backoff (or the Retry-After the service asks for) and waits for the
+    suspend operation to finish.
+    """
+    return _run_capacity_action(capacity_name, resource_group, "suspend", max_attempts, wait)
+
+
+def resume_capacity(capacity_name: str, resource_group: str, max_attempts: int = 5, wait: bool = True) -> bool:
+    """
+    Resume a paused Fabric capacity.
+    With `wait=False` only the resume request is issued, so callers can track readiness themselves.
+    """
+    return _run_capacity_action(capacity_name, resource_group, "resume", max_attempts, wait)
@@ -0,0 +1,189 @@
+"""
+Predictive resume/suspend scheduling for capacities that are only needed during job windows.
+
+The scheduler remembers how long each capacity took to go from Paused to Active
+and issues the resume that much earlier (plus a margin), so the capacity is Active
+when the job window opens. Capacities are suspended as soon as the job reports done.
+Several capacities are handled from one loop. Time comes from a `Clock`, so the
+schedule logic can run against a fake clock.
+"""
+
+import os
+import json
+import time
+import heapq
+import itertools
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from .capacities import get_capacity_status, resume_capacity, suspend_capacity
+
+
+DEFAULT_HISTORY_PATH = Path(".fabric_core") / "capacity_warmup.json"
+
+
+class Clock:
+    """Wall clock. Replace with a fake implementing now() and sleep() to test schedules."""
+
+    def now(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class WarmupHistory:
+    """
+    Measured Paused -> Active durations per capacity, persisted as JSON.
+    """
+
+    def __init__(self, path: str|Path|None = None, max_samples: int = 20):
+        self.path = Path(path or os.getenv("CAPACITY_WARMUP_HISTORY", DEFAULT_HISTORY_PATH))
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.samples = {}
+        if self.path.exists():
+            self.samples = json.loads(self.path.read_text() or "{}")
+
+    def record(self, capacity_name: str, seconds: float) -> None:
+        with self._lock:
+            samples = self.samples.setdefault(capacity_name, [])
+            samples.append(round(seconds, 1))
+            del samples[:-self.max_samples]
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self.samples, indent=2))
+
+    def estimate(self, capacity_name: str, default: float = 120.0, percentile: float = 0.9) -> float:
+        """Returns the given percentile of the recorded warm-up times, or `default` without history."""
+        with self._lock:
+            samples = sorted(self.samples.get(capacity_name, []))
+        if not samples:
+            return default
+        index = min(len(samples) - 1, int(round(percentile * (len(samples) - 1))))
+        return samples[index]
+
+
+@dataclass
+class CapacityWindow:
+    capacity_name: str
+    resource_group: str
+    start_at: float  # epoch seconds when the job window opens
+    resume_at: float|None = None
+    state: str = "scheduled"  # scheduled | resuming | active | failed
+    resume_requested_at: float|None = None
+    active_at: float|None = None
+    error: str|None = None
+
+    @property
+    def lateness(self) -> float|None:
+        """Seconds the capacity became Active after the window opened (negative means early)."""
+        return None if self.active_at is None else self.active_at - self.start_at
+
+
+def plan_resume_times(windows: list[CapacityWindow], history: WarmupHistory, margin_seconds: float = 30,
+                      default_warmup: float = 120.0) -> list[CapacityWindow]:
+    """Sets resume_at = start_at - estimated warm-up - margin on every window."""
+    for window in windows:
+        window.resume_at = window.start_at - history.estimate(window.capacity_name, default_warmup) - margin_seconds
+    return windows
+
+
+def run_resume_schedule(windows: list[CapacityWindow], history: WarmupHistory|None = None, clock: Clock|None = None,
+                        margin_seconds: float = 30, poll_seconds: float = 10,
+                        timeout_seconds: float = 1800) -> list[CapacityWindow]:
+    """
+    Resumes each capacity at its planned time and polls until it is Active, all from one loop.
+    Measured warm-up times are added to the history.
+    """
+    history = history or WarmupHistory()
+    clock = clock or Clock()
+    plan_resume_times(windows, history, margin_seconds)
+
+    counter = itertools.count()
+    events = [(window.resume_at, next(counter), window) for window in windows]
+    heapq.heapify(events)
+
+    while events:
+        due, _, window = heapq.heappop(events)
+        clock.sleep(due - clock.now())
+        now = clock.now()
+
+        if window.state == "scheduled":
+            print(f"→ Resuming {window.capacity_name} "
+                  f"({window.start_at - now:.0f}s before its window opens)")
+            try:
+                _, state = get_capacity_status(window.capacity_name, window.resource_group)
+                if state == "Active":
+                    window.state, window.active_at = "active", now
+                    print(f"✓ {window.capacity_name} is already Active")
+                    continue
+                window.resume_requested_at = now
+                if not resume_capacity(window.capacity_name, window.resource_group, wait=False):
+                    raise RuntimeError("resume request failed")
+            except Exception as e:
+                window.state, window.error = "failed", str(e)
+                print(f"✗ {window.capacity_name}: {e}")
+                continue
+            window.state = "resuming"
+            heapq.heappush(events, (now + poll_seconds, next(counter), window))
+            continue
+
+        try:
+            _, state = get_capacity_status(window.capacity_name, window.resource_group)
+        except Exception as e:
+            state, window.error = None, str(e)
+
+        if state == "Active":
+            window.state, window.active_at = "active", now
+            history.record(window.capacity_name, now - window.resume_requested_at)
+            late = window.lateness
+            print(f"✓ {window.capacity_name} Active after {now - window.resume_requested_at:.0f}s "
+                  f"({'late' if late > 0 else 'early'} by {abs(late):.0f}s)")
+        elif now - window.resume_requested_at > timeout_seconds:
+            window.state = "failed"
+            window.error = window.error or f"not Active after {timeout_seconds}s (state={state})"
+            print(f"✗ {window.capacity_name}: {window.error}")
+        else:
+            heapq.heappush(events, (now + poll_seconds, next(counter), window))
+
+    return windows
+
+
+def suspend_capacities(capacity_names: list[str], resource_group: str, max_workers: int = 6) -> dict[str, bool]:
+    """Suspends several capacities concurrently."""
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        return dict(zip(capacity_names, pool.map(lambda name: suspend_capacity(name, resource_group), capacity_names)))
+
+
+def suspend_when_done(capacity_names: list[str], resource_group: str, is_done: Callable[[], bool],
+                      clock: Clock|None = None, poll_seconds: float = 15,
+                      timeout_seconds: float = 6 * 3600) -> dict[str, bool]:
+    """
+    Polls `is_done` and suspends the capacities the moment the job reports done
+    (or when the timeout is reached, so a stuck job cannot keep them running forever).
+    """
+    clock = clock or Clock()
+    deadline = clock.now() + timeout_seconds
+    while not is_done() and clock.now() < deadline:
+        clock.sleep(poll_seconds)
+    return suspend_capacities(capacity_names, resource_group)
+
+
+def parse_window_start(value: str, clock: Clock|None = None) -> float:
+    """
+    Parses a window start as an ISO timestamp or as HH:MM (the next occurrence in local time).
+    """
+    clock = clock or Clock()
+    now = datetime.fromtimestamp(clock.now())
+    if len(value) <= 5 and ":" in value:
+        hour, minute = (int(part) for part in value.split(":"))
+        start = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if start < now:
+            start += timedelta(days=1)
+        return start.timestamp()
+    return datetime.fromisoformat(value).timestamp()
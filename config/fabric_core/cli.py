@@ -0,0 +1,389 @@
+"""
+The `fabric-core` command line: `python -m config.fabric_core <command> ...`
+
+Each subcommand imports only the modules it needs. When a daemon is listening
+(`fabric-core daemon start`) commands are forwarded to it and reuse its login, tokens,
+connection pool and inventory; otherwise they run in this process.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+
+DEFAULT_TEMPLATE = Path(__file__).resolve().parent.parent / "templates" / "v01" / "v01_template.yaml"
+INVENTORY_TTL_SECONDS = float(os.getenv("FABRIC_CORE_INVENTORY_TTL", "300"))
+
+_inventories = {}  # resource group -> (Inventory, loaded_at); reused across daemon commands
+
+
+def get_cached_inventory(resource_group: str, refresh: bool = False):
+    """Returns the inventory of a resource group, reloading it when older than FABRIC_CORE_INVENTORY_TTL."""
+    from .inventory import load_inventory
+
+    cached = _inventories.get(resource_group)
+    if refresh or cached is None or time.monotonic() - cached[1] > INVENTORY_TTL_SECONDS:
+        cached = (load_inventory(resource_group), time.monotonic())
+        _inventories[resource_group] = cached
+    return cached[0]
+
+
+def _load(args, strict: bool = False):
+    from .login import ensure_logged_in
+    from .load_config import load_config_from_file
+
+    config = load_config_from_file(args.template, strict=strict)
+    ensure_logged_in()
+    return config
+
+
+def _resource_group(args) -> str:
+    if args.resource_group:
+        return args.resource_group
+    from .load_config import load_config_from_file
+    return load_config_from_file(args.template)["azure"]["capacity_defaults"]["resource_group"]
+
+
+def _failed(results) -> int:
+    return int(any(result.status not in ("succeeded", "up-to-date", "updated") for result in results.values()))
+
+
+def deploy_command(args) -> int:
+    from .deployment import deploy_from_config
+    from .journal import DeploymentJournal, get_journal_path
+
+    config = _load(args, strict=True)
+    inventory = get_cached_inventory(config["azure"]["capacity_defaults"]["resource_group"], args.refresh)
+    journal = DeploymentJournal(get_journal_path(config, args.journal))
+    return _failed(deploy_from_config(config, max_workers=args.max_workers, inventory=inventory,
+                                      journal=journal, resume=args.resume))
+
+
+def plan_command(args) -> int:
+    from .plan import fetch_live_state, build_plan, print_plan, apply_plan
+    from .deployment import print_deployment_summary
+
+    config = _load(args, strict=True)
+    inventory = get_cached_inventory(config["azure"]["capacity_defaults"]["resource_group"], args.refresh)
+    state = fetch_live_state(config, inventory, max_workers=args.max_workers)
+    actions = build_plan(config, state)
+    print_plan(actions)
+    if not args.apply:
+        return 0
+    results = apply_plan(actions, config, state, max_workers=args.max_workers)
+    print_deployment_summary(results)
+    return _failed(results)
+
+
+def permissions_command(args) -> int:
+    from .login import ensure_logged_in
+    from .load_config import load_config_from_file
+    from .role_assignments import reconcile_role_assignments, print_reconciliation_summary
+
+    configs = [load_config_from_file(template, strict=True) for template in args.templates or [DEFAULT_TEMPLATE]]
+    ensure_logged_in()
+    security_groups, workspaces = {}, []
+    for config in configs:
+        security_groups.update(config["azure"]["security_groups"])
+        inventory = get_cached_inventory(config["azure"]["capacity_defaults"]["resource_group"], args.refresh)
+        for workspace in config["workspaces"]:
+            workspace_id = inventory.get_workspace_id(workspace["name"])
+            if workspace_id:
+                workspaces.append((workspace["name"], workspace_id, workspace.get("permissions", [])))
+            else:
+                print(f"✗ {workspace['name']} does not exist, skipping")
+    reports = reconcile_role_assignments(workspaces, security_groups, max_workers=args.max_workers,
+                                         prune=not args.no_prune, dry_run=args.dry_run)
+    print_reconciliation_summary(reports)
+    return int(any(report.errors for report in reports.values()))
+
+
+def sync_command(args) -> int:
+    from .git_sync import find_workspaces_on_branch, sync_workspaces_from_git, print_sync_report
+
+    config = _load(args)
+    solution_version = config.get("solution_version", "av01")
+    branch = args.branch or config["github"]["branch"]
+    inventory = get_cached_inventory(config["azure"]["capacity_defaults"]["resource_group"], args.refresh)
+    candidates = {name: workspace["id"] for name, workspace in inventory.list_workspaces().items()
+                  if name.startswith(f"{solution_version}-")}
+    workspaces = find_workspaces_on_branch(candidates, branch, max_workers=args.max_workers)
+    results = sync_workspaces_from_git(workspaces, max_workers=args.max_workers)
+    print_sync_report(results)
+    return _failed(results)
+
+
+def items_command(args) -> int:
+    from .item_deployment import select_item_workspaces, deploy_items, print_item_deployment_report
+
+    config = _load(args)
+    inventory = get_cached_inventory(config["azure"]["capacity_defaults"]["resource_group"], args.refresh)
+    workspaces = select_item_workspaces(config, inventory, args.stage, args.workspace)
+    results = deploy_items(workspaces, max_workers=args.max_workers, delete=not args.no_delete, dry_run=args.dry_run)
+    print_item_deployment_report(results, args.dry_run)
+    return int(any(result.failed for result in results.values()))
+
+
+def jobs_command(args) -> int:
+    from .jobs import JobSpec, resolve_jobs, run_jobs, print_job_run_report
+
+    config = _load(args)
+    resource_group = config["azure"]["capacity_defaults"]["resource_group"]
+    specs = [JobSpec.parse(job) for job in args.job or []] or [JobSpec.from_config(job)
+                                                               for job in config.get("jobs") or []]
+    if not specs:
+        print("✗ No jobs: pass --job workspace/item[:ItemType] or add a 'jobs' section to the template")
+        return 2
+    runs = resolve_jobs(specs, get_cached_inventory(resource_group, args.refresh), args.max_workers)
+    report = run_jobs(runs, resource_group, suspend=not args.no_suspend, timeout=args.timeout,
+                      max_workers=args.max_workers, suspend_active=args.suspend_active)
+    print_job_run_report(report)
+    if args.report:
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.report).write_text(json.dumps(report.to_dict(), indent=2))
+    return int(not report.succeeded)
+
+
+def destroy_command(args) -> int:
+    from .teardown import build_template_teardown, build_branch_teardown, run_teardown
+    from .deployment import print_deployment_summary
+
+    if not args.dry_run and not args.yes:
+        print("✗ destroy deletes resources: pass --yes, or --dry-run to list what would be removed")
+        return 2
+    config = _load(args)
+    inventory = get_cached_inventory(config["azure"]["capacity_defaults"]["resource_group"], args.refresh)
+    if args.branch:
+        tasks = build_branch_teardown(config.get("solution_version", "av01"), args.branch, inventory)
+    else:
+        tasks = build_template_teardown(config, inventory, args.capacities)
+    results = run_teardown(tasks, max_workers=args.max_workers, dry_run=args.dry_run)
+    if results:
+        print_deployment_summary(results)
+    return _failed(results)
+
+
+def versions_command(args) -> int:
+    from .multi_version import deploy_versions
+
+    results = deploy_versions(args.templates, mode=args.mode, max_processes=args.processes,
+                              max_workers=args.max_workers, resume=args.resume)
+    return int(any(result.status != "succeeded" for result in results.values()))
+
+
+def capacity_command(args) -> int:
+    from .capacities import get_capacity_status, resume_capacity, suspend_capacity
+
+    resource_group = _resource_group(args)
+    ok = True
+    for name in args.names:
+        if args.action == "status":
+            provisioning_state, state = get_capacity_status(name, resource_group)
+            print(f"{name}: {state} (provisioning {provisioning_state})")
+        elif args.action == "resume":
+            ok = resume_capacity(name, resource_group, wait=not args.no_wait) and ok
+        else:
+            ok = suspend_capacity(name, resource_group) and ok
+    return 0 if ok else 1
+
+
+def audit_command(args) -> int:
+    from .audit import (open_audit_db, take_snapshot, who_had_role, audit_drift, changes_between, print_changes,
+                        snapshot_at)
+    from .load_config import load_config_from_file
+
+    if args.action == "snapshot":
+        config = _load(args)
+        inventory = get_cached_inventory(config["azure"]["capacity_defaults"]["resource_group"], args.refresh)
+        take_snapshot(config, args.db, inventory, args.max_workers, template=str(args.template))
+        return 0
+
+    if args.action == "who" and not args.workspace:
+        print("✗ audit who needs a workspace")
+        return 2
+    if args.action == "changes" and not args.since:
+        print("✗ audit changes needs --since")
+        return 2
+    connection = open_audit_db(args.db)
+    try:
+        snapshot = snapshot_at(connection, args.at)
+        if snapshot is None:
+            print("✗ No snapshot recorded at that time")
+            return 1
+        if args.action == "who":
+            principals = who_had_role(connection, args.workspace, args.role, args.at)
+            print(f"{args.workspace} as of snapshot {snapshot['id']} ({snapshot['taken_at']}):")
+            for principal in principals:
+                print(f"  {principal['role']}: {principal['principal_name'] or principal['principal_id']} "
+                      f"({principal['principal_type']})")
+            return 0
+        if args.action == "drift":
+            drift = audit_drift(connection, load_config_from_file(args.template), args.at)
+            for line in drift:
+                print(f"⚠ {line}")
+            if not drift:
+                print(f"✓ Snapshot {snapshot['id']} ({snapshot['taken_at']}) matches the template")
+            return int(bool(drift))
+        print_changes(changes_between(connection, args.since, args.at))
+        return 0
+    finally:
+        connection.close()
+
+
+def autoscale_command(args) -> int:
+    from .autoscaler import CapacityAutoscaler, FileMetricsFeed
+
+    config = _load(args)
+    inventory = get_cached_inventory(config["azure"]["capacity_defaults"]["resource_group"], args.refresh)
+    autoscaler = CapacityAutoscaler.from_config(config, FileMetricsFeed(args.metrics_file), inventory=inventory,
+                                                interval_seconds=args.interval, dry_run=args.dry_run)
+    autoscaler.run(args.iterations)
+    return 0
+
+
+def daemon_command(args) -> int:
+    from .daemon import DaemonClient, serve_daemon
+
+    client = DaemonClient(args.socket)
+    if args.action == "start":
+        serve_daemon(args.socket)
+        return 0
+    if args.action == "stop":
+        if not client.shutdown():
+            print("✗ No fabric-core daemon is running")
+            return 1
+        print("✓ fabric-core daemon stopping")
+        return 0
+    status = client.ping()
+    if status is None:
+        print("✗ No fabric-core daemon is running")
+        return 1
+    print(f"✓ fabric-core daemon pid {status['pid']}, up {status['uptime']:.0f}s, "
+          f"{status['commands_served']} commands served")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="fabric-core", description="Deploy and operate Fabric solutions")
+    parser.add_argument("--socket", default=None, help="Daemon socket (defaults to FABRIC_CORE_SOCKET)")
+    parser.add_argument("--no-daemon", action="store_true", help="Run in this process even if a daemon is running")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add(name, func, help_text, template=True):
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.set_defaults(func=func)
+        if template:
+            subparser.add_argument("--template", default=os.getenv("CONFIG_FILE") or str(DEFAULT_TEMPLATE),
+                                   help="Path to the YAML template")
+            subparser.add_argument("--max-workers", type=int, default=int(os.getenv("DEPLOY_MAX_WORKERS", "8")))
+            subparser.add_argument("--refresh", action="store_true", help="Reload the inventory instead of reusing it")
+        return subparser
+
+    deploy = add("deploy", deploy_command, "Create the capacities, workspaces and git connections of a template")
+    deploy.add_argument("--resume", action="store_true", help="Continue an interrupted deployment from its journal")
+    deploy.add_argument("--journal", default=None, help="Journal file (defaults to FABRIC_CORE_JOURNAL)")
+
+    plan = add("plan", plan_command, "Show (or --apply) the changes needed to match a template")
+    plan.add_argument("--apply", action="store_true")
+
+    permissions = subparsers.add_parser("permissions", help="Reconcile workspace role assignments")
+    permissions.set_defaults(func=permissions_command)
+    permissions.add_argument("templates", nargs="*")
+    permissions.add_argument("--dry-run", action="store_true")
+    permissions.add_argument("--no-prune", action="store_true")
+    permissions.add_argument("--max-workers", type=int, default=int(os.getenv("DEPLOY_MAX_WORKERS", "8")))
+    permissions.add_argument("--refresh", action="store_true")
+
+    sync = add("sync", sync_command, "Sync the workspaces connected to a branch with its head")
+    sync.add_argument("--branch", default=os.getenv("SYNC_BRANCH"))
+
+    items = add("items", items_command, "Deploy changed items from the solution folders to workspaces")
+    items.add_argument("--stage", action="append", help="Only workspaces of this stage, e.g. test (repeatable)")
+    items.add_argument("--workspace", action="append", help="Only this workspace (repeatable)")
+    items.add_argument("--dry-run", action="store_true", help="Only show what would change")
+    items.add_argument("--no-delete", action="store_true", help="Keep items that were removed from the solution")
+
+    jobs = add("jobs", jobs_command, "Resume capacities, run item jobs and suspend the capacities when they finish")
+    jobs.add_argument("--job", action="append", help="workspace/item[:ItemType] to run, e.g. "
+                      "av01-prod-processing/pl_master (repeatable; default: the template's jobs)")
+    jobs.add_argument("--timeout", type=float, default=6 * 3600, help="Seconds before running jobs are cancelled")
+    jobs.add_argument("--no-suspend", action="store_true", help="Leave the capacities Active after the jobs")
+    jobs.add_argument("--suspend-active", action="store_true",
+                      help="Also suspend capacities that were already Active before the run")
+    jobs.add_argument("--report", help="Write the run report as JSON to this file")
+
+    destroy = add("destroy", destroy_command, "Delete the workspaces and capacities of a template or feature branch")
+    destroy.add_argument("--branch", help="Only the workspaces of this feature branch")
+    destroy.add_argument("--capacities", choices=["delete", "suspend", "keep"], default="delete",
+                         help="What to do with the template's capacities once their workspaces are gone")
+    destroy.add_argument("--dry-run", action="store_true", help="Only list what would be removed")
+    destroy.add_argument("--yes", action="store_true", help="Confirm the deletion")
+
+    versions = subparsers.add_parser("versions", help="Deploy, plan or apply several solution versions in parallel")
+    versions.set_defaults(func=versions_command)
+    versions.add_argument("mode", choices=["deploy", "plan", "apply"])
+    versions.add_argument("templates", nargs="+", help="Template paths or glob patterns")
+    versions.add_argument("--processes", type=int, default=None, help="Worker processes (default: one per version)")
+    versions.add_argument("--max-workers", type=int, default=int(os.getenv("DEPLOY_MAX_WORKERS", "8")),
+                          help="Concurrent steps within each version")
+    versions.add_argument("--resume", action="store_true",
+                          help="deploy: continue each version's interrupted deployment from its journal")
+
+    capacity = subparsers.add_parser("capacity", help="Show, resume or suspend capacities")
+    capacity.set_defaults(func=capacity_command)
+    capacity.add_argument("action", choices=["status", "resume", "suspend"])
+    capacity.add_argument("names", nargs="+")
+    capacity.add_argument("--resource-group")
+    capacity.add_argument("--template", default=os.getenv("CONFIG_FILE") or str(DEFAULT_TEMPLATE))
+    capacity.add_argument("--no-wait", action="store_true", help="resume: do not wait for the capacity to be Active")
+
+    audit = add("audit", audit_command, "Record and query snapshots of the tenant state")
+    audit.add_argument("action", choices=["snapshot", "who", "drift", "changes"])
+    audit.add_argument("workspace", nargs="?", help="who: the workspace, e.g. prod-consumption")
+    audit.add_argument("--role", help="who: only this role, e.g. Admin")
+    audit.add_argument("--at", help="Date or UTC timestamp to query (default: the latest snapshot)")
+    audit.add_argument("--since", help="changes: date or UTC timestamp to list changes from")
+    audit.add_argument("--db", default=None, help="Audit store (defaults to FABRIC_CORE_AUDIT_DB)")
+
+    autoscale = add("autoscale", autoscale_command, "Scale capacity SKUs with their utilization")
+    autoscale.add_argument("--metrics-file", default=os.getenv("CAPACITY_METRICS_FILE", ".fabric_core/capacity_metrics.json"),
+                           help="JSON file with the latest utilization per capacity, written by an exporter")
+    autoscale.add_argument("--interval", type=float, default=60, help="Seconds between samples")
+    autoscale.add_argument("--iterations", type=int, default=None, help="Stop after this many samples")
+    autoscale.add_argument("--dry-run", action="store_true", help="Only print the SKU changes")
+
+    daemon = subparsers.add_parser("daemon", help="Start, stop or check the fabric-core daemon")
+    daemon.set_defaults(func=daemon_command)
+    daemon.add_argument("action", choices=["start", "stop", "status"])
+
+    return parser
+
+
+def run_command(argv: list[str]) -> int:
+    """Parses and runs a command in this process. Also used by the daemon."""
+    return _run(build_parser().parse_args(argv))
+
+
+def _run(args) -> int:
+    from .tracing import span, profiling
+
+    with profiling(), span(f"fabric-core {args.command}"):
+        return args.func(args) or 0
+
+
+def main(argv: list[str]|None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    args = build_parser().parse_args(argv)
+
+    if args.command != "daemon" and not args.no_daemon:
+        from .daemon import DaemonClient
+        exit_code = DaemonClient(args.socket).run(argv)
+        if exit_code is not None:
+            return exit_code
+
+    from .utils import set_stdout_encoding_to_utf_8
+    set_stdout_encoding_to_utf_8()
+    return _run(args)
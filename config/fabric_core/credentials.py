@@ -0,0 +1,239 @@
+"""
+Service principal tokens for the Fabric and ARM audiences.
+
+Tokens are acquired with the client credentials flow, cached in memory per audience
+and refreshed ahead of expiry in the background, so callers never wait on a refresh.
+Concurrent callers of one audience share a single acquisition; different audiences
+are acquired independently.
+
+When FABRIC_CORE_TOKEN_CACHE points at a file, tokens are also shared with other
+processes (e.g. parallel deployment workers) through that file. It is encrypted with a
+key derived from the client secret, which needs the optional `cryptography` package;
+without it the on-disk cache is not used. Acquisition across processes is serialized
+with a lock file, so N workers starting together fetch each token once.
+"""
+
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+from pathlib import Path
+from urllib.parse import urlencode
+
+from .transport import AUDIENCE_SCOPES, AZURE_AUTHORITY_HOST, send_http_request
+
+try:
+    import fcntl
+except ImportError:  # Windows: the disk cache works without cross-process locking
+    fcntl = None
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+
+EXPIRY_MARGIN_SECONDS = 300  # a token is not handed out in its last 5 minutes
+REFRESH_AHEAD_SECONDS = 600  # a background refresh starts 10 minutes before expiry
+
+
+class TokenProvider:
+    """
+    Per-audience token cache with refresh-ahead. Safe to share between threads;
+    with a cache file, also between processes.
+    """
+
+    def __init__(self, tenant_id: str|None = None, client_id: str|None = None, client_secret: str|None = None,
+                 cache_file: str|Path|None = None, authority_host: str|None = None):
+        self.tenant_id = tenant_id or os.getenv("AZURE_TENANT_ID")
+        self.client_id = client_id or os.getenv("SPN_CLIENT_ID")
+        self.client_secret = client_secret or os.getenv("SPN_CLIENT_SECRET")
+        self.authority_host = (authority_host or os.getenv("AZURE_AUTHORITY_HOST", AZURE_AUTHORITY_HOST)).rstrip("/")
+        self.cache_file = Path(cache_file) if cache_file else None
+        if self.cache_file and Fernet is None:
+            print("⚠ cryptography is not installed, tokens are cached in memory only")
+            self.cache_file = None
+
+        self._tokens = {}  # audience -> (token, expires_at, refresh_at)
+        self._rejected = {}  # audience -> token the service answered 401 to
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._refreshing = set()
+        self.acquisitions = 0
+
+    def _reset_locks(self) -> None:
+        """Replaces the locks in a forked child, where a lock held by another parent thread would never be released."""
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._refreshing = set()
+
+    def _lock_for(self, audience: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(audience, threading.Lock())
+
+    def _store(self, audience: str, token: str, expires_at: float) -> None:
+        """Caches a token; its background refresh starts REFRESH_AHEAD_SECONDS (or half its lifetime) before expiry."""
+        lifetime = expires_at - time.time()
+        self._tokens[audience] = (token, expires_at, expires_at - min(REFRESH_AHEAD_SECONDS, lifetime / 2))
+
+    def _cache_key(self, audience: str) -> str:
+        return f"{self.tenant_id}:{self.client_id}:{audience}"
+
+    def _fernet(self):
+        key = hashlib.sha256(f"fabric-core-token-cache:{self.client_secret}".encode()).digest()
+        return Fernet(base64.urlsafe_b64encode(key))
+
+    def _read_disk(self) -> dict:
+        try:
+            return json.loads(self._fernet().decrypt(self.cache_file.read_bytes()))
+        except (OSError, ValueError, InvalidToken):
+            return {}
+
+    def _write_disk(self, audience: str, token: str, expires_at: float) -> None:
+        entries = {key: entry for key, entry in self._read_disk().items() if entry["expires_at"] > time.time()}
+        entries[self._cache_key(audience)] = {"token": token, "expires_at": expires_at}
+        temp_file = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}.tmp")
+        temp_file.write_bytes(self._fernet().encrypt(json.dumps(entries).encode()))
+        os.chmod(temp_file, 0o600)
+        os.replace(temp_file, self.cache_file)
+
+    def _request_token(self, audience: str) -> tuple[str, float]:
+        form = urlencode({
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "scope": AUDIENCE_SCOPES[audience],
+        }).encode()
+        status, _, payload = send_http_request(
+            "post", f"{self.authority_host}/{self.tenant_id}/oauth2/v2.0/token", body=form,
+            headers={"Content-Type": "application/x-www-form-urlencoded"})
+        if status != 200:
+            raise RuntimeError(f"Failed to acquire token for audience {audience}. status: {status}, "
+                               f"output: {payload.decode('utf-8', errors='replace')}")
+        result = json.loads(payload)
+        self.acquisitions += 1
+        return result["access_token"], time.time() + int(result.get("expires_in", 3600))
+
+    def _acquire(self, audience: str, min_expires_at: float) -> tuple[str, float]:
+        """Gets a token valid past `min_expires_at` from the disk cache or the token endpoint."""
+        if self.cache_file is None:
+            return self._request_token(audience)
+
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_file.with_name(f"{self.cache_file.name}.lock"), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                entry = self._read_disk().get(self._cache_key(audience))
+                if entry and entry["expires_at"] > min_expires_at and entry["token"] != self._rejected.get(audience):
+                    return entry["token"], entry["expires_at"]
+                token, expires_at = self._request_token(audience)
+                self._write_disk(audience, token, expires_at)
+                return token, expires_at
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self, audience: str) -> None:
+        try:
+            with self._lock_for(audience):
+                _, _, refresh_at = self._tokens.get(audience, (None, 0, 0))
+                if time.time() >= refresh_at:
+                    self._store(audience, *self._acquire(audience, time.time() + REFRESH_AHEAD_SECONDS))
+        except Exception as e:
+            print(f"⚠ Background token refresh for {audience} failed, will retry on next use. {e}")
+        finally:
+            with self._locks_lock:
+                self._refreshing.discard(audience)
+
+    def _refresh_in_background(self, audience: str) -> None:
+        with self._locks_lock:
+            if audience in self._refreshing:
+                return
+            self._refreshing.add(audience)
+        threading.Thread(target=self._refresh, args=(audience,), name=f"fabric-token-refresh-{audience}",
+                         daemon=True).start()
+
+    def get_cached_token(self, audience: str|None = None) -> str|None:
+        """
+        Returns the cached token of the audience without ever blocking (for event loops),
+        or None when a new one has to be acquired first.
+        """
+        audience = audience or "fabric"
+        token, expires_at, refresh_at = self._tokens.get(audience, (None, 0, 0))
+        now = time.time()
+        if token and expires_at - now > EXPIRY_MARGIN_SECONDS:
+            if now >= refresh_at:
+                self._refresh_in_background(audience)
+            return token
+        return None
+
+    def get_token(self, audience: str|None = None) -> str:
+        """
+        Returns a bearer token for the audience. A cached token close to expiry is
+        still returned while a background thread replaces it.
+        """
+        audience = audience or "fabric"
+        token = self.get_cached_token(audience)
+        if token:
+            return token
+
+        with self._lock_for(audience):
+            token, expires_at, _ = self._tokens.get(audience, (None, 0, 0))
+            if token and expires_at - time.time() > EXPIRY_MARGIN_SECONDS:
+                return token
+            token, expires_at = self._acquire(audience, time.time() + EXPIRY_MARGIN_SECONDS)
+            self._store(audience, token, expires_at)
+            return token
+
+    def export_tokens(self) -> dict[str, tuple[str, float]]:
+        """Returns {audience: (token, expires_at)} of the cached tokens, to hand to worker processes."""
+        return {audience: (token, expires_at) for audience, (token, expires_at, _) in dict(self._tokens).items()}
+
+    def seed(self, tokens: dict[str, tuple[str, float]]) -> None:
+        """Caches tokens acquired by another process (see `export_tokens`)."""
+        for audience, (token, expires_at) in tokens.items():
+            if expires_at - time.time() > EXPIRY_MARGIN_SECONDS:
+                with self._lock_for(audience):
+                    self._store(audience, token, expires_at)
+
+    def invalidate(self, audience: str|None = None) -> None:
+        """Drops cached tokens (e.g. after a 401) so the next call acquires a new one."""
+        with self._locks_lock:
+            for key in ([audience] if audience else list(self._tokens)):
+                token, _, _ = self._tokens.pop(key, (None, 0, 0))
+                if token:
+                    self._rejected[key] = token
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_token_provider() -> TokenProvider:
+    """Returns the process-wide token provider, configured from the environment on first use."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = TokenProvider(cache_file=os.getenv("FABRIC_CORE_TOKEN_CACHE"))
+        return _provider
+
+
+def reset_token_provider() -> None:
+    """Forgets the process-wide provider, e.g. after the credentials in the environment changed."""
+    global _provider
+    with _provider_lock:
+        _provider = None
+
+
+def _after_fork_in_child() -> None:
+    global _provider_lock
+    _provider_lock = threading.Lock()
+    if _provider is not None:
+        _provider._reset_locks()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,224 @@
+"""
+Long-lived fabric-core process that runs CLI commands sent over a local Unix socket.
+
+The daemon keeps what every one-shot script pays for again: the Fabric CLI login,
+access tokens, the pooled HTTP connections, inventory snapshots and compiled templates.
+Clients send one JSON line {"argv": [...], "cwd": "...", "env": {...}} and receive the
+command's output as JSON lines {"output": "..."} followed by {"exit_code": n}.
+
+`env` holds the client's fabric-core variables (config file, workers, credentials, transport,
+see FORWARDED_ENV_PREFIXES). A command runs with them in place of the daemon's own, plus the
+local env file, so it behaves as if it had been run without the daemon.
+
+Commands run one at a time (they share the process' stdout, working directory and
+environment), each with as much internal parallelism as it already has.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import threading
+import socketserver
+from contextlib import redirect_stdout, contextmanager
+
+
+FORWARDED_ENV_PREFIXES = ("FABRIC_", "AZURE_", "SPN_", "GITHUB_", "CONFIG_FILE", "DEPLOY_", "SYNC_",
+                          "FEATURE_", "CAPACITY_", "WORKSPACES_")
+
+
+def _is_forwarded_env(name: str) -> bool:
+    """Whether a variable is sent by the client and applied by the daemon for the command."""
+    return name.startswith(FORWARDED_ENV_PREFIXES) and name != "FABRIC_CORE_SOCKET"
+
+
+@contextmanager
+def _client_environment(env: dict|None):
+    """
+    Replaces the daemon's forwarded variables with the client's for the duration of a command,
+    and logs in with the client's service principal when it is not the one tokens are cached for.
+    """
+    if env is None:  # older client: keep the daemon's environment
+        yield
+        return
+    from .utils import load_local_env_file
+    from .credentials import get_token_provider, reset_token_provider
+
+    saved = dict(os.environ)
+    try:
+        for name in [name for name in os.environ if _is_forwarded_env(name) and name not in env]:
+            del os.environ[name]
+        os.environ.update({name: str(value) for name, value in env.items() if _is_forwarded_env(name)})
+        load_local_env_file(reload=True)
+        provider = get_token_provider()
+        if ((provider.tenant_id, provider.client_id, provider.client_secret)
+                != (os.getenv("AZURE_TENANT_ID"), os.getenv("SPN_CLIENT_ID"), os.getenv("SPN_CLIENT_SECRET"))):
+            reset_token_provider()
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+
+def get_socket_path() -> str:
+    """FABRIC_CORE_SOCKET, or a per-user socket in the runtime/temp directory."""
+    default_dir = os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    user_id = os.getuid() if hasattr(os, "getuid") else 0
+    return os.getenv("FABRIC_CORE_SOCKET") or os.path.join(default_dir, f"fabric-core-{user_id}.sock")
+
+
+class _SocketWriter:
+    """File-like object that forwards printed text to the client as it is written."""
+
+    def __init__(self, connection: socket.socket):
+        self.connection = connection
+        self.encoding = "utf-8"
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        if text:
+            try:
+                with self._lock:
+                    self.connection.sendall(json.dumps({"output": text}).encode() + b"\n")
+            except OSError:
+                pass
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+class _DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        super().__init__(socket_path, _RequestHandler)
+        self.command_lock = threading.Lock()
+        self.started_at = time.time()
+        self.commands_served = 0
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        from .cli import run_command
+
+        try:
+            request = json.loads(self.rfile.readline() or b"{}")
+        except ValueError:
+            return self._send({"exit_code": 2, "output": "✗ Malformed request\n"})
+
+        if request.get("command") == "ping":
+            return self._send({"exit_code": 0, "pid": os.getpid(), "uptime": time.time() - self.server.started_at,
+                               "commands_served": self.server.commands_served})
+        if request.get("command") == "shutdown":
+            self._send({"exit_code": 0})
+            return threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+        with self.server.command_lock:
+            self.server.commands_served += 1
+            cwd = os.getcwd()
+            try:
+                os.chdir(request.get("cwd") or cwd)
+                with _client_environment(request.get("env")), redirect_stdout(_SocketWriter(self.connection)):
+                    exit_code = run_command(request.get("argv") or [])
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else 1
+            except Exception as e:
+                self._send({"output": f"✗ {e}\n"})
+                exit_code = 1
+            finally:
+                os.chdir(cwd)
+        self._send({"exit_code": exit_code})
+
+    def _send(self, message: dict) -> None:
+        try:
+            self.wfile.write(json.dumps(message).encode() + b"\n")
+        except OSError:
+            pass
+
+
+def serve_daemon(socket_path: str|None = None) -> None:
+    """Logs in, warms up tokens and serves commands until `fabric-core daemon stop`."""
+    from .login import ensure_logged_in
+    from .utils import use_http_transport
+    from .transport import get_access_token
+
+    socket_path = socket_path or get_socket_path()
+    if DaemonClient(socket_path).ping():
+        raise RuntimeError(f"A fabric-core daemon is already listening on {socket_path}")
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    ensure_logged_in()
+    if use_http_transport():
+        for audience in ("fabric", "azure"):
+            get_access_token(audience)
+
+    old_umask = os.umask(0o177)
+    try:
+        server = _DaemonServer(socket_path)
+    finally:
+        os.umask(old_umask)
+
+    print(f"✓ fabric-core daemon listening on {socket_path} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        print("✓ fabric-core daemon stopped")
+
+
+class DaemonClient:
+    """Thin client for the daemon. Only imports the standard library."""
+
+    def __init__(self, socket_path: str|None = None, timeout: float|None = None):
+        self.socket_path = socket_path or get_socket_path()
+        self.timeout = timeout
+
+    def _connect(self) -> socket.socket|None:
+        if not hasattr(socket, "AF_UNIX") or not os.path.exists(self.socket_path):
+            return None
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self.timeout)
+        try:
+            connection.connect(self.socket_path)
+        except OSError:
+            connection.close()
+            return None
+        return connection
+
+    def _request(self, request: dict, on_output=None) -> dict|None:
+        connection = self._connect()
+        if connection is None:
+            return None
+        with connection, connection.makefile("rb") as reader:
+            connection.sendall(json.dumps(request).encode() + b"\n")
+            for line in reader:
+                message = json.loads(line)
+                if "output" in message and on_output:
+                    on_output(message["output"])
+                if "exit_code" in message:
+                    return message
+        return {"exit_code": 1}
+
+    def ping(self) -> dict|None:
+        """Returns the daemon's status, or None when no daemon is listening."""
+        return self._request({"command": "ping"})
+
+    def shutdown(self) -> bool:
+        return self._request({"command": "shutdown"}) is not None
+
+    def run(self, argv: list[str]) -> int|None:
+        """Runs a command in the daemon, streaming its output to stdout. None when no daemon is listening."""
+        def write(text):
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+        env = {name: value for name, value in os.environ.items() if _is_forwarded_env(name)}
+        response = self._request({"argv": list(argv), "cwd": os.getcwd(), "env": env}, on_output=write)
+        return None if response is None else response["exit_code"]
@@ -0,0 +1,105 @@
+"""
+Compiles a solution template into a dependency graph of deployment steps and runs it.
+
+capacity -> workspace -> role assignments -> git connect
+
+Every workspace only waits for its own capacity, so independent chains run side by side.
+"""
+
+from .task_graph import Task, TaskResult, run_task_graph, require
+from .inventory import Inventory, load_inventory
+from .journal import DeploymentJournal
+from .capacities import create_capacity
+from .workspaces import create_workspace, assign_permissions
+from .git_integration import get_or_create_git_connection, connect_workspace_to_git, get_git_connection
+
+
+def build_deployment_graph(config: dict, inventory: Inventory|None = None) -> dict[str, Task]:
+    """
+    Builds the deployment tasks for a loaded template.
+    When an inventory snapshot is given, the steps consult it instead of probing each resource.
+    """
+    tasks = {}
+
+    capacity_defaults = config["azure"]["capacity_defaults"]
+    resource_group = capacity_defaults["resource_group"]
+    security_groups = config["azure"]["security_groups"]
+    github_config = config["github"]
+
+    def add(name, func, depends_on=None):
+        tasks[name] = Task(name, func, depends_on or [])
+
+    for capacity in config.get("capacities", []):
+        add(f"capacity:{capacity['name']}",
+            lambda outputs, capacity=capacity: create_capacity(capacity, resource_group, capacity_defaults, inventory))
+
+    if any(workspace.get("connect_to_git_folder") for workspace in config.get("workspaces", [])):
+        add("git_connection", lambda outputs: require(get_or_create_git_connection(github_config),
+                                                       "Could not get or create the git connection"))
+
+    for workspace in config.get("workspaces", []):
+        workspace_name = workspace["name"]
+        workspace_task = f"workspace:{workspace_name}"
+        capacity_task = f"capacity:{workspace.get('capacity')}"
+
+        add(workspace_task,
+            lambda outputs, workspace=workspace: require(create_workspace(workspace, inventory),
+                                                          f"Could not resolve id of {workspace['name']}"),
+            [capacity_task] if capacity_task in tasks else [])
+
+        permissions_task = f"permissions:{workspace_name}"
+        add(permissions_task,
+            lambda outputs, workspace=workspace, workspace_task=workspace_task: assign_permissions(
+                workspace_id=outputs[workspace_task], permissions=workspace.get("permissions", []),
+                security_groups=security_groups, workspace_name=workspace["name"]),
+            [workspace_task])
+
+        if workspace.get("connect_to_git_folder"):
+            add(f"git:{workspace_name}",
+                lambda outputs, workspace=workspace, workspace_task=workspace_task: require(
+                    _connect_to_git(outputs[workspace_task], workspace, github_config, outputs["git_connection"]),
+                    f"Could not connect {workspace['name']} to git"),
+                [permissions_task, "git_connection"])
+
+    return tasks
+
+
+def deploy_from_config(config: dict, max_workers: int = 4, inventory: Inventory|None = None,
+                       journal: DeploymentJournal|None = None, resume: bool = False) -> dict[str, TaskResult]:
+    """
+    Deploys a loaded template with at most `max_workers` steps in flight and prints a summary.
+    Existing resources are looked up in an inventory snapshot, loaded in bulk if not given.
+    With a journal every finished step is recorded, and `resume` continues from the journal.
+    """
+    if inventory is None:
+        inventory = load_inventory(config["azure"]["capacity_defaults"]["resource_group"])
+    tasks = build_deployment_graph(config, inventory)
+    if journal is not None:
+        tasks = journal.wrap(tasks, journal.open_run(config, resume))
+    results = run_task_graph(tasks, max_workers=max_workers)
+    if journal is not None and all(result.status == "succeeded" for result in results.values()):
+        journal.append("finish")
+    print_deployment_summary(results)
+    return results
+
+
+def print_deployment_summary(results: dict[str, TaskResult]) -> None:
+    print("===== Deployment summary =====")
+    for result in results.values():
+        symbol = "✓" if result.status == "succeeded" else "✗"
+        line = f"{symbol} {result.name}: {result.status} ({result.duration:.1f}s)"
+        if result.error:
+            line += f" - {result.error}"
+        print(line)
+
+
+def _connect_to_git(workspace_id: str, workspace: dict, github_config: dict, connection_id: str) -> bool:
+    """Connects a workspace to git; a workspace that is already connected (e.g. on a re-run) counts as done."""
+    if connect_workspace_to_git(workspace_id=workspace_id, workspace_name=workspace["name"],
+                                directory_name=workspace["connect_to_git_folder"], git_config=github_config,
+                                connection_id=connection_id):
+        return True
+    if get_git_connection(workspace_id).get("gitConnectionState", "NotConnected") != "NotConnected":
+        print(f"✓ {workspace['name']} is already connected to Git")
+        return True
+    return False
@@ -1,100 +1,222 @@
 """
 This file contains functions to connect and manage Github connections to Fabric workspaces
 """
-from .utils import call_azure_fabric_rest_api, load_local_env_file
+from .utils import call_azure_fabric_rest_api, iter_paged_items
+from .operations import OperationFailedError, OperationTimeoutError, wait_for_operation
 import json
 import os
+import threading
 
 
-load_local_env_file()
+def get_connection_repository(connection: dict) -> tuple[str, str]|None:
+    """
+    Returns (owner, repo) of a GitHub source control connection, lower-cased, or None.
+    """
+    details = connection.get("connectionDetails") or {}
+    path = (details.get("path") or "").lower()
+    if "github.com/" not in path:
+        return None
+    parts = path.rstrip("/").split("github.com/", 1)[-1].split("/")
+    if len(parts) < 2:
+        return None
+    return parts[0], parts[1].removesuffix(".git")
+
+
+class ConnectionRegistry:
+    """
+    Process-wide cache of Fabric connections, indexed by displayName and by GitHub (owner, repo).
+
+    Pages are streamed lazily and only as far as needed to answer a lookup; the
+    listing is shared by every caller in the process and is safe to use from
+    concurrent workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._by_name = {}
+            self._by_repository = {}
+            self._pages = None
+            self._complete = False
+
+    def _index(self, connection: dict) -> None:
+        self._by_name.setdefault(connection.get("displayName"), connection)
+        repository = get_connection_repository(connection)
+        if repository:
+            self._by_repository.setdefault(repository, connection)
+
+    def _lookup(self, display_name: str|None, repository: tuple[str, str]|None) -> dict|None:
+        if display_name and display_name in self._by_name:
+            return self._by_name[display_name]
+        if repository and repository in self._by_repository:
+            return self._by_repository[repository]
+        return None
+
+    def find(self, display_name: str|None = None, owner: str|None = None, repo: str|None = None) -> dict|None:
+        """Finds a connection by displayName or by GitHub owner/repo, listing more pages only on a miss."""
+        repository = (owner.lower(), repo.lower()) if owner and repo else None
+        with self._lock:
+            connection = self._lookup(display_name, repository)
+            if connection or self._complete:
+                return connection
+
+            for item in self._iter_remaining():
+                connection = self._lookup(display_name, repository)
+                if connection:
+                    return connection
+            return None
+
+    def all(self) -> dict[str, dict]:
+        """Lists every connection (streaming the remaining pages) and returns them by displayName."""
+        with self._lock:
+            if not self._complete:
+                for _ in self._iter_remaining():
+                    pass
+            return dict(self._by_name)
+
+    def _iter_remaining(self):
+        """
+        Indexes and yields the connections of the pages not listed yet. If a page fails
+        (throttling, server or network error) the listing starts over on the next lookup,
+        rather than the failed pager being taken for the end of the list.
+        """
+        if self._pages is None:
+            self._pages = iter_paged_items("connections")
+        try:
+            for item in self._pages:
+                self._index(item)
+                yield item
+        except Exception:  # not GeneratorExit: a lookup that stops early leaves the pager where it is
+            self._pages = None
+            raise
+        self._complete = True
+
+    def add(self, connection: dict) -> None:
+        with self._lock:
+            self._index(connection)
+
+    def find_or_create(self, create, display_name: str|None = None, owner: str|None = None,
+                       repo: str|None = None) -> tuple[dict|None, bool]:
+        """
+        Finds a connection or, while still holding the registry lock, creates it with `create()`.
+        Returns (connection, created). Concurrent callers wait instead of creating duplicates.
+        """
+        with self._lock:
+            connection = self.find(display_name, owner, repo)
+            if connection:
+                return connection, False
+            connection = create()
+            if connection:
+                self._index(connection)
+            return connection, True
+
+
+_connection_registry = ConnectionRegistry()
+
+
+def get_connection_registry() -> ConnectionRegistry:
+    """Returns the process-wide connection registry."""
+    return _connection_registry
 
 
 def get_or_create_git_connection(git_config: dict) -> str|None:
     """
     This function creates a connection to Github for Fabric.
+    Existing connections are found through the process-wide connection registry,
+    so concurrent callers share one listing and never create duplicates.
     """
     owner_name = git_config.get("organization")
     repo_name = git_config.get("repository")
     connection_name = f"GitHub-{owner_name}-{repo_name}"
-
-    list_response = call_azure_fabric_rest_api(api_endpoint="connections")
-    list_json = json.loads(list_response.stdout)
-
-    if list_json.get("status_code") == 200:
-        connections = list_json.get("text", {}).get("value", [])
-        for conn in connections:
-            if conn.get("displayName") == connection_name:
-                print(f"✓ Using existing connection: {connection_name}")
-                return conn.get("id")
+    registry = get_connection_registry()
 
     github_url = f"https://github.com/{owner_name}/{repo_name}"
-    request_body = {
-        "connectivityType": "ShareableCloud",
-        "displayName": connection_name,
-        "connectionDetails": {
-            "type": "GitHubSourceControl",
-            "creationMethod": "GitHubSourceControl.Contents",
-            "parameters": [{"dataType": "Text", "name": "url", "value": github_url}]
-        },
-        "credentialDetails": {
-            "credentials": {"credentialType": "Key", "key": os.getenv("GITHUB_PAT")}
+
+    def create() -> dict|None:
+        request_body = {
+            "connectivityType": "ShareableCloud",
+            "displayName": connection_name,
+            "connectionDetails": {
+                "type": "GitHubSourceControl",
+                "creationMethod": "GitHubSourceControl.Contents",
+                "parameters": [{"dataType": "Text", "name": "url", "value": github_url}]
+            },
+            "credentialDetails": {
+                "credentials": {"credentialType": "Key", "key": os.getenv("GITHUB_PAT")}
+            }
         }
-    }
 
-    create_response = call_azure_fabric_rest_api(api_endpoint="connections", method="post", request_body=request_body)
-    create_json = json.loads(create_response.stdout)
+        create_response = call_azure_fabric_rest_api(api_endpoint="connections", method="post", request_body=request_body)
+        create_json = json.loads(create_response.stdout)
 
-    if create_json.get("status_code") in [200, 201]:
-        connection_id = create_json.get("text", {}).get("id")
-        print(f"✓ Created connection: {connection_name}")
-        return connection_id
+        if create_json.get("status_code") not in [200, 201]:
+            return None
+        connection = create_json.get("text", {}) or {}
+        connection.setdefault("displayName", connection_name)
+        connection.setdefault("connectionDetails", {"type": "GitHubSourceControl", "path": github_url})
+        return connection
 
-    return None
+    connection, created = registry.find_or_create(create, display_name=connection_name,
+                                                  owner=owner_name, repo=repo_name)
+    if connection is None:
+        return None
 
+    if created:
+        print(f"✓ Created connection: {connection_name}")
+    else:
+        print(f"✓ Using existing connection: {connection.get('displayName')}")
+    return connection.get("id")
 
-def update_workspace_from_git(workspace_id, workspace_name):
-    """
-    Update workspace content from Git (pull from Git).
 
-    This syncs the Git repository content into the workspace.
+def get_git_status(workspace_id: str) -> dict:
+    """
+    Returns the `{status_code, text}` git status of a workspace (workspaceHead, remoteCommitHash, changes).
+    An uninitialized git connection is initialized first.
     """
-    # Get Git status to retrieve remoteCommitHash
     status_response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}/git/status')
-
     if not status_response.stdout.strip():
-        print(f"  ⚠ Failed to get Git status")
-        return False
+        return {}
+    status_json = json.loads(status_response.stdout)
 
-    try:
+    # Handle uninitialized connection
+    if is_git_connection_uninitialized(status_json):
+        print("  → Initializing Git connection")
+        init_response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}/git/initializeConnection', method="post")
+        wait_for_operation(init_response)
+        # Retry getting status after initialization
+        status_response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}/git/status')
         status_json = json.loads(status_response.stdout)
-        status_code = status_json.get('status_code')
-
-        # Handle uninitialized connection
-        if status_code == 400:
-            error_text = status_json.get('text', {})
-            if error_text.get('errorCode') == 'WorkspaceGitConnectionNotInitialized':
-                print(f"  → Initializing Git connection")
-                call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}/git/initializeConnection', method="post")
-                # Retry getting status after initialization
-                status_response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}/git/status')
-                status_json = json.loads(status_response.stdout)
-                status_code = status_json.get('status_code')
-
-        if status_code != 200:
-            error_text = status_json.get('text', {})
-            print(f"  ⚠ Failed to get Git status: {status_code}")
-            print(f"     Error: {error_text}")
-            return False
-
-        remote_commit_hash = status_json.get('text', {}).get('remoteCommitHash')
-        if not remote_commit_hash:
-            print(f"  ⚠ No remoteCommitHash found in status")
-            return False
-    except json.JSONDecodeError:
-        print(f"  ⚠ Failed to parse Git status")
-        return False
 
-    # Update from Git using the remoteCommitHash
+    return status_json
+
+
+def is_git_connection_uninitialized(status_json: dict) -> bool:
+    """Whether a git/status response says the connection still has to be initialized."""
+    error_text = status_json.get('text', {})
+    return (status_json.get('status_code') == 400 and isinstance(error_text, dict)
+            and error_text.get('errorCode') == 'WorkspaceGitConnectionNotInitialized')
+
+
+def initialize_git_connection(workspace_id: str, strategy: str = "PreferRemote") -> dict:
+    """
+    Initializes a freshly connected workspace and waits for the operation.
+    Returns the final document (which may ask for an UpdateFromGit as required action).
+    """
+    response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}/git/initializeConnection',
+                                          method="post", request_body={"initializationStrategy": strategy})
+    response_json = json.loads(response.stdout or "{}")
+    if response_json.get('status_code') not in [200, 202]:
+        raise RuntimeError(f"Failed to initialize git connection of {workspace_id}: {response_json}")
+    return wait_for_operation(response_json)
+
+
+def build_update_from_git_request(remote_commit_hash: str, workspace_head: str|None = None) -> dict:
+    """
+    Builds the updateFromGit request body. Workspace conflicts resolve in favour of the workspace.
+    """
     update_request = {
         "remoteCommitHash": remote_commit_hash,
         "conflictResolution": {
@@ -103,6 +225,57 @@ def update_workspace_from_git(workspace_id, workspace_name):
         },
         "options": {"allowOverrideItems": True}
     }
+    if workspace_head:
+        update_request["workspaceHead"] = workspace_head
+    return update_request
+
+
+def read_update_from_git_request(status_json: dict) -> dict|None:
+    """
+    Builds the updateFromGit request from a git/status response, using its remoteCommitHash.
+    Prints why and returns None when the status cannot be used.
+    """
+    if not status_json:
+        print("  ⚠ Failed to get Git status")
+        return None
+
+    status_code = status_json.get('status_code')
+    if status_code != 200:
+        error_text = status_json.get('text', {})
+        print(f"  ⚠ Failed to get Git status: {status_code}")
+        print(f"     Error: {error_text}")
+        return None
+
+    status = status_json.get('text', {})
+    remote_commit_hash = status.get('remoteCommitHash')
+    if not remote_commit_hash:
+        print("  ⚠ No remoteCommitHash found in status")
+        return None
+
+    # Update from Git using the remoteCommitHash
+    return build_update_from_git_request(remote_commit_hash, status.get('workspaceHead'))
+
+
+def update_workspace_from_git(workspace_id, workspace_name, wait: bool = True):
+    """
+    Update workspace content from Git (pull from Git).
+
+    This syncs the Git repository content into the workspace.
+    With `wait`, the long-running update operation is followed until it finishes.
+    """
+    # Get Git status to retrieve remoteCommitHash
+    try:
+        status_json = get_git_status(workspace_id)
+    except json.JSONDecodeError:
+        print("  ⚠ Failed to parse Git status")
+        return False
+    except (OperationFailedError, OperationTimeoutError) as e:
+        print(f"  ⚠ Failed to initialize Git connection: {e}")
+        return False
+
+    update_request = read_update_from_git_request(status_json)
+    if update_request is None:
+        return False
 
     update_response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}/git/updateFromGit', method="post",
         request_body=update_request)
@@ -113,21 +286,24 @@ def update_workspace_from_git(workspace_id, workspace_name):
     try:
         response_json = json.loads(update_response.stdout)
         if response_json.get('status_code') in [200, 201, 202]:
+            if wait:
+                wait_for_operation(response_json)
             print(f"  ✓ Updated {workspace_name} from Git")
             return True
     except json.JSONDecodeError:
         pass
+    except (OperationFailedError, OperationTimeoutError) as e:
+        print(f"  ⚠ Update from Git failed: {e}")
+        return False
 
-    print(f"  ⚠ Update from Git may have failed")
+    print("  ⚠ Update from Git may have failed")
     return False
 
 
 
-def connect_workspace_to_git(workspace_id:str, workspace_name:str, directory_name:str, git_config:dict, connection_id:str)->bool:
-    """
-    This function connects a workspace to Github repo.
-    """
-    request_body = {
+def build_git_connect_request(directory_name: str, git_config: dict, connection_id: str) -> dict:
+    """Builds the git/connect request body for a folder of the repo, authenticated by a connection."""
+    return {
         "gitProviderDetails": {
             "ownerName": git_config.get("organization"),
             "gitProviderType": git_config.get("provider"),
@@ -141,6 +317,13 @@ def connect_workspace_to_git(workspace_id:str, workspace_name:str, directory_nam
         }
     }
 
+
+def connect_workspace_to_git(workspace_id:str, workspace_name:str, directory_name:str, git_config:dict, connection_id:str)->bool:
+    """
+    This function connects a workspace to Github repo.
+    """
+    request_body = build_git_connect_request(directory_name, git_config, connection_id)
+
     connect_response = call_azure_fabric_rest_api(api_endpoint=f"workspaces/{workspace_id}/git/connect",
                                     method="post", request_body=request_body)
     connect_json = json.loads(connect_response.stdout)
@@ -152,3 +335,28 @@ def connect_workspace_to_git(workspace_id:str, workspace_name:str, directory_nam
     return False
 
 
+def get_git_connection(workspace_id: str) -> dict:
+    """
+    Returns the git connection of a workspace: gitConnectionState and gitProviderDetails.
+    """
+    response = call_azure_fabric_rest_api(api_endpoint=f"workspaces/{workspace_id}/git/connection")
+    response_json = json.loads(response.stdout)
+
+    if response_json.get("status_code") != 200:
+        raise RuntimeError(f"Failed to get git connection of {workspace_id}: {response_json}")
+
+    return response_json.get("text", {}) or {}
+
+
+def disconnect_workspace_from_git(workspace_id: str, workspace_name: str) -> bool:
+    """
+    Disconnects a workspace from its git repo.
+    """
+    response = call_azure_fabric_rest_api(api_endpoint=f"workspaces/{workspace_id}/git/disconnect", method="post")
+    response_json = json.loads(response.stdout)
+
+    if response_json.get("status_code") == 200:
+        print(f"✓ Disconnected {workspace_name} from Git")
+        return True
+
+    return False
@@ -0,0 +1,130 @@
+"""
+Syncs many git-connected workspaces at once.
+
+Git status is read for all workspaces concurrently, workspaces whose
+workspaceHead already equals the remote commit are skipped, updateFromGit is
+started in parallel for the rest and every update operation is tracked to
+completion by one shared poller.
+"""
+
+import json
+import time
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import call_azure_fabric_rest_api
+from .operations import get_operation_poller
+from .git_integration import get_git_status, get_git_connection, build_update_from_git_request
+
+
+UP_TO_DATE = "up-to-date"
+UPDATED = "updated"
+FAILED = "failed"
+
+
+@dataclass
+class SyncResult:
+    workspace_name: str
+    workspace_id: str
+    status: str = FAILED  # up-to-date | updated | failed
+    workspace_head: str|None = None
+    remote_commit_hash: str|None = None
+    duration: float = 0.0
+    error: str|None = None
+
+
+def find_workspaces_on_branch(workspaces: dict[str, str], branch: str, max_workers: int = 8) -> dict[str, str]:
+    """
+    Returns the subset of {workspace_name: workspace_id} whose git connection points at `branch`.
+    Connections are read concurrently.
+    """
+    def read(item):
+        name, workspace_id = item
+        try:
+            connection = get_git_connection(workspace_id)
+        except RuntimeError:
+            return name, None
+        return name, (connection.get("gitProviderDetails") or {}).get("branchName")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        branches = dict(pool.map(read, workspaces.items()))
+    return {name: workspaces[name] for name, workspace_branch in branches.items() if workspace_branch == branch}
+
+
+def sync_workspaces_from_git(workspaces: dict[str, str], max_workers: int = 8,
+                             timeout: float = 1800) -> dict[str, SyncResult]:
+    """
+    Brings every workspace in {workspace_name: workspace_id} up to the head of its branch.
+    Returns a per-workspace report.
+    """
+    results = {name: SyncResult(name, workspace_id) for name, workspace_id in workspaces.items()}
+    started = {name: time.monotonic() for name in workspaces}
+
+    def read_status(result: SyncResult) -> None:
+        try:
+            status_json = get_git_status(result.workspace_id)
+        except Exception as e:
+            result.error = f"could not read git status: {e}"
+            return
+        if status_json.get("status_code") != 200:
+            result.error = f"could not read git status: {status_json.get('text')}"
+            return
+        status = status_json.get("text", {}) or {}
+        result.workspace_head = status.get("workspaceHead")
+        result.remote_commit_hash = status.get("remoteCommitHash")
+        if not result.remote_commit_hash:
+            result.error = "no remoteCommitHash in git status"
+        elif result.workspace_head == result.remote_commit_hash:
+            result.status = UP_TO_DATE
+
+    def start_update(result: SyncResult):
+        try:
+            response = call_azure_fabric_rest_api(
+                api_endpoint=f"workspaces/{result.workspace_id}/git/updateFromGit", method="post",
+                request_body=build_update_from_git_request(result.remote_commit_hash, result.workspace_head))
+            response_json = json.loads(response.stdout or "{}")
+        except Exception as e:
+            result.error = f"could not start update: {e}"
+            return None
+        if response_json.get("status_code") not in [200, 201, 202]:
+            result.error = f"could not start update: {response_json.get('text')}"
+            return None
+        return response_json
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        list(pool.map(read_status, results.values()))
+
+        to_update = [result for result in results.values() if result.error is None and result.status != UP_TO_DATE]
+        responses = dict(zip([result.workspace_name for result in to_update], pool.map(start_update, to_update)))
+
+    poller = get_operation_poller()
+    futures = {name: poller.submit_operation(response, timeout=timeout)
+               for name, response in responses.items() if response is not None}
+    finished = {}
+    for name, future in futures.items():
+        future.add_done_callback(lambda _, name=name: finished.setdefault(name, time.monotonic()))
+
+    for name, future in futures.items():
+        result = results[name]
+        try:
+            future.result()
+            result.status = UPDATED
+            result.workspace_head = result.remote_commit_hash
+        except Exception as e:
+            result.error = f"update failed: {e}"
+
+    now = time.monotonic()
+    for name, result in results.items():
+        result.duration = finished.get(name, now) - started[name]
+    return results
+
+
+def print_sync_report(results: dict[str, SyncResult]) -> None:
+    print("===== Git sync report =====")
+    for result in results.values():
+        symbol = "✗" if result.status == FAILED else "✓"
+        head = (result.workspace_head or "-")[:8]
+        line = f"{symbol} {result.workspace_name}: {result.status} (head={head}, {result.duration:.1f}s)"
+        if result.error:
+            line += f" - {result.error}"
+        print(line)
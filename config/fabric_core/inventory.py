@@ -0,0 +1,167 @@
+"""
+In-memory snapshot of the tenant's workspaces, capacities and connections.
+
+A handful of bulk list calls replace the per-resource existence probes, and the
+create functions keep the snapshot up to date as they write.
+"""
+
+import threading
+
+from .utils import list_all_items, get_subscription_id
+from .git_integration import get_connection_registry
+
+
+
+class Inventory:
+    """
+    Name -> resource index of workspaces, capacities (per resource group) and connections.
+    Safe to share between deployment workers.
+    """
+
+    def __init__(self):
+        self.workspaces = {}
+        self.capacities = {}
+        self.fabric_capacities = {}
+        self.connections = {}
+        self._lock = threading.Lock()
+
+    def load(self, resource_group: str|None = None, connections: bool = True) -> "Inventory":
+        """Fetches workspaces, the capacities of `resource_group` and connections in bulk."""
+        self.refresh_workspaces()
+        if resource_group:
+            self.refresh_capacities(resource_group)
+        if connections:
+            self.refresh_connections()
+        return self
+
+    def refresh_workspaces(self) -> None:
+        workspaces = {item["displayName"]: item for item in list_all_items("workspaces")}
+        with self._lock:
+            self.workspaces = workspaces
+        print(f"✓ Inventory: {len(workspaces)} workspaces")
+
+    def refresh_capacities(self, resource_group: str) -> None:
+        capacities = {
+            item["name"]: item
+            for item in list_all_items(
+                f"/subscriptions/{get_subscription_id()}/resourceGroups/{resource_group}/providers/"
+                f"Microsoft.Fabric/capacities?api-version=2023-11-01",
+                audience="azure",
+            )
+        }
+        with self._lock:
+            self.capacities.update(capacities)
+        print(f"✓ Inventory: {len(capacities)} capacities in {resource_group}")
+
+    def refresh_fabric_capacities(self) -> None:
+        """Fetches the Fabric view of capacities, which holds the ids workspaces are assigned to."""
+        fabric_capacities = {item["displayName"]: item for item in list_all_items("capacities")}
+        with self._lock:
+            self.fabric_capacities = fabric_capacities
+
+    def refresh_connections(self) -> None:
+        """Lists connections through the shared connection registry, so the listing is reused by git setup."""
+        registry = get_connection_registry()
+        registry.invalidate()
+        connections = registry.all()
+        with self._lock:
+            self.connections = connections
+        print(f"✓ Inventory: {len(connections)} connections")
+
+    def snapshot(self) -> dict:
+        """Returns a plain copy of the indexes, e.g. to hand to worker processes."""
+        with self._lock:
+            return {"workspaces": dict(self.workspaces), "capacities": dict(self.capacities),
+                    "fabric_capacities": dict(self.fabric_capacities), "connections": dict(self.connections)}
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict) -> "Inventory":
+        """Rebuilds an inventory from `snapshot()` without calling the API; its connections seed the registry."""
+        inventory = cls()
+        inventory.workspaces = dict(snapshot.get("workspaces", {}))
+        inventory.capacities = dict(snapshot.get("capacities", {}))
+        inventory.fabric_capacities = dict(snapshot.get("fabric_capacities", {}))
+        inventory.connections = dict(snapshot.get("connections", {}))
+        registry = get_connection_registry()
+        for connection in inventory.connections.values():
+            registry.add(connection)
+        return inventory
+
+    def list_workspaces(self) -> dict[str, dict]:
+        """Returns a copy of the workspace index that is safe to iterate while workers write."""
+        with self._lock:
+            return dict(self.workspaces)
+
+    def get_workspace(self, workspace_name: str) -> dict|None:
+        """Returns a copy of the workspace's entry (id, capacityId, ...), or None when it does not exist."""
+        with self._lock:
+            workspace = self.workspaces.get(workspace_name)
+            return dict(workspace) if workspace is not None else None
+
+    def get_workspace_id(self, workspace_name: str) -> str|None:
+        with self._lock:
+            return (self.workspaces.get(workspace_name) or {}).get("id")
+
+    def list_capacities(self) -> dict[str, dict]:
+        """Returns a copy of the ARM capacity index that is safe to iterate while workers write."""
+        with self._lock:
+            return dict(self.capacities)
+
+    def get_capacity(self, capacity_name: str) -> dict|None:
+        """Returns the ARM document of a capacity (sku, properties.state, ...), or None."""
+        with self._lock:
+            capacity = self.capacities.get(capacity_name)
+            return dict(capacity) if capacity is not None else None
+
+    def has_capacity(self, capacity_name: str) -> bool:
+        with self._lock:
+            return capacity_name in self.capacities
+
+    def get_capacity_status(self, capacity_name: str) -> tuple[str|None, str|None]:
+        with self._lock:
+            props = (self.capacities.get(capacity_name) or {}).get("properties", {}) or {}
+        return props.get("provisioningState"), props.get("state")
+
+    def get_fabric_capacity_id(self, capacity_name: str, refresh: bool = True) -> str|None:
+        """Returns the Fabric id of a capacity; a miss refreshes the Fabric capacity list once unless `refresh` is off."""
+        with self._lock:
+            capacity = self.fabric_capacities.get(capacity_name)
+        if capacity is None and refresh:
+            self.refresh_fabric_capacities()
+            with self._lock:
+                capacity = self.fabric_capacities.get(capacity_name)
+        return (capacity or {}).get("id")
+
+    def get_fabric_capacity_name(self, capacity_id: str|None) -> str|None:
+        with self._lock:
+            for name, capacity in self.fabric_capacities.items():
+                if capacity.get("id") == capacity_id:
+                    return name
+        return None
+
+    def get_connection_id(self, connection_name: str) -> str|None:
+        with self._lock:
+            return (self.connections.get(connection_name) or {}).get("id")
+
+    def record_workspace(self, workspace_name: str, workspace_id: str, **properties) -> None:
+        with self._lock:
+            self.workspaces[workspace_name] = {"id": workspace_id, "displayName": workspace_name, **properties}
+
+    def forget_workspace(self, workspace_name: str) -> None:
+        with self._lock:
+            self.workspaces.pop(workspace_name, None)
+
+    def record_capacity(self, capacity_name: str, capacity: dict) -> None:
+        with self._lock:
+            self.capacities[capacity_name] = {"name": capacity_name, **capacity}
+
+    def record_connection(self, connection_name: str, connection_id: str) -> None:
+        connection = {"id": connection_id, "displayName": connection_name}
+        get_connection_registry().add(connection)
+        with self._lock:
+            self.connections[connection_name] = connection
+
+
+def load_inventory(resource_group: str|None = None, connections: bool = True) -> Inventory:
+    """Builds an inventory snapshot with a few paginated bulk calls."""
+    return Inventory().load(resource_group, connections)
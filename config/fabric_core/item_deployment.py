@@ -0,0 +1,292 @@
+"""
+Deploys workspace items straight from the `solution/<type>/` folders.
+
+Every item folder (`<name>.<type>/` with a `.platform` file, the layout Fabric git
+integration writes) is hashed locally. The hash of the deployed content is kept in the
+item's description, so a deployment lists the workspace items once and only creates,
+updates or deletes the items whose hash differs. Uploads run in parallel and their
+long-running operations are tracked by the shared poller, so promoting a change to test
+and prod costs in proportion to the change, not to the solution.
+
+Only items carrying a hash are ever deleted: items created by hand or by Fabric itself
+(e.g. the SQL endpoint of a lakehouse) are left alone.
+"""
+
+import re
+import json
+import time
+import base64
+import hashlib
+from pathlib import Path
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import call_azure_fabric_rest_api, list_all_items
+from .operations import get_operation_poller, parse_response
+
+
+SOLUTION_DIR = Path(__file__).resolve().parents[2] / "solution"
+HASH_MARKER = "fabric-core:sha256="
+HASH_PATTERN = re.compile(re.escape(HASH_MARKER) + r"([0-9a-f]{64})")
+MAX_DESCRIPTION_LENGTH = 256
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+UNCHANGED = "unchanged"
+
+
+@dataclass
+class LocalItem:
+    display_name: str
+    item_type: str
+    path: Path
+    description: str = ""
+    content_hash: str = ""
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.item_type, self.display_name
+
+
+@dataclass
+class ItemChange:
+    action: str  # create | update | delete | unchanged
+    item_type: str
+    display_name: str
+    item_id: str|None = None
+    local: LocalItem|None = None
+    error: str|None = None
+
+
+@dataclass
+class ItemDeploymentResult:
+    workspace_name: str
+    workspace_id: str|None
+    folder: str
+    changes: list[ItemChange] = field(default_factory=list)
+    duration: float = 0.0
+    error: str|None = None
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None or any(change.error for change in self.changes)
+
+    def count(self, action: str) -> int:
+        return sum(1 for change in self.changes if change.action == action)
+
+
+def get_items_folder(workspace_config: dict) -> Path:
+    """
+    Returns the solution folder a workspace's items come from: `items_folder` or
+    `connect_to_git_folder` from the template, else `solution/<type>/` from the workspace
+    name (`av01-test-processing` -> `solution/processing/`).
+    """
+    folder = workspace_config.get("items_folder") or workspace_config.get("connect_to_git_folder")
+    if folder:
+        return SOLUTION_DIR.parent / folder
+    return SOLUTION_DIR / workspace_config["name"].rsplit("-", 1)[-1]
+
+
+def select_item_workspaces(config: dict, inventory, stages: list[str]|None = None,
+                           names: list[str]|None = None) -> dict[str, tuple[str|None, Path]]:
+    """
+    Returns {workspace_name: (workspace_id, folder)} for the template workspaces to deploy
+    items to: those named, else those of `stages` (e.g. test, prod), else every workspace
+    that is not connected to git (git-connected workspaces get their content from git).
+    A workspace that does not exist has a None id, which `deploy_items` reports as failed.
+    """
+    solution_version = config.get("solution_version", "av01")
+    selected = {}
+    for workspace in config.get("workspaces", []):
+        name = workspace["name"]
+        if names:
+            wanted = name in names
+        elif stages:
+            wanted = any(name.startswith(f"{solution_version}-{stage}-") for stage in stages)
+        else:
+            wanted = not workspace.get("connect_to_git_folder")
+        if not wanted:
+            continue
+        selected[name] = (inventory.get_workspace_id(name), get_items_folder(workspace))
+    return selected
+
+
+def hash_item_folder(path: Path) -> str:
+    """Hashes every file of an item folder (relative path and bytes) in a stable order."""
+    digest = hashlib.sha256()
+    for file in sorted(path.rglob("*")):
+        if file.is_file():
+            digest.update(file.relative_to(path).as_posix().encode() + b"\0")
+            digest.update(file.read_bytes() + b"\0")
+    return digest.hexdigest()
+
+
+def read_local_items(folder: str|Path) -> dict[tuple[str, str], LocalItem]:
+    """Returns {(type, displayName): LocalItem} for every item folder (one with a `.platform`) under `folder`."""
+    items = {}
+    for platform_file in sorted(Path(folder).rglob(".platform")):
+        metadata = json.loads(platform_file.read_text(encoding="utf-8")).get("metadata", {})
+        item = LocalItem(metadata.get("displayName") or platform_file.parent.name.rsplit(".", 1)[0],
+                         metadata.get("type") or platform_file.parent.name.rsplit(".", 1)[-1],
+                         platform_file.parent, metadata.get("description") or "",
+                         hash_item_folder(platform_file.parent))
+        items[item.key] = item
+    return items
+
+
+def build_item_definition(item: LocalItem) -> dict:
+    """Builds the definition of an item from the files of its folder (`.platform` is sent as metadata)."""
+    parts = [
+        {"path": file.relative_to(item.path).as_posix(),
+         "payload": base64.b64encode(file.read_bytes()).decode("ascii"),
+         "payloadType": "InlineBase64"}
+        for file in sorted(item.path.rglob("*"))
+        if file.is_file() and file.name != ".platform"
+    ]
+    return {"parts": parts}
+
+
+def get_stored_hash(description: str|None) -> str|None:
+    match = HASH_PATTERN.search(description or "")
+    return match.group(1) if match else None
+
+
+def build_description(item: LocalItem) -> str:
+    """The item's description followed by its content hash, within Fabric's description limit."""
+    marker = f"{HASH_MARKER}{item.content_hash}"
+    description = item.description[:MAX_DESCRIPTION_LENGTH - len(marker) - 1].strip()
+    return f"{description} {marker}" if description else marker
+
+
+def plan_item_changes(local_items: dict[tuple[str, str], LocalItem], workspace_items: list[dict],
+                      delete: bool = True) -> list[ItemChange]:
+    """Compares local items with the items of a workspace by type, name and content hash."""
+    remote = {(item.get("type"), item.get("displayName")): item for item in workspace_items}
+    changes = []
+    for key, local in local_items.items():
+        existing = remote.get(key)
+        if existing is None:
+            changes.append(ItemChange(CREATE, *key, local=local))
+        elif get_stored_hash(existing.get("description")) != local.content_hash:
+            changes.append(ItemChange(UPDATE, *key, existing.get("id"), local))
+        else:
+            changes.append(ItemChange(UNCHANGED, *key, existing.get("id"), local))
+    if delete:
+        for key, existing in remote.items():
+            if key not in local_items and get_stored_hash(existing.get("description")):
+                changes.append(ItemChange(DELETE, *key, existing.get("id")))
+    return changes
+
+
+def _start(change: ItemChange, workspace_id: str):
+    """Sends the request of one change and returns the parsed response to track."""
+    if change.action == CREATE:
+        response = call_azure_fabric_rest_api(
+            f"workspaces/{workspace_id}/items", method="post",
+            request_body={"displayName": change.display_name, "type": change.item_type,
+                          "description": build_description(change.local),
+                          "definition": build_item_definition(change.local)})
+    elif change.action == UPDATE:
+        response = call_azure_fabric_rest_api(
+            f"workspaces/{workspace_id}/items/{change.item_id}/updateDefinition", method="post",
+            request_body={"definition": build_item_definition(change.local)})
+    else:
+        response = call_azure_fabric_rest_api(f"workspaces/{workspace_id}/items/{change.item_id}", method="delete")
+
+    result = parse_response(response)
+    if result.get("status_code") not in (200, 201, 202):
+        raise RuntimeError(f"{change.action} failed: {result.get('text')}")
+    return result
+
+
+def _record_hash(change: ItemChange, workspace_id: str) -> None:
+    """Stores the new content hash of an updated item; created items got theirs on creation."""
+    result = parse_response(call_azure_fabric_rest_api(
+        f"workspaces/{workspace_id}/items/{change.item_id}", method="patch",
+        request_body={"description": build_description(change.local)}))
+    if result.get("status_code") != 200:
+        raise RuntimeError(f"could not record content hash: {result.get('text')}")
+
+
+def _apply(pending: list[tuple[ItemDeploymentResult, ItemChange]], pool: ThreadPoolExecutor, timeout: float) -> None:
+    """Sends every change through the pool, waits for their operations and records the hashes of updated items."""
+    def start(item):
+        result, change = item
+        try:
+            return _start(change, result.workspace_id)
+        except Exception as e:
+            change.error = str(e)
+            return None
+
+    def record(item) -> None:
+        result, change = item
+        try:
+            _record_hash(change, result.workspace_id)
+        except Exception as e:
+            change.error = str(e)
+
+    responses = list(pool.map(start, pending))
+    poller = get_operation_poller()
+    futures = [(result, change, poller.submit_operation(response, timeout=timeout))
+               for (result, change), response in zip(pending, responses) if response is not None]
+    updated = []
+    for result, change, future in futures:
+        try:
+            future.result()
+            if change.action == UPDATE:
+                updated.append((result, change))
+        except Exception as e:
+            change.error = f"{change.action} failed: {e}"
+    list(pool.map(record, updated))
+
+
+def deploy_items(workspaces: dict[str, tuple[str|None, str|Path]], max_workers: int = 8, delete: bool = True,
+                 dry_run: bool = False, timeout: float = 1800) -> dict[str, ItemDeploymentResult]:
+    """
+    Deploys the items of {workspace_name: (workspace_id, folder)}: workspace item lists are
+    read concurrently, then every create, update and delete of every workspace is sent
+    through one pool of `max_workers` and their operations are awaited together.
+    Workspaces without an id (missing from the tenant) fail without any request.
+    """
+    started = time.monotonic()
+    results = {name: ItemDeploymentResult(name, workspace_id, str(folder),
+                                          error=None if workspace_id else "workspace does not exist")
+               for name, (workspace_id, folder) in workspaces.items()}
+
+    def plan(result: ItemDeploymentResult) -> None:
+        if result.error:
+            return
+        try:
+            local_items = read_local_items(result.folder)
+            result.changes = plan_item_changes(local_items, list_all_items(f"workspaces/{result.workspace_id}/items"),
+                                               delete)
+        except Exception as e:
+            result.error = f"could not compare items: {e}"
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        list(pool.map(plan, results.values()))
+        pending = [(result, change) for result in results.values() for change in result.changes
+                   if change.action != UNCHANGED]
+        if pending and not dry_run:
+            _apply(pending, pool, timeout)
+
+    for result in results.values():
+        result.duration = time.monotonic() - started
+    return results
+
+
+def print_item_deployment_report(results: dict[str, ItemDeploymentResult], dry_run: bool = False) -> None:
+    print("===== Item deployment report =====" + (" (dry run)" if dry_run else ""))
+    for result in results.values():
+        symbol = "✗" if result.failed else "✓"
+        line = (f"{symbol} {result.workspace_name}: {result.count(CREATE)} created, {result.count(UPDATE)} updated, "
+                f"{result.count(DELETE)} deleted, {result.count(UNCHANGED)} unchanged ({result.duration:.1f}s)")
+        if result.error:
+            line += f" - {result.error}"
+        print(line)
+        for change in result.changes:
+            if change.action != UNCHANGED or change.error:
+                detail = f" - {change.error}" if change.error else ""
+                print(f"    {'✗' if change.error else '-'} {change.action} {change.item_type} "
+                      f"{change.display_name}{detail}")
@@ -0,0 +1,326 @@
+"""
+Runs item jobs (pipelines, notebooks, Spark job definitions) on capacities that are only
+Active while the jobs run.
+
+A run resumes the capacities of the jobs' workspaces, triggers every job at once with
+`POST .../items/{id}/jobs/instances?jobType=...` and follows all job instances from one
+polling loop (Retry-After or backoff). The moment the last job of a capacity reaches a
+terminal state (Completed, Failed, Cancelled, Deduped) that capacity is suspended, so it
+is not billed a minute longer than its jobs need. Jobs still running at the timeout are
+cancelled before their capacity is suspended.
+
+Only capacities the run resumed are suspended: one that was already Active may be serving
+other workloads (or another run's jobs) and is left Active unless `suspend_active` is set.
+
+Jobs come from the `jobs` section of the template or from `workspace/item[:ItemType]`
+on the command line; the run returns a report with each job's status and duration.
+"""
+
+import time
+from dataclasses import dataclass, field, asdict
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import call_azure_fabric_rest_api, list_all_items
+from .operations import (PollResult, OperationTimeoutError, parse_response, get_header, get_retry_after,
+                         poll_until_all)
+from .capacities import get_capacity_status, resume_capacity, suspend_capacity
+from .inventory import Inventory
+
+
+# item type -> the jobType its on-demand job runs as
+JOB_TYPES = {"DataPipeline": "Pipeline", "Notebook": "RunNotebook", "SparkJobDefinition": "sparkjob"}
+TERMINAL_STATUSES = {"Completed", "Failed", "Cancelled", "Deduped"}
+
+
+@dataclass
+class JobSpec:
+    workspace: str
+    item: str
+    item_type: str = "DataPipeline"
+    job_type: str|None = None  # defaults from the item type, e.g. Pipeline for a DataPipeline
+    execution_data: dict|None = None  # sent as executionData, e.g. pipeline parameters
+
+    @property
+    def name(self) -> str:
+        return f"{self.workspace}/{self.item}"
+
+    def get_job_type(self) -> str:
+        return self.job_type or JOB_TYPES.get(self.item_type, "DefaultJob")
+
+    @classmethod
+    def parse(cls, value: str) -> "JobSpec":
+        """Parses `workspace/item[:ItemType]`, e.g. `av01-prod-processing/pl_master:DataPipeline`."""
+        workspace, _, item = value.partition("/")
+        item, _, item_type = item.partition(":")
+        if not workspace or not item:
+            raise ValueError(f"Expected workspace/item[:ItemType], got {value}")
+        return cls(workspace, item, item_type or "DataPipeline")
+
+    @classmethod
+    def from_config(cls, job: dict) -> "JobSpec":
+        return cls(job["workspace"], job["item"], job.get("item_type", "DataPipeline"), job.get("job_type"),
+                   job.get("execution_data"))
+
+
+@dataclass
+class JobRun:
+    spec: JobSpec
+    workspace_id: str|None = None
+    item_id: str|None = None
+    capacity_name: str|None = None
+    instance_url: str|None = None
+    status: str = "Pending"  # Pending, then the service's status, or NotTriggered / TimedOut / Unknown
+    failure_reason: str|None = None
+    triggered_at: float|None = None
+    finished_at: float|None = None
+
+    @property
+    def duration(self) -> float|None:
+        if self.triggered_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.triggered_at
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == "Completed"
+
+
+@dataclass
+class CapacityUsage:
+    name: str
+    was_active: bool = False
+    resumed: bool = False
+    resume_seconds: float|None = None
+    jobs_done_at: float|None = None
+    suspended: bool|None = None  # None: not suspended (suspend off, or never resumed)
+    suspended_at: float|None = None
+    error: str|None = None
+
+    @property
+    def active_after_jobs(self) -> float|None:
+        """Seconds between the capacity's last job ending and its suspend completing."""
+        if self.jobs_done_at is None or self.suspended_at is None:
+            return None
+        return self.suspended_at - self.jobs_done_at
+
+
+@dataclass
+class JobRunReport:
+    jobs: list[JobRun]
+    capacities: dict[str, CapacityUsage] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.time)
+    finished_at: float|None = None
+
+    @property
+    def succeeded(self) -> bool:
+        return all(run.succeeded for run in self.jobs) and not any(
+            usage.error or usage.suspended is False for usage in self.capacities.values())
+
+    def to_dict(self) -> dict:
+        document = asdict(self)
+        for run, entry in zip(self.jobs, document["jobs"]):
+            entry["name"], entry["duration"] = run.spec.name, run.duration
+        for name, entry in document["capacities"].items():
+            entry["active_after_jobs"] = self.capacities[name].active_after_jobs
+        return document
+
+
+def resolve_jobs(specs: list[JobSpec], inventory: Inventory, max_workers: int = 8) -> list[JobRun]:
+    """Looks up the workspace, item and capacity of every job; jobs that cannot be resolved are NotTriggered."""
+    runs = [JobRun(spec) for spec in specs]
+    for run in runs:
+        run.workspace_id = inventory.get_workspace_id(run.spec.workspace)
+        if run.workspace_id is None:
+            run.status, run.failure_reason = "NotTriggered", f"workspace {run.spec.workspace} not found"
+            continue
+        capacity_id = (inventory.get_workspace(run.spec.workspace) or {}).get("capacityId")
+        run.capacity_name = inventory.get_fabric_capacity_name(capacity_id)
+        if run.capacity_name is None and capacity_id:
+            inventory.refresh_fabric_capacities()
+            run.capacity_name = inventory.get_fabric_capacity_name(capacity_id)
+
+    workspace_ids = sorted({run.workspace_id for run in runs if run.workspace_id})
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        items = dict(zip(workspace_ids, pool.map(lambda workspace_id: list_all_items(
+            f"workspaces/{workspace_id}/items"), workspace_ids)))
+    for run in runs:
+        if run.workspace_id is None:
+            continue
+        run.item_id = next((item.get("id") for item in items[run.workspace_id]
+                            if item.get("displayName") == run.spec.item and item.get("type") == run.spec.item_type),
+                           None)
+        if run.item_id is None:
+            run.status, run.failure_reason = "NotTriggered", f"{run.spec.item_type} {run.spec.item} not found"
+    return runs
+
+
+def trigger_job(run: JobRun) -> float|None:
+    """Starts a job instance and records its URL. Returns the Retry-After to wait before the first poll."""
+    request_body = {"executionData": run.spec.execution_data} if run.spec.execution_data else None
+    result = parse_response(call_azure_fabric_rest_api(
+        f"workspaces/{run.workspace_id}/items/{run.item_id}/jobs/instances", method="post",
+        request_body=request_body, params={"jobType": run.spec.get_job_type()}))
+    location = get_header(result, "location")
+    if result.get("status_code") != 202 or not location:
+        raise RuntimeError(f"Failed to start {run.spec.name}: {result.get('text')}")
+    run.instance_url, run.triggered_at, run.status = location, time.time(), "NotStarted"
+    return get_retry_after(result)
+
+
+def check_job_instance(run: JobRun) -> PollResult:
+    """Polls a job instance once; done when it reaches a terminal status."""
+    result = parse_response(call_azure_fabric_rest_api(run.instance_url))
+    status_code = result.get("status_code", 0)
+    retry_after = get_retry_after(result)
+    if status_code == 429 or status_code >= 500:
+        return PollResult(False, retry_after=retry_after)
+    if status_code != 200:
+        raise RuntimeError(f"Failed to read job instance of {run.spec.name}: {result.get('text')}")
+
+    document = result.get("text") if isinstance(result.get("text"), dict) else {}
+    run.status = document.get("status") or run.status
+    if run.status not in TERMINAL_STATUSES:
+        return PollResult(False, retry_after=retry_after)
+    run.finished_at = time.time()
+    failure = document.get("failureReason")
+    if failure:
+        run.failure_reason = failure.get("message") if isinstance(failure, dict) else str(failure)
+    return PollResult(True, run.status)
+
+
+def cancel_job(run: JobRun) -> None:
+    """Asks the service to cancel a job instance; failures are printed, not raised."""
+    response = parse_response(call_azure_fabric_rest_api(f"{run.instance_url}/cancel", method="post"))
+    if response.get("status_code") not in (200, 202):
+        print(f"⚠ Could not cancel {run.spec.name}: {response.get('text')}")
+
+
+def _activate(usage: CapacityUsage, resource_group: str) -> None:
+    try:
+        usage.was_active = get_capacity_status(usage.name, resource_group)[1] == "Active"
+        if usage.was_active:
+            print(f"✓ {usage.name} is already Active")
+            return
+        started = time.time()
+        usage.resumed = resume_capacity(usage.name, resource_group)
+        usage.resume_seconds = time.time() - started
+        if not usage.resumed:
+            usage.error = "could not be resumed"
+    except Exception as e:
+        usage.error = str(e)
+
+
+def _release(usage: CapacityUsage, resource_group: str) -> None:
+    try:
+        usage.suspended = suspend_capacity(usage.name, resource_group)
+    except Exception as e:
+        usage.suspended, usage.error = False, str(e)
+    usage.suspended_at = time.time()
+
+
+def run_jobs(runs: list[JobRun], resource_group: str, suspend: bool = True, timeout: float = 6 * 3600,
+             max_workers: int = 8, poll_seconds: float = 60, suspend_active: bool = False) -> JobRunReport:
+    """
+    Resumes the capacities of the jobs, starts every job at once, polls them from one loop and
+    suspends each capacity it resumed as soon as its last job ends (`suspend=False` leaves them
+    Active). Capacities that were already Active are only suspended with `suspend_active`.
+    """
+    report = JobRunReport(runs)
+    for run in runs:
+        if run.capacity_name and run.status == "Pending":
+            report.capacities.setdefault(run.capacity_name, CapacityUsage(run.capacity_name))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        list(pool.map(lambda usage: _activate(usage, resource_group), report.capacities.values()))
+        for run in runs:
+            usage = report.capacities.get(run.capacity_name)
+            if run.status == "Pending" and (usage is None or usage.error):
+                run.status = "NotTriggered"
+                run.failure_reason = f"capacity {run.capacity_name} {usage.error if usage else 'not found'}"
+
+        def trigger(run: JobRun) -> float|None:
+            try:
+                return trigger_job(run)
+            except Exception as e:
+                run.status, run.failure_reason = "NotTriggered", str(e)
+                return None
+
+        pending = [run for run in runs if run.status == "Pending"]
+        retry_afters = [delay for delay in pool.map(trigger, pending) if delay is not None]
+        started = [run for run in pending if run.status != "NotTriggered"]
+        for run in pending:
+            if run in started:
+                print(f"→ Started {run.spec.name} ({run.spec.get_job_type()})")
+            else:
+                print(f"✗ Could not start {run.spec.name}: {run.failure_reason}")
+
+        remaining = {name: 0 for name in report.capacities}
+        for run in started:
+            remaining[run.capacity_name] += 1
+        suspends = []
+
+        def capacity_done(name: str) -> None:
+            usage = report.capacities[name]
+            usage.jobs_done_at = time.time()
+            if suspend and (usage.resumed or (suspend_active and usage.was_active)):
+                print(f"→ Suspending {name}, its jobs are done")
+                suspends.append(pool.submit(_release, usage, resource_group))
+
+        def job_done(run: JobRun) -> None:
+            remaining[run.capacity_name] -= 1
+            if remaining[run.capacity_name] == 0:
+                capacity_done(run.capacity_name)
+
+        for name, count in remaining.items():
+            if count == 0:
+                capacity_done(name)
+
+        def check(run: JobRun) -> PollResult:
+            poll = check_job_instance(run)
+            if poll.done:
+                symbol = "✓" if run.succeeded else "✗"
+                print(f"{symbol} {run.spec.name} {run.status} after {run.duration:.0f}s")
+                job_done(run)
+            return poll
+
+        outcome = poll_until_all({run.spec.name: lambda run=run: check(run) for run in started}, timeout=timeout,
+                                 initial_delay=min(5.0, poll_seconds), max_delay=poll_seconds,
+                                 first_delay=min(retry_afters) if retry_afters else None, raise_on_error=False)
+        for run in started:
+            error = outcome.get(run.spec.name)
+            if run.status in TERMINAL_STATUSES or not isinstance(error, Exception):
+                continue
+            if isinstance(error, OperationTimeoutError):
+                cancel_job(run)
+                run.status, run.failure_reason = "TimedOut", f"still running after {timeout:.0f}s, cancelled"
+            else:
+                run.status, run.failure_reason = "Unknown", str(error)
+            run.finished_at = time.time()
+            print(f"✗ {run.spec.name}: {run.failure_reason}")
+            job_done(run)
+
+        for future in suspends:
+            future.result()
+    report.finished_at = time.time()
+    return report
+
+
+def print_job_run_report(report: JobRunReport) -> None:
+    print("===== Job run report =====")
+    for run in report.jobs:
+        symbol = "✓" if run.succeeded else "✗"
+        duration = f" in {run.duration:.1f}s" if run.duration is not None else ""
+        detail = f" - {run.failure_reason}" if run.failure_reason else ""
+        print(f"{symbol} {run.spec.name} ({run.spec.get_job_type()}): {run.status}{duration}{detail}")
+    for usage in report.capacities.values():
+        symbol = "✗" if usage.error or usage.suspended is False else "✓"
+        state = f"resumed in {usage.resume_seconds:.0f}s" if usage.resumed else (
+            "already Active" if usage.was_active else "not resumed")
+        if usage.suspended:
+            state += f", suspended {usage.active_after_jobs:.0f}s after its last job"
+        elif usage.suspended is None and (usage.resumed or usage.was_active):
+            state += ", left Active"
+        detail = f" - {usage.error}" if usage.error else ""
+        print(f"{symbol} {usage.name}: {state}{detail}")
+    if report.finished_at:
+        print(f"Total: {report.finished_at - report.started_at:.1f}s")
@@ -0,0 +1,135 @@
+"""
+Append-only journal of a deployment, so an interrupted run resumes instead of restarting.
+
+Every deployment step that succeeds is appended (with its output, e.g. the workspace id)
+to a JSON lines file, and so is every long-running operation a step starts waiting on.
+Each line is flushed and fsynced before the step moves on, so a cancelled GitHub Actions
+runner loses at most the step it was in.
+
+A `--resume` run replays the journal: finished steps return their recorded output without
+calling any API, steps that were waiting on an operation re-attach to its URL, and
+everything else runs as usual. A fresh run appends a new `start` record, which begins
+a new journal generation without rewriting the file.
+
+The journal lives in FABRIC_CORE_JOURNAL (default `.fabric_core/journal-<solution version>.jsonl`);
+upload it as a workflow artifact to resume on another runner.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime, timezone
+from dataclasses import dataclass, field
+
+from .task_graph import Task
+from .operations import operation_listener, check_operation, poll_until_all
+
+
+@dataclass
+class JournalState:
+    """What a journal generation says about a deployment."""
+    config_hash: str|None = None
+    completed: dict = field(default_factory=dict)  # task name -> output
+    pending_operations: dict = field(default_factory=dict)  # task name -> (operation url, audience)
+    finished: bool = False
+
+
+def get_journal_path(config: dict, path: str|Path|None = None) -> Path:
+    default = Path(".fabric_core") / f"journal-{config.get('solution_version', 'av01')}.jsonl"
+    return Path(path or os.getenv("FABRIC_CORE_JOURNAL") or default)
+
+
+def get_config_hash(config: dict) -> str:
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def read_journal(path: str|Path) -> JournalState:
+    """Replays the last generation of a journal. A torn last line (from a crash mid-write) is ignored."""
+    state = JournalState()
+    path = Path(path)
+    if not path.exists():
+        return state
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        event = record.get("event")
+        if event == "start":
+            state = JournalState(record.get("config_hash"))
+        elif event == "step":
+            state.completed[record["task"]] = record.get("output")
+            state.pending_operations.pop(record["task"], None)
+        elif event == "operation":
+            state.pending_operations[record["task"]] = (record["url"], record.get("audience"))
+        elif event == "finish":
+            state.finished = True
+    return state
+
+
+class DeploymentJournal:
+    """Appends records to a journal file; safe to use from the task graph's worker threads."""
+
+    def __init__(self, path: str|Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def append(self, event: str, **fields) -> None:
+        record = {"event": event, "at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"), **fields}
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as journal_file:
+                journal_file.write(line)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+    def open_run(self, config: dict, resume: bool = False) -> JournalState:
+        """
+        Starts a run. When resuming a journal of the same template, returns its state;
+        otherwise starts a new generation and returns an empty state.
+        """
+        config_hash = get_config_hash(config)
+        state = read_journal(self.path) if resume else JournalState()
+        if resume and state.config_hash not in (None, config_hash):
+            print(f"⚠ {self.path} was written for a different template, starting from the top")
+            state = JournalState()
+        if resume and state.config_hash == config_hash:
+            self.append("resume", completed=len(state.completed), pending_operations=len(state.pending_operations))
+            print(f"✓ Resuming from {self.path}: {len(state.completed)} steps done, "
+                  f"{len(state.pending_operations)} operations in flight")
+            return state
+        self.append("start", config_hash=config_hash, solution_version=config.get("solution_version"))
+        return JournalState(config_hash)
+
+    def wrap(self, tasks: dict[str, Task], state: JournalState) -> dict[str, Task]:
+        """Returns tasks that replay finished steps, re-attach to pending operations and journal their progress."""
+        return {name: Task(name, self._journaled(name, task.func, state), task.depends_on)
+                for name, task in tasks.items()}
+
+    def _journaled(self, name: str, func, state: JournalState):
+        def run(outputs):
+            if name in state.completed:
+                print(f"✓ {name} done in a previous run")
+                return state.completed[name]
+            if name in state.pending_operations:
+                self._reattach(name, *state.pending_operations[name])
+            token = operation_listener.set(
+                lambda url, audience: self.append("operation", task=name, url=url, audience=audience))
+            try:
+                output = func(outputs)
+            finally:
+                operation_listener.reset(token)
+            self.append("step", task=name, output=output)
+            return output
+        return run
+
+    def _reattach(self, name: str, operation_url: str, audience: str|None) -> None:
+        """Waits for an operation a previous run left in flight; the step then runs and finds its result."""
+        print(f"... {name}: re-attaching to the operation of a previous run")
+        outcome = poll_until_all({operation_url: lambda: check_operation(operation_url, audience)},
+                                 timeout=600, raise_on_error=False)
+        if isinstance(outcome.get(operation_url), Exception):
+            print(f"⚠ {name}: previous operation did not succeed ({outcome[operation_url]}), running the step again")
@@ -1,32 +1,325 @@
 """
 This file loads the YAML config file for creating the resources
+
+The template is compiled once: `{{SOLUTION_VERSION}}` and `${VAR}` placeholders are
+substituted in a single pass, the result is parsed and validated into a typed
+`SolutionConfig`, and unresolved placeholders are reported before anything talks to
+Azure. Compiled templates are cached on disk, keyed by the file hash and the values
+of the environment variables the template references.
 """
 from pathlib import Path
 import yaml, os
-from string import Template
+import re
+import json
+import hashlib
+from dataclasses import dataclass, field
 from .utils import load_local_env_file
 
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = Path(".fabric_core") / "config_cache"
+PLACEHOLDER_PATTERN = re.compile(r"\{\{SOLUTION_VERSION\}\}|\$\{([A-Za-z_][A-Za-z0-9_]*)\}")
+SOLUTION_VERSION_PATTERN = re.compile(r"""^solution_version:\s*['"]?([^'"\s#]+)""", re.MULTILINE)
+VALID_ROLES = ("Admin", "Member", "Contributor", "Viewer")
+
+
+class ConfigError(ValueError):
+    """Raised when a template is invalid. `problems` lists everything that is wrong with it."""
+
+    def __init__(self, file_path, problems: list[str]):
+        self.problems = problems
+        super().__init__(f"Invalid config {file_path}:\n" + "\n".join(f"  - {problem}" for problem in problems))
+
+
+@dataclass(slots=True)
+class PermissionConfig:
+    group: str
+    role: str
+
+
+@dataclass(slots=True)
+class AutoscaleConfig:
+    min_sku: str|None = None
+    max_sku: str|None = None
+    cooldown_minutes: float = 15
+    scale_up_at: float = 80  # utilization % that counts as busy
+    scale_down_at: float = 30  # utilization % that counts as idle
+
+
+@dataclass(slots=True)
+class CapacityConfig:
+    name: str
+    sku: str|None = None
+    region: str|None = None
+    capacity_admins: str|None = None
+    autoscale: AutoscaleConfig|None = None
+
+
+@dataclass(slots=True)
+class WorkspaceConfig:
+    name: str
+    capacity: str|None = None
+    permissions: list[PermissionConfig] = field(default_factory=list)
+    connect_to_git_folder: str|None = None
+    items_folder: str|None = None
+
+
+@dataclass(slots=True)
+class JobConfig:
+    workspace: str
+    item: str
+    item_type: str = "DataPipeline"
+    job_type: str|None = None  # defaults from the item type, e.g. Pipeline for a DataPipeline
+    execution_data: dict|None = None
+
+
+@dataclass(slots=True)
+class GithubConfig:
+    organization: str
+    repository: str
+    branch: str
+    provider: str = "GitHub"
+
+
+@dataclass(slots=True)
+class CapacityDefaults:
+    resource_group: str
+    region: str|None = None
+    sku: str|None = None
+    capacity_admins: str|None = None
+    autoscale: AutoscaleConfig|None = None
+
+
+@dataclass(slots=True)
+class AzureConfig:
+    subscription_id: str|None
+    tenant_id: str|None
+    security_groups: dict[str, str]
+    capacity_defaults: CapacityDefaults
+
+
+@dataclass(slots=True)
+class SolutionConfig:
+    solution_version: str
+    azure: AzureConfig
+    github: GithubConfig
+    capacities: list[CapacityConfig]
+    workspaces: list[WorkspaceConfig]
+    jobs: list[JobConfig] = field(default_factory=list)
+    unresolved: list[str] = field(default_factory=list)  # ${VAR} placeholders with no value
+    raw: dict = field(default_factory=dict)  # the substituted template, as the rest of fabric_core consumes it
+
+    def get_capacity(self, name: str) -> CapacityConfig|None:
+        return next((capacity for capacity in self.capacities if capacity.name == name), None)
+
+    def get_workspace(self, name: str) -> WorkspaceConfig|None:
+        return next((workspace for workspace in self.workspaces if workspace.name == name), None)
+
+
+def get_referenced_variables(yaml_content: str) -> list[str]:
+    """Returns the environment variables referenced as ${VAR} in a template."""
+    return sorted({match.group(1) for match in PLACEHOLDER_PATTERN.finditer(yaml_content) if match.group(1)})
+
+
+def substitute_placeholders(yaml_content: str, solution_version: str,
+                            environ=None) -> tuple[str, list[str]]:
+    """
+    Replaces `{{SOLUTION_VERSION}}` and `${VAR}` in one pass.
+    Returns the text and the unresolved placeholders ("VAR (line N)"); those are left as they are.
+    """
+    environ = os.environ if environ is None else environ
+    unresolved = []
+
+    def replace(match):
+        name = match.group(1)
+        if name is None:
+            return solution_version
+        if name in environ:
+            return environ[name]
+        unresolved.append(f"{name} (line {yaml_content.count(chr(10), 0, match.start()) + 1})")
+        return match.group(0)
+
+    return PLACEHOLDER_PATTERN.sub(replace, yaml_content), unresolved
+
+
+def build_autoscale_config(autoscale, owner: str, problems: list[str]) -> AutoscaleConfig|None:
+    """Validates an `autoscale` block, adding what is wrong with it to `problems`."""
+    from .capacities import FABRIC_SKUS
+
+    if autoscale is None:
+        return None
+    if not isinstance(autoscale, dict):
+        problems.append(f"{owner}: autoscale is not a mapping")
+        return None
+    for key in ("min_sku", "max_sku"):
+        if autoscale.get(key) is not None and autoscale[key] not in FABRIC_SKUS:
+            problems.append(f"{owner}: autoscale.{key} {autoscale[key]} is not one of {', '.join(FABRIC_SKUS)}")
+    if (autoscale.get("min_sku") in FABRIC_SKUS and autoscale.get("max_sku") in FABRIC_SKUS
+            and FABRIC_SKUS.index(autoscale["min_sku"]) > FABRIC_SKUS.index(autoscale["max_sku"])):
+        problems.append(f"{owner}: autoscale.min_sku is larger than autoscale.max_sku")
+    config = AutoscaleConfig(autoscale.get("min_sku"), autoscale.get("max_sku"))
+    for key in ("cooldown_minutes", "scale_up_at", "scale_down_at"):
+        if key in autoscale:
+            if not isinstance(autoscale[key], (int, float)) or autoscale[key] < 0:
+                problems.append(f"{owner}: autoscale.{key} must be a non-negative number")
+            else:
+                setattr(config, key, autoscale[key])
+    if config.scale_down_at >= config.scale_up_at:
+        problems.append(f"{owner}: autoscale.scale_down_at must be below scale_up_at")
+    return config
+
+
+def build_solution_config(data: dict, file_path="<template>", unresolved: list[str]|None = None) -> SolutionConfig:
+    """Validates a substituted template and returns the typed model. Raises ConfigError listing every problem."""
+    problems = []
+
+    def section(parent, key, kind=dict):
+        value = parent.get(key) if isinstance(parent, dict) else None
+        if not isinstance(value, kind):
+            problems.append(f"'{key}' is missing or is not a {'mapping' if kind is dict else 'list'}")
+            return kind()
+        return value
+
+    if not isinstance(data, dict):
+        raise ConfigError(file_path, ["template is empty or is not a mapping"])
+
+    azure = section(data, "azure")
+    security_groups = azure.get("security_groups") or {}
+    defaults = section(azure, "capacity_defaults")
+    if not defaults.get("resource_group"):
+        problems.append("azure.capacity_defaults.resource_group is required")
+    default_autoscale = build_autoscale_config(defaults.get("autoscale"), "capacity_defaults", problems)
+    github = section(data, "github")
+    for key in ("organization", "repository", "branch"):
+        if not github.get(key):
+            problems.append(f"github.{key} is required")
+
+    capacities = []
+    for index, capacity in enumerate(section(data, "capacities", list)):
+        if not isinstance(capacity, dict) or not capacity.get("name"):
+            problems.append(f"capacities[{index}] has no name")
+            continue
+        capacities.append(CapacityConfig(capacity["name"], capacity.get("sku"), capacity.get("region"),
+                                         capacity.get("capacity_admins"),
+                                         build_autoscale_config(capacity.get("autoscale"), f"capacity {capacity['name']}",
+                                                                problems)))
+    capacity_names = {capacity.name for capacity in capacities}
+
+    workspaces, seen = [], set()
+    for index, workspace in enumerate(section(data, "workspaces", list)):
+        if not isinstance(workspace, dict) or not workspace.get("name"):
+            problems.append(f"workspaces[{index}] has no name")
+            continue
+        name = workspace["name"]
+        if name in seen:
+            problems.append(f"workspace {name} is defined twice")
+        seen.add(name)
+        if workspace.get("capacity") not in capacity_names:
+            problems.append(f"workspace {name} uses capacity {workspace.get('capacity')}, which is not in 'capacities'")
+        permissions = []
+        for permission in workspace.get("permissions") or []:
+            group, role = permission.get("group"), permission.get("role")
+            if group not in security_groups:
+                problems.append(f"workspace {name} grants {role} to unknown security group {group}")
+            if role not in VALID_ROLES:
+                problems.append(f"workspace {name} uses unknown role {role} (expected one of {', '.join(VALID_ROLES)})")
+            permissions.append(PermissionConfig(group, role))
+        workspaces.append(WorkspaceConfig(name, workspace.get("capacity"), permissions,
+                                          workspace.get("connect_to_git_folder"), workspace.get("items_folder")))
+
+    jobs = []
+    for index, job in enumerate(data.get("jobs") or []):
+        if not isinstance(job, dict) or not job.get("workspace") or not job.get("item"):
+            problems.append(f"jobs[{index}] needs a workspace and an item")
+            continue
+        if job["workspace"] not in seen:
+            problems.append(f"job {job['item']} runs in workspace {job['workspace']}, which is not in 'workspaces'")
+        if not isinstance(job.get("execution_data") or {}, dict):
+            problems.append(f"job {job['item']} has execution_data that is not a mapping")
+        jobs.append(JobConfig(job["workspace"], job["item"], job.get("item_type", "DataPipeline"), job.get("job_type"),
+                              job.get("execution_data")))
+
+    if problems:
+        raise ConfigError(file_path, problems)
+
+    return SolutionConfig(
+        solution_version=str(data.get("solution_version", "av01")),
+        azure=AzureConfig(azure.get("subscription_id"), azure.get("tenant_id"), dict(security_groups),
+                          CapacityDefaults(defaults["resource_group"], defaults.get("region"), defaults.get("sku"),
+                                           defaults.get("capacity_admins"), default_autoscale)),
+        github=GithubConfig(github["organization"], github["repository"], github["branch"],
+                            github.get("provider", "GitHub")),
+        capacities=capacities,
+        workspaces=workspaces,
+        jobs=jobs,
+        unresolved=list(unresolved or []),
+        raw=data)
+
+
+def get_cache_key(content: bytes, environ=None) -> str:
+    """Hash of the template plus the values of the environment variables it references."""
+    environ = os.environ if environ is None else environ
+    digest = hashlib.sha256(f"v{CACHE_VERSION}\0".encode())
+    digest.update(content)
+    for name in get_referenced_variables(content.decode("utf-8")):
+        digest.update(f"\0{name}={environ.get(name, chr(0))}".encode())
+    return digest.hexdigest()
+
+
+def _read_cache(cache_file: Path) -> dict|None:
+    try:
+        return json.loads(cache_file.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(cache_file: Path, payload: dict) -> None:
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        temp_file.write_text(json.dumps(payload))
+        os.chmod(temp_file, 0o600)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        pass
+
 
-load_local_env_file()
+def load_solution_config(file_path: str, strict: bool = False, use_cache: bool = True,
+                         cache_dir: str|Path|None = None) -> SolutionConfig:
+    """
+    Loads, substitutes and validates a template.
 
-def load_config_from_file(file_path: str) -> dict:
+    Unresolved ${VAR} placeholders are printed as a warning, or raise ConfigError when `strict`.
+    """
     path = Path(file_path)
 
     if not path.exists():
         raise FileNotFoundError(f"Config file not found: {file_path}")
 
-    yaml_content = path.read_text()
+    load_local_env_file()
+    content = path.read_bytes()
+    cache_file = Path(cache_dir or os.getenv("FABRIC_CORE_CACHE_DIR") or DEFAULT_CACHE_DIR) / f"{get_cache_key(content)}.json"
+    cached = _read_cache(cache_file) if use_cache else None
 
-    temp_config = yaml.safe_load(yaml_content) or {}
-    solution_version = str(temp_config.get("solution_version", "av01"))
+    if cached is not None:
+        data, unresolved = cached["config"], cached["unresolved"]
+    else:
+        yaml_content = content.decode("utf-8")
+        match = SOLUTION_VERSION_PATTERN.search(yaml_content)
+        solution_version = match.group(1) if match else "av01"
+        final_config, unresolved = substitute_placeholders(yaml_content, solution_version)
+        data = yaml.safe_load(final_config) or {}
 
-    yaml_with_version = yaml_content.replace(
-        "{{SOLUTION_VERSION}}",
-        solution_version,
-    )
+    if unresolved:
+        if strict:
+            raise ConfigError(path, [f"unresolved placeholder {name}" for name in unresolved])
+        print(f"⚠ {path.name}: unresolved placeholders: {', '.join(unresolved)}")
 
-    final_config = Template(yaml_with_version).safe_substitute(os.environ)
+    solution_config = build_solution_config(data, path, unresolved)
+    if use_cache and cached is None:
+        _write_cache(cache_file, {"config": data, "unresolved": unresolved})
+    return solution_config
 
-    return yaml.safe_load(final_config)
 
-    
\ No newline at end of file
+def load_config_from_file(file_path: str, strict: bool = False, use_cache: bool = True) -> dict:
+    """Loads and validates a template and returns it as a dict."""
+    return load_solution_config(file_path, strict, use_cache).raw
@@ -1,21 +1,33 @@
 """
 Method to login to Azure using Service Principal
 """
-from .utils import run_fabric_cli_command, load_local_env_file
+from .utils import run_fabric_cli_command, load_local_env_file, use_http_transport
 import os
+import threading
 
 
-load_local_env_file()
+_login_lock = threading.Lock()
+_logged_in_as = None  # (tenant, client id) the Fabric CLI is logged in with
 
-client_id = os.getenv("SPN_CLIENT_ID")
-client_secret = os.getenv("SPN_CLIENT_SECRET")
-tenant_id = os.getenv("AZURE_TENANT_ID")
 
-
-def login():
+def login(cli: bool = False):
+    """
+    Logs the Fabric CLI in with the service principal. With the HTTP transport the requests
+    carry their own tokens, so the `fab auth login` process is skipped unless `cli` is set
+    (a request falling back to the CLI logs it in on first use).
+    """
+    global _logged_in_as
+    load_local_env_file()
+    if use_http_transport() and not cli:
+        print("Using the HTTP transport, skipping the Fabric CLI login")
+        return
+    client_id = os.getenv("SPN_CLIENT_ID")
+    client_secret = os.getenv("SPN_CLIENT_SECRET")
+    tenant_id = os.getenv("AZURE_TENANT_ID")
     try:
         result = run_fabric_cli_command(["auth", "login", "-u", f"{client_id}", "-p", f"{client_secret}", "--tenant", f"{tenant_id}"])
         if result.returncode == 0:
+            _logged_in_as = (tenant_id, client_id)
             print(f"Successfully logged In. return code: {result.returncode}")
         else:
             print(f"Login Failed. return code: {result.returncode}\n, stdout: {result.stdout}\n, stderr: {result.stderr}")
@@ -23,3 +35,17 @@ def login():
         print(f"Failed to run login function. {e}")
 
 
+def ensure_logged_in(cli: bool = False) -> bool:
+    """
+    Logs the Fabric CLI in once per process. Long-lived processes (the fabric-core daemon)
+    call this before every command instead of spawning `fab auth login` each time; it logs
+    in again only when the service principal in the environment changed. With the HTTP
+    transport there is nothing to do unless `cli` is set.
+    """
+    with _login_lock:
+        load_local_env_file()
+        if use_http_transport() and not cli:
+            return True
+        if _logged_in_as != (os.getenv("AZURE_TENANT_ID"), os.getenv("SPN_CLIENT_ID")):
+            login(cli=True)
+        return _logged_in_as is not None
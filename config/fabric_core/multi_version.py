@@ -0,0 +1,204 @@
+"""
+Deploys several solution versions (av01, av02, ...) side by side.
+
+The templates are loaded, and the login, tokens, git connections and inventory are
+fetched once in this process. Each version is then deployed (or planned/applied) in its
+own worker process from a read-only copy of that inventory, so three versions take about
+as long as one. The output of each worker is printed per version, followed by a report.
+Each version's deployment is journaled to its own file, so an interrupted run can resume.
+"""
+
+import io
+import glob
+import time
+import contextlib
+import multiprocessing
+from pathlib import Path
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+MODES = ("deploy", "plan", "apply")
+
+
+@dataclass
+class VersionResult:
+    solution_version: str
+    template: str
+    status: str = "failed"  # succeeded | failed
+    steps: int = 0
+    failed_steps: list[str] = field(default_factory=list)
+    planned_changes: int = 0
+    duration: float = 0.0
+    error: str|None = None
+    output: str = ""
+
+
+def expand_templates(patterns) -> list[Path]:
+    """
+    Resolves template paths and glob patterns (e.g. `config/templates/*/*_template.yaml`)
+    in the given order, without duplicates.
+    """
+    paths = []
+    for pattern in patterns:
+        pattern = str(pattern)
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise FileNotFoundError(f"No templates match {pattern}")
+        for match in matches:
+            path = Path(match).resolve()
+            if not path.is_file():
+                raise FileNotFoundError(f"Template {match} not found")
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def prepare_shared_state(configs: list[dict]) -> dict:
+    """
+    Logs in, acquires the API tokens, makes sure every git connection the templates need
+    exists and loads one inventory covering all of their resource groups.
+    Returns the picklable state handed to the worker processes.
+    """
+    from .login import ensure_logged_in
+    from .utils import use_http_transport
+    from .inventory import Inventory
+    from .credentials import get_token_provider
+    from .git_integration import get_or_create_git_connection
+
+    ensure_logged_in()
+    tokens = {}
+    if use_http_transport():
+        provider = get_token_provider()
+        for audience in ("fabric", "azure"):
+            provider.get_token(audience)
+        tokens = provider.export_tokens()
+
+    inventory = Inventory()
+    inventory.refresh_workspaces()
+    for resource_group in sorted({config["azure"]["capacity_defaults"]["resource_group"] for config in configs}):
+        inventory.refresh_capacities(resource_group)
+    inventory.refresh_fabric_capacities()
+    inventory.refresh_connections()
+
+    # Versions share the connection to their repository: create it here so workers never race to create it
+    repositories = {(config["github"]["organization"], config["github"]["repository"]): config["github"]
+                    for config in configs
+                    if any(workspace.get("connect_to_git_folder") for workspace in config.get("workspaces", []))}
+    for (owner, repo), github_config in repositories.items():
+        connection_id = get_or_create_git_connection(github_config)
+        if connection_id:
+            inventory.record_connection(f"GitHub-{owner}-{repo}", connection_id)
+
+    return {"tokens": tokens, "inventory": inventory.snapshot()}
+
+
+def run_version(config: dict, template: str, mode: str, shared: dict, max_workers: int = 8,
+                resume: bool = False) -> VersionResult:
+    """
+    Deploys, plans or applies one loaded template from the shared state. Runs in a worker process.
+    A deployment is journaled to the version's journal file, and `resume` continues from it.
+    """
+    from .credentials import get_token_provider
+    from .journal import DeploymentJournal, get_journal_path
+    from .inventory import Inventory
+    from .deployment import deploy_from_config, print_deployment_summary
+    from .plan import fetch_live_state, build_plan, print_plan, apply_plan, NO_OP
+
+    result = VersionResult(config.get("solution_version", "?"), template)
+    started = time.monotonic()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            get_token_provider().seed(shared.get("tokens", {}))
+            inventory = Inventory.from_snapshot(shared.get("inventory", {}))
+            if mode == "deploy":
+                results = deploy_from_config(config, max_workers=max_workers, inventory=inventory,
+                                             journal=DeploymentJournal(get_journal_path(config)), resume=resume)
+            else:
+                state = fetch_live_state(config, inventory, max_workers=max_workers)
+                actions = build_plan(config, state)
+                print_plan(actions)
+                result.planned_changes = sum(1 for action in actions if action.action != NO_OP)
+                results = apply_plan(actions, config, state, max_workers=max_workers) if mode == "apply" else {}
+                if results:
+                    print_deployment_summary(results)
+            result.steps = len(results)
+            result.failed_steps = [name for name, task in results.items() if task.status != "succeeded"]
+            result.status = "failed" if result.failed_steps else "succeeded"
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+            print(f"✗ {result.solution_version}: {result.error}")
+    result.duration = time.monotonic() - started
+    result.output = output.getvalue()
+    return result
+
+
+def deploy_versions(templates, mode: str = "deploy", max_processes: int|None = None,
+                    max_workers: int = 8, resume: bool = False) -> dict[str, VersionResult]:
+    """
+    Deploys (or plans/applies) every template matched by `templates`, one worker process
+    per solution version, and prints each version's output and a combined report.
+    With `resume` every version continues from its own journal.
+    Returns {solution_version: VersionResult} in template order.
+    """
+    from .journal import get_journal_path
+    from .load_config import load_config_from_file
+
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode}, expected one of {MODES}")
+    if resume and mode != "deploy":
+        raise ValueError(f"Only a deployment can be resumed, not {mode}")
+    configs = {str(path): load_config_from_file(path, strict=True) for path in expand_templates(templates)}
+    versions = [config.get("solution_version") for config in configs.values()]
+    duplicates = sorted({version for version in versions if versions.count(version) > 1})
+    if duplicates:
+        raise ValueError(f"Several templates deploy solution version {', '.join(duplicates)}")
+    if mode == "deploy":
+        journals = [get_journal_path(config) for config in configs.values()]
+        shared_journals = sorted({str(path) for path in journals if journals.count(path) > 1})
+        if shared_journals:
+            raise ValueError(f"Several solution versions would share the journal {', '.join(shared_journals)} "
+                             "(unset FABRIC_CORE_JOURNAL to give each version its own)")
+
+    started = time.monotonic()
+    shared = prepare_shared_state(list(configs.values()))
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, min(max_processes or len(configs), len(configs))),
+                             mp_context=context) as pool:
+        futures = {pool.submit(run_version, config, template, mode, shared, max_workers, resume): (template, config)
+                   for template, config in configs.items()}
+        for future in as_completed(futures):
+            template, config = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # the worker process died
+                result = VersionResult(config.get("solution_version", "?"), template, error=f"{type(e).__name__}: {e}")
+            print(f"===== {result.solution_version} ({Path(template).name}) =====")
+            print(result.output, end="")
+            results[result.solution_version] = result
+
+    results = {version: results[version] for version in versions}
+    print_version_report(results, time.monotonic() - started)
+    return results
+
+
+def print_version_report(results: dict[str, VersionResult], wall: float|None = None) -> None:
+    print("===== Solution versions =====")
+    for result in results.values():
+        symbol = "✓" if result.status == "succeeded" else "✗"
+        line = f"{symbol} {result.solution_version}: {result.status}"
+        if result.steps:
+            line += f" ({result.steps - len(result.failed_steps)}/{result.steps} steps"
+        else:
+            line += f" ({result.planned_changes} planned changes"
+        line += f", {result.duration:.1f}s)"
+        if result.failed_steps:
+            line += f" - failed: {', '.join(result.failed_steps)}"
+        if result.error:
+            line += f" - {result.error}"
+        print(line)
+    if wall is not None:
+        sequential = sum(result.duration for result in results.values())
+        print(f"Wall time {wall:.1f}s for {len(results)} versions ({sequential:.1f}s one after another)")
@@ -0,0 +1,303 @@
+"""
+Helpers for long-running operations (LRO) on the Fabric and Azure REST APIs.
+
+ARM and Fabric answer slow requests with 202 Accepted plus `Location`,
+`Azure-AsyncOperation` and `Retry-After` headers. These helpers follow the
+operation URLs, honour Retry-After and otherwise back off exponentially with
+jitter. `poll_until_all` and `OperationPoller` track many pending operations
+from a single loop instead of one sleeping thread per operation.
+"""
+
+import json
+import time
+import heapq
+import itertools
+import threading
+import contextvars
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from .utils import call_azure_fabric_rest_api
+from .tracing import span, current_span, record_span, endpoint_template
+from .throttling import parse_retry_after, backoff_delay
+
+
+SUCCEEDED_STATES = {"succeeded", "completed"}
+FAILED_STATES = {"failed", "canceled", "cancelled", "deduped"}
+
+# Called with (operation_url, audience) when wait_for_operation starts waiting, e.g. to journal it
+operation_listener: contextvars.ContextVar[Callable[[str, str|None], None]|None] = contextvars.ContextVar(
+    "operation_listener", default=None)
+
+
+class OperationFailedError(RuntimeError):
+    """Raised when a long-running operation ends in a failed state."""
+
+
+class OperationTimeoutError(TimeoutError):
+    """Raised when a long-running operation does not finish in time."""
+
+
+@dataclass
+class PollResult:
+    """The outcome of one poll: whether the operation is done, its value, and an optional Retry-After hint."""
+    done: bool
+    value: Any = None
+    retry_after: float|None = None
+
+
+def parse_response(response) -> dict:
+    """Parses the `{status_code, text, headers}` JSON printed by call_azure_fabric_rest_api."""
+    stdout = (response.stdout or "").strip()
+    if not stdout:
+        return {}
+    try:
+        return json.loads(stdout)
+    except json.JSONDecodeError:
+        return {}
+
+
+def get_header(result: dict, name: str) -> str|None:
+    headers = result.get("headers") or {}
+    return {key.lower(): value for key, value in headers.items()}.get(name.lower())
+
+
+def get_retry_after(result: dict) -> float|None:
+    """Returns the Retry-After header in seconds (delta-seconds or HTTP date), if present."""
+    return parse_retry_after(get_header(result, "retry-after"))
+
+
+def get_operation_url(result: dict) -> str|None:
+    """Returns the URL to poll for an accepted operation, preferring Azure-AsyncOperation over Location."""
+    return get_header(result, "azure-asyncoperation") or get_header(result, "location")
+
+
+def next_delay(poll: PollResult, attempt: int, initial_delay: float, max_delay: float) -> float:
+    if poll.retry_after is not None:
+        return min(poll.retry_after, max_delay)
+    return max(initial_delay / 2, backoff_delay(attempt, initial_delay, max_delay))
+
+
+def check_operation(operation_url: str, audience: str|None = None) -> PollResult:
+    """
+    Polls an operation URL once.
+    Understands Fabric `operations/{id}` documents, ARM Azure-AsyncOperation documents
+    and ARM Location URLs that answer 202 until the operation is done.
+    """
+    return read_operation_poll(parse_response(call_azure_fabric_rest_api(operation_url, audience=audience)))
+
+
+def read_operation_poll(result: dict) -> PollResult:
+    """Interprets one poll response of an operation URL."""
+    status_code = result.get("status_code", 0)
+    retry_after = get_retry_after(result)
+    text = result.get("text")
+    body = text if isinstance(text, dict) else {}
+
+    if status_code == 202:
+        return PollResult(False, retry_after=retry_after)
+    if status_code == 429 or status_code >= 500:
+        return PollResult(False, retry_after=retry_after)
+    if status_code not in (200, 201, 204):
+        raise OperationFailedError(f"Operation poll failed: {result}")
+
+    status = str(body.get("status", "")).lower()
+    if status in FAILED_STATES:
+        raise OperationFailedError(f"Operation {status}: {body.get('error') or body}")
+    if status and status not in SUCCEEDED_STATES:
+        return PollResult(False, retry_after=retry_after)
+    return PollResult(True, value=body)
+
+
+def wait_for_operation(response_or_result, audience: str|None = None, timeout: float = 600,
+                       initial_delay: float = 2.0, max_delay: float = 30.0) -> dict:
+    """
+    Waits for the operation started by a 202 response to finish and returns the final document.
+    Responses that are already final (no operation URL) are returned as they are.
+    """
+    result = response_or_result if isinstance(response_or_result, dict) else parse_response(response_or_result)
+    operation_url = get_operation_url(result)
+    if result.get("status_code") != 202 or not operation_url:
+        return result.get("text") if isinstance(result.get("text"), dict) else {}
+
+    listener = operation_listener.get()
+    if listener is not None:
+        listener(operation_url, audience)
+    first_delay = get_retry_after(result)
+    outcome = poll_until_all({operation_url: lambda: check_operation(operation_url, audience)},
+                             timeout=timeout, initial_delay=initial_delay, max_delay=max_delay,
+                             first_delay=first_delay)
+    return outcome[operation_url]
+
+
+def wait_until(check: Callable[[], PollResult], timeout: float = 600, initial_delay: float = 2.0,
+               max_delay: float = 30.0) -> Any:
+    """Polls a single condition with backoff until it reports done."""
+    return poll_until_all({"condition": check}, timeout=timeout, initial_delay=initial_delay,
+                          max_delay=max_delay, first_delay=0)["condition"]
+
+
+def poll_until_all(checks: dict[str, Callable[[], PollResult]], timeout: float = 600,
+                   initial_delay: float = 2.0, max_delay: float = 30.0,
+                   first_delay: float|None = 0, raise_on_error: bool = True) -> dict[str, Any]:
+    """
+    Polls many operations from one loop until all are done.
+    Each operation is polled on its own schedule (Retry-After or backoff).
+    Returns {key: value}; with raise_on_error=False failed or timed out
+    operations map to their exception instead of raising.
+    """
+    with span("poll", kind="poll", **{"poll.operations": len(checks)}) as current:
+        return _poll_until_all(checks, timeout, initial_delay, max_delay, first_delay, raise_on_error, current)
+
+
+def _poll_until_all(checks, timeout, initial_delay, max_delay, first_delay, raise_on_error, current) -> dict[str, Any]:
+    deadline = time.monotonic() + timeout
+    start = time.monotonic() + (first_delay if first_delay is not None else initial_delay)
+    counter = itertools.count()
+    schedule = [(start, next(counter), key, 0) for key in checks]
+    heapq.heapify(schedule)
+    outcome = {}
+
+    while schedule:
+        due, _, key, attempt = heapq.heappop(schedule)
+        now = time.monotonic()
+        if due > deadline:
+            error = OperationTimeoutError(f"Operation {key} did not finish within {timeout} seconds")
+            if raise_on_error:
+                raise error
+            outcome[key] = error
+            continue
+        if due > now:
+            time.sleep(due - now)
+
+        current.add("poll.iterations")
+        try:
+            poll = checks[key]()
+        except Exception as e:
+            if raise_on_error:
+                raise
+            outcome[key] = e
+            continue
+
+        if poll.done:
+            outcome[key] = poll.value
+        else:
+            delay = next_delay(poll, attempt, initial_delay, max_delay)
+            heapq.heappush(schedule, (time.monotonic() + delay, next(counter), key, attempt + 1))
+
+    return outcome
+
+
+@dataclass(order=True)
+class _ScheduledPoll:
+    due: float
+    sequence: int
+    key: str = field(compare=False)
+    check: Callable[[], PollResult] = field(compare=False)
+    future: Future = field(compare=False)
+    deadline: float = field(compare=False)
+    attempt: int = field(compare=False, default=0)
+    submitted_ns: int = field(compare=False, default_factory=time.time_ns)
+    parent_span_id: str|None = field(compare=False, default=None)
+
+
+class OperationPoller:
+    """
+    A single background loop that polls any number of operations submitted from any thread.
+    `submit` returns a Future that resolves with the operation's final value.
+    """
+
+    def __init__(self, initial_delay: float = 2.0, max_delay: float = 30.0):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self._schedule = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def submit(self, key: str, check: Callable[[], PollResult], timeout: float = 600,
+               first_delay: float|None = None) -> Future:
+        future = Future()
+        now = time.monotonic()
+        delay = self.initial_delay if first_delay is None else first_delay
+        with self._condition:
+            heapq.heappush(self._schedule, _ScheduledPoll(now + delay, next(self._counter), key, check,
+                                                          future, now + timeout,
+                                                          parent_span_id=getattr(current_span(), "span_id", None)))
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="fabric-operation-poller", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    def submit_operation(self, response_or_result, audience: str|None = None, timeout: float = 600) -> Future:
+        """Tracks the operation started by a 202 response."""
+        result = response_or_result if isinstance(response_or_result, dict) else parse_response(response_or_result)
+        operation_url = get_operation_url(result)
+        if result.get("status_code") != 202 or not operation_url:
+            future = Future()
+            future.set_result(result.get("text") if isinstance(result.get("text"), dict) else {})
+            return future
+        return self.submit(operation_url, lambda: check_operation(operation_url, audience), timeout,
+                           first_delay=get_retry_after(result))
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def _finish(self, item: _ScheduledPoll, value: Any = None, error: Exception|None = None) -> None:
+        record_span("operation", "poll", item.submitted_ns, time.time_ns(), item.parent_span_id,
+                    error=str(error) if error else None,
+                    **{"poll.iterations": item.attempt + 1, "url.template": endpoint_template(item.key)})
+        if error is None:
+            item.future.set_result(value)
+        else:
+            item.future.set_exception(error)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped and (not self._schedule or
+                                             self._schedule[0].due > time.monotonic()):
+                    wait = self._schedule[0].due - time.monotonic() if self._schedule else None
+                    self._condition.wait(wait)
+                if self._stopped:
+                    return
+                item = heapq.heappop(self._schedule)
+
+            if item.future.cancelled():
+                continue
+            if item.due > item.deadline:
+                self._finish(item, error=OperationTimeoutError(f"Operation {item.key} did not finish in time"))
+                continue
+            try:
+                poll = item.check()
+            except Exception as e:
+                self._finish(item, error=e)
+                continue
+            if poll.done:
+                self._finish(item, value=poll.value)
+                continue
+
+            item.due = time.monotonic() + next_delay(poll, item.attempt, self.initial_delay, self.max_delay)
+            item.attempt += 1
+            item.sequence = next(self._counter)
+            with self._condition:
+                heapq.heappush(self._schedule, item)
+
+
+_default_poller = None
+_default_poller_lock = threading.Lock()
+
+
+def get_operation_poller() -> OperationPoller:
+    """Returns the process-wide operation poller."""
+    global _default_poller
+    with _default_poller_lock:
+        if _default_poller is None:
+            _default_poller = OperationPoller()
+        return _default_poller
@@ -0,0 +1,285 @@
+"""
+Plan/apply for solution templates.
+
+`build_plan` compares a loaded template with the live state of the tenant and
+returns a typed list of create/update/delete/no-op actions. `apply_plan` runs only the
+actions that change something, in dependency order and in parallel.
+"""
+
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+from .task_graph import Task, TaskResult, run_task_graph, require
+from .inventory import Inventory, load_inventory
+from .role_assignments import ADD, DELETE, diff_role_assignments
+from .capacities import create_capacity, update_capacity, get_capacity_admins, get_desired_sku
+from .workspaces import (create_workspace, list_role_assignments, add_role_assignment, update_role_assignment,
+                         delete_role_assignment, assign_workspace_to_capacity)
+from .git_integration import (get_or_create_git_connection, connect_workspace_to_git, get_git_connection,
+                              disconnect_workspace_from_git)
+
+
+CREATE = "create"
+UPDATE = "update"
+REMOVE = "delete"
+NO_OP = "no-op"
+
+
+@dataclass
+class PlannedAction:
+    action: str  # create | update | delete | no-op
+    resource_type: str  # capacity | workspace | role_assignment | git_connection
+    name: str
+    changes: dict = field(default_factory=dict)  # field -> (current, desired)
+    details: dict = field(default_factory=dict)  # whatever apply needs to run the action
+    depends_on: list[str] = field(default_factory=list)
+
+    @property
+    def key(self) -> str:
+        return f"{self.resource_type}:{self.name}"
+
+
+@dataclass
+class LiveState:
+    inventory: Inventory
+    role_assignments: dict = field(default_factory=dict)  # workspace name -> list of role assignments
+    git_connections: dict = field(default_factory=dict)  # workspace name -> git connection document
+
+
+def fetch_live_state(config: dict, inventory: Inventory|None = None, max_workers: int = 8) -> LiveState:
+    """
+    Reads everything the template describes: capacities, workspaces, their role assignments
+    and git connections. Per-workspace reads run concurrently.
+    """
+    if inventory is None:
+        inventory = load_inventory(config["azure"]["capacity_defaults"]["resource_group"])
+    inventory.refresh_fabric_capacities()
+    state = LiveState(inventory)
+
+    existing = [(workspace, inventory.get_workspace_id(workspace["name"])) for workspace in config.get("workspaces", [])]
+    existing = [(workspace, workspace_id) for workspace, workspace_id in existing if workspace_id]
+
+    def read(workspace, workspace_id):
+        assignments = list_role_assignments(workspace_id)
+        connection = get_git_connection(workspace_id) if workspace.get("connect_to_git_folder") else None
+        return workspace["name"], assignments, connection
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for name, assignments, connection in pool.map(lambda item: read(*item), existing):
+            state.role_assignments[name] = assignments
+            if connection is not None:
+                state.git_connections[name] = connection
+
+    return state
+
+
+def build_plan(config: dict, state: LiveState) -> list[PlannedAction]:
+    """
+    Diffs the template against the live state.
+    """
+    actions = []
+    inventory = state.inventory
+    defaults = config["azure"]["capacity_defaults"]
+    security_groups = config["azure"]["security_groups"]
+    github_config = config["github"]
+
+    for capacity in config.get("capacities", []):
+        name = capacity["name"]
+        desired_sku = capacity.get("sku", defaults.get("sku"))
+        desired_admins = sorted(get_capacity_admins(capacity, defaults))
+        live = inventory.get_capacity(name)
+        if live is None:
+            actions.append(PlannedAction(CREATE, "capacity", name, details={"config": capacity},
+                                         changes={"sku": (None, desired_sku)}))
+            continue
+
+        changes = {}
+        live_sku = (live.get("sku") or {}).get("name")
+        desired_sku = get_desired_sku(capacity, defaults, live_sku)
+        if live_sku != desired_sku:
+            changes["sku"] = (live_sku, desired_sku)
+        live_admins = sorted(((live.get("properties") or {}).get("administration") or {}).get("members", []))
+        if live_admins != desired_admins:
+            changes["admin_members"] = (live_admins, desired_admins)
+        desired_region = capacity.get("region", defaults.get("region"))
+        if _normalize_region(live.get("location")) != _normalize_region(desired_region):
+            print(f"⚠ {name} is in {live.get('location')}, template says {desired_region}; "
+                  f"a capacity cannot be moved, recreate it to change region")
+
+        actions.append(PlannedAction(UPDATE if changes else NO_OP, "capacity", name, changes,
+                                     {"config": capacity}))
+
+    planned_capacities = {action.name for action in actions if action.action != NO_OP}
+
+    for workspace in config.get("workspaces", []):
+        name = workspace["name"]
+        workspace_id = inventory.get_workspace_id(name)
+        capacity_dependency = [f"capacity:{workspace['capacity']}"] if workspace.get("capacity") in planned_capacities else []
+
+        if workspace_id is None:
+            actions.append(PlannedAction(CREATE, "workspace", name, {"capacity": (None, workspace.get("capacity"))},
+                                         {"config": workspace}, capacity_dependency))
+        else:
+            live_capacity = inventory.get_fabric_capacity_name(inventory.get_workspace(name).get("capacityId"))
+            if live_capacity != workspace.get("capacity"):
+                actions.append(PlannedAction(UPDATE, "workspace", name, {"capacity": (live_capacity, workspace.get("capacity"))},
+                                             {"config": workspace, "workspace_id": workspace_id}, capacity_dependency))
+            else:
+                actions.append(PlannedAction(NO_OP, "workspace", name, details={"workspace_id": workspace_id}))
+
+        workspace_changed = actions[-1].action != NO_OP
+        workspace_dependency = [f"workspace:{name}"] if workspace_changed else []
+
+        live_assignments = state.role_assignments.get(name, []) if workspace_id else []
+        changes = {change.principal_id: change
+                   for change in diff_role_assignments(name, workspace_id, live_assignments,
+                                                       workspace.get("permissions", []), security_groups)}
+        for permission in workspace.get("permissions", []):
+            group_id = security_groups.get(permission.get("group"))
+            role = permission.get("role")
+            assignment_name = f"{name}/{permission.get('group')}"
+            change = changes.get(group_id)
+            details = {"workspace": name, "workspace_id": workspace_id, "group_id": group_id, "role": role}
+            if change is None:
+                actions.append(PlannedAction(NO_OP, "role_assignment", assignment_name, details=details))
+            elif change.operation == ADD:
+                actions.append(PlannedAction(CREATE, "role_assignment", assignment_name, {"role": (None, role)},
+                                             details, workspace_dependency))
+            else:
+                actions.append(PlannedAction(UPDATE, "role_assignment", assignment_name, {"role": (change.current_role, role)},
+                                             {**details, "role_assignment_id": change.role_assignment_id},
+                                             workspace_dependency))
+        for change in changes.values():
+            if change.operation == DELETE:
+                actions.append(PlannedAction(REMOVE, "role_assignment", f"{name}/{change.group}",
+                                             {"role": (change.current_role, None)},
+                                             {"workspace": name, "workspace_id": workspace_id,
+                                              "role_assignment_id": change.role_assignment_id}))
+
+        directory = workspace.get("connect_to_git_folder")
+        if not directory:
+            continue
+        desired = {"ownerName": github_config.get("organization"), "repositoryName": github_config.get("repository"),
+                   "branchName": github_config.get("branch"), "directoryName": directory}
+        connection = (state.git_connections.get(name) or {}) if workspace_id else {}
+        details = {"workspace": name, "workspace_id": workspace_id, "directory": directory}
+        if connection.get("gitConnectionState", "NotConnected") == "NotConnected":
+            actions.append(PlannedAction(CREATE, "git_connection", name,
+                                         {key: (None, value) for key, value in desired.items()},
+                                         details, workspace_dependency))
+            continue
+        live_details = connection.get("gitProviderDetails") or {}
+        changes = {key: (live_details.get(key), value) for key, value in desired.items()
+                   if _normalize_git_value(key, live_details.get(key)) != _normalize_git_value(key, value)}
+        actions.append(PlannedAction(UPDATE if changes else NO_OP, "git_connection", name, changes, details,
+                                     workspace_dependency if changes else []))
+
+    return actions
+
+
+def plan_from_config(config: dict, inventory: Inventory|None = None, max_workers: int = 8) -> list[PlannedAction]:
+    """Fetches the live state and returns the plan for a loaded template."""
+    return build_plan(config, fetch_live_state(config, inventory, max_workers))
+
+
+def print_plan(actions: list[PlannedAction]) -> None:
+    symbols = {CREATE: "+", UPDATE: "~", REMOVE: "-", NO_OP: "="}
+    for action in actions:
+        line = f"{symbols[action.action]} {action.action:<6} {action.resource_type:<15} {action.name}"
+        if action.changes and action.action != NO_OP:
+            line += "  " + ", ".join(f"{key}: {current} -> {desired}" for key, (current, desired) in action.changes.items())
+        print(line)
+
+    counts = {kind: sum(1 for action in actions if action.action == kind) for kind in symbols}
+    print(f"Plan: {counts[CREATE]} to create, {counts[UPDATE]} to update, {counts[REMOVE]} to delete, "
+          f"{counts[NO_OP]} unchanged.")
+
+
+def apply_plan(actions: list[PlannedAction], config: dict, state: LiveState,
+               max_workers: int = 4) -> dict[str, TaskResult]:
+    """
+    Runs the create, update and delete actions of a plan. No-op actions cost nothing.
+    """
+    inventory = state.inventory
+    defaults = config["azure"]["capacity_defaults"]
+    resource_group = defaults["resource_group"]
+    github_config = config["github"]
+    pending = [action for action in actions if action.action != NO_OP]
+    keys = {action.key for action in pending}
+    tasks = {}
+
+    def workspace_id_for(outputs: dict, details: dict) -> str:
+        return outputs.get(f"workspace:{details['workspace']}") or details.get("workspace_id") \
+            or inventory.get_workspace_id(details["workspace"])
+
+    def capacity_task(action):
+        if action.action == CREATE:
+            create_capacity(action.details["config"], resource_group, defaults, inventory)
+        else:
+            update_capacity(action.name, resource_group,
+                            sku=action.changes.get("sku", (None, None))[1],
+                            admin_members=action.changes.get("admin_members", (None, None))[1])
+
+    def workspace_task(action):
+        workspace = action.details["config"]
+        if action.action == CREATE:
+            workspace_id = create_workspace(workspace, inventory)
+            if not workspace_id:
+                raise RuntimeError(f"Could not resolve id of {workspace['name']}")
+            return workspace_id
+        capacity_id = inventory.get_fabric_capacity_id(workspace["capacity"])
+        if not capacity_id:
+            raise RuntimeError(f"Capacity {workspace['capacity']} is not visible to Fabric")
+        assign_workspace_to_capacity(action.details["workspace_id"], capacity_id)
+        print(f"✓ Assigned {action.name} to {workspace['capacity']}")
+        return action.details["workspace_id"]
+
+    def role_assignment_task(action, outputs):
+        details = action.details
+        workspace_id = workspace_id_for(outputs, details)
+        if action.action == CREATE:
+            add_role_assignment(workspace_id, details["group_id"], details["role"])
+        elif action.action == UPDATE:
+            update_role_assignment(workspace_id, details["role_assignment_id"], details["role"])
+        else:
+            delete_role_assignment(workspace_id, details["role_assignment_id"])
+        print(f"  ✓ {action.action.capitalize()}d role assignment {action.name}")
+
+    def git_task(action, outputs):
+        details = action.details
+        workspace_id = workspace_id_for(outputs, details)
+        if action.action == UPDATE:
+            disconnect_workspace_from_git(workspace_id, details["workspace"])
+        if not connect_workspace_to_git(workspace_id, details["workspace"], details["directory"],
+                                        github_config, outputs["git_connection"]):
+            raise RuntimeError(f"Could not connect {details['workspace']} to git")
+
+    for action in pending:
+        depends_on = [key for key in action.depends_on if key in keys]
+        if action.resource_type == "capacity":
+            func = lambda outputs, action=action: capacity_task(action)
+        elif action.resource_type == "workspace":
+            func = lambda outputs, action=action: workspace_task(action)
+        elif action.resource_type == "role_assignment":
+            func = lambda outputs, action=action: role_assignment_task(action, outputs)
+        else:
+            if "git_connection" not in tasks:
+                tasks["git_connection"] = Task("git_connection", lambda outputs: require(
+                    get_or_create_git_connection(github_config), "Could not get or create the git connection"))
+            depends_on.append("git_connection")
+            func = lambda outputs, action=action: git_task(action, outputs)
+        tasks[action.key] = Task(action.key, func, depends_on)
+
+    return run_task_graph(tasks, max_workers=max_workers)
+
+
+def _normalize_region(region: str|None) -> str:
+    return (region or "").replace(" ", "").lower()
+
+
+def _normalize_git_value(key: str, value: str|None) -> str:
+    value = value or ""
+    if key == "directoryName":
+        return value.strip("/")
+    return value
+
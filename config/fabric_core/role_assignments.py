@@ -0,0 +1,152 @@
+"""
+Reconciles workspace role assignments with the `permissions` of a template.
+
+Each workspace's role assignments are read once, diffed against the template
+(resolved through `security_groups`) and the minimal set of add, role-change and
+delete operations is applied concurrently across all workspaces.
+"""
+
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
+
+from .workspaces import list_role_assignments, add_role_assignment, update_role_assignment, delete_role_assignment
+
+
+ADD = "add"
+CHANGE = "change"
+DELETE = "delete"
+
+
+@dataclass
+class RoleAssignmentChange:
+    operation: str  # add | change | delete
+    workspace_name: str
+    workspace_id: str
+    principal_id: str
+    group: str|None
+    role: str|None
+    current_role: str|None = None
+    role_assignment_id: str|None = None
+
+    def describe(self) -> str:
+        principal = self.group or self.principal_id
+        if self.operation == ADD:
+            return f"+ {self.workspace_name}: {principal} -> {self.role}"
+        if self.operation == CHANGE:
+            return f"~ {self.workspace_name}: {principal} {self.current_role} -> {self.role}"
+        return f"- {self.workspace_name}: {principal} ({self.current_role})"
+
+
+@dataclass
+class WorkspaceReconciliation:
+    workspace_name: str
+    changes: list[RoleAssignmentChange] = field(default_factory=list)
+    applied: list[RoleAssignmentChange] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+
+def diff_role_assignments(workspace_name: str, workspace_id: str, live_assignments: list[dict],
+                          permissions: Sequence[dict], security_groups: dict,
+                          prune: bool = True) -> list[RoleAssignmentChange]:
+    """
+    Returns the changes that bring the live role assignments of a workspace in line with `permissions`.
+
+    Only groups listed in `security_groups` are ever deleted, so assignments the template
+    does not manage (the service principal's own Admin role, individual users) are left alone.
+    """
+    group_names = {group_id: name for name, group_id in security_groups.items()}
+    desired = {}
+    for permission in permissions:
+        group_id = security_groups.get(permission.get("group"))
+        if not group_id:
+            raise ValueError(f"Unknown security group {permission.get('group')} for {workspace_name}")
+        desired[group_id] = permission.get("role")
+
+    live = {assignment.get("principal", {}).get("id"): assignment for assignment in live_assignments}
+    changes = []
+
+    for group_id, role in desired.items():
+        assignment = live.get(group_id)
+        if assignment is None:
+            changes.append(RoleAssignmentChange(ADD, workspace_name, workspace_id, group_id,
+                                                group_names.get(group_id), role))
+        elif assignment.get("role") != role:
+            changes.append(RoleAssignmentChange(CHANGE, workspace_name, workspace_id, group_id,
+                                                group_names.get(group_id), role, assignment.get("role"),
+                                                assignment.get("id")))
+
+    if prune:
+        for principal_id, assignment in live.items():
+            if principal_id in group_names and principal_id not in desired:
+                changes.append(RoleAssignmentChange(DELETE, workspace_name, workspace_id, principal_id,
+                                                    group_names[principal_id], None, assignment.get("role"),
+                                                    assignment.get("id")))
+
+    return changes
+
+
+def apply_role_assignment_change(change: RoleAssignmentChange) -> None:
+    if change.operation == ADD:
+        add_role_assignment(change.workspace_id, change.principal_id, change.role)
+    elif change.operation == CHANGE:
+        update_role_assignment(change.workspace_id, change.role_assignment_id, change.role)
+    else:
+        delete_role_assignment(change.workspace_id, change.role_assignment_id)
+
+
+def reconcile_role_assignments(workspaces: Sequence[tuple[str, str, Sequence[dict]]], security_groups: dict,
+                               max_workers: int = 8, prune: bool = True,
+                               dry_run: bool = False) -> dict[str, WorkspaceReconciliation]:
+    """
+    Reconciles the role assignments of many workspaces.
+
+    `workspaces` holds (workspace_name, workspace_id, permissions) tuples. Reads run concurrently
+    (one per workspace), then all changes of all workspaces are applied concurrently.
+    """
+    reports = {name: WorkspaceReconciliation(name) for name, _, _ in workspaces}
+
+    def read(item):
+        name, workspace_id, permissions = item
+        try:
+            return diff_role_assignments(name, workspace_id, list_role_assignments(workspace_id), permissions,
+                                         security_groups, prune)
+        except Exception as e:
+            reports[name].errors.append(str(e))
+            return []
+
+    def apply(change):
+        try:
+            apply_role_assignment_change(change)
+            reports[change.workspace_name].applied.append(change)
+            print(f"  ✓ {change.describe()}")
+        except Exception as e:
+            reports[change.workspace_name].errors.append(f"{change.describe()}: {e}")
+            print(f"  ✗ {change.describe()}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        all_changes = []
+        for (name, _, _), changes in zip(workspaces, pool.map(read, workspaces)):
+            reports[name].changes = changes
+            all_changes.extend(changes)
+
+        if dry_run:
+            for change in all_changes:
+                print(f"  {change.describe()}")
+        else:
+            list(pool.map(apply, all_changes))
+
+    return reports
+
+
+def print_reconciliation_summary(reports: dict[str, WorkspaceReconciliation]) -> None:
+    print("===== Role assignment summary =====")
+    for report in reports.values():
+        symbol = "✗" if report.errors else "✓"
+        counts = {operation: sum(1 for change in report.changes if change.operation == operation)
+                  for operation in (ADD, CHANGE, DELETE)}
+        line = (f"{symbol} {report.workspace_name}: {counts[ADD]} to add, {counts[CHANGE]} to change, "
+                f"{counts[DELETE]} to delete, {len(report.applied)} applied")
+        for error in report.errors:
+            line += f"\n    {error}"
+        print(line)
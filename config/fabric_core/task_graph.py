@@ -0,0 +1,142 @@
+"""
+Runs a graph of dependent tasks on a bounded worker pool.
+A task starts as soon as all the tasks it depends on have succeeded.
+"""
+
+import time
+import threading
+import contextvars
+from dataclasses import dataclass, field
+from typing import Any, Callable
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .tracing import span
+
+
+@dataclass
+class Task:
+    """A unit of work. `func` receives the results of all finished tasks, keyed by task name."""
+    name: str
+    func: Callable[[dict], Any]
+    depends_on: list[str] = field(default_factory=list)
+
+
+@dataclass
+class TaskResult:
+    name: str
+    status: str = "pending"  # pending | succeeded | failed | skipped
+    result: Any = None
+    error: str|None = None
+    started_at: float|None = None
+    finished_at: float|None = None
+
+    @property
+    def duration(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+def require(value, message: str):
+    """Returns `value`, or raises RuntimeError(message) when it is falsy, so the task is marked failed."""
+    if not value:
+        raise RuntimeError(message)
+    return value
+
+
+def validate_task_graph(tasks: dict[str, Task]) -> list[str]:
+    """
+    Checks that every dependency exists and that the graph has no cycles.
+    Returns the task names in a valid execution order.
+    """
+    for task in tasks.values():
+        for dependency in task.depends_on:
+            if dependency not in tasks:
+                raise ValueError(f"Task {task.name} depends on unknown task {dependency}")
+
+    order = []
+    state = {}
+
+    def visit(name: str, path: list[str]) -> None:
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+        state[name] = "visiting"
+        for dependency in tasks[name].depends_on:
+            visit(dependency, path + [name])
+        state[name] = "done"
+        order.append(name)
+
+    for name in tasks:
+        visit(name, [])
+    return order
+
+
+def run_task_graph(tasks: dict[str, Task], max_workers: int = 4) -> dict[str, TaskResult]:
+    """
+    Executes the tasks with at most `max_workers` running at once.
+    When a task fails, every task that depends on it (directly or not) is skipped.
+    """
+    validate_task_graph(tasks)
+
+    results = {name: TaskResult(name) for name in tasks}
+    outputs = {}
+    outputs_lock = threading.Lock()
+    remaining = {name: set(task.depends_on) for name, task in tasks.items()}
+    dependents = {name: [] for name in tasks}
+    for name, task in tasks.items():
+        for dependency in task.depends_on:
+            dependents[dependency].append(name)
+
+    def run(name: str) -> Any:
+        with outputs_lock:
+            snapshot = dict(outputs)
+        results[name].started_at = time.monotonic()
+        try:
+            with span(name, kind="task", **{"task.name": name, "task.depends_on": list(tasks[name].depends_on)}):
+                return tasks[name].func(snapshot)
+        finally:
+            results[name].finished_at = time.monotonic()
+
+    def submit(name: str):
+        # Each task runs in a copy of the caller's context, so its spans nest under the caller's span.
+        return pool.submit(contextvars.copy_context().run, run, name)
+
+    def skip_dependents(name: str) -> None:
+        for dependent in dependents[name]:
+            if results[dependent].status == "pending":
+                results[dependent].status = "skipped"
+                results[dependent].error = f"dependency {name} did not succeed"
+                skip_dependents(dependent)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        running = {}
+        for name in tasks:
+            if not remaining[name]:
+                running[submit(name)] = name
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    output = future.result()
+                except Exception as e:
+                    results[name].status = "failed"
+                    results[name].error = str(e)
+                    print(f"✗ {name} failed: {e}")
+                    skip_dependents(name)
+                    continue
+
+                results[name].status = "succeeded"
+                results[name].result = output
+                with outputs_lock:
+                    outputs[name] = output
+
+                for dependent in dependents[name]:
+                    remaining[dependent].discard(name)
+                    if not remaining[dependent] and results[dependent].status == "pending":
+                        running[submit(dependent)] = dependent
+
+    return results
@@ -0,0 +1,143 @@
+"""
+Tears down a solution version or the workspaces of a feature branch.
+
+The teardown is a dependency graph run like a deployment, in reverse:
+
+git disconnect -> workspace delete -> capacity delete (or suspend)
+
+Every workspace is disconnected and deleted independently of the others, and a
+capacity is deleted or suspended as soon as the last of its workspaces is gone.
+A template teardown also removes the version's feature and pool workspaces that live on
+its capacities; a capacity that still hosts a workspace of anything else is not touched.
+"""
+
+from .task_graph import Task, TaskResult, run_task_graph, validate_task_graph, require
+from .inventory import Inventory, load_inventory
+from .capacities import delete_capacity, suspend_capacity
+from .workspaces import delete_workspace
+from .git_integration import get_git_connection, disconnect_workspace_from_git
+from .workspace_pool import FEATURE_WORKSPACE_TYPES, get_feature_workspace_name
+
+
+CAPACITY_ACTIONS = ("delete", "suspend", "keep")
+
+
+def _disconnect_git(workspace_id: str, workspace_name: str) -> bool:
+    if get_git_connection(workspace_id).get("gitConnectionState", "NotConnected") == "NotConnected":
+        return True
+    return disconnect_workspace_from_git(workspace_id, workspace_name)
+
+
+def _delete_workspace(workspace_id: str, workspace_name: str, inventory: Inventory) -> bool:
+    deleted = delete_workspace(workspace_id, workspace_name)
+    if deleted:
+        inventory.forget_workspace(workspace_name)
+    return deleted
+
+
+def _release_capacity(capacity_name: str, resource_group: str, action: str, inventory: Inventory,
+                      deleted_workspaces: set[str]) -> bool:
+    """Deletes or suspends a capacity unless it still hosts workspaces this teardown does not remove."""
+    capacity_id = inventory.get_fabric_capacity_id(capacity_name)
+    remaining = sorted(name for name, workspace in inventory.list_workspaces().items()
+                       if capacity_id and workspace.get("capacityId") == capacity_id and name not in deleted_workspaces)
+    if remaining:
+        raise RuntimeError(f"{capacity_name} still hosts {', '.join(remaining)}")
+    if action == "delete":
+        delete_capacity(capacity_name, resource_group)
+        return True
+    if inventory.get_capacity_status(capacity_name)[1] == "Paused":
+        print(f"✓ {capacity_name} is already suspended")
+        return True
+    return suspend_capacity(capacity_name, resource_group)
+
+
+def build_teardown_graph(workspaces: dict[str, str], capacities: list[str], resource_group: str,
+                         inventory: Inventory, capacity_action: str = "delete") -> dict[str, Task]:
+    """
+    Builds the teardown tasks for {workspace_name: workspace_id} and the capacities to
+    release afterwards (`capacity_action` is delete, suspend or keep).
+    """
+    if capacity_action not in CAPACITY_ACTIONS:
+        raise ValueError(f"Unknown capacity action {capacity_action}, expected one of {CAPACITY_ACTIONS}")
+    tasks = {}
+
+    def add(name, func, depends_on=None):
+        tasks[name] = Task(name, func, depends_on or [])
+
+    workspace_tasks_by_capacity = {}
+    for workspace_name, workspace_id in workspaces.items():
+        git_task, workspace_task = f"disconnect-git:{workspace_name}", f"delete-workspace:{workspace_name}"
+        add(git_task, lambda outputs, workspace_id=workspace_id, workspace_name=workspace_name: require(
+            _disconnect_git(workspace_id, workspace_name), f"Could not disconnect {workspace_name} from git"))
+        add(workspace_task, lambda outputs, workspace_id=workspace_id, workspace_name=workspace_name: require(
+            _delete_workspace(workspace_id, workspace_name, inventory), f"Could not delete {workspace_name}"),
+            [git_task])
+        capacity_id = (inventory.get_workspace(workspace_name) or {}).get("capacityId")
+        capacity_name = inventory.get_fabric_capacity_name(capacity_id)
+        workspace_tasks_by_capacity.setdefault(capacity_name, []).append(workspace_task)
+
+    if capacity_action != "keep":
+        deleted_workspaces = set(workspaces)
+        for capacity_name in capacities:
+            if not inventory.has_capacity(capacity_name):
+                continue
+            add(f"{capacity_action}-capacity:{capacity_name}",
+                lambda outputs, capacity_name=capacity_name: require(
+                    _release_capacity(capacity_name, resource_group, capacity_action, inventory, deleted_workspaces),
+                    f"Could not {capacity_action} {capacity_name}"),
+                workspace_tasks_by_capacity.get(capacity_name, []))
+    return tasks
+
+
+def build_template_teardown(config: dict, inventory: Inventory|None = None,
+                            capacity_action: str = "delete") -> dict[str, Task]:
+    """Teardown of everything a template deployed, plus the version's feature and pool workspaces on its capacities."""
+    resource_group = config["azure"]["capacity_defaults"]["resource_group"]
+    if inventory is None:
+        inventory = load_inventory(resource_group, connections=False)
+    inventory.refresh_fabric_capacities()
+    solution_version = config.get("solution_version", "av01")
+    capacities = [capacity["name"] for capacity in config.get("capacities", [])]
+    capacity_ids = {inventory.get_fabric_capacity_id(name) for name in capacities if inventory.has_capacity(name)}
+
+    workspaces = {}
+    for workspace in config.get("workspaces", []):
+        workspace_id = inventory.get_workspace_id(workspace["name"])
+        if workspace_id:
+            workspaces[workspace["name"]] = workspace_id
+    for name, workspace in inventory.list_workspaces().items():
+        if name.startswith(f"{solution_version}-") and workspace.get("capacityId") in capacity_ids - {None}:
+            workspaces.setdefault(name, workspace["id"])
+    return build_teardown_graph(workspaces, capacities, resource_group, inventory, capacity_action)
+
+
+def build_branch_teardown(solution_version: str, branch: str, inventory: Inventory|None = None) -> dict[str, Task]:
+    """Teardown of a feature branch's workspaces; the shared dev capacities are kept."""
+    if inventory is None:
+        inventory = load_inventory(connections=False)
+    inventory.refresh_fabric_capacities()
+    workspaces = {}
+    for workspace_type in FEATURE_WORKSPACE_TYPES:
+        name = get_feature_workspace_name(solution_version, branch, workspace_type)
+        workspace_id = inventory.get_workspace_id(name)
+        if workspace_id:
+            workspaces[name] = workspace_id
+    return build_teardown_graph(workspaces, [], "", inventory, "keep")
+
+
+def print_teardown_plan(tasks: dict[str, Task]) -> None:
+    print("===== Teardown plan (dry run) =====")
+    if not tasks:
+        print("Nothing to tear down")
+    for name in validate_task_graph(tasks):
+        after = f" (after {', '.join(tasks[name].depends_on)})" if tasks[name].depends_on else ""
+        print(f"- {name}{after}")
+
+
+def run_teardown(tasks: dict[str, Task], max_workers: int = 8, dry_run: bool = False) -> dict[str, TaskResult]:
+    """Runs (or with `dry_run` only lists) a teardown graph. Returns the task results."""
+    if dry_run:
+        print_teardown_plan(tasks)
+        return {}
+    return run_task_graph(tasks, max_workers=max_workers)
@@ -0,0 +1,294 @@
+"""
+Client-side rate limiting and retries for the Fabric and ARM REST APIs.
+
+Every request passes through the limiter of its API family (`arm.read`, `arm.write`,
+`workspaces`, `git`, `roleAssignments`, ...). A family has a token bucket for its request
+rate and a concurrency limit, both adapted AIMD-style: each success raises them a little
+(up to the configured maximum), a 429 halves them and pauses the whole family for the
+Retry-After the service asked for. The limiters are shared by all threads of the process,
+so parallel deployment workers back off together instead of each hammering the API.
+
+Throttled requests (429) were not executed by the service and are always retried.
+Server errors (5xx) are retried only for idempotent requests: GET, PUT and DELETE, or a
+POST the caller marks as idempotent.
+
+Fabric does not publish its limits, so its families start generous and rely on the
+adaptation. Rates can be overridden with FABRIC_CORE_RATE_LIMITS, e.g. `git=2,arm.write=5:50:4`
+(requests per second, then optionally burst and maximum concurrency).
+"""
+
+import os
+import re
+import json
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+from .tracing import current_span
+
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+DEFAULT_THROTTLE_PAUSE_SECONDS = 5.0  # pause after a 429 without Retry-After
+
+# family -> (requests per second, burst, maximum concurrency)
+FAMILY_LIMITS = {
+    "arm.read": (25, 250, 16),  # ARM's per-subscription buckets
+    "arm.write": (10, 200, 8),
+    "default": (100, 200, 16),
+}
+
+
+def parse_retry_after(value: str|None) -> float|None:
+    """Parses a Retry-After header (delta-seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, initial_delay: float = 2.0, max_delay: float = 60.0) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(max_delay, initial_delay * (2 ** attempt)))
+
+
+def get_api_family(api_endpoint: str, method: str = "get", audience: str|None = None) -> str:
+    """
+    Names the rate limit family of a request, e.g. `workspaces/{id}/git/status` -> `git`.
+    ARM requests are split into reads and writes, which ARM limits separately.
+    """
+    if audience == "azure" or "/subscriptions/" in api_endpoint:
+        return "arm.read" if method.upper() in ("GET", "HEAD") else "arm.write"
+    path = re.sub(r"^https?://[^/]+", "", api_endpoint).split("?", 1)[0].split("/v1/", 1)[-1]
+    segments = [segment for segment in path.split("/") if segment]
+    if len(segments) > 2 and segments[0] == "workspaces":
+        return segments[2]
+    return segments[0] if segments else "default"
+
+
+def parse_rate_limits(spec: str|None) -> dict[str, tuple[float, float, int]]:
+    """Parses FABRIC_CORE_RATE_LIMITS (`family=rate[:burst[:concurrency]],...`) over the defaults."""
+    limits = dict(FAMILY_LIMITS)
+    for entry in (spec or "").split(","):
+        if "=" not in entry:
+            continue
+        family, values = (part.strip() for part in entry.split("=", 1))
+        rate, burst, concurrency = limits.get(family, limits["default"])
+        parts = values.split(":")
+        rate = float(parts[0])
+        burst = float(parts[1]) if len(parts) > 1 else max(1.0, rate * 2)
+        concurrency = int(parts[2]) if len(parts) > 2 else concurrency
+        limits[family] = (rate, burst, concurrency)
+    return limits
+
+
+class TokenBucket:
+    """Admits `rate` requests per second on average with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes a token and returns how long to wait before it may be used."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def slow_down(self) -> None:
+        """Halves the rate and drops the saved-up burst."""
+        with self._lock:
+            self.rate = max(self.max_rate / 64, self.rate / 2)
+            self._tokens = min(self._tokens, 0)
+
+    def speed_up(self) -> None:
+        """Raises the rate by 1% of its maximum."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+
+class FamilyLimiter:
+    """
+    Token bucket plus concurrency limit for one API family. The concurrency limit grows by
+    about one per round of successful requests, the rate by 1% per request; both halve on a 429.
+    """
+
+    def __init__(self, family: str, rate: float, burst: float, max_concurrency: int, min_concurrency: int = 1):
+        self.family = family
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """Waits for a free slot, the end of any pause and a token. Returns the seconds waited."""
+        started = time.monotonic()
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    self._condition.wait(self.paused_until - now)
+                elif self.in_flight >= int(self.limit):
+                    self._condition.wait()
+                else:
+                    self.in_flight += 1
+                    self.requests += 1
+                    break
+        delay = self.bucket.reserve()
+        if delay:
+            time.sleep(delay)
+        return time.monotonic() - started
+
+    def try_acquire(self) -> tuple[bool, float]:
+        """
+        Non-blocking acquire for event loops. Returns (True, seconds to wait for the token)
+        when a slot was taken, else (False, seconds until the pause ends, or 0 when the slots are full).
+        """
+        with self._condition:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return False, self.paused_until - now
+            if self.in_flight >= int(self.limit):
+                return False, 0.0
+            self.in_flight += 1
+            self.requests += 1
+        return True, self.bucket.reserve()
+
+    def release(self, throttled: bool = False, retry_after: float|None = None) -> None:
+        """Returns a slot and adapts the limit to the outcome of the request."""
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+                # 429s answered during a pause belong to the same burst: decrease once
+                if now >= self.paused_until:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self.bucket.slow_down()
+                pause = retry_after if retry_after is not None else DEFAULT_THROTTLE_PAUSE_SECONDS
+                self.paused_until = max(self.paused_until, now + pause)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                self.bucket.speed_up()
+            self._condition.notify_all()
+
+
+class RateLimiter:
+    """The family limiters of a process, created on first use."""
+
+    def __init__(self, limits: dict[str, tuple[float, float, int]]|None = None):
+        self.limits = limits or parse_rate_limits(os.getenv("FABRIC_CORE_RATE_LIMITS"))
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def get(self, family: str) -> FamilyLimiter:
+        with self._lock:
+            limiter = self._families.get(family)
+            if limiter is None:
+                rate, burst, concurrency = self.limits.get(family, self.limits["default"])
+                limiter = self._families[family] = FamilyLimiter(family, rate, burst, concurrency)
+            return limiter
+
+    def stats(self) -> dict[str, dict]:
+        """Returns {family: {requests, throttled, limit, rate}} for reporting."""
+        with self._lock:
+            return {family: {"requests": limiter.requests, "throttled": limiter.throttled,
+                             "limit": round(limiter.limit, 1), "rate": round(limiter.bucket.rate, 1)}
+                    for family, limiter in self._families.items()}
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide rate limiter, configured from the environment on first use."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
+
+
+def reset_rate_limiter() -> None:
+    """Forgets the process-wide limiter, e.g. after FABRIC_CORE_RATE_LIMITS changed."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        _rate_limiter = None
+
+
+def _read_status(result) -> tuple[int|None, float|None]:
+    """Returns (status_code, Retry-After seconds) of a `{status_code, text, headers}` response."""
+    try:
+        document = json.loads(result.stdout or "{}")
+    except (TypeError, ValueError):
+        return None, None
+    if not isinstance(document, dict):
+        return None, None
+    headers = {key.lower(): value for key, value in (document.get("headers") or {}).items()}
+    return document.get("status_code"), parse_retry_after(headers.get("retry-after"))
+
+
+def send_with_retries(send, family: str, method: str = "get", idempotent: bool|None = None,
+                      max_attempts: int|None = None):
+    """
+    Sends a request through its family limiter, retrying throttled requests (and, for
+    idempotent ones, server errors) until `max_attempts`. Returns the last response.
+    """
+    limiter = get_rate_limiter().get(family)
+    idempotent = method.upper() in IDEMPOTENT_METHODS if idempotent is None else idempotent
+    max_attempts = max_attempts or int(os.getenv("FABRIC_CORE_MAX_ATTEMPTS", "6"))
+    current = current_span()
+
+    for attempt in range(max_attempts):
+        waited = limiter.acquire()
+        if waited > 0.001:
+            current.add("throttle.wait_seconds", waited)
+        try:
+            result = send()
+        except BaseException:
+            limiter.release()
+            raise
+        status_code, retry_after = _read_status(result)
+        throttled = status_code == 429
+        limiter.release(throttled, retry_after)
+
+        retryable = throttled or (idempotent and status_code in RETRYABLE_STATUS_CODES)
+        if not retryable or attempt == max_attempts - 1:
+            return result
+        current.add("http.retries")
+        if throttled:
+            current.add("http.throttled")
+        else:
+            # the limiter only pauses for 429s, so server errors wait here
+            time.sleep(retry_after if retry_after is not None else backoff_delay(attempt, 1, 30))
+    return result
+
+
+def _after_fork_in_child() -> None:
+    global _rate_limiter, _rate_limiter_lock
+    _rate_limiter_lock = threading.Lock()
+    _rate_limiter = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
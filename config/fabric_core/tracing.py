@@ -0,0 +1,320 @@
+"""
+Structured tracing of REST calls, `fab` processes, polls and deployment tasks.
+
+Tracing is off unless FABRIC_CORE_TRACE is set to a file path (or `enable_tracing` is
+called); missing directories of the path are created. Every finished span is then
+appended to that file as a JSON line, and at exit the spans are also written as an
+OpenTelemetry (OTLP/JSON) document next to it and a timeline report with the critical
+path of the deployment is printed.
+
+Setting FABRIC_CORE_PROFILE to a file path profiles `fabric-core` commands with cProfile.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import secrets
+import threading
+import contextvars
+from contextlib import contextmanager
+
+
+UUID_PATTERN = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+ARM_NAME_PATTERN = re.compile(r"/(subscriptions|resourceGroups|capacities)/[^/?]+", re.IGNORECASE)
+ARM_NAME_PLACEHOLDERS = {"subscriptions": "{subscriptionId}", "resourcegroups": "{resourceGroup}",
+                         "capacities": "{capacity}"}
+OTLP_SPAN_KINDS = {"internal": 1, "server": 2, "client": 3, "cli": 3, "poll": 1, "task": 1}
+
+_current = contextvars.ContextVar("fabric_core_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes",
+                 "status", "error", "_started")
+
+    recording = True
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: str|None, attributes: dict):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.error = None
+        self._started = time.perf_counter()
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float = 1) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "kind": self.kind, "trace_id": self.trace_id, "span_id": self.span_id,
+                "parent_id": self.parent_id, "start_ns": self.start_ns, "end_ns": self.end_ns,
+                "duration": round(self.duration, 6), "status": self.status, "error": self.error,
+                "attributes": self.attributes}
+
+
+class _NoOpSpan:
+    """Returned when tracing is off, so call sites do not need to check."""
+    recording = False
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def add(self, key: str, amount: float = 1) -> None:
+        pass
+
+
+NO_OP_SPAN = _NoOpSpan()
+
+
+class Tracer:
+    """Collects the spans of this process and appends them to a JSON lines file as they finish."""
+
+    def __init__(self, path: str|None = None):
+        self.path = path
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+        self._lock = threading.Lock()
+        self._file = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+
+    def finish(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            if self._file:
+                self._file.write(json.dumps(span.to_dict(), default=str) + "\n")
+                self._file.flush()
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+_tracer_checked = False
+
+
+def enable_tracing(path: str|None = None, report_at_exit: bool = True) -> Tracer:
+    """Turns tracing on for this process. Spans go to `path` (JSON lines) if given."""
+    global _tracer, _tracer_checked
+    with _tracer_lock:
+        _tracer = Tracer(path)
+        _tracer_checked = True
+    if report_at_exit:
+        atexit.register(_export_at_exit, _tracer)
+    return _tracer
+
+
+def get_tracer() -> Tracer|None:
+    """
+    Returns the active tracer, enabling it from FABRIC_CORE_TRACE on first use, or None.
+    A trace file that cannot be opened turns tracing off with a single warning.
+    """
+    global _tracer_checked
+    if not _tracer_checked:
+        path = os.getenv("FABRIC_CORE_TRACE")
+        if path:
+            try:
+                enable_tracing(path)
+            except OSError as e:
+                print(f"⚠ Tracing is off, could not open FABRIC_CORE_TRACE={path}. {e}", file=sys.stderr)
+        _tracer_checked = True
+    return _tracer
+
+
+def current_span():
+    return _current.get() or NO_OP_SPAN
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """Times the enclosed block as a child of the current span."""
+    tracer = get_tracer()
+    if tracer is None:
+        yield NO_OP_SPAN
+        return
+    parent = _current.get()
+    current = Span(name, kind, tracer.trace_id, parent.span_id if parent else None, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status, current.error = "error", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        current.end_ns = current.start_ns + int((time.perf_counter() - current._started) * 1e9)
+        tracer.finish(current)
+
+
+def record_span(name: str, kind: str, start_ns: int, end_ns: int, parent_id: str|None = None,
+                error: str|None = None, **attributes) -> None:
+    """Records a span measured elsewhere, e.g. an operation tracked by the background poller."""
+    tracer = get_tracer()
+    if tracer is None:
+        return
+    recorded = Span(name, kind, tracer.trace_id, parent_id, attributes)
+    recorded.start_ns, recorded.end_ns = start_ns, end_ns
+    if error:
+        recorded.status, recorded.error = "error", error
+    tracer.finish(recorded)
+
+
+def endpoint_template(api_endpoint: str) -> str:
+    """
+    Reduces an endpoint to its template, e.g. `workspaces/{id}/git/status` or
+    `/subscriptions/{subscriptionId}/resourceGroups/{resourceGroup}/.../capacities/{capacity}`.
+    """
+    path = re.sub(r"^https?://[^/]+", "", api_endpoint).split("?", 1)[0]
+    path = UUID_PATTERN.sub("{id}", path)
+    return ARM_NAME_PATTERN.sub(
+        lambda match: f"/{match.group(1)}/{ARM_NAME_PLACEHOLDERS[match.group(1).lower()]}", path)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: list[Span], service_name: str = "fabric_core") -> dict:
+    """Converts spans to an OTLP/JSON ExportTraceServiceRequest (loadable by an OpenTelemetry collector)."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{
+            "scope": {"name": "config.fabric_core"},
+            "spans": [{
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                "name": span.name,
+                "kind": OTLP_SPAN_KINDS.get(span.kind, 1),
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+                "status": {"code": 2, "message": span.error} if span.status == "error" else {"code": 1},
+            } for span in spans],
+        }],
+    }]}
+
+
+def export_otlp_json(path: str, spans: list[Span]|None = None) -> None:
+    tracer = get_tracer()
+    spans = spans if spans is not None else (tracer.spans if tracer else [])
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(to_otlp(spans), file, default=str)
+
+
+def critical_path(spans: list[Span]) -> list[Span]:
+    """
+    Returns the chain of task spans that determined the end of the run: starting from the
+    task that finished last, repeatedly the dependency that finished last.
+    """
+    tasks = {span.attributes.get("task.name"): span for span in spans if span.kind == "task"}
+    if not tasks:
+        return []
+    path = [max(tasks.values(), key=lambda span: span.end_ns or 0)]
+    while True:
+        dependencies = [tasks[name] for name in path[-1].attributes.get("task.depends_on", []) if name in tasks]
+        if not dependencies:
+            return list(reversed(path))
+        path.append(max(dependencies, key=lambda span: span.end_ns or 0))
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percentile * (len(values) - 1))))]
+
+
+def print_trace_report(spans: list[Span]|None = None, top: int = 10, width: int = 40) -> None:
+    """Prints where the time went: slowest endpoints, the critical path and a task timeline."""
+    tracer = get_tracer()
+    spans = spans if spans is not None else (tracer.spans if tracer else [])
+    if not spans:
+        return
+    run_start = min(span.start_ns for span in spans)
+    run_end = max(span.end_ns or span.start_ns for span in spans)
+    wall = max((run_end - run_start) / 1e9, 1e-9)
+    counts = {kind: sum(1 for span in spans if span.kind == kind) for kind in ("client", "cli", "poll", "task")}
+
+    print("===== Trace report =====")
+    print(f"Wall time {wall:.1f}s, {len(spans)} spans: {counts['client']} REST calls, {counts['cli']} fab processes, "
+          f"{counts['poll']} polls, {counts['task']} tasks")
+
+    by_endpoint = {}
+    for span in spans:
+        if span.kind in ("client", "cli"):
+            by_endpoint.setdefault(span.name, []).append(span.duration)
+    if by_endpoint:
+        print("Slowest calls (total time):")
+        print(f"  {'calls':>5} {'total':>8} {'p50':>7} {'max':>7}  call")
+        for name, durations in sorted(by_endpoint.items(), key=lambda item: -sum(item[1]))[:top]:
+            print(f"  {len(durations):>5} {sum(durations):>7.1f}s {_percentile(durations, 0.5):>6.2f}s "
+                  f"{max(durations):>6.2f}s  {name}")
+
+    path = critical_path(spans)
+    if path:
+        print(f"Critical path ({sum(span.duration for span in path):.1f}s of {wall:.1f}s):")
+        for span in path:
+            print(f"  +{(span.start_ns - run_start) / 1e9:>7.1f}s {span.duration:>7.1f}s  {span.attributes['task.name']}")
+
+    rows = [span for span in spans if span.kind == "task"] or [span for span in spans if span.parent_id is None]
+    if rows:
+        print("Timeline:")
+        label_width = min(40, max(len(span.name) for span in rows))
+        for span in sorted(rows, key=lambda span: span.start_ns)[:50]:
+            begin = int((span.start_ns - run_start) / 1e9 / wall * width)
+            length = max(1, int(span.duration / wall * width))
+            bar = " " * begin + ("█" if span.status == "ok" else "▒") * length
+            print(f"  {span.name[:label_width]:<{label_width}} |{bar:<{width}}| {span.duration:.1f}s")
+
+
+def _export_at_exit(tracer: Tracer) -> None:
+    if not tracer.spans:
+        return
+    if tracer.path:
+        export_otlp_json(f"{tracer.path}.otlp.json", tracer.spans)
+    try:
+        print_trace_report(tracer.spans)
+    except Exception as e:
+        print(f"⚠ Could not print the trace report. {e}", file=sys.stderr)
+
+
+@contextmanager
+def profiling(path: str|None = None):
+    """Profiles the enclosed block with cProfile when `path` or FABRIC_CORE_PROFILE is set."""
+    path = path or os.getenv("FABRIC_CORE_PROFILE")
+    if not path:
+        yield None
+        return
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"===== Profile (saved to {path}) =====")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
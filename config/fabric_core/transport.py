@@ -0,0 +1,217 @@
+"""
+In-process HTTP transport for the Fabric and Azure Resource Manager REST APIs.
+
+Requests are sent over keep-alive connections that are pooled per host, so a
+deployment pays the TLS handshake once instead of spawning a `fab` process
+for every call. Responses are returned in the same `{status_code, text}` shape
+that `fab api` prints, wrapped in a `subprocess.CompletedProcess`.
+"""
+
+import os, json, time, threading, subprocess, http.client
+from urllib.parse import urlsplit, urlencode
+
+from .tracing import current_span
+from .throttling import IDEMPOTENT_METHODS
+
+
+FABRIC_API_BASE_URL = "https://api.fabric.microsoft.com/v1"
+AZURE_MANAGEMENT_BASE_URL = "https://management.azure.com"
+AZURE_AUTHORITY_HOST = "https://login.microsoftonline.com"
+
+AUDIENCE_SCOPES = {
+    "fabric": "https://api.fabric.microsoft.com/.default",
+    "azure": "https://management.azure.com/.default",
+}
+
+_RETRYABLE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                                ConnectionResetError, BrokenPipeError)
+
+
+class RequestNotSentError(ConnectionError):
+    """
+    Raised when a request failed before any of it was written (connect, TLS or token
+    failure), so the service cannot have acted on it and it is safe to send again.
+    """
+
+
+def get_base_url(audience: str|None) -> str:
+    """
+    Returns the base URL for an audience. Can be overridden through the environment,
+    e.g. to point the transport at a local stub server.
+    """
+    if audience == "azure":
+        return os.getenv("AZURE_MANAGEMENT_BASE_URL", AZURE_MANAGEMENT_BASE_URL).rstrip("/")
+    return os.getenv("FABRIC_API_BASE_URL", FABRIC_API_BASE_URL).rstrip("/")
+
+
+def build_request_url(api_endpoint: str, audience: str|None = None, params: dict|None = None) -> str:
+    """
+    Builds the absolute URL for an endpoint, the same way `fab api` resolves it.
+    Absolute URLs (e.g. operation URLs returned by the service) are used as they are.
+    """
+    if api_endpoint.startswith(("http://", "https://")):
+        url = api_endpoint
+    else:
+        url = f"{get_base_url(audience)}/{api_endpoint.lstrip('/')}"
+    if params:
+        url = f"{url}{'&' if '?' in url else '?'}{urlencode(params)}"
+    return url
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of keep-alive HTTP(S) connections, keyed by scheme, host and port.
+    """
+
+    def __init__(self, max_idle_per_host: int = 8, timeout: float = 60):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, scheme: str, netloc: str) -> tuple[http.client.HTTPConnection, bool]:
+        """Returns (connection, reused): an idle connection, or a new one that is not connected yet."""
+        key = (scheme, netloc)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout), False
+        return http.client.HTTPConnection(netloc, timeout=self.timeout), False
+
+    def release(self, scheme: str, netloc: str, connection: http.client.HTTPConnection) -> None:
+        key = (scheme, netloc)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self) -> None:
+        with self._lock:
+            connections = [conn for idle in self._idle.values() for conn in idle]
+            self._idle.clear()
+        for connection in connections:
+            connection.close()
+
+
+_pool = ConnectionPool(timeout=float(os.getenv("FABRIC_CORE_HTTP_TIMEOUT", "60")))
+
+
+def get_connection_pool() -> ConnectionPool:
+    """Returns the process-wide connection pool."""
+    return _pool
+
+
+def send_http_request(method: str, url: str, body: bytes|None = None,
+                      headers: dict|None = None) -> tuple[int, dict, bytes]:
+    """
+    Sends a request over a pooled connection and returns (status, headers, body).
+    When an idempotent request fails on a keep-alive connection the server has since
+    closed, it is sent again once on a new connection; other requests may have reached
+    the server, so their errors are raised. Failures to connect raise RequestNotSentError.
+    """
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+
+    for attempt in range(2):
+        connection, reused = _pool.acquire(parts.scheme, parts.netloc)
+        if not reused:
+            try:
+                connection.connect()
+            except OSError as e:
+                connection.close()
+                raise RequestNotSentError(f"Failed to connect to {parts.netloc}. {e}") from e
+        try:
+            connection.request(method.upper(), path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            payload = response.read()
+        except _RETRYABLE_CONNECTION_ERRORS:
+            connection.close()
+            if attempt == 1 or not reused or method.upper() not in IDEMPOTENT_METHODS:
+                raise
+            current_span().add("http.retries")
+            continue
+        except Exception:
+            connection.close()
+            raise
+
+        response_headers = {name.lower(): value for name, value in response.getheaders()}
+        if response.will_close:
+            connection.close()
+        else:
+            _pool.release(parts.scheme, parts.netloc, connection)
+        return response.status, response_headers, payload
+
+
+def has_service_principal_credentials() -> bool:
+    """Checks whether the service principal credentials are present in the environment."""
+    return all(os.getenv(name) for name in ("AZURE_TENANT_ID", "SPN_CLIENT_ID", "SPN_CLIENT_SECRET"))
+
+
+def get_access_token(audience: str|None = None) -> str:
+    """
+    Returns a bearer token for the audience from the shared token provider
+    (service principal client credentials flow, cached and refreshed ahead of expiry).
+    Raises RequestNotSentError when no token can be acquired.
+    """
+    from .credentials import get_token_provider
+    try:
+        return get_token_provider().get_token(audience)
+    except Exception as e:
+        raise RequestNotSentError(f"Failed to get a token for {audience or 'fabric'}. {e}") from e
+
+
+def build_request(method: str, request_body: dict|None, token: str) -> tuple[dict, bytes|None]:
+    """Returns the (headers, body) of a REST request; POST, PUT and PATCH always carry a JSON body."""
+    headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+    body = None
+    if request_body is not None or method.lower() in ("post", "put", "patch"):
+        body = json.dumps(request_body or {}).encode()
+        headers["Content-Type"] = "application/json"
+    return headers, body
+
+
+def build_response(method: str, url: str, status: int, response_headers: dict,
+                   payload: bytes) -> subprocess.CompletedProcess:
+    """Wraps a raw response in the `{status_code, text, headers}` shape `fab api` prints."""
+    text = payload.decode("utf-8", errors="replace")
+    try:
+        text = json.loads(text) if text.strip() else {}
+    except json.JSONDecodeError:
+        pass
+
+    stdout = json.dumps({"status_code": status, "text": text, "headers": response_headers})
+    return subprocess.CompletedProcess(args=[method.upper(), url], returncode=0, stdout=stdout, stderr="")
+
+
+def call_rest_api_over_http(api_endpoint: str, method: str = "get",
+                            request_body: dict|None = None, audience: str|None = None,
+                            params: dict|None = None) -> subprocess.CompletedProcess:
+    """
+    Calls a Fabric or Azure REST API endpoint in-process.
+    The returned stdout holds the same JSON document `fab api` prints:
+    {"status_code": ..., "text": ..., "headers": ...}.
+    """
+    from .credentials import get_token_provider
+
+    url = build_request_url(api_endpoint, audience, params)
+    current = current_span()
+    started = time.perf_counter()
+    headers, body = build_request(method, request_body, get_access_token(audience))
+    current.set(**{"http.token_seconds": time.perf_counter() - started})
+
+    started = time.perf_counter()
+    status, response_headers, payload = send_http_request(method, url, body=body, headers=headers)
+    if status == 401:
+        # The token was revoked or the credentials were rotated: retry once with a fresh one.
+        current.add("http.retries")
+        get_token_provider().invalidate(audience or "fabric")
+        headers["Authorization"] = f"Bearer {get_access_token(audience)}"
+        status, response_headers, payload = send_http_request(method, url, body=body, headers=headers)
+    current.set(**{"http.server_seconds": time.perf_counter() - started})
+    return build_response(method, url, status, response_headers, payload)
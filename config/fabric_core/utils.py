@@ -2,20 +2,42 @@
 Helper functions for interacting with Microsoft Fabric using the Fabric CLI.
 """
 
-import sys, shutil, json, subprocess, os
+import sys, shutil, json, subprocess, os, time
 from pathlib import Path
+from typing import Callable, Iterator
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from .transport import call_rest_api_over_http, has_service_principal_credentials, get_base_url, RequestNotSentError
+from .tracing import span, current_span, endpoint_template
+from .throttling import IDEMPOTENT_METHODS, get_api_family, send_with_retries
 
 
-def load_local_env_file():
+
+_env_loaded = False
+
+
+def load_local_env_file(reload: bool = False):
     """
-    It loads local env file if not inside Github actions
+    It loads local env file if not inside Github actions.
+    Only the first call reads the file, so it is cheap to call before reading the environment;
+    with `reload` it is read again (variables already set are never overridden).
     """
+    global _env_loaded
+    if _env_loaded and not reload:
+        return
+    _env_loaded = True
     if os.getenv("GITHUB_ACTIONS") == None:
         load_dotenv()
 
 
+def get_subscription_id() -> str|None:
+    """Returns the Azure subscription the capacities live in."""
+    load_local_env_file()
+    return os.getenv("AZURE_SUBSCRIPTION_ID")
+
+
 def set_stdout_encoding_to_utf_8() -> None:
     """
     Sets the standard output encoding to UTF 8.
@@ -41,24 +63,89 @@ def get_fab_cli_executable_path() -> str:
 
 def run_fabric_cli_command(cmd: list[str]) -> subprocess.CompletedProcess:
     """
-    Runs a command in a separate process and returns the completed process object
+    Runs a command in a separate process and returns the completed process object.
+    When tracing, the time to spawn the process is recorded apart from the total.
     """
     full_cmd = [get_fab_cli_executable_path(), *cmd]
-    return subprocess.run(full_cmd, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    name = f"fab {cmd[0]} {endpoint_template(cmd[1])}" if cmd[:1] == ["api"] and len(cmd) > 1 else f"fab {cmd[0]}"
+    with span(name, kind="cli", **{"process.command": cmd[0] if cmd else ""}) as current:
+        started = time.perf_counter()
+        with subprocess.Popen(full_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                              encoding="utf-8", errors="replace") as process:
+            current.set(**{"process.spawn_seconds": time.perf_counter() - started})
+            try:
+                stdout, stderr = process.communicate()
+            except BaseException:
+                process.kill()
+                raise
+        current.set(**{"process.exit_code": process.returncode})
+    return subprocess.CompletedProcess(full_cmd, process.returncode, stdout, stderr)
+
+
+def use_http_transport() -> bool:
+    """
+    Decides whether REST calls go through the in-process HTTP transport or the Fabric CLI.
+    FABRIC_CORE_TRANSPORT can be set to "http" or "cli"; by default the HTTP transport
+    is used whenever the service principal credentials are available.
+    """
+    transport = os.getenv("FABRIC_CORE_TRANSPORT", "auto").lower()
+    if transport == "cli":
+        return False
+    if transport == "http":
+        return True
+    return has_service_principal_credentials()
+
+
+def to_relative_api_endpoint(api_endpoint: str) -> str:
+    """
+    Turns an absolute URL returned by the service (e.g. an operation Location header)
+    into the relative endpoint the Fabric CLI expects.
+    """
+    if not api_endpoint.startswith(("http://", "https://")):
+        return api_endpoint
+    azure_base_url = get_base_url("azure")
+    if api_endpoint.startswith(azure_base_url):
+        return api_endpoint[len(azure_base_url):]
+    fabric_base_url = get_base_url("fabric")
+    if api_endpoint.startswith(fabric_base_url):
+        return api_endpoint[len(fabric_base_url):].lstrip("/")
+    return api_endpoint
 
 
 def call_azure_fabric_rest_api(api_endpoint: str, method: str = "get", 
                          request_body: dict|None = None, audience: str|None = None, 
-                         params: dict|None = None) -> subprocess.CompletedProcess:
+                         params: dict|None = None, idempotent: bool|None = None) -> subprocess.CompletedProcess:
     
     """
-    Calls a Microsoft Azure and Fabric REST API endpoint through the Fabric CLI.
-    Builds the CLI command dynamically using the provided HTTP method,
-    request body, audience, and query parameters, then executes the request
-    and returns the full process response.
+    Calls a Microsoft Azure and Fabric REST API endpoint.
+    Uses the pooled in-process HTTP transport when possible and falls back to the
+    Fabric CLI, building the `fab api` command from the provided HTTP method,
+    request body, audience, and query parameters. Either way the stdout of the
+    returned process holds the JSON {"status_code": ..., "text": ...} response.
+    Requests go through the shared rate limiter of their API family; 429s are retried
+    after the Retry-After, and 5xx errors too when the request is idempotent (GET, PUT,
+    DELETE, or `idempotent=True`).
     """
-        
-    cmd = ["api", api_endpoint, "-X", method]
+    load_local_env_file()
+    template = endpoint_template(api_endpoint)
+    with span(f"{method.upper()} {template}", kind="client",
+              **{"http.request.method": method.upper(), "url.template": template,
+                 "fabric.audience": audience or "fabric"}) as current:
+        result = send_with_retries(
+            lambda: _call_azure_fabric_rest_api(api_endpoint, method, request_body, audience, params, idempotent),
+            get_api_family(api_endpoint, method, audience), method, idempotent)
+        if current.recording:
+            try:
+                current.set(**{"http.response.status_code": json.loads(result.stdout or "{}").get("status_code", 0)})
+            except ValueError:
+                pass
+        return result
+
+
+def build_fab_api_command(api_endpoint: str, method: str = "get", request_body: dict|None = None,
+                          audience: str|None = None, params: dict|None = None) -> list[str]:
+    """Builds the `fab api` arguments of a REST request."""
+    cmd = ["api", to_relative_api_endpoint(api_endpoint), "-X", method]
     if request_body:
         cmd.extend(["-i", json.dumps(request_body)])
     if audience:
@@ -66,14 +153,95 @@ def call_azure_fabric_rest_api(api_endpoint: str, method: str = "get",
     if params:
         for key, value in params.items():
             cmd.extend(["-P", f"{key}={value}"])
-    result = run_fabric_cli_command(cmd)
+    return cmd
+
+
+def can_fall_back_to_cli(error: Exception, method: str, idempotent: bool|None = None) -> bool:
+    """
+    Checks whether a request that failed over HTTP may be sent again through the Fabric CLI:
+    only when it never reached the service, or when running it twice is harmless.
+    """
+    if os.getenv("FABRIC_CORE_TRANSPORT", "auto").lower() == "http":
+        return False
+    if isinstance(error, RequestNotSentError):
+        return True
+    return method.upper() in IDEMPOTENT_METHODS if idempotent is None else idempotent
+
+
+def _call_azure_fabric_rest_api(api_endpoint: str, method: str, request_body: dict|None, audience: str|None,
+                                params: dict|None, idempotent: bool|None = None) -> subprocess.CompletedProcess:
+    if use_http_transport():
+        try:
+            current_span().set(**{"fabric.transport": "http"})
+            return call_rest_api_over_http(api_endpoint, method, request_body, audience, params)
+        except Exception as e:
+            if not can_fall_back_to_cli(e, method, idempotent):
+                raise RuntimeError(f"Failed to run function call_azure_fabric_rest_api over http. {e}") from e
+            print(f"⚠ HTTP transport failed, falling back to Fabric CLI. {e}")
+            from .login import ensure_logged_in
+            ensure_logged_in(cli=True)  # the CLI login was skipped for the HTTP transport
+
+    current_span().set(**{"fabric.transport": "cli"})
+    result = run_fabric_cli_command(build_fab_api_command(api_endpoint, method, request_body, audience, params))
     if result.returncode == 0:
         return result
     else:
         raise RuntimeError(f"Failed to run function call_azure_fabric_rest_api. output: {result.stderr}, return_code: {result.returncode}")
 
 
+def fetch_page(api_endpoint: str, audience: str|None = None,
+               first_endpoint: str|None = None) -> tuple[list[dict], str|None]:
+    """
+    Fetches one page of a list endpoint and returns (items, next_endpoint).
+    Understands Fabric continuationUri/continuationToken and ARM nextLink.
+    """
+    response = call_azure_fabric_rest_api(api_endpoint, audience=audience)
+    return read_page(json.loads(response.stdout or "{}"), api_endpoint, first_endpoint)
+
 
+def read_page(result: dict, api_endpoint: str, first_endpoint: str|None = None) -> tuple[list[dict], str|None]:
+    """Returns (items, next_endpoint) of a list response; raises unless it is a 200."""
+    if result.get("status_code") != 200:
+        raise RuntimeError(f"Failed to list {api_endpoint}: {result}")
 
+    page = result.get("text", {}) or {}
+    next_endpoint = page.get("nextLink") or page.get("continuationUri")
+    if not next_endpoint and page.get("continuationToken"):
+        base_endpoint = first_endpoint or api_endpoint
+        separator = "&" if "?" in base_endpoint else "?"
+        next_endpoint = f"{base_endpoint}{separator}continuationToken={quote(page['continuationToken'], safe='')}"
+    return page.get("value", []), next_endpoint
 
 
+def iter_paged_items(api_endpoint: str, audience: str|None = None, prefetch: bool = False) -> Iterator[dict]:
+    """
+    Lazily yields the items of a Fabric or ARM list endpoint across all pages.
+    With `prefetch`, the next page is requested while the caller works through the current one.
+    Stopping the iteration early (e.g. after a match) stops fetching pages.
+    """
+    if not prefetch:
+        next_endpoint = api_endpoint
+        while next_endpoint:
+            items, next_endpoint = fetch_page(next_endpoint, audience, api_endpoint)
+            yield from items
+        return
+
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fabric-pager")
+    try:
+        pending = pool.submit(fetch_page, api_endpoint, audience, api_endpoint)
+        while pending is not None:
+            items, next_endpoint = pending.result()
+            pending = pool.submit(fetch_page, next_endpoint, audience, api_endpoint) if next_endpoint else None
+            yield from items
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def list_all_items(api_endpoint: str, audience: str|None = None) -> list[dict]:
+    """Returns the items of a list endpoint across all pages."""
+    return list(iter_paged_items(api_endpoint, audience, prefetch=True))
+
+
+def find_item(api_endpoint: str, predicate: Callable[[dict], bool], audience: str|None = None) -> dict|None:
+    """Returns the first item of a list endpoint matching `predicate`, fetching only the pages needed."""
+    return next((item for item in iter_paged_items(api_endpoint, audience) if predicate(item)), None)
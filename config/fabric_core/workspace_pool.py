@@ -0,0 +1,330 @@
+"""
+Warm pool of pre-created feature workspaces.
+
+Pool workspaces are created ahead of time on the dev capacities, with permissions
+already assigned, and are named `<solution_version>-pool-<type>-<suffix>`.
+Claiming one for a feature branch only renames it, connects it to git and syncs it.
+Feature workspaces connected to this repo whose branch was deleted, or merged without
+new commits since, are garbage-collected.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+import urllib.request
+from typing import Callable
+from urllib.parse import quote, urlencode
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+from .inventory import Inventory
+from .workspaces import create_workspace, assign_permissions, get_workspace, rename_workspace, delete_workspace
+from .git_integration import (get_or_create_git_connection, connect_workspace_to_git, initialize_git_connection,
+                              update_workspace_from_git, get_git_connection)
+
+
+FEATURE_WORKSPACE_TYPES = ("processing", "datastores", "consumption")
+STAGE_NAMES = ("dev", "test", "prod", "pool")
+FEATURE_PERMISSIONS = [{"group": "SG_AV_Engineers", "role": "Admin"}]
+CLAIM_ATTEMPTS = 3
+
+
+def get_feature_capacity(workspace_type: str, solution_version: str) -> str|None:
+    """Returns the dev capacity feature workspaces of a type live on."""
+    capacity_map = {
+        "processing": f"fc{solution_version}devengineering",
+        "datastores": f"fc{solution_version}devengineering",
+        "consumption": f"fc{solution_version}devconsumption"
+    }
+    return capacity_map.get(workspace_type)
+
+
+def get_feature_workspace_name(solution_version: str, branch: str, workspace_type: str) -> str:
+    return f"{solution_version}-{branch}-{workspace_type}"
+
+
+def get_pool_prefix(solution_version: str, workspace_type: str) -> str:
+    return f"{solution_version}-pool-{workspace_type}-"
+
+
+def list_pool_workspaces(inventory: Inventory, solution_version: str, workspace_type: str) -> dict[str, str]:
+    """Returns {name: id} of the idle pool workspaces of a type."""
+    prefix = get_pool_prefix(solution_version, workspace_type)
+    return {name: workspace["id"] for name, workspace in inventory.list_workspaces().items() if name.startswith(prefix)}
+
+
+@dataclass
+class ClaimResult:
+    workspace_type: str
+    workspace_name: str
+    workspace_id: str|None = None
+    from_pool: bool = False
+    synced: bool = False
+    error: str|None = None
+
+
+class WorkspacePool:
+    """
+    Keeps `size` pre-provisioned workspaces per type and hands them out to feature branches.
+    """
+
+    def __init__(self, solution_version: str, security_groups: dict, git_config: dict,
+                 size: int = 1, inventory: Inventory|None = None, max_workers: int = 4,
+                 claim_settle_seconds: float|None = None):
+        self.solution_version = solution_version
+        self.security_groups = security_groups
+        self.git_config = git_config
+        self.size = size
+        self.max_workers = max_workers
+        self.inventory = inventory
+        self.claim_settle_seconds = (float(os.getenv("FEATURE_POOL_CLAIM_SETTLE_SECONDS", "2"))
+                                     if claim_settle_seconds is None else claim_settle_seconds)
+        self._lock = threading.Lock()
+
+    def _get_inventory(self) -> Inventory:
+        if self.inventory is None:
+            self.inventory = Inventory()
+            self.inventory.refresh_workspaces()
+        return self.inventory
+
+    def _provision(self, workspace_type: str) -> str|None:
+        """
+        Creates one pool workspace. If its permissions cannot be assigned it is deleted again,
+        so the pool never hands out a workspace without them. Returns None when nothing was added.
+        """
+        name = f"{get_pool_prefix(self.solution_version, workspace_type)}{uuid.uuid4().hex[:8]}"
+        inventory = self._get_inventory()
+        try:
+            workspace_id = create_workspace({"name": name,
+                                             "capacity": get_feature_capacity(workspace_type, self.solution_version)},
+                                            inventory)
+        except Exception as e:
+            print(f"✗ Could not create pool workspace {name}: {e}")
+            return None
+        if not workspace_id:
+            return None
+        try:
+            assign_permissions(workspace_id, FEATURE_PERMISSIONS, self.security_groups, workspace_name=name)
+        except Exception as e:
+            print(f"✗ Could not assign permissions to {name}, deleting it: {e}")
+            inventory.forget_workspace(name)
+            try:
+                delete_workspace(workspace_id, name)
+            except Exception as delete_error:
+                print(f"✗ Could not delete {name}: {delete_error}")
+            return None
+        return workspace_id
+
+    def refill(self, workspace_types=FEATURE_WORKSPACE_TYPES) -> int:
+        """Creates pool workspaces concurrently until every type has `size` idle ones. Returns the number created."""
+        inventory = self._get_inventory()
+        missing = []
+        for workspace_type in workspace_types:
+            idle = len(list_pool_workspaces(inventory, self.solution_version, workspace_type))
+            missing.extend([workspace_type] * max(0, self.size - idle))
+
+        if not missing:
+            print("✓ Workspace pool is full")
+            return 0
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            created = [workspace_id for workspace_id in pool.map(self._provision, missing) if workspace_id]
+        print(f"✓ Added {len(created)} workspaces to the pool")
+        return len(created)
+
+    def refill_in_background(self, workspace_types=FEATURE_WORKSPACE_TYPES) -> threading.Thread:
+        thread = threading.Thread(target=self.refill, args=(workspace_types,), name="fabric-pool-refill", daemon=True)
+        thread.start()
+        return thread
+
+    def _take(self, workspace_type: str, skip: set[str] = frozenset()) -> tuple[str, str]|None:
+        with self._lock:
+            idle = {name: workspace_id for name, workspace_id in
+                    list_pool_workspaces(self._get_inventory(), self.solution_version, workspace_type).items()
+                    if workspace_id not in skip}
+            if not idle:
+                return None
+            name, workspace_id = sorted(idle.items())[0]
+            self.inventory.forget_workspace(name)
+            return name, workspace_id
+
+    def _claim_from_pool(self, branch: str, workspace_type: str, name: str) -> tuple[str, str]|None:
+        """
+        Renames an idle pool workspace to `name`. The lock above only covers this process, so
+        another run can rename the same pool workspace at the same time: the rename carries a
+        claim token in the description and is read back after a moment; if the other run's
+        rename is the one that stuck, the next pool workspace is tried.
+        """
+        tried = set()
+        for _ in range(CLAIM_ATTEMPTS):
+            taken = self._take(workspace_type, tried)
+            if taken is None:
+                return None
+            pool_name, workspace_id = taken
+            tried.add(workspace_id)
+            description = f"Feature workspace for {branch} (claim {uuid.uuid4().hex[:12]})"
+            try:
+                rename_workspace(workspace_id, name, description=description)
+                time.sleep(self.claim_settle_seconds)
+                workspace = get_workspace(workspace_id) or {}
+            except RuntimeError as e:
+                print(f"⚠ Could not claim {pool_name}: {e}")
+                continue
+            if workspace.get("displayName") == name and workspace.get("description") == description:
+                # pool workspaces were provisioned with permissions; re-applying them only adds what is missing
+                assign_permissions(workspace_id, FEATURE_PERMISSIONS, self.security_groups, workspace_name=name)
+                return pool_name, workspace_id
+            print(f"⚠ {pool_name} was claimed by another run, trying the next pool workspace")
+        return None
+
+    def acquire(self, branch: str, workspace_type: str) -> ClaimResult:
+        """
+        Gives a feature branch its workspace of a type: the existing one, an idle pool
+        workspace renamed for the branch, or (if the pool is empty) a newly created one.
+        """
+        name = get_feature_workspace_name(self.solution_version, branch, workspace_type)
+        result = ClaimResult(workspace_type, name)
+        inventory = self._get_inventory()
+
+        try:
+            workspace_id = inventory.get_workspace_id(name)
+            if workspace_id:
+                print(f"✓ {name} exists")
+            else:
+                taken = self._claim_from_pool(branch, workspace_type, name)
+                if taken:
+                    pool_name, workspace_id = taken
+                    inventory.record_workspace(name, workspace_id)
+                    result.from_pool = True
+                    print(f"✓ Claimed {pool_name} as {name}")
+                else:
+                    print(f"… Pool empty for {workspace_type}, creating {name}")
+                    workspace_id = create_workspace({"name": name,
+                                                     "capacity": get_feature_capacity(workspace_type, self.solution_version)},
+                                                    inventory)
+                    if not workspace_id:
+                        raise RuntimeError(f"Could not create {name}")
+                    assign_permissions(workspace_id, FEATURE_PERMISSIONS, self.security_groups, workspace_name=name)
+            result.workspace_id = workspace_id
+        except Exception as e:
+            result.error = str(e)
+            print(f"✗ {name}: {e}")
+        return result
+
+    def connect(self, branch: str, result: ClaimResult) -> ClaimResult:
+        """Connects an acquired workspace to `solution/<type>/` on the branch and syncs it."""
+        if result.error or not result.workspace_id:
+            return result
+        try:
+            git_config = {**self.git_config, "branch": branch}
+            connection_id = get_or_create_git_connection(git_config)
+            if not connection_id:
+                raise RuntimeError("Could not get or create the git connection")
+            if connect_workspace_to_git(result.workspace_id, result.workspace_name,
+                                        f"solution/{result.workspace_type}/", git_config, connection_id):
+                initialize_git_connection(result.workspace_id)
+                print("  ✓ Initialized Git connection")
+            result.synced = update_workspace_from_git(result.workspace_id, result.workspace_name)
+        except Exception as e:
+            result.error = str(e)
+            print(f"✗ {result.workspace_name}: {e}")
+        return result
+
+    def claim(self, branch: str, workspace_types, refill: bool = True) -> tuple[list[ClaimResult], threading.Thread|None]:
+        """
+        Claims one workspace per type for a branch. Once the pool workspaces are taken the
+        pool starts refilling in the background while the claimed workspaces are connected
+        and synced. Returns the results and the refill thread (if any) to join before exiting.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            results = list(pool.map(lambda workspace_type: self.acquire(branch, workspace_type), workspace_types))
+            refill_thread = self.refill_in_background(workspace_types) if refill else None
+            results = list(pool.map(lambda result: self.connect(branch, result), results))
+        return results, refill_thread
+
+    def collect_garbage(self, active_branches: set[str], dry_run: bool = False,
+                        merged_branches: Callable[[set[str]], set[str]]|None = None) -> list[str]:
+        """
+        Deletes feature workspaces connected to this template's GitHub repo whose branch no
+        longer exists, or (with `merged_branches`, which is given the branches still in use
+        and returns those that were merged) was merged. Workspaces connected to another repo
+        are never collected. Returns the names of the collected workspaces.
+        """
+        inventory = self._get_inventory()
+        owner = (self.git_config.get("organization") or "").lower()
+        repository = (self.git_config.get("repository") or "").lower()
+        candidates = {}
+        for name, workspace in inventory.list_workspaces().items():
+            for workspace_type in FEATURE_WORKSPACE_TYPES:
+                prefix, suffix = f"{self.solution_version}-", f"-{workspace_type}"
+                if name.startswith(prefix) and name.endswith(suffix):
+                    branch = name[len(prefix):-len(suffix)]
+                    if branch and branch not in STAGE_NAMES:
+                        candidates[name] = workspace["id"]
+
+        def branch_of(item):
+            name, workspace_id = item
+            try:
+                details = get_git_connection(workspace_id).get("gitProviderDetails") or {}
+            except RuntimeError:
+                return name, None
+            if ((details.get("ownerName") or "").lower(), (details.get("repositoryName") or "").lower()) != \
+                    (owner, repository):
+                return name, None
+            return name, details.get("branchName")
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            branches = {name: branch for name, branch in pool.map(branch_of, candidates.items()) if branch}
+            in_use = {branch for branch in branches.values() if branch in active_branches}
+            merged = merged_branches(in_use) if merged_branches and in_use else set()
+            stale = [name for name, branch in branches.items() if branch not in active_branches or branch in merged]
+
+            for name in stale:
+                reason = "merged" if branches[name] in merged else "deleted"
+                print(f"{'(dry run) ' if dry_run else ''}Stale feature workspace {name} "
+                      f"(branch {branches[name]} {reason})")
+            if not dry_run:
+                list(pool.map(lambda name: delete_workspace(candidates[name], name), stale))
+
+        return stale
+
+
+def _github_get(url: str, token: str|None = None):
+    """GETs a GitHub API URL. Returns the JSON body and the URL of the next page (from the Link header)."""
+    token = token or os.getenv("GITHUB_PAT")
+    request = urllib.request.Request(url, headers={"Accept": "application/vnd.github+json",
+                                                   **({"Authorization": f"Bearer {token}"} if token else {})})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        body = json.loads(response.read())
+        next_url = None
+        for link in (response.headers.get("Link") or "").split(","):
+            if 'rel="next"' in link:
+                next_url = link.split(";")[0].strip().strip("<>")
+    return body, next_url
+
+
+def list_github_branches(owner: str, repo: str, token: str|None = None) -> set[str]:
+    """Lists the branches of a GitHub repo, following the API's pagination."""
+    branches = set()
+    url = f"https://api.github.com/repos/{owner}/{repo}/branches?per_page=100"
+    while url:
+        page, url = _github_get(url, token)
+        branches.update(branch["name"] for branch in page)
+    return branches
+
+
+def list_merged_branches(owner: str, repo: str, branches: set[str], token: str|None = None) -> set[str]:
+    """
+    Returns the branches that were merged through a pull request and have no commits since:
+    the branch head is still the head of a merged pull request.
+    """
+    merged = set()
+    for branch in branches:
+        head, _ = _github_get(f"https://api.github.com/repos/{owner}/{repo}/branches/{quote(branch, safe='')}", token)
+        query = urlencode({"state": "closed", "head": f"{owner}:{branch}", "per_page": 100})
+        pulls, _ = _github_get(f"https://api.github.com/repos/{owner}/{repo}/pulls?{query}", token)
+        if any(pull.get("merged_at") and pull["head"]["sha"] == head["commit"]["sha"] for pull in pulls):
+            merged.add(branch)
+    return merged
@@ -1,19 +1,28 @@
 """
 This file contains functions for creating and managing workspaces in Fabric.
 """
-from .utils import run_fabric_cli_command, call_azure_fabric_rest_api
+from .utils import run_fabric_cli_command, call_azure_fabric_rest_api, list_all_items, find_item, use_http_transport
+from .operations import PollResult, OperationTimeoutError, wait_until
 import re
-import time
 import json
 from typing import Sequence
 
+def find_workspace(workspace_name: str) -> dict|None:
+    """Looks a workspace up by displayName through the REST API, fetching only the pages needed."""
+    return find_item("workspaces", lambda item: item.get("displayName") == workspace_name)
+
+
 def workspace_exists(workspace_name: str)-> bool:
     """Check if a Fabric workspace exists."""
+    if use_http_transport():
+        return find_workspace(workspace_name) is not None
     return run_fabric_cli_command(['ls', f'{workspace_name}.Workspace']).returncode == 0
 
 
 def get_workspace_id(workspace_name)-> str|None:
     """Get the UUID of a workspace by name."""
+    if use_http_transport():
+        return (find_workspace(workspace_name) or {}).get("id")
     response = run_fabric_cli_command(
         ['get', f'{workspace_name}.Workspace', '-q', 'id'])
     if response.returncode == 0:
@@ -25,45 +34,175 @@ def get_workspace_id(workspace_name)-> str|None:
     return uuid_match.group() if uuid_match else None
 
 
-def create_workspace(workspace_config: dict)->str:
+def create_workspace(workspace_config: dict, inventory=None)->str:
     """
-    Function to create Fabric workspaces
+    Function to create Fabric workspaces.
+    With an inventory snapshot, existing workspaces are resolved locally and new ones are recorded.
     """
     workspace_name = workspace_config['name']
 
-    if workspace_exists(workspace_name):
+    if inventory is not None:
+        workspace_id = inventory.get_workspace_id(workspace_name)
+        if workspace_id:
+            print(f"✓ {workspace_name} exists")
+            return workspace_id
+    elif workspace_exists(workspace_name):
         print(f"✓ {workspace_name} exists")
         return get_workspace_id(workspace_name)
 
-    run_fabric_cli_command(['create',
-                f'{workspace_name}.Workspace', '-P', f'capacityname={workspace_config["capacity"]}'])
+    if use_http_transport():
+        workspace_id = create_workspace_over_rest(workspace_name, workspace_config["capacity"], inventory)
+    else:
+        run_fabric_cli_command(['create',
+                    f'{workspace_name}.Workspace', '-P', f'capacityname={workspace_config["capacity"]}'])
+        workspace_id = wait_for_workspace_id(workspace_name)
     print(f"✓ Created {workspace_name}")
 
-    time.sleep(5)
-    return get_workspace_id(workspace_name)
+    if workspace_id and inventory is not None:
+        inventory.record_workspace(workspace_name, workspace_id)
+    return workspace_id
 
 
-def assign_permissions(workspace_id: str, permissions: Sequence[dict], security_groups: dict)->None:
+def create_workspace_over_rest(workspace_name: str, capacity_name: str, inventory=None) -> str|None:
+    """
+    Creates a workspace on a capacity with one POST, which returns the new id directly.
+    A workspace created concurrently under the same name is resolved instead.
     """
-    Function to assign workspace role and user permissions
+    if inventory is not None:
+        capacity_id = inventory.get_fabric_capacity_id(capacity_name)
+    else:
+        capacity_id = (find_item("capacities", lambda item: item.get("displayName") == capacity_name) or {}).get("id")
+    if not capacity_id:
+        raise RuntimeError(f"Capacity {capacity_name} of {workspace_name} not found")
+
+    response = call_azure_fabric_rest_api(api_endpoint='workspaces', method="post",
+                                          request_body={"displayName": workspace_name, "capacityId": capacity_id})
+    response_json = json.loads(response.stdout or "{}")
+    if response_json.get('status_code') in [200, 201]:
+        return (response_json.get('text') or {}).get('id')
+    error_text = response_json.get('text')
+    if isinstance(error_text, dict) and error_text.get('errorCode') == 'WorkspaceNameAlreadyExists':
+        return get_workspace_id(workspace_name)
+    raise RuntimeError(f"Failed to create workspace {workspace_name}: {response_json}")
+
+
+def wait_for_workspace_id(workspace_name: str, max_wait_seconds: int = 60) -> str|None:
     """
-    for permission in permissions:
-        group_id = security_groups.get(permission.get('group'))
-
-        request_body = {
-            "principal": {
-                "id": group_id,
-                "type": "Group",
-                "groupDetails": {"groupType": "SecurityGroup"}
-            },
-            "role": permission.get('role')
-        }
-
-        assign_response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}/roleAssignments', method="post", 
-                                                      request_body=request_body)
-        response_json = json.loads(assign_response.stdout)
-
-        if response_json.get('status_code') in [200, 201]:
-            print(
-                f"  ✓ Assigned {permission['role']} to {permission['group']}")
+    Polls with backoff until a newly created workspace can be resolved to its id.
+    """
+    def check() -> PollResult:
+        workspace_id = get_workspace_id(workspace_name)
+        return PollResult(workspace_id is not None, workspace_id)
+
+    try:
+        return wait_until(check, timeout=max_wait_seconds, initial_delay=1, max_delay=10)
+    except OperationTimeoutError:
+        print(f"✗ Could not resolve id of {workspace_name} after {max_wait_seconds} seconds")
+        return None
+
+
+def assign_permissions(workspace_id: str, permissions: Sequence[dict], security_groups: dict,
+                       workspace_name: str|None = None)->None:
+    """
+    Function to assign workspace role and user permissions.
+    Reads the existing role assignments once and only adds missing ones or changes wrong roles.
+    Raises ValueError, before any change is made, when a permission names a group missing
+    from `security_groups` (such a group used to be POSTed without an id and fail silently).
+    """
+    from .role_assignments import diff_role_assignments, apply_role_assignment_change
+
+    changes = diff_role_assignments(workspace_name or workspace_id, workspace_id, list_role_assignments(workspace_id),
+                                    permissions, security_groups, prune=False)
+    for change in changes:
+        apply_role_assignment_change(change)
+        print(f"  ✓ {change.describe()}")
+    if not changes:
+        print("  ✓ Permissions already up to date")
+
+
+def list_role_assignments(workspace_id: str) -> list[dict]:
+    """Returns all role assignments of a workspace."""
+    return list_all_items(f'workspaces/{workspace_id}/roleAssignments')
+
+
+def build_role_assignment_request(group_id: str, role: str) -> dict:
+    """Builds the request body that grants a security group a workspace role."""
+    return {
+        "principal": {
+            "id": group_id,
+            "type": "Group",
+            "groupDetails": {"groupType": "SecurityGroup"}
+        },
+        "role": role
+    }
+
+
+def add_role_assignment(workspace_id: str, group_id: str, role: str) -> None:
+    """Grants a security group a role on a workspace."""
+    response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}/roleAssignments', method="post",
+                                          request_body=build_role_assignment_request(group_id, role))
+    response_json = json.loads(response.stdout)
+    if response_json.get('status_code') not in [200, 201]:
+        raise RuntimeError(f"Failed to assign {role} to {group_id}: {response_json}")
+
+
+def update_role_assignment(workspace_id: str, role_assignment_id: str, role: str) -> None:
+    """Changes the role of an existing workspace role assignment."""
+    response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}/roleAssignments/{role_assignment_id}',
+                                          method="patch", request_body={"role": role})
+    response_json = json.loads(response.stdout)
+    if response_json.get('status_code') != 200:
+        raise RuntimeError(f"Failed to change role assignment {role_assignment_id} to {role}: {response_json}")
+
+
+def delete_role_assignment(workspace_id: str, role_assignment_id: str) -> None:
+    """Removes a role assignment from a workspace."""
+    response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}/roleAssignments/{role_assignment_id}',
+                                          method="delete")
+    response_json = json.loads(response.stdout)
+    if response_json.get('status_code') not in [200, 204]:
+        raise RuntimeError(f"Failed to delete role assignment {role_assignment_id}: {response_json}")
+
+
+def assign_workspace_to_capacity(workspace_id: str, capacity_id: str) -> None:
+    """Moves a workspace to another capacity (by Fabric capacity id)."""
+    response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}/assignToCapacity', method="post",
+                                          request_body={"capacityId": capacity_id})
+    response_json = json.loads(response.stdout)
+    if response_json.get('status_code') not in [200, 202]:
+        raise RuntimeError(f"Failed to assign workspace {workspace_id} to capacity {capacity_id}: {response_json}")
+
+
+def get_workspace(workspace_id: str) -> dict|None:
+    """Reads a workspace by id (displayName, description, capacityId); None if it does not exist."""
+    response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}')
+    response_json = json.loads(response.stdout)
+    if response_json.get('status_code') == 404:
+        return None
+    if response_json.get('status_code') != 200:
+        raise RuntimeError(f"Failed to read workspace {workspace_id}: {response_json}")
+    return response_json.get('text') or {}
+
+
+def rename_workspace(workspace_id: str, new_name: str, description: str|None = None) -> None:
+    """Renames a workspace (and optionally replaces its description)."""
+    request_body = {"displayName": new_name}
+    if description is not None:
+        request_body["description"] = description
+    response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}', method="patch",
+                                          request_body=request_body)
+    response_json = json.loads(response.stdout)
+    if response_json.get('status_code') != 200:
+        raise RuntimeError(f"Failed to rename workspace {workspace_id} to {new_name}: {response_json}")
+
+
+def delete_workspace(workspace_id: str, workspace_name: str) -> bool:
+    """Deletes a workspace."""
+    response = call_azure_fabric_rest_api(api_endpoint=f'workspaces/{workspace_id}', method="delete")
+    response_json = json.loads(response.stdout)
+    if response_json.get('status_code') in [200, 204]:
+        print(f"✓ Deleted {workspace_name}")
+        return True
+    print(f"✗ Failed to delete {workspace_name}: {response_json}")
+    return False
 
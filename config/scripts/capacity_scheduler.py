@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT_DIR))
+
+from config.fabric_core import (set_stdout_encoding_to_utf_8, login, load_config_from_file, CapacityWindow,
+                                WarmupHistory, run_resume_schedule, parse_window_start, suspend_capacities,
+                                suspend_when_done)
+
+
+set_stdout_encoding_to_utf_8()
+
+DEFAULT_TEMPLATE = Path(__file__).parent.parent / "templates" / "v01" / "v01_template.yaml"
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Resume capacities just in time for a job window and suspend them when the job is done")
+    parser.add_argument("command", choices=["resume", "suspend"])
+    parser.add_argument("--capacity", action="append", required=True, help="Capacity name (repeatable)")
+    parser.add_argument("--template", default=str(DEFAULT_TEMPLATE), help="Template holding the resource group")
+    parser.add_argument("--window-start", help="resume: when the job window opens (HH:MM or ISO timestamp); default now")
+    parser.add_argument("--margin", type=float, default=30, help="resume: extra seconds on top of the predicted warm-up")
+    parser.add_argument("--done-file", help="suspend: wait until this file exists before suspending")
+    parser.add_argument("--history", default=os.getenv("CAPACITY_WARMUP_HISTORY"),
+                        help="resume: warm-up history JSON file kept between runs (required, "
+                             "e.g. restored and saved by a workflow cache)")
+    args = parser.parse_args()
+    if args.command == "resume" and not args.history:
+        # the default under .fabric_core is gitignored and lost with every CI runner, so every
+        # scheduled run would plan with the default warm-up instead of the measured ones
+        parser.error("resume needs --history or CAPACITY_WARMUP_HISTORY pointing at a file kept between runs")
+
+    config = load_config_from_file(args.template)
+    resource_group = config["azure"]["capacity_defaults"]["resource_group"]
+
+    login()
+
+    if args.command == "resume":
+        start_at = parse_window_start(args.window_start) if args.window_start else time.time()
+        windows = [CapacityWindow(name, resource_group, start_at) for name in args.capacity]
+        windows = run_resume_schedule(windows, WarmupHistory(args.history), margin_seconds=args.margin)
+        if any(window.state != "active" for window in windows):
+            sys.exit(1)
+    else:
+        if args.done_file:
+            results = suspend_when_done(args.capacity, resource_group, lambda: Path(args.done_file).exists())
+        else:
+            results = suspend_capacities(args.capacity, resource_group)
+        if not all(results.values()):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,13 @@
 import os
 import sys
 from pathlib import Path
-from dotenv import load_dotenv
-import json
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT_DIR))
+
+from concurrent.futures import ThreadPoolExecutor
 
 from config.fabric_core import (set_stdout_encoding_to_utf_8, load_local_env_file, load_config_from_file,
-                                login, create_workspace, get_or_create_git_connection, assign_permissions,
-                                connect_workspace_to_git, update_workspace_from_git, get_fab_cli_executable_path,
-                                run_fabric_cli_command)
+                                login, WorkspacePool, get_feature_capacity, expand_templates)
 
 
 
@@ -15,13 +15,17 @@ from config.fabric_core import (set_stdout_encoding_to_utf_8, load_local_env_fil
 set_stdout_encoding_to_utf_8()
 
 def get_capacity_for_workspace_type(workspace_type: str, solution_version: str) -> str:
-    capacity_map = {
-        "processing" : f"fc{solution_version}devengineering",
-        "datastores" : f"fc{solution_version}devengineering",
-        "consumption" : f"fc{solution_version}devconsumption"
-    }
+    return get_feature_capacity(workspace_type, solution_version)
+
+def claim_feature_workspaces(config: dict, feature_branch: str, workspace_types: list[str], pool_size: int):
+    """Claims the feature workspaces of one solution version. Returns the results and the pool refill thread."""
+    solution_version = config.get("solution_version", "av01")
+    security_groups = config.get("azure", {}).get("security_groups", {})
+    git_config = config.get("github", {})
+
+    pool = WorkspacePool(solution_version, security_groups, git_config, size=pool_size)
+    return pool.claim(feature_branch, workspace_types)
 
-    return capacity_map.get(workspace_type, None)
 
 def main():
 
@@ -30,19 +34,22 @@ def main():
     
     feature_branch = os.getenv("FEATURE_BRANCH_NAME")
     workspaces_input = os.getenv("WORKSPACES_TO_CREATE", "processing,datastores")
+    pool_size = int(os.getenv("FEATURE_POOL_SIZE", "1"))
+    # Comma-separated template paths or globs, one per solution version
+    templates = os.getenv("FEATURE_TEMPLATES", str(Path(__file__).parent.parent / "templates" / "v01" / "v01_template.yaml"))
 
     workspace_types = [ws.strip() for ws in workspaces_input.split(",") if ws.strip()]
 
 
-    config = load_config_from_file("config/templates/v01/v01-template.yml")
-
-    solution_version = config.get(solution_version, "av01")
-    azure_config = config.get("azure", {})
-    security_groups = config.get("security_groups", {})
-    git_config = config.get("github", {})
+    configs = [load_config_from_file(path, strict=True) for path in expand_templates(
+        [template.strip() for template in templates.split(",") if template.strip()])]
 
+    solution_version = configs[0].get("solution_version", "av01")
 
-    git_config["branch"] = feature_branch
+    for workspace_type in workspace_types:
+        if not get_capacity_for_workspace_type(workspace_type, solution_version):
+            print(f"✗ Unknown workspace type: {workspace_type}")
+    workspace_types = [ws for ws in workspace_types if get_capacity_for_workspace_type(ws, solution_version)]
 
     print("=== AUTHENTICATING ===")
 
@@ -50,68 +57,31 @@ def main():
 
     print(
         f"\n=== CREATING FEATURE WORKSPACES FOR BRANCH: {feature_branch} ===")
-    
-    github_connection_id = None
 
-    for workspace_type in workspace_types:
-        # Construct workspace name: <solution_version>-<branch>-<type>
-        workspace_name = f"{solution_version}-{feature_branch}-{workspace_type}"
+    # Versions are independent, so their claims run side by side
+    with ThreadPoolExecutor(max_workers=len(configs)) as executor:
+        claims = list(executor.map(
+            lambda config: claim_feature_workspaces(config, feature_branch, workspace_types, pool_size), configs))
+    results = [result for version_results, _ in claims for result in version_results]
+    refill_threads = [refill_thread for _, refill_thread in claims if refill_thread]
 
-        # Get capacity for this workspace type
-        capacity_name = get_capacity_for_workspace_type(
-            workspace_type, solution_version)
-
-        if not capacity_name:
-            print(f"✗ Unknown workspace type: {workspace_type}")
-            continue
-
-        print(f"\n--- Creating {workspace_name} ---")
-
-        # Create workspace
-        workspace_config = {
-            'name': workspace_name,
-            'capacity': capacity_name
-        }
-        workspace_id = create_workspace(workspace_config)
-
-        if workspace_id:
-            # Assign Engineers as Contributors
-            permissions = [{'group': 'SG_AV_Engineers', 'role': 'Admin'}]
-            assign_permissions(workspace_id, permissions, security_groups)
-
-            # Connect to Git (feature branch, solution/<type>/ folder)
-            if not github_connection_id:
-                github_connection_id = get_or_create_git_connection(git_config)
-
-            if github_connection_id:
-                git_directory = f"solution/{workspace_type}/"
-                success = connect_workspace_to_git(
-                    workspace_id,
-                    workspace_name,
-                    git_directory,
-                    git_config,
-                    github_connection_id
-                )
-
-                if success:
-                    # Initialize the connection
-                    init_response = run_fabric_cli_command([
-                        'api', '-X', 'post',
-                        f'workspaces/{workspace_id}/git/initializeConnection',
-                        '-i', '{}'
-                    ])
-                    print(f"  ✓ Initialized Git connection")
-
-                    # Pull content from Git into the workspace
-                    update_workspace_from_git(workspace_id, workspace_name)
+    for result in results:
+        source = "from pool" if result.from_pool else "new"
+        if result.error:
+            print(f"✗ {result.workspace_name}: {result.error}")
+        else:
+            print(f"✓ {result.workspace_name} ready ({source}, synced={result.synced})")
 
     print("\n✓ Feature workspace creation complete")
 
+    if refill_threads:
+        print("\n=== REFILLING WORKSPACE POOL ===")
+        for refill_thread in refill_threads:
+            refill_thread.join()
 
-if __name__ == "__main__":
-    main()
-
-
-
+    if any(result.error for result in results):
+        sys.exit(1)
 
 
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,69 @@
+import os
 import sys
+import argparse
 from pathlib import Path
 ROOT_DIR = Path(__file__).resolve().parents[2]
 print(ROOT_DIR)
 sys.path.append(str(ROOT_DIR))
 
-from config.fabric_core import (login, load_config_from_file, create_capacity, create_workspace,
-                                assign_permissions, get_or_create_git_connection, connect_workspace_to_git)
-
+from config.fabric_core import (login, load_config_from_file, deploy_from_config, expand_templates, deploy_versions,
+                                DeploymentJournal, get_journal_path)
 
 
+DEFAULT_TEMPLATE = Path(__file__).parent.parent / "templates" / "v01" / "v01_template.yaml"
 
 
 def main():
 
-    print("===== Azure Login =====")
+    parser = argparse.ArgumentParser(description="Deploy Fabric capacities and workspaces from a YAML template")
+    parser.add_argument("--template", action="append", default=None,
+                        help="Template path or glob; repeat (or use a glob) to deploy several solution versions in parallel")
+    parser.add_argument("--max-workers", type=int, default=int(os.getenv("DEPLOY_MAX_WORKERS", "8")),
+                        help="Maximum number of deployment steps running at the same time")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="Worker processes when deploying several versions (default: one per version)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted deployment from its journal instead of starting from the top")
+    parser.add_argument("--journal", default=None,
+                        help="Journal file (defaults to FABRIC_CORE_JOURNAL or .fabric_core/journal-<version>.jsonl); "
+                             "only with a single template")
+    args = parser.parse_args()
 
-    login()
+    template_paths = expand_templates(args.template or [DEFAULT_TEMPLATE])
 
-    print("===== Loading config file =====")
+    if len(template_paths) > 1:
+        if args.journal:
+            parser.error("--journal names one file; with several templates each version uses "
+                         ".fabric_core/journal-<version>.jsonl")
 
-    template_file_path = Path(__file__).parent.parent / "templates" / "v01" / "v01_template.yaml"
+        print(f"===== Deploying {len(template_paths)} solution versions =====")
 
-    if template_file_path.exists():
-        config = load_config_from_file(template_file_path)
-        print("===config file loaded===")
-    else:
-        raise RuntimeError("Config file not found.")
+        results = deploy_versions(template_paths, max_processes=args.processes, max_workers=args.max_workers,
+                                  resume=args.resume)
 
-    print("===== Creating Capacities =====")
+        if any(result.status != "succeeded" for result in results.values()):
+            sys.exit(1)
+        return
 
-    capacities_config = config["capacities"]
-    capacities_defaults_config = config["azure"]["capacity_defaults"]
-    resource_group = capacities_defaults_config["resource_group"]
+    print("===== Loading config file =====")
+
+    config = load_config_from_file(template_paths[0], strict=True)
+    print("===config file loaded===")
 
-    
-    for item in capacities_config:
-        create_capacity(item, resource_group, capacities_defaults_config)
+    print("===== Azure Login =====")
 
-    print("===== Creating Workspaces and setting up Git connection =====")
+    login()
 
-    workspaces_config = config["workspaces"]
-    security_groups = config["azure"]["security_groups"]
-    github_config = config["github"]
+    print("===== Deploying Capacities, Workspaces and Git connections =====")
 
+    journal = DeploymentJournal(get_journal_path(config, args.journal))
+    results = deploy_from_config(config, max_workers=args.max_workers, journal=journal, resume=args.resume)
 
-    for item in workspaces_config:
-        print(item)
-        print(item["permissions"])
-        workspace_id = create_workspace(item)
-        assign_permissions(workspace_id = workspace_id, permissions = item["permissions"], security_groups = security_groups)
-        git_connection_id = get_or_create_git_connection(github_config)
-        if git_connection_id:
-            connect_workspace_to_git(workspace_id = workspace_id, workspace_name = item["name"], 
-                                     directory_name = item["connect_to_git_folder"], git_config = github_config, connection_id = git_connection_id)
+    if any(result.status != "succeeded" for result in results.values()):
+        sys.exit(1)
 
 
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
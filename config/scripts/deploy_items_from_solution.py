@@ -0,0 +1,48 @@
+import os
+import sys
+import argparse
+from pathlib import Path
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT_DIR))
+
+from config.fabric_core import (set_stdout_encoding_to_utf_8, login, load_config_from_file, load_inventory,
+                                select_item_workspaces, deploy_items, print_item_deployment_report)
+
+
+set_stdout_encoding_to_utf_8()
+
+DEFAULT_TEMPLATE = Path(__file__).parent.parent / "templates" / "v01" / "v01_template.yaml"
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Deploy the items that changed in solution/<type>/ to workspaces")
+    parser.add_argument("--template", default=os.getenv("CONFIG_FILE") or str(DEFAULT_TEMPLATE),
+                        help="Path to the YAML template")
+    parser.add_argument("--stage", action="append", default=None,
+                        help="Only workspaces of this stage, e.g. test or prod (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Only show what would change")
+    parser.add_argument("--no-delete", action="store_true", help="Keep items that were removed from the solution")
+    parser.add_argument("--max-workers", type=int, default=int(os.getenv("DEPLOY_MAX_WORKERS", "8")))
+    args = parser.parse_args()
+
+    config = load_config_from_file(args.template)
+
+    print("===== Azure Login =====")
+
+    login()
+
+    inventory = load_inventory(connections=False)
+    workspaces = select_item_workspaces(config, inventory, stages=args.stage)
+
+    print(f"===== Deploying items to {len(workspaces)} workspaces =====")
+
+    results = deploy_items(workspaces, max_workers=args.max_workers, delete=not args.no_delete, dry_run=args.dry_run)
+    print_item_deployment_report(results, args.dry_run)
+
+    if any(result.failed for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import argparse
+from pathlib import Path
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT_DIR))
+
+from config.fabric_core import (set_stdout_encoding_to_utf_8, load_config_from_file, login, WorkspacePool,
+                                list_github_branches, list_merged_branches)
+
+
+set_stdout_encoding_to_utf_8()
+
+DEFAULT_TEMPLATE = Path(__file__).parent.parent / "templates" / "v01" / "v01_template.yaml"
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Refill the warm pool of feature workspaces and delete stale ones")
+    parser.add_argument("--template", default=str(DEFAULT_TEMPLATE), help="Path to the YAML template")
+    parser.add_argument("--pool-size", type=int, default=int(os.getenv("FEATURE_POOL_SIZE", "1")),
+                        help="Idle workspaces to keep per workspace type")
+    parser.add_argument("--skip-refill", action="store_true")
+    parser.add_argument("--skip-gc", action="store_true")
+    parser.add_argument("--dry-run", action="store_true", help="Only list stale feature workspaces")
+    args = parser.parse_args()
+
+    config = load_config_from_file(args.template, strict=True)
+    git_config = config["github"]
+
+    print("=== AUTHENTICATING ===")
+
+    login()
+
+    pool = WorkspacePool(config.get("solution_version", "av01"), config["azure"]["security_groups"], git_config,
+                         size=args.pool_size)
+
+    if not args.skip_gc:
+        print("\n=== COLLECTING STALE FEATURE WORKSPACES ===")
+        owner, repository = git_config["organization"], git_config["repository"]
+        branches = list_github_branches(owner, repository)
+        stale = pool.collect_garbage(branches, dry_run=args.dry_run,
+                                     merged_branches=lambda in_use: list_merged_branches(owner, repository, in_use))
+        print(f"✓ {len(stale)} stale feature workspaces")
+
+    if not args.skip_refill and not args.dry_run:
+        print("\n=== REFILLING WORKSPACE POOL ===")
+        pool.refill()
+
+
+if __name__ == "__main__":
+    main()
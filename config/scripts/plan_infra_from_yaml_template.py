@@ -0,0 +1,52 @@
+import os
+import sys
+import argparse
+from pathlib import Path
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT_DIR))
+
+from config.fabric_core import (login, load_config_from_file, fetch_live_state, build_plan, print_plan,
+                                apply_plan, print_deployment_summary)
+
+
+DEFAULT_TEMPLATE = Path(__file__).parent.parent / "templates" / "v01" / "v01_template.yaml"
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Show or apply the changes needed to bring the tenant in line with a template")
+    parser.add_argument("command", choices=["plan", "apply"])
+    parser.add_argument("--template", default=str(DEFAULT_TEMPLATE), help="Path to the YAML template")
+    parser.add_argument("--max-workers", type=int, default=int(os.getenv("DEPLOY_MAX_WORKERS", "8")),
+                        help="Maximum number of reads/changes running at the same time")
+    args = parser.parse_args()
+
+    print("===== Loading config file =====")
+
+    config = load_config_from_file(args.template, strict=True)
+
+    print("===== Azure Login =====")
+
+    login()
+
+    print("===== Reading live state =====")
+
+    state = fetch_live_state(config, max_workers=args.max_workers)
+    actions = build_plan(config, state)
+
+    print("===== Plan =====")
+
+    print_plan(actions)
+
+    if args.command == "apply":
+        print("===== Applying =====")
+
+        results = apply_plan(actions, config, state, max_workers=args.max_workers)
+        print_deployment_summary(results)
+
+        if any(result.status != "succeeded" for result in results.values()):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
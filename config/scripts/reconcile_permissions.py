@@ -0,0 +1,62 @@
+import os
+import sys
+import argparse
+from pathlib import Path
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT_DIR))
+
+from config.fabric_core import (login, load_config_from_file, Inventory, reconcile_role_assignments,
+                                print_reconciliation_summary)
+
+
+DEFAULT_TEMPLATE = Path(__file__).parent.parent / "templates" / "v01" / "v01_template.yaml"
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Reconcile workspace role assignments with one or more templates")
+    parser.add_argument("templates", nargs="*", default=[str(DEFAULT_TEMPLATE)], help="Paths to YAML templates")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the changes")
+    parser.add_argument("--no-prune", action="store_true",
+                        help="Do not delete assignments of template security groups missing from permissions")
+    parser.add_argument("--max-workers", type=int, default=int(os.getenv("DEPLOY_MAX_WORKERS", "8")))
+    args = parser.parse_args()
+
+    print("===== Loading config files =====")
+
+    configs = [load_config_from_file(template, strict=True) for template in args.templates]
+
+    security_groups = {}
+    for config in configs:
+        for name, group_id in config["azure"]["security_groups"].items():
+            if security_groups.setdefault(name, group_id) != group_id:
+                raise RuntimeError(f"Security group {name} has different ids across templates")
+
+    print("===== Azure Login =====")
+
+    login()
+
+    inventory = Inventory()
+    inventory.refresh_workspaces()
+
+    workspaces = []
+    for config in configs:
+        for workspace in config["workspaces"]:
+            workspace_id = inventory.get_workspace_id(workspace["name"])
+            if not workspace_id:
+                print(f"✗ {workspace['name']} does not exist, skipping")
+                continue
+            workspaces.append((workspace["name"], workspace_id, workspace.get("permissions", [])))
+
+    print("===== Reconciling role assignments =====")
+
+    reports = reconcile_role_assignments(workspaces, security_groups, max_workers=args.max_workers,
+                                         prune=not args.no_prune, dry_run=args.dry_run)
+    print_reconciliation_summary(reports)
+
+    if any(report.errors for report in reports.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT_DIR))
+
+from config.fabric_core import (set_stdout_encoding_to_utf_8, login, load_config_from_file, load_inventory, JobSpec,
+                                resolve_jobs, run_jobs, print_job_run_report)
+
+
+set_stdout_encoding_to_utf_8()
+
+DEFAULT_TEMPLATE = Path(__file__).parent.parent / "templates" / "v01" / "v01_template.yaml"
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Resume capacities, run pipeline jobs and suspend the capacities when they finish")
+    parser.add_argument("--template", default=os.getenv("CONFIG_FILE") or str(DEFAULT_TEMPLATE),
+                        help="Path to the YAML template")
+    parser.add_argument("--job", action="append", default=None,
+                        help="workspace/item[:ItemType] to run (repeatable); default: the template's jobs")
+    parser.add_argument("--timeout", type=float, default=6 * 3600, help="Seconds before running jobs are cancelled")
+    parser.add_argument("--no-suspend", action="store_true", help="Leave the capacities Active after the jobs")
+    parser.add_argument("--suspend-active", action="store_true",
+                        help="Also suspend capacities that were already Active before the run")
+    parser.add_argument("--report", help="Write the run report as JSON to this file")
+    args = parser.parse_args()
+
+    config = load_config_from_file(args.template)
+    resource_group = config["azure"]["capacity_defaults"]["resource_group"]
+    specs = [JobSpec.parse(job) for job in args.job or []] or [JobSpec.from_config(job) for job in config.get("jobs") or []]
+    if not specs:
+        print("✗ No jobs: pass --job or add a 'jobs' section to the template")
+        sys.exit(2)
+
+    print("===== Azure Login =====")
+
+    login()
+
+    print(f"===== Running {len(specs)} jobs =====")
+
+    runs = resolve_jobs(specs, load_inventory(resource_group, connections=False))
+    report = run_jobs(runs, resource_group, suspend=not args.no_suspend, timeout=args.timeout,
+                      suspend_active=args.suspend_active)
+    print_job_run_report(report)
+    if args.report:
+        Path(args.report).write_text(json.dumps(report.to_dict(), indent=2))
+
+    if not report.succeeded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
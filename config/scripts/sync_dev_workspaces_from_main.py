@@ -0,0 +1,54 @@
+import os
+import sys
+import argparse
+from pathlib import Path
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT_DIR))
+
+from config.fabric_core import (set_stdout_encoding_to_utf_8, login, load_config_from_file, Inventory,
+                                find_workspaces_on_branch, sync_workspaces_from_git, print_sync_report)
+
+
+set_stdout_encoding_to_utf_8()
+
+DEFAULT_TEMPLATE = Path(__file__).parent.parent / "templates" / "v01" / "v01_template.yaml"
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Sync every workspace connected to a branch with the head of that branch")
+    parser.add_argument("--template", default=os.getenv("CONFIG_FILE") or str(DEFAULT_TEMPLATE),
+                        help="Path to the YAML template")
+    parser.add_argument("--branch", default=os.getenv("SYNC_BRANCH"),
+                        help="Branch to sync (defaults to the template's github branch)")
+    parser.add_argument("--max-workers", type=int, default=int(os.getenv("DEPLOY_MAX_WORKERS", "8")))
+    args = parser.parse_args()
+
+    config = load_config_from_file(args.template)
+    solution_version = config.get("solution_version", "av01")
+    branch = args.branch or config["github"]["branch"]
+
+    print("===== Azure Login =====")
+
+    login()
+
+    print(f"===== Finding {solution_version} workspaces connected to {branch} =====")
+
+    inventory = Inventory()
+    inventory.refresh_workspaces()
+    candidates = {name: workspace["id"] for name, workspace in inventory.list_workspaces().items()
+                  if name.startswith(f"{solution_version}-")}
+    workspaces = find_workspaces_on_branch(candidates, branch, max_workers=args.max_workers)
+    print(f"✓ {len(workspaces)} workspaces on {branch}: {', '.join(workspaces) or '-'}")
+
+    print("===== Syncing =====")
+
+    results = sync_workspaces_from_git(workspaces, max_workers=args.max_workers)
+    print_sync_report(results)
+
+    if any(result.status == "failed" for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+from simulator import FabricSimulator, SimulatorSettings
+from run_benchmarks import benchmark_environment, reset_process_state
+
+
+@pytest.fixture
+def simulator_settings() -> SimulatorSettings:
+    """Override in a test module to change how the simulated tenant behaves."""
+    return SimulatorSettings(operation_seconds=0.1, job_seconds=0.3, page_size=5)
+
+
+@pytest.fixture
+def simulator(simulator_settings, monkeypatch, tmp_path):
+    """A local Fabric/ARM simulator the HTTP transport points at, with the process state reset around it."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GITHUB_ACTIONS", "true")  # no .env file is read
+    monkeypatch.delenv("FABRIC_CORE_TRACE", raising=False)
+    with FabricSimulator(simulator_settings) as simulator:
+        for name, value in benchmark_environment(simulator).items():
+            monkeypatch.setenv(name, value)
+        reset_process_state()
+        yield simulator
+        reset_process_state()
+
+
+class FakeClock:
+    """Clock whose sleep() only moves now() forward, for schedules and sampling loops."""
+
+    def __init__(self, now: float = 1_760_000_000.0):
+        self.current = now
+        self.sleeps = []
+
+    def now(self) -> float:
+        return self.current
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.current += max(0.0, seconds)
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def add_capacity(simulator, name: str, sku: str = "F2", state: str = "Active",
+                 resource_group: str = "rg-benchmark") -> None:
+    """Puts a provisioned capacity into the simulated tenant without going through ARM."""
+    with simulator.lock:
+        simulator.capacities[name] = {
+            "id": f"/subscriptions/sub/resourceGroups/{resource_group}/providers/Microsoft.Fabric/capacities/{name}",
+            "name": name, "type": "Microsoft.Fabric/capacities", "location": "australiaeast",
+            "sku": {"name": sku, "tier": "Fabric"}, "_resource_group": resource_group,
+            "properties": {"provisioningState": "Succeeded", "state": state, "administration": {"members": []}}}
+        simulator.fabric_capacity_ids.setdefault(name, str(uuid.uuid4()))
@@ -0,0 +1,99 @@
+import socket
+import asyncio
+import importlib
+import subprocess
+
+import pytest
+
+from config.fabric_core import aio
+from config.fabric_core.transport import RequestNotSentError
+from tests.conftest import add_capacity
+
+login = importlib.import_module("config.fabric_core.login")  # the package exports the function under this name
+
+
+def test_connect_failure_is_request_not_sent():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    async def send():
+        try:
+            await aio.send_http_request("post", f"http://127.0.0.1:{port}/v1/workspaces", body=b"{}")
+        finally:
+            await aio.close()
+
+    with pytest.raises(RequestNotSentError):
+        asyncio.run(send())
+
+
+@pytest.mark.parametrize("error, method, falls_back", [
+    (RequestNotSentError("connect failed"), "post", True),
+    (ConnectionResetError("reset after send"), "get", True),
+    (ConnectionResetError("reset after send"), "post", False),
+])
+def test_cli_fallback_only_when_request_cannot_run_twice(monkeypatch, error, method, falls_back):
+    monkeypatch.setenv("FABRIC_CORE_TRANSPORT", "auto")
+    for name in ("AZURE_TENANT_ID", "SPN_CLIENT_ID", "SPN_CLIENT_SECRET"):
+        monkeypatch.setenv(name, "stub")
+    cli_calls = []
+
+    async def fail_over_http(*args):
+        raise error
+
+    async def run_cli(cmd):
+        cli_calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, '{"status_code": 200, "text": {}}', "")
+
+    def run_cli_login(cmd):
+        cli_calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    monkeypatch.setattr(aio, "call_rest_api_over_http", fail_over_http)
+    monkeypatch.setattr(aio, "run_fabric_cli_command", run_cli)
+    monkeypatch.setattr(login, "run_fabric_cli_command", run_cli_login)
+    monkeypatch.setattr(login, "_logged_in_as", None)
+    call = aio.call_azure_fabric_rest_api("workspaces", method=method, request_body={"displayName": "ws"})
+
+    if falls_back:
+        asyncio.run(call)
+        assert [cmd[0] for cmd in cli_calls] == ["auth", "api"]
+    else:
+        with pytest.raises(RuntimeError):
+            asyncio.run(call)
+        assert cli_calls == []
+
+
+def test_create_capacity_raises_when_it_does_not_become_ready(simulator, monkeypatch):
+    async def never_ready(*args, **kwargs):
+        return False
+
+    monkeypatch.setattr(aio, "wait_for_capacity_ready", never_ready)
+    capacity = {"name": "fcstuck", "sku": "F2", "region": "australiaeast", "admin_members": ["admin@contoso.com"]}
+
+    async def create():
+        try:
+            await aio.create_capacity(capacity, "rg-benchmark", {"sku": "F2", "region": "australiaeast"})
+        finally:
+            await aio.close()
+
+    with pytest.raises(RuntimeError, match="did not become ready"):
+        asyncio.run(create())
+    assert "fcstuck" in simulator.capacities
+
+
+def test_update_capacity_raises_when_it_does_not_become_ready(simulator, monkeypatch):
+    async def never_ready(*args, **kwargs):
+        return False
+
+    add_capacity(simulator, "fcstuck")
+    monkeypatch.setattr(aio, "wait_for_capacity_ready", never_ready)
+
+    async def update():
+        try:
+            await aio.update_capacity("fcstuck", "rg-benchmark", sku="F4")
+        finally:
+            await aio.close()
+
+    with pytest.raises(RuntimeError, match="did not become ready"):
+        asyncio.run(update())
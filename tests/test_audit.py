@@ -0,0 +1,101 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from config.fabric_core.audit import (Crawl, audit_drift, changes_between, open_audit_db, store_snapshot,
+                                      who_had_role)
+
+
+WORKSPACE = "av01-prod-consumption"
+
+
+def crawl(sku: str = "F2", roles: dict|None = None, unreadable_roles: bool = False) -> Crawl:
+    """What a crawl of one capacity and one workspace with the given {principal: role} would see."""
+    result = Crawl({"fcav01prodconsumption"}, {WORKSPACE})
+    result.rows["capacities"].append({"name": "fcav01prodconsumption", "state": "Active", "sku": sku,
+                                      "region": "australiaeast", "admins": "admin-id"})
+    result.rows["workspaces"].append({"name": WORKSPACE, "workspace_id": "ws-id", "capacity": "fcav01prodconsumption"})
+    for principal, role in (roles or {}).items():
+        result.rows["role_assignments"].append({"workspace": WORKSPACE, "principal_id": principal,
+                                                "principal_type": "Group", "principal_name": principal, "role": role})
+    if unreadable_roles:
+        result.unreadable["role_assignments"].add(WORKSPACE)
+    return result
+
+
+def at(day: int) -> datetime:
+    return datetime(2026, 3, day, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def connection(tmp_path):
+    connection = open_audit_db(tmp_path / "audit.sqlite")
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def history(connection):
+    """Three snapshots: the SKU changes and an Analysts' role is removed, then the roles cannot be read."""
+    return [
+        store_snapshot(connection, crawl("F2", {"engineers": "Admin", "analysts": "Viewer"}), "av01", taken_at=at(1)),
+        store_snapshot(connection, crawl("F4", {"engineers": "Admin"}), "av01", taken_at=at(5)),
+        store_snapshot(connection, crawl("F4", unreadable_roles=True), "av01", taken_at=at(10)),
+    ]
+
+
+def test_store_snapshot_only_writes_what_changed(connection, history):
+    assert [changes for _, changes in history] == [4, 2, 0]
+
+    capacities = [tuple(row) for row in connection.execute(
+        "SELECT sku, valid_from, valid_to FROM capacities ORDER BY valid_from")]
+    assert capacities == [("F2", 1, 2), ("F4", 2, None)]
+    roles = {row["principal_id"]: (row["valid_from"], row["valid_to"]) for row in connection.execute(
+        "SELECT principal_id, valid_from, valid_to FROM role_assignments")}
+    assert roles == {"engineers": (1, None), "analysts": (1, 2)}  # unreadable in snapshot 3: left as they were
+
+
+def test_who_had_role_at_a_point_in_time(connection, history):
+    assert [row["principal_id"] for row in who_had_role(connection, "prod-consumption", at="2026-03-03")] == [
+        "analysts", "engineers"]
+    assert [row["principal_id"] for row in who_had_role(connection, WORKSPACE, "Admin", at="2026-03-12")] == [
+        "engineers"]
+    assert who_had_role(connection, "prod-consumption", "Viewer") == []
+    assert who_had_role(connection, "prod-consumption", at="2026-02-28") == []
+
+
+def test_changes_between_lists_changes_after_the_first_snapshot(connection, history):
+    changes = changes_between(connection, "2026-03-02", "2026-03-06")
+
+    assert [(change["table"], change["key"], change["change"]) for change in changes] == [
+        ("capacities", "fcav01prodconsumption", "changed"),
+        ("role_assignments", f"{WORKSPACE}/analysts", "removed")]
+    assert changes[0]["before"]["sku"] == "F2" and changes[0]["after"]["sku"] == "F4"
+    assert changes[0]["taken_at"] == "2026-03-05T12:00:00Z"
+    assert changes_between(connection, "2026-03-06") == []
+
+
+def test_audit_drift_compares_a_snapshot_with_the_template(connection, history, tmp_path):
+    config = {
+        "azure": {"capacity_defaults": {"sku": "F2", "capacity_admins": "admin-id"},
+                  "security_groups": {"SG_AV_Engineers": "engineers", "SG_AV_Analysts": "analysts"}},
+        "github": {"branch": "main"},
+        "capacities": [{"name": "fcav01prodconsumption"}],
+        "workspaces": [{"name": WORKSPACE, "capacity": "fcav01prodconsumption",
+                        "permissions": [{"group": "SG_AV_Engineers", "role": "Admin"},
+                                        {"group": "SG_AV_Analysts", "role": "Viewer"}],
+                        "connect_to_git_folder": "solution/consumption/"},
+                       {"name": "av01-prod-processing", "capacity": "fcav01prodengineering"}],
+    }
+
+    assert audit_drift(connection, config, at="2026-03-03") == [
+        f"workspace {WORKSPACE}: not connected to git (template solution/consumption/)",
+        "workspace av01-prod-processing: missing"]
+    assert audit_drift(connection, config) == [
+        "capacity fcav01prodconsumption: sku F4 (template F2)",
+        f"workspace {WORKSPACE}: SG_AV_Analysts has no role (template Viewer)",
+        f"workspace {WORKSPACE}: not connected to git (template solution/consumption/)",
+        "workspace av01-prod-processing: missing"]
+    empty = open_audit_db(tmp_path / "empty.sqlite")
+    assert audit_drift(empty, config) == ["No snapshot recorded yet"]
+    empty.close()
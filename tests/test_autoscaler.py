@@ -0,0 +1,144 @@
+import json
+import functools
+
+import pytest
+
+from tests.conftest import add_capacity
+
+from config.fabric_core import autoscaler as autoscaler_module, capacities
+from config.fabric_core.operations import PollResult
+from config.fabric_core.autoscaler import (AutoscalePolicy, CapacityAutoscaler, CapacityScaleState, FileMetricsFeed,
+                                           MetricSample, SimulatedMetricsFeed, decide)
+from config.fabric_core.load_config import ConfigError, build_solution_config
+from run_benchmarks import build_template
+
+
+def make_policy(**overrides) -> AutoscalePolicy:
+    return AutoscalePolicy(**{"capacity_name": "fcscale", "min_sku": "F2", "max_sku": "F8", "cooldown_seconds": 600,
+                              "scale_up_at": 80, "scale_down_at": 30, "up_samples": 3, "down_samples": 4,
+                              **overrides})
+
+
+def feed(policy, state, utilizations, start=0.0, interval=60.0):
+    """Feeds samples one interval apart; returns the decision after each."""
+    return [decide(policy, state, MetricSample(*value) if isinstance(value, tuple) else MetricSample(value),
+                   start + index * interval)
+            for index, value in enumerate(utilizations)]
+
+
+def test_scales_up_only_after_consecutive_busy_samples():
+    policy, state = make_policy(), CapacityScaleState("F2")
+
+    assert feed(policy, state, [90, 95, 50, 90, 85]) == [None] * 5
+    assert decide(policy, state, MetricSample(20, throttled=True), 300) == "F4"
+
+
+def test_scales_down_after_idle_samples_only_when_half_the_units_would_do():
+    policy, state = make_policy(), CapacityScaleState("F8")
+    assert feed(policy, state, [10, 10, 10, 10]) == [None, None, None, "F4"]
+
+    state = CapacityScaleState("F8")
+    assert feed(policy, state, [10, 10, 10, 45], interval=60) == [None] * 4  # 45% is not idle
+    policy = make_policy(scale_down_at=50)
+    state = CapacityScaleState("F8")
+    assert feed(policy, state, [45, 45, 45, 45]) == [None] * 4  # 90% on F4 would be busy
+
+
+def test_respects_cooldown_and_bounds():
+    policy = make_policy(up_samples=1)
+    state = CapacityScaleState("F4", last_change_at=0)
+    assert decide(policy, state, MetricSample(99), 300) is None
+    assert decide(policy, state, MetricSample(99), 600) == "F8"
+
+    assert decide(policy, CapacityScaleState("F8"), MetricSample(99), 0) is None
+    assert decide(policy, CapacityScaleState("F64"), None, 0) == "F8"
+    assert decide(policy, CapacityScaleState(None), MetricSample(99), 0) is None
+
+
+def test_file_feed_counts_each_exported_sample_once(tmp_path, clock):
+    path = tmp_path / "metrics.json"
+    metrics_feed = FileMetricsFeed(path, clock=clock, max_age_seconds=900)
+
+    def export(timestamp=None, utilization=90.0):
+        document = {"utilization": utilization}
+        if timestamp is not None:
+            document["timestamp"] = timestamp
+        path.write_text(json.dumps({"fcscale": document}))
+
+    export()
+    assert metrics_feed.sample("fcscale") is None  # no timestamp
+
+    export(clock.now() - 30)
+    assert metrics_feed.sample("fcscale").utilization == 90
+    assert metrics_feed.sample("fcscale") is None  # the exporter has not written again
+    clock.sleep(60)
+    assert metrics_feed.sample("fcscale") is None
+
+    export(clock.now() - 5, 40)
+    assert metrics_feed.sample("fcscale").utilization == 40
+    export(clock.now() - 1000, 40)
+    assert metrics_feed.sample("fcscale") is None  # too old
+
+
+def test_slow_exporter_does_not_count_one_reading_as_several(tmp_path, clock):
+    path = tmp_path / "metrics.json"
+    path.write_text(json.dumps({"fcscale": {"utilization": 95, "timestamp": clock.now()}}))
+    policy, state = make_policy(), CapacityScaleState("F2")
+    metrics_feed = FileMetricsFeed(path, clock=clock)
+
+    decisions = []
+    for _ in range(5):
+        decisions.append(decide(policy, state, metrics_feed.sample("fcscale"), clock.now()))
+        clock.sleep(60)
+    assert decisions == [None] * 5
+    assert state.busy_streak == 1
+
+
+def test_autoscaler_changes_skus_through_arm(simulator, clock):
+    add_capacity(simulator, "fcscale", "F2")
+    add_capacity(simulator, "fcsteady", "F4")
+    policies = [make_policy(up_samples=2), make_policy(capacity_name="fcsteady")]
+    metrics_feed = SimulatedMetricsFeed({"fcscale": [90, (60, True), 90, 95, 99], "fcsteady": [50, 55, 60, 50, 45]})
+    autoscaler = CapacityAutoscaler(policies, "rg-benchmark", metrics_feed, clock=clock, interval_seconds=60)
+
+    states = autoscaler.run(iterations=5)
+
+    assert states["fcscale"].history == [(clock.now() - 3 * 60, "F2", "F4")]  # 2nd busy sample, then the cooldown
+    with simulator.lock:
+        assert simulator.capacities["fcscale"]["sku"]["name"] == "F4"
+        assert simulator.capacities["fcsteady"]["sku"]["name"] == "F4"
+    assert states["fcsteady"].history == []
+    assert clock.sleeps == [60] * 4
+
+
+def test_change_to_a_capacity_that_never_becomes_ready_is_not_recorded(simulator, clock, monkeypatch):
+    add_capacity(simulator, "fcscale", "F2")
+    read_capacity_readiness = capacities.read_capacity_readiness
+    monkeypatch.setattr(capacities, "read_capacity_readiness", lambda name, *states: (
+        PollResult(False) if name == "fcscale" else read_capacity_readiness(name, *states)))
+    monkeypatch.setattr(capacities, "wait_for_capacity_ready",
+                        functools.partial(capacities.wait_for_capacity_ready, max_wait_seconds=3))
+    updates = []
+    monkeypatch.setattr(autoscaler_module, "update_capacity",
+                        lambda name, *args, **kwargs: updates.append(name) or capacities.update_capacity(
+                            name, *args, **kwargs))
+    metrics_feed = SimulatedMetricsFeed({"fcscale": [90, 95]})
+    autoscaler = CapacityAutoscaler([make_policy(up_samples=1)], "rg-benchmark", metrics_feed, clock=clock)
+    autoscaler.refresh()
+
+    assert autoscaler.step() == {}
+    state = autoscaler.states["fcscale"]
+    assert state.sku == "F2" and state.last_change_at is None and state.history == []
+
+    clock.sleep(60)
+    assert autoscaler.step() == {}  # no cooldown: the next busy sample tries again
+    assert updates == ["fcscale", "fcscale"]
+
+
+def test_invalid_default_autoscale_block_is_reported():
+    template = build_template(9)
+    template["azure"]["capacity_defaults"]["autoscale"] = {"min_sku": "F999", "max_sku": "F2"}
+
+    with pytest.raises(ConfigError) as error:
+        build_solution_config(template)
+    assert "capacity_defaults: autoscale.min_sku F999 is not one of" in str(error.value)
@@ -0,0 +1,46 @@
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+from tests.conftest import add_capacity
+from config.fabric_core.capacity_scheduler import CapacityWindow, WarmupHistory, run_resume_schedule
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+
+def test_resume_is_planned_from_the_history_and_records_the_warmup(simulator, clock, tmp_path):
+    add_capacity(simulator, "fcwarm", state="Paused")
+    history_file = tmp_path / "history" / "warmup.json"
+    history_file.parent.mkdir()
+    history_file.write_text(json.dumps({"fcwarm": [60, 90, 100]}))
+    start_at = clock.now() + 1000
+
+    windows = run_resume_schedule([CapacityWindow("fcwarm", "rg-benchmark", start_at)], WarmupHistory(history_file),
+                                  clock=clock, margin_seconds=30, poll_seconds=10)
+
+    assert windows[0].state == "active"
+    assert clock.sleeps[0] == 1000 - 100 - 30  # p90 of the history plus the margin
+    assert sum(count for key, count in simulator.calls.items() if key.endswith("/resume")) == 1
+    assert len(WarmupHistory(history_file).samples["fcwarm"]) == 4  # persisted for the next run
+
+
+def test_already_active_capacity_is_not_resumed(simulator, clock, tmp_path):
+    add_capacity(simulator, "fcwarm")
+    windows = run_resume_schedule([CapacityWindow("fcwarm", "rg-benchmark", clock.now())],
+                                  WarmupHistory(tmp_path / "warmup.json"), clock=clock)
+
+    assert windows[0].state == "active"
+    assert not any(key.endswith("/resume") for key in simulator.calls)
+    assert not (tmp_path / "warmup.json").exists()
+
+
+def test_scheduled_resume_requires_a_persisted_history():
+    env = {name: value for name, value in os.environ.items() if name != "CAPACITY_WARMUP_HISTORY"}
+    result = subprocess.run([sys.executable, str(ROOT_DIR / "config" / "scripts" / "capacity_scheduler.py"),
+                             "resume", "--capacity", "fcwarm"], env=env, capture_output=True, text=True)
+
+    assert result.returncode == 2
+    assert "CAPACITY_WARMUP_HISTORY" in result.stderr
@@ -0,0 +1,68 @@
+import uuid
+
+import pytest
+
+from config.fabric_core import git_integration
+from config.fabric_core.git_integration import ConnectionRegistry, get_or_create_git_connection
+
+
+GIT_CONFIG = {"organization": "contoso", "repository": "fabric-benchmark", "provider": "GitHub", "branch": "main"}
+
+
+def add_connections(simulator, count: int) -> None:
+    for index in range(count):
+        connection_id = str(uuid.uuid4())
+        simulator.connections[connection_id] = {
+            "id": connection_id, "displayName": f"GitHub-other-repo{index}", "connectivityType": "ShareableCloud",
+            "connectionDetails": {"type": "GitHubSourceControl", "path": f"https://github.com/other/repo{index}"}}
+
+
+def count_calls(simulator, call: str) -> int:
+    with simulator.lock:
+        return simulator.calls[call]
+
+
+def test_find_lists_only_the_pages_needed(simulator):
+    add_connections(simulator, 12)
+    registry = ConnectionRegistry()
+
+    assert registry.find(owner="other", repo="repo3")["displayName"] == "GitHub-other-repo3"
+    assert count_calls(simulator, "GET /connections") == 1
+
+    assert registry.find(display_name="GitHub-other-repo11")["id"]
+    assert registry.find(display_name="GitHub-other-repo11")["id"]
+    assert count_calls(simulator, "GET /connections") == 3
+
+
+def test_concurrent_callers_create_one_connection(simulator):
+    from concurrent.futures import ThreadPoolExecutor
+
+    add_connections(simulator, 7)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        connection_ids = set(pool.map(lambda _: get_or_create_git_connection(GIT_CONFIG), range(8)))
+
+    assert len(connection_ids) == 1
+    assert count_calls(simulator, "POST /connections") == 1
+
+
+def test_failed_listing_is_not_taken_for_the_end_of_the_list(simulator, monkeypatch):
+    add_connections(simulator, 12)
+    get_or_create_git_connection(GIT_CONFIG)
+    git_integration.get_connection_registry().invalidate()
+
+    real_iter_paged_items = git_integration.iter_paged_items
+    failures = [RuntimeError("Failed to list connections: 429")]
+
+    def flaky_iter_paged_items(api_endpoint, *args, **kwargs):
+        for index, item in enumerate(real_iter_paged_items(api_endpoint, *args, **kwargs)):
+            if index == 7 and failures:
+                raise failures.pop()
+            yield item
+
+    monkeypatch.setattr(git_integration, "iter_paged_items", flaky_iter_paged_items)
+    with pytest.raises(RuntimeError):
+        get_or_create_git_connection(GIT_CONFIG)
+
+    assert get_or_create_git_connection(GIT_CONFIG)
+    assert count_calls(simulator, "POST /connections") == 1
+    assert len(simulator.connections) == 13
@@ -0,0 +1,107 @@
+import json
+import importlib
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from config.fabric_core.credentials import TokenProvider
+
+login = importlib.import_module("config.fabric_core.login")  # the package exports the function under this name
+
+
+class TokenEndpoint(BaseHTTPRequestHandler):
+    """Client credentials endpoint answering after `delay` seconds with tokens token-1, token-2, ..."""
+    protocol_version = "HTTP/1.1"
+    requests = 0
+    delay = 0.0
+    expires_in = 3600
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.delay)
+        cls = type(self)
+        cls.requests += 1
+        body = json.dumps({"access_token": f"token-{cls.requests}", "expires_in": cls.expires_in}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def token_endpoint():
+    handler = type("Endpoint", (TokenEndpoint,), {"requests": 0, "delay": 0.0})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield handler, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def make_provider(authority_host: str) -> TokenProvider:
+    return TokenProvider("tenant", "client", "secret", authority_host=authority_host)
+
+
+def test_token_is_cached_per_audience(token_endpoint):
+    handler, url = token_endpoint
+    provider = make_provider(url)
+
+    assert provider.get_token() == provider.get_token() == "token-1"
+    assert provider.get_token("azure") == "token-2"
+    assert handler.requests == 2
+
+
+def test_token_due_for_refresh_is_returned_while_it_refreshes_in_background(token_endpoint):
+    handler, url = token_endpoint
+    provider = make_provider(url)
+    provider.get_token()
+    token, expires_at, _ = provider._tokens["fabric"]
+    provider._tokens["fabric"] = (token, expires_at, time.time() - 1)  # past its refresh-ahead mark
+    handler.delay = 0.5
+
+    started = time.perf_counter()
+    tokens = [provider.get_token() for _ in range(20)]
+    assert time.perf_counter() - started < handler.delay  # nobody waited for the refresh
+    assert set(tokens) == {"token-1"}
+
+    deadline = time.time() + 5
+    while provider.get_token() == "token-1" and time.time() < deadline:
+        time.sleep(0.05)
+    assert provider.get_token() == "token-2"
+    assert handler.requests == 2  # one background refresh for all the callers
+
+
+def test_expired_token_is_acquired_once_for_concurrent_callers(token_endpoint):
+    handler, url = token_endpoint
+    handler.delay = 0.2
+    provider = make_provider(url)
+    tokens = []
+
+    threads = [threading.Thread(target=lambda: tokens.append(provider.get_token())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert tokens == ["token-1"] * 8
+    assert handler.requests == 1
+
+
+@pytest.mark.parametrize("transport, cli_logins", [("http", 0), ("cli", 1)])
+def test_cli_login_is_skipped_with_the_http_transport(monkeypatch, transport, cli_logins):
+    calls = []
+    monkeypatch.setenv("FABRIC_CORE_TRANSPORT", transport)
+    monkeypatch.setattr(login, "_logged_in_as", None)
+    monkeypatch.setattr(login, "run_fabric_cli_command", lambda cmd: calls.append(cmd) or
+                        type("Result", (), {"returncode": 0, "stdout": "", "stderr": ""})())
+
+    login.login()
+    login.ensure_logged_in()
+
+    assert len(calls) == cli_logins
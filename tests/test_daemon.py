@@ -0,0 +1,77 @@
+import os
+import tempfile
+import threading
+
+import pytest
+
+from config.fabric_core import cli, credentials
+from config.fabric_core.daemon import DaemonClient, _DaemonServer
+
+
+@pytest.fixture
+def daemon(monkeypatch):
+    """A daemon on a temporary socket whose commands record the environment they ran with."""
+    seen = []
+
+    def run_command(argv):
+        seen.append((argv, {name: os.getenv(name) for name in
+                            ("CONFIG_FILE", "DEPLOY_MAX_WORKERS", "SPN_CLIENT_ID", "HOME")}))
+        print(f"ran {' '.join(argv)}")
+        return 0
+
+    monkeypatch.setattr(cli, "run_command", run_command)
+    monkeypatch.setenv("GITHUB_ACTIONS", "true")  # no .env file is read
+    socket_path = os.path.join(tempfile.mkdtemp(), "daemon.sock")
+    server = _DaemonServer(socket_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield DaemonClient(socket_path), seen
+    server.shutdown()
+    server.server_close()
+    credentials.reset_token_provider()
+
+
+def test_command_runs_with_the_client_environment(daemon, monkeypatch, capsys):
+    client, seen = daemon
+    monkeypatch.setenv("CONFIG_FILE", "daemon.yaml")
+    monkeypatch.setenv("SPN_CLIENT_ID", "daemon-spn")
+    daemon_environment = dict(os.environ)
+
+    # what the client sends: its own CONFIG_FILE, no SPN_CLIENT_ID, an extra DEPLOY_MAX_WORKERS
+    client_env = {name: value for name, value in os.environ.items() if name.startswith("GITHUB_")}
+    client_env.update({"CONFIG_FILE": "client.yaml", "DEPLOY_MAX_WORKERS": "3"})
+    response = client._request({"argv": ["deploy"], "cwd": os.getcwd(), "env": client_env})
+
+    assert response["exit_code"] == 0
+    argv, env = seen[0]
+    assert argv == ["deploy"]
+    assert env["CONFIG_FILE"] == "client.yaml"
+    assert env["DEPLOY_MAX_WORKERS"] == "3"
+    assert env["SPN_CLIENT_ID"] is None
+    assert env["HOME"] == os.getenv("HOME")  # unrelated variables are the daemon's
+    assert dict(os.environ) == daemon_environment  # restored after the command
+
+
+def test_client_forwards_its_environment(daemon, monkeypatch, capsys):
+    client, seen = daemon
+    monkeypatch.setenv("CONFIG_FILE", "client.yaml")
+    monkeypatch.setenv("DEPLOY_MAX_WORKERS", "5")
+
+    assert client.run(["plan"]) == 0
+    assert seen[0][1]["CONFIG_FILE"] == "client.yaml"
+    assert seen[0][1]["DEPLOY_MAX_WORKERS"] == "5"
+    assert "ran plan" in capsys.readouterr().out
+
+
+def test_changed_credentials_reset_the_token_provider(daemon, monkeypatch, capsys):
+    client, seen = daemon
+    monkeypatch.setenv("SPN_CLIENT_ID", "daemon-spn")
+    credentials.reset_token_provider()
+    daemon_provider = credentials.get_token_provider()
+
+    client._request({"argv": ["plan"], "cwd": os.getcwd(),
+                     "env": {"SPN_CLIENT_ID": "daemon-spn", "GITHUB_ACTIONS": "true"}})
+    assert credentials.get_token_provider() is daemon_provider
+
+    client._request({"argv": ["plan"], "cwd": os.getcwd(),
+                     "env": {"SPN_CLIENT_ID": "client-spn", "GITHUB_ACTIONS": "true"}})
+    assert credentials.get_token_provider() is not daemon_provider
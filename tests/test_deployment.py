@@ -0,0 +1,113 @@
+import threading
+import functools
+
+import pytest
+
+from run_benchmarks import build_template
+
+from config.fabric_core import capacities
+from config.fabric_core.operations import PollResult
+from config.fabric_core.task_graph import Task, run_task_graph, validate_task_graph
+from config.fabric_core.inventory import load_inventory
+from config.fabric_core.deployment import deploy_from_config
+
+
+def test_tasks_run_after_their_dependencies_and_failures_skip_dependents():
+    order, lock = [], threading.Lock()
+
+    def step(name, fail=False):
+        def func(outputs):
+            with lock:
+                order.append(name)
+            if fail:
+                raise RuntimeError(f"{name} broke")
+            return name
+        return func
+
+    tasks = {task.name: task for task in [
+        Task("capacity", step("capacity")),
+        Task("workspace", step("workspace"), ["capacity"]),
+        Task("permissions", step("permissions", fail=True), ["workspace"]),
+        Task("git", step("git"), ["permissions"]),
+        Task("other", step("other")),
+    ]}
+    results = run_task_graph(tasks, max_workers=2)
+
+    assert order.index("capacity") < order.index("workspace") < order.index("permissions")
+    assert {name: result.status for name, result in results.items()} == {
+        "capacity": "succeeded", "workspace": "succeeded", "permissions": "failed", "git": "skipped",
+        "other": "succeeded"}
+    assert results["permissions"].error == "permissions broke"
+    assert "git" not in order
+
+
+def test_task_graph_rejects_cycles_and_unknown_dependencies():
+    with pytest.raises(ValueError, match="cycle"):
+        validate_task_graph({"a": Task("a", lambda outputs: None, ["b"]), "b": Task("b", lambda outputs: None, ["a"])})
+    with pytest.raises(ValueError, match="unknown"):
+        validate_task_graph({"a": Task("a", lambda outputs: None, ["missing"])})
+
+
+def test_task_graph_runs_at_most_max_workers_at_once():
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def func(outputs):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        threading.Event().wait(0.02)
+        with lock:
+            running[0] -= 1
+
+    run_task_graph({f"task{index}": Task(f"task{index}", func) for index in range(12)}, max_workers=3)
+    assert peak[0] <= 3
+
+
+def test_deploys_template_and_redeploys_without_writes(simulator):
+    config = build_template(9)
+    results = deploy_from_config(config, max_workers=8, inventory=load_inventory("rg-benchmark"))
+
+    assert all(result.status == "succeeded" for result in results.values())
+    assert len(simulator.workspaces) == 9
+    assert all(capacity["properties"]["state"] == "Active" for capacity in simulator.capacities.values())
+
+    simulator.reset_counters()
+    results = deploy_from_config(config, max_workers=8, inventory=load_inventory("rg-benchmark"))
+
+    assert all(result.status == "succeeded" for result in results.values())
+    with simulator.lock:
+        calls = dict(simulator.calls)
+    assert not [call for call in calls if call.startswith(("PUT", "PATCH", "DELETE"))]
+    assert "POST /workspaces" not in calls
+    assert "POST /workspaces/{id}/roleAssignments" not in calls
+
+
+def test_capacity_that_never_becomes_ready_fails_its_workspaces(simulator, monkeypatch):
+    stuck = "fcav01devengineering"
+    read_capacity_readiness = capacities.read_capacity_readiness
+    monkeypatch.setattr(capacities, "read_capacity_readiness", lambda name, *states: (
+        PollResult(False) if name == stuck else read_capacity_readiness(name, *states)))
+    monkeypatch.setattr(capacities, "wait_for_capacity_ready",
+                        functools.partial(capacities.wait_for_capacity_ready, max_wait_seconds=3))
+
+    results = deploy_from_config(build_template(9), max_workers=8, inventory=load_inventory("rg-benchmark"))
+
+    assert results[f"capacity:{stuck}"].status == "failed"
+    assert "did not become ready" in results[f"capacity:{stuck}"].error
+    for workspace in ("av01-dev-processing", "av01-dev-datastores", "av01-dev-consumption"):
+        assert results[f"workspace:{workspace}"].status == "skipped"
+    assert results["workspace:av01-test-processing"].status == "succeeded"
+
+
+def test_inventory_accessors_return_copies(simulator):
+    deploy_from_config(build_template(9), max_workers=8, inventory=load_inventory("rg-benchmark"))
+    inventory = load_inventory("rg-benchmark", connections=False)
+    inventory.refresh_fabric_capacities()
+
+    workspace = inventory.get_workspace("av01-dev-processing")
+    workspace["capacityId"] = None
+    capacity_id = inventory.get_workspace("av01-dev-processing")["capacityId"]
+    assert inventory.get_fabric_capacity_name(capacity_id) == "fcav01devengineering"
+    assert inventory.get_workspace("av01-missing") is None
+    assert set(inventory.list_capacities()) == set(simulator.capacities)
+    assert inventory.get_capacity("fcav01devengineering")["sku"]["name"]
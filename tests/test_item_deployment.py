@@ -0,0 +1,20 @@
+from run_benchmarks import build_template
+
+from config.fabric_core.inventory import Inventory
+from config.fabric_core.item_deployment import deploy_items, print_item_deployment_report, select_item_workspaces
+
+
+def test_missing_workspace_is_reported_as_failed(simulator, capsys):
+    inventory = Inventory()
+    inventory.record_workspace("av01-prod-processing", "00000000-0000-0000-0000-000000000001")
+
+    workspaces = select_item_workspaces(build_template(9), inventory, stages=["test", "prod"])
+    missing = [name for name, (workspace_id, _) in workspaces.items() if workspace_id is None]
+    assert "av01-prod-processing" in workspaces and "av01-test-processing" in missing
+
+    results = deploy_items({name: workspaces[name] for name in missing}, dry_run=True)
+    print_item_deployment_report(results, dry_run=True)
+
+    assert all(result.failed and result.error == "workspace does not exist" for result in results.values())
+    assert not any(key.endswith("/items") for key in simulator.calls)
+    assert "✗ av01-test-processing" in capsys.readouterr().out
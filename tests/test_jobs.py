@@ -0,0 +1,66 @@
+import uuid
+
+import pytest
+
+from run_benchmarks import build_template
+
+from config.fabric_core.inventory import load_inventory
+from config.fabric_core.deployment import deploy_from_config
+from config.fabric_core.jobs import JobSpec, resolve_jobs, run_jobs
+
+
+@pytest.fixture
+def tenant(simulator):
+    """The 9-workspace template deployed, with a pipeline in a dev and a prod workspace and the prod capacity suspended."""
+    deploy_from_config(build_template(9), max_workers=8, inventory=load_inventory("rg-benchmark"))
+    workspace_ids = {workspace["displayName"]: workspace_id for workspace_id, workspace in simulator.workspaces.items()}
+    for workspace in ("av01-dev-processing", "av01-prod-processing"):
+        item_id = str(uuid.uuid4())
+        simulator.items.setdefault(workspace_ids[workspace], {})[item_id] = {
+            "id": item_id, "displayName": "pl_master", "type": "DataPipeline", "description": "",
+            "workspaceId": workspace_ids[workspace], "definition": None}
+    simulator.capacities["fcav01prodengineering"]["properties"]["state"] = "Paused"
+    return simulator
+
+
+def run(simulator, **kwargs):
+    specs = [JobSpec.parse("av01-dev-processing/pl_master"), JobSpec.parse("av01-prod-processing/pl_master"),
+             JobSpec.parse("av01-prod-processing/pl_missing")]
+    runs = resolve_jobs(specs, load_inventory("rg-benchmark", connections=False))
+    return run_jobs(runs, "rg-benchmark", poll_seconds=0.2, **kwargs)
+
+
+def get_state(simulator, capacity_name: str) -> str:
+    with simulator.lock:
+        return simulator.capacities[capacity_name]["properties"]["state"]
+
+
+def test_suspends_only_the_capacities_it_resumed(tenant):
+    report = run(tenant)
+
+    assert [job.status for job in report.jobs] == ["Completed", "Completed", "NotTriggered"]
+    assert report.capacities["fcav01prodengineering"].resumed
+    assert report.capacities["fcav01prodengineering"].suspended
+    assert get_state(tenant, "fcav01prodengineering") == "Paused"
+
+    assert report.capacities["fcav01devengineering"].was_active
+    assert report.capacities["fcav01devengineering"].suspended is None
+    assert get_state(tenant, "fcav01devengineering") == "Active"
+
+
+def test_suspend_active_also_suspends_capacities_that_were_active(tenant):
+    report = run(tenant, suspend_active=True)
+
+    assert report.capacities["fcav01devengineering"].suspended
+    assert get_state(tenant, "fcav01devengineering") == "Paused"
+    assert get_state(tenant, "fcav01prodengineering") == "Paused"
+
+
+def test_jobs_past_the_timeout_are_cancelled_and_their_capacity_suspended(tenant):
+    tenant.settings.job_seconds = 30
+    report = run(tenant, timeout=1)
+
+    assert [job.status for job in report.jobs[:2]] == ["TimedOut", "TimedOut"]
+    assert all(instance["document"]["status"] == "Cancelled" for instance in tenant.job_instances.values())
+    assert get_state(tenant, "fcav01prodengineering") == "Paused"
+    assert get_state(tenant, "fcav01devengineering") == "Active"
@@ -0,0 +1,132 @@
+import json
+
+import pytest
+import yaml
+
+from run_benchmarks import build_template
+
+from config.fabric_core import deployment
+from config.fabric_core.inventory import load_inventory
+from config.fabric_core.journal import DeploymentJournal, get_journal_path, read_journal
+from config.fabric_core.multi_version import deploy_versions, prepare_shared_state, run_version
+
+
+def deploy(config: dict, journal: DeploymentJournal, resume: bool = False) -> dict:
+    return deployment.deploy_from_config(config, max_workers=8, inventory=load_inventory("rg-benchmark"),
+                                         journal=journal, resume=resume)
+
+
+def test_resume_after_a_failed_step_only_runs_what_is_left(simulator, monkeypatch, tmp_path):
+    config = build_template(9)
+    journal = DeploymentJournal(tmp_path / "journal.jsonl")
+    create_workspace = deployment.create_workspace
+
+    def interrupted(workspace, inventory=None):
+        if workspace["name"] == "av01-prod-processing":
+            raise RuntimeError("runner cancelled")
+        return create_workspace(workspace, inventory)
+
+    monkeypatch.setattr(deployment, "create_workspace", interrupted)
+    results = deploy(config, journal)
+    assert results["workspace:av01-prod-processing"].status == "failed"
+    assert results["permissions:av01-prod-processing"].status == "skipped"
+    assert not read_journal(journal.path).finished
+
+    monkeypatch.setattr(deployment, "create_workspace", create_workspace)
+    simulator.reset_counters()
+    results = deploy(config, journal, resume=True)
+
+    assert all(result.status == "succeeded" for result in results.values())
+    with simulator.lock:
+        calls = dict(simulator.calls)
+    assert calls.get("POST /workspaces") == 1  # only the workspace of the failed step
+    assert not [call for call in calls if call.startswith("PUT")]  # capacities were journaled as done
+    assert read_journal(journal.path).finished
+
+
+def test_finished_steps_are_replayed_without_calls(simulator, tmp_path, capsys):
+    config = build_template(9)
+    journal = DeploymentJournal(tmp_path / "journal.jsonl")
+    first = deploy(config, journal)
+
+    simulator.reset_counters()
+    second = deploy(config, journal, resume=True)
+
+    assert {name: result.result for name, result in second.items()} == {
+        name: result.result for name, result in first.items()}
+    with simulator.lock:
+        calls = dict(simulator.calls)
+    assert not [call for call in calls if not call.startswith("GET")]
+    assert "done in a previous run" in capsys.readouterr().out
+
+
+def test_version_resumes_from_its_own_journal(simulator, monkeypatch):
+    config = build_template(9)
+    journal = DeploymentJournal(get_journal_path(config))
+    create_workspace = deployment.create_workspace
+
+    def interrupted(workspace, inventory=None):
+        if workspace["name"] == "av01-prod-processing":
+            raise RuntimeError("runner cancelled")
+        return create_workspace(workspace, inventory)
+
+    monkeypatch.setattr(deployment, "create_workspace", interrupted)
+    assert deploy(config, journal)["workspace:av01-prod-processing"].status == "failed"
+
+    monkeypatch.setattr(deployment, "create_workspace", create_workspace)
+    shared = prepare_shared_state([config])
+    simulator.reset_counters()
+    result = run_version(config, "av01_template.yaml", "deploy", shared, resume=True)
+
+    assert result.status == "succeeded", result.output
+    assert "done in a previous run" in result.output
+    with simulator.lock:
+        assert simulator.calls.get("POST /workspaces") == 1
+    assert read_journal(journal.path).finished
+
+
+def test_versions_may_not_share_a_journal(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    templates = []
+    for version in ("av01", "av02"):
+        templates.append(tmp_path / f"{version}_template.yaml")
+        templates[-1].write_text(yaml.safe_dump(build_template(9, version)))
+    for name in ("AZURE_SUBSCRIPTION_ID", "AZURE_TENANT_ID", "SPN_OBJECT_ID"):
+        monkeypatch.setenv(name, f"test-{name.lower()}")  # templates of several versions are loaded strictly
+    monkeypatch.setenv("FABRIC_CORE_JOURNAL", str(tmp_path / "journal.jsonl"))
+
+    with pytest.raises(ValueError, match="would share the journal"):
+        deploy_versions(templates)
+    with pytest.raises(ValueError, match="Only a deployment can be resumed"):
+        deploy_versions(templates, mode="plan", resume=True)
+
+
+def test_journal_of_another_template_starts_over(tmp_path, capsys):
+    journal = DeploymentJournal(tmp_path / "journal.jsonl")
+    journal.open_run({"solution_version": "av01", "workspaces": []})
+    journal.append("step", task="workspace:a", output="id-a")
+
+    state = journal.open_run({"solution_version": "av01", "workspaces": [{"name": "b"}]}, resume=True)
+
+    assert state.completed == {}
+    assert "different template" in capsys.readouterr().out
+
+
+def test_read_journal_replays_the_last_generation_and_ignores_a_torn_line(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    records = [
+        {"event": "start", "config_hash": "old"},
+        {"event": "step", "task": "capacity:c", "output": None},
+        {"event": "start", "config_hash": "new"},
+        {"event": "operation", "task": "workspace:a", "url": "https://ops/1", "audience": None},
+        {"event": "step", "task": "workspace:a", "output": "id-a"},
+        {"event": "operation", "task": "workspace:b", "url": "https://ops/2", "audience": None},
+    ]
+    path.write_text("".join(json.dumps(record) + "\n" for record in records) + '{"event": "step", "task": "work')
+
+    state = read_journal(path)
+
+    assert state.config_hash == "new"
+    assert state.completed == {"workspace:a": "id-a"}
+    assert state.pending_operations == {"workspace:b": ("https://ops/2", None)}  # a's step finished
+    assert not state.finished
@@ -0,0 +1,70 @@
+import pytest
+import yaml
+
+from run_benchmarks import build_template
+
+from config.fabric_core import load_config
+from config.fabric_core.load_config import ConfigError, load_solution_config
+
+
+@pytest.fixture
+def template(tmp_path, monkeypatch):
+    """A template whose security groups come from SG_TEST_* environment variables."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GITHUB_ACTIONS", "true")  # no .env file is read
+    monkeypatch.delenv("FABRIC_CORE_CACHE_DIR", raising=False)
+    for name in ("AZURE_SUBSCRIPTION_ID", "AZURE_TENANT_ID", "SPN_OBJECT_ID"):
+        monkeypatch.setenv(name, f"test-{name.lower()}")
+    config = build_template(9)
+    config["azure"]["security_groups"] = {"SG_AV_Engineers": "${SG_TEST_ENGINEERS}",
+                                          "SG_AV_Analysts": "${SG_TEST_ANALYSTS}"}
+    path = tmp_path / "template.yaml"
+    path.write_text(yaml.safe_dump(config, sort_keys=False))
+    return path
+
+
+def test_unresolved_placeholders_warn_or_fail_when_strict(template, monkeypatch, capsys):
+    monkeypatch.setenv("SG_TEST_ENGINEERS", "engineers-id")
+    monkeypatch.delenv("SG_TEST_ANALYSTS", raising=False)
+
+    config = load_solution_config(template, use_cache=False)
+    assert config.azure.security_groups == {"SG_AV_Engineers": "engineers-id", "SG_AV_Analysts": "${SG_TEST_ANALYSTS}"}
+    assert "unresolved placeholders: SG_TEST_ANALYSTS (line" in capsys.readouterr().out
+
+    with pytest.raises(ConfigError, match="unresolved placeholder SG_TEST_ANALYSTS"):
+        load_solution_config(template, strict=True, use_cache=False)
+
+    monkeypatch.setenv("SG_TEST_ANALYSTS", "analysts-id")
+    assert load_solution_config(template, strict=True, use_cache=False).unresolved == []
+
+
+def test_cache_is_reused_until_a_referenced_variable_changes(template, monkeypatch, tmp_path):
+    monkeypatch.setenv("SG_TEST_ENGINEERS", "engineers-id")
+    monkeypatch.setenv("SG_TEST_ANALYSTS", "analysts-id")
+    cache_dir = tmp_path / "cache"
+    substitute_placeholders = load_config.substitute_placeholders
+    compiled = []
+    monkeypatch.setattr(load_config, "substitute_placeholders",
+                        lambda *args, **kwargs: compiled.append(args) or substitute_placeholders(*args, **kwargs))
+
+    load_solution_config(template, cache_dir=cache_dir)
+    monkeypatch.setenv("UNRELATED_VARIABLE", "changed")
+    assert load_solution_config(template, cache_dir=cache_dir).azure.security_groups["SG_AV_Engineers"] == \
+        "engineers-id"
+    assert len(compiled) == 1
+
+    monkeypatch.setenv("SG_TEST_ENGINEERS", "other-engineers-id")
+    assert load_solution_config(template, cache_dir=cache_dir).azure.security_groups["SG_AV_Engineers"] == \
+        "other-engineers-id"
+    assert len(compiled) == 2
+
+    monkeypatch.delenv("SG_TEST_ANALYSTS")  # an unset variable is part of the key too
+    with pytest.raises(ConfigError, match="unresolved placeholder SG_TEST_ANALYSTS"):
+        load_solution_config(template, strict=True, cache_dir=cache_dir)
+    assert len(compiled) == 3
+
+    template.write_text(template.read_text().replace("rg-benchmark", "rg-changed"))
+    monkeypatch.setenv("SG_TEST_ANALYSTS", "analysts-id")
+    assert load_solution_config(template, cache_dir=cache_dir).azure.capacity_defaults.resource_group == "rg-changed"
+    assert len(compiled) == 4
+    assert len(list(cache_dir.iterdir())) == 3  # the rejected config was not cached
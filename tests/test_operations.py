@@ -0,0 +1,106 @@
+import time
+import json
+
+import pytest
+
+from tests.conftest import add_capacity
+from config.fabric_core.utils import call_azure_fabric_rest_api
+from config.fabric_core.operations import (OperationFailedError, OperationPoller, OperationTimeoutError, PollResult,
+                                           poll_until_all, read_operation_poll, wait_for_operation)
+
+
+def polls_until_done(polls: int, value, retry_after: float|None = None):
+    """A check that reports not done `polls - 1` times, then done with `value`; counts its calls."""
+    calls = []
+
+    def check() -> PollResult:
+        calls.append(time.monotonic())
+        return PollResult(True, value) if len(calls) >= polls else PollResult(False, retry_after=retry_after)
+    check.calls = calls
+    return check
+
+
+def test_poll_until_all_polls_each_operation_on_its_own_schedule():
+    slow, fast = polls_until_done(4, "slow"), polls_until_done(1, "fast")
+
+    outcome = poll_until_all({"slow": slow, "fast": fast}, initial_delay=0.01, max_delay=0.05)
+
+    assert outcome == {"slow": "slow", "fast": "fast"}
+    assert (len(slow.calls), len(fast.calls)) == (4, 1)
+
+
+def test_retry_after_sets_the_next_poll():
+    check = polls_until_done(2, "done", retry_after=0.3)
+
+    assert poll_until_all({"op": check}, initial_delay=0.01, max_delay=5) == {"op": "done"}
+    assert check.calls[1] - check.calls[0] >= 0.3
+
+
+def test_timeouts_and_failures_are_raised_or_returned():
+    never = polls_until_done(10 ** 6, None)
+
+    def failing() -> PollResult:
+        raise OperationFailedError("Operation failed")
+
+    with pytest.raises(OperationTimeoutError):
+        poll_until_all({"never": never}, timeout=0.2, initial_delay=0.05, max_delay=0.05)
+
+    outcome = poll_until_all({"never": never, "failing": failing, "done": polls_until_done(1, 1)},
+                             timeout=0.2, initial_delay=0.05, max_delay=0.05, raise_on_error=False)
+    assert isinstance(outcome["never"], OperationTimeoutError)
+    assert isinstance(outcome["failing"], OperationFailedError)
+    assert outcome["done"] == 1
+
+
+@pytest.mark.parametrize("result, done", [
+    ({"status_code": 202, "headers": {"Retry-After": "5"}}, False),
+    ({"status_code": 429}, False),
+    ({"status_code": 503}, False),
+    ({"status_code": 200, "text": {"status": "Running"}}, False),
+    ({"status_code": 200, "text": {"status": "Succeeded", "id": "1"}}, True),
+    ({"status_code": 200, "text": {"id": "1"}}, True),
+])
+def test_read_operation_poll(result, done):
+    assert read_operation_poll(result).done is done
+
+
+def test_failed_operation_raises():
+    with pytest.raises(OperationFailedError):
+        read_operation_poll({"status_code": 200, "text": {"status": "Failed", "error": {"code": "Boom"}}})
+    with pytest.raises(OperationFailedError):
+        read_operation_poll({"status_code": 404, "text": {}})
+
+
+def test_wait_for_operation_follows_retry_after_of_the_service(simulator):
+    add_capacity(simulator, "fcpoll")
+
+    response = call_azure_fabric_rest_api(
+        "/subscriptions/sub/resourceGroups/rg-benchmark/providers/Microsoft.Fabric/capacities/fcpoll/suspend"
+        "?api-version=2023-11-01", method="post", audience="azure")
+    assert json.loads(response.stdout)["status_code"] == 202
+    wait_for_operation(response, audience="azure", initial_delay=0.01)
+
+    assert simulator.capacities["fcpoll"]["properties"]["state"] == "Paused"
+    operation_polls = sum(count for key, count in simulator.calls.items() if "/operations/" in key)
+    assert 1 <= operation_polls <= 2  # the first poll waits for the Retry-After instead of backing off from 10ms
+
+
+def test_operation_poller_resolves_futures_from_one_thread():
+    poller = OperationPoller(initial_delay=0.01, max_delay=0.05)
+
+    def failing() -> PollResult:
+        raise OperationFailedError("Operation failed")
+
+    try:
+        futures = {key: poller.submit(key, polls_until_done(polls, key), timeout=5)
+                   for key, polls in (("a", 1), ("b", 3), ("c", 5))}
+        failed = poller.submit("failed", failing)
+        timed_out = poller.submit("slow", polls_until_done(10 ** 6, None), timeout=0.1)
+
+        assert {key: future.result(timeout=5) for key, future in futures.items()} == {"a": "a", "b": "b", "c": "c"}
+        with pytest.raises(OperationFailedError):
+            failed.result(timeout=5)
+        with pytest.raises(OperationTimeoutError):
+            timed_out.result(timeout=5)
+    finally:
+        poller.stop()
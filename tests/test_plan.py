@@ -0,0 +1,34 @@
+import copy
+import functools
+
+from run_benchmarks import build_template
+
+from config.fabric_core import capacities
+from config.fabric_core.operations import PollResult
+from config.fabric_core.inventory import load_inventory
+from config.fabric_core.deployment import deploy_from_config
+from config.fabric_core.plan import UPDATE, apply_plan, build_plan, fetch_live_state
+
+
+def test_capacity_update_that_never_becomes_ready_fails(simulator, monkeypatch):
+    config = build_template(9)
+    deploy_from_config(config, max_workers=8, inventory=load_inventory("rg-benchmark"))
+    stuck = "fcav01devengineering"
+    config = copy.deepcopy(config)
+    next(capacity for capacity in config["capacities"] if capacity["name"] == stuck)["sku"] = "F4"
+
+    read_capacity_readiness = capacities.read_capacity_readiness
+    monkeypatch.setattr(capacities, "read_capacity_readiness", lambda name, *states: (
+        PollResult(False) if name == stuck else read_capacity_readiness(name, *states)))
+    monkeypatch.setattr(capacities, "wait_for_capacity_ready",
+                        functools.partial(capacities.wait_for_capacity_ready, max_wait_seconds=3))
+
+    state = fetch_live_state(config, load_inventory("rg-benchmark"))
+    actions = build_plan(config, state)
+    update = next(action for action in actions if action.name == stuck)
+    assert update.action == UPDATE and update.changes["sku"][1] == "F4"
+
+    results = apply_plan(actions, config, state, max_workers=8)
+
+    failed = [result for result in results.values() if result.status == "failed"]
+    assert len(failed) == 1 and "did not become ready" in failed[0].error
@@ -0,0 +1,36 @@
+import pytest
+
+from run_benchmarks import SECURITY_GROUPS
+
+from tests.conftest import add_capacity
+
+from config.fabric_core.workspaces import assign_permissions, create_workspace, list_role_assignments
+
+
+def test_assign_permissions_adds_and_changes_roles_by_workspace_name(simulator, capsys):
+    add_capacity(simulator, "fcroles")
+    workspace_id = create_workspace({"name": "av01-dev-roles", "capacity": "fcroles"})
+    assign_permissions(workspace_id, [{"group": "SG_AV_Engineers", "role": "Viewer"}], SECURITY_GROUPS,
+                       workspace_name="av01-dev-roles")
+    capsys.readouterr()
+
+    assign_permissions(workspace_id, [{"group": "SG_AV_Engineers", "role": "Admin"},
+                                      {"group": "SG_AV_Analysts", "role": "Contributor"}], SECURITY_GROUPS,
+                       workspace_name="av01-dev-roles")
+
+    output = capsys.readouterr().out
+    assert "~ av01-dev-roles: SG_AV_Engineers Viewer -> Admin" in output
+    assert "+ av01-dev-roles: SG_AV_Analysts -> Contributor" in output
+    roles = {assignment["principal"]["id"]: assignment["role"] for assignment in list_role_assignments(workspace_id)}
+    assert roles == {SECURITY_GROUPS["SG_AV_Engineers"]: "Admin", SECURITY_GROUPS["SG_AV_Analysts"]: "Contributor"}
+
+
+def test_unknown_group_fails_before_any_change(simulator):
+    add_capacity(simulator, "fcroles")
+    workspace_id = create_workspace({"name": "av01-dev-roles", "capacity": "fcroles"})
+
+    with pytest.raises(ValueError, match="Unknown security group SG_Missing for av01-dev-roles"):
+        assign_permissions(workspace_id, [{"group": "SG_AV_Engineers", "role": "Admin"},
+                                          {"group": "SG_Missing", "role": "Viewer"}], SECURITY_GROUPS,
+                           workspace_name="av01-dev-roles")
+    assert list_role_assignments(workspace_id) == []
@@ -0,0 +1,103 @@
+import threading
+
+from run_benchmarks import SECURITY_GROUPS, build_template
+
+from config.fabric_core import teardown
+from config.fabric_core.inventory import Inventory, load_inventory
+from config.fabric_core.deployment import deploy_from_config
+from config.fabric_core.workspaces import create_workspace
+from config.fabric_core.workspace_pool import WorkspacePool
+from config.fabric_core.teardown import build_branch_teardown, build_template_teardown, run_teardown
+
+
+def deploy(config: dict) -> None:
+    results = deploy_from_config(config, max_workers=8, inventory=load_inventory("rg-benchmark"))
+    assert all(result.status == "succeeded" for result in results.values())
+
+
+def live(simulator) -> tuple[set[str], set[str]]:
+    """The names of the workspaces and capacities in the simulated tenant."""
+    with simulator.lock:
+        return ({workspace["displayName"] for workspace in simulator.workspaces.values()}, set(simulator.capacities))
+
+
+def test_capacity_that_still_hosts_foreign_workspaces_is_not_deleted(simulator):
+    config = build_template(9)
+    deploy(config)
+    create_workspace({"name": "reporting-sandbox", "capacity": "fcav01prodengineering"})
+
+    results = run_teardown(build_template_teardown(config, load_inventory("rg-benchmark", connections=False)))
+
+    failed = {name: result.error for name, result in results.items() if result.status == "failed"}
+    assert list(failed) == ["delete-capacity:fcav01prodengineering"]
+    assert "still hosts reporting-sandbox" in failed["delete-capacity:fcav01prodengineering"]
+    workspaces, capacities = live(simulator)
+    assert workspaces == {"reporting-sandbox"}
+    assert capacities == {"fcav01prodengineering"}
+
+
+def test_dry_run_only_lists_the_teardown(simulator, capsys):
+    config = build_template(9)
+    deploy(config)
+    before = live(simulator)
+    tasks = build_template_teardown(config, load_inventory("rg-benchmark", connections=False))
+    simulator.reset_counters()
+
+    assert run_teardown(tasks, dry_run=True) == {}
+
+    output = capsys.readouterr().out
+    assert "- delete-workspace:av01-dev-processing (after disconnect-git:av01-dev-processing)" in output
+    assert "- delete-capacity:fcav01devengineering (after delete-workspace:av01-dev-processing" in output
+    assert live(simulator) == before
+    with simulator.lock:
+        assert all(call.startswith("GET") for call in simulator.calls)
+
+
+def test_branch_teardown_keeps_the_dev_capacities(simulator):
+    config = build_template(9)
+    deploy(config)
+    inventory = Inventory()
+    inventory.refresh_workspaces()
+    pool = WorkspacePool("av01", SECURITY_GROUPS, config["github"], inventory=inventory, claim_settle_seconds=0)
+    results, _ = pool.claim("feature-a", ("processing", "datastores"), refill=False)
+    assert not any(result.error for result in results)
+    before_workspaces, before_capacities = live(simulator)
+
+    tasks = build_branch_teardown("av01", "feature-a", load_inventory(connections=False))
+
+    assert sorted(tasks) == ["delete-workspace:av01-feature-a-datastores", "delete-workspace:av01-feature-a-processing",
+                             "disconnect-git:av01-feature-a-datastores", "disconnect-git:av01-feature-a-processing"]
+    assert all(result.status == "succeeded" for result in run_teardown(tasks).values())
+    workspaces, capacities = live(simulator)
+    assert workspaces == before_workspaces - {"av01-feature-a-processing", "av01-feature-a-datastores"}
+    assert capacities == before_capacities
+
+
+def test_workspaces_are_disconnected_then_deleted_before_their_capacity_is_released(simulator, monkeypatch):
+    config = build_template(9)
+    deploy(config)
+    events, lock = [], threading.Lock()
+    disconnect_git, delete_workspace, release_capacity = (
+        teardown._disconnect_git, teardown._delete_workspace, teardown._release_capacity)
+
+    def record(event):
+        with lock:
+            events.append(event)
+        return True
+
+    monkeypatch.setattr(teardown, "_disconnect_git", lambda workspace_id, name: (
+        disconnect_git(workspace_id, name) and record(("disconnect", name))))
+    monkeypatch.setattr(teardown, "_delete_workspace", lambda workspace_id, name, inventory: (
+        delete_workspace(workspace_id, name, inventory) and record(("delete", name))))
+    monkeypatch.setattr(teardown, "_release_capacity", lambda name, *args: (
+        release_capacity(name, *args) and record(("release", name))))
+
+    results = run_teardown(build_template_teardown(config, load_inventory("rg-benchmark", connections=False)))
+
+    assert all(result.status == "succeeded" for result in results.values())
+    assert live(simulator) == (set(), set())
+    position = {event: index for index, event in enumerate(events)}
+    assert len(position) == 2 * 9 + 6
+    for workspace in config["workspaces"]:
+        name = workspace["name"]
+        assert position[("disconnect", name)] < position[("delete", name)] < position[("release", workspace["capacity"])]
@@ -0,0 +1,38 @@
+import json
+import types
+
+import pytest
+
+from config.fabric_core import tracing
+
+
+@pytest.fixture(autouse=True)
+def fresh_tracer(monkeypatch):
+    """Tracing state as in a new process, without the report at exit."""
+    monkeypatch.setattr(tracing, "_tracer", None)
+    monkeypatch.setattr(tracing, "_tracer_checked", False)
+    monkeypatch.setattr(tracing, "atexit", types.SimpleNamespace(register=lambda *args: None))
+
+
+def test_trace_file_directory_is_created(monkeypatch, tmp_path):
+    path = tmp_path / "traces" / "run-1" / "trace.jsonl"
+    monkeypatch.setenv("FABRIC_CORE_TRACE", str(path))
+
+    with tracing.span("deploy", kind="task"):
+        with tracing.span("GET workspaces", kind="client"):
+            pass
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [span["name"] for span in spans] == ["GET workspaces", "deploy"]
+
+
+def test_unwritable_trace_file_turns_tracing_off_with_one_warning(monkeypatch, tmp_path, capsys):
+    (tmp_path / "not-a-directory").write_text("")
+    monkeypatch.setenv("FABRIC_CORE_TRACE", str(tmp_path / "not-a-directory" / "trace.jsonl"))
+
+    for _ in range(3):
+        with tracing.span("GET workspaces", kind="client") as current:
+            current.set(status=200)
+
+    assert tracing.get_tracer() is None
+    assert capsys.readouterr().err.count("Tracing is off") == 1
@@ -0,0 +1,127 @@
+import time
+import importlib
+import socket
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from config.fabric_core import utils
+from config.fabric_core.transport import RequestNotSentError, get_connection_pool, send_http_request
+
+login = importlib.import_module("config.fabric_core.login")  # the package exports the function under this name
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.respond()
+
+    def respond(self):
+        self.server.requests.append((self.command, self.client_address))
+        payload = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        # closes the keep-alive connection without telling the client, like an idle timeout would
+        self.close_connection = self.server.drop_connections
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.requests, server.drop_connections = [], False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    get_connection_pool().close()
+    yield server
+    get_connection_pool().close()
+    server.shutdown()
+    server.server_close()
+
+
+def get_url(server, path="/v1/workspaces"):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def test_keep_alive_connection_is_reused(stub_server):
+    for _ in range(3):
+        status, _, payload = send_http_request("get", get_url(stub_server))
+        assert (status, payload) == (200, b'{"ok": true}')
+
+    assert len(stub_server.requests) == 3
+    assert len({client for _, client in stub_server.requests}) == 1
+
+
+def test_stale_connection_is_replaced_for_idempotent_request(stub_server):
+    stub_server.drop_connections = True
+    send_http_request("get", get_url(stub_server))
+    time.sleep(0.1)
+
+    status, _, _ = send_http_request("get", get_url(stub_server))
+
+    assert status == 200
+    assert len(stub_server.requests) == 2
+    assert len({client for _, client in stub_server.requests}) == 2
+
+
+def test_stale_connection_is_not_retried_for_post(stub_server):
+    stub_server.drop_connections = True
+    send_http_request("get", get_url(stub_server))
+    time.sleep(0.1)
+
+    with pytest.raises(ConnectionError):
+        send_http_request("post", get_url(stub_server), body=b"{}", headers={"Content-Length": "2"})
+    assert [method for method, _ in stub_server.requests] == ["GET"]
+
+
+def test_connect_failure_is_request_not_sent():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    with pytest.raises(RequestNotSentError):
+        send_http_request("post", f"http://127.0.0.1:{port}/v1/workspaces", body=b"{}")
+
+
+@pytest.mark.parametrize("error, method, falls_back", [
+    (RequestNotSentError("connect failed"), "post", True),
+    (ConnectionResetError("reset after send"), "get", True),
+    (ConnectionResetError("reset after send"), "post", False),
+])
+def test_cli_fallback_only_when_request_cannot_run_twice(monkeypatch, error, method, falls_back):
+    monkeypatch.setenv("FABRIC_CORE_TRANSPORT", "auto")
+    for name in ("AZURE_TENANT_ID", "SPN_CLIENT_ID", "SPN_CLIENT_SECRET"):
+        monkeypatch.setenv(name, "stub")
+    cli_calls = []
+
+    def fail_over_http(*args):
+        raise error
+
+    def run_cli(cmd):
+        cli_calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, '{"status_code": 200, "text": {}}', "")
+
+    monkeypatch.setattr(utils, "call_rest_api_over_http", fail_over_http)
+    monkeypatch.setattr(utils, "run_fabric_cli_command", run_cli)
+    monkeypatch.setattr(login, "run_fabric_cli_command", run_cli)
+    monkeypatch.setattr(login, "_logged_in_as", None)
+
+    if falls_back:
+        utils.call_azure_fabric_rest_api("workspaces", method=method, request_body={"displayName": "ws"})
+        assert [cmd[0] for cmd in cli_calls] == ["auth", "api"]  # the skipped CLI login happens on fallback
+    else:
+        with pytest.raises(RuntimeError):
+            utils.call_azure_fabric_rest_api("workspaces", method=method, request_body={"displayName": "ws"})
+        assert cli_calls == []
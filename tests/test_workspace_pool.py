@@ -0,0 +1,106 @@
+from run_benchmarks import SECURITY_GROUPS, build_template
+
+from tests.conftest import add_capacity
+
+from config.fabric_core import workspace_pool
+from config.fabric_core.inventory import Inventory
+from config.fabric_core.workspace_pool import FEATURE_WORKSPACE_TYPES, WorkspacePool, list_pool_workspaces
+from config.fabric_core.workspaces import list_role_assignments
+
+
+ENGINEERS = SECURITY_GROUPS["SG_AV_Engineers"]
+
+
+def make_pool(size: int = 1) -> WorkspacePool:
+    inventory = Inventory()
+    inventory.refresh_workspaces()
+    return WorkspacePool("av01", SECURITY_GROUPS, build_template(9)["github"], size=size, inventory=inventory,
+                         claim_settle_seconds=0)
+
+
+def roles(workspace_id: str) -> dict[str, str]:
+    return {assignment["principal"]["id"]: assignment["role"] for assignment in list_role_assignments(workspace_id)}
+
+
+def names(simulator) -> set[str]:
+    with simulator.lock:
+        return {workspace["displayName"] for workspace in simulator.workspaces.values()}
+
+
+def add_dev_capacities(simulator) -> None:
+    add_capacity(simulator, "fcav01devengineering")
+    add_capacity(simulator, "fcav01devconsumption")
+
+
+def test_refill_creates_the_missing_workspaces_with_permissions(simulator):
+    add_dev_capacities(simulator)
+    pool = make_pool(size=2)
+
+    assert pool.refill() == 6
+    assert pool.refill() == 0
+    for workspace_type in FEATURE_WORKSPACE_TYPES:
+        idle = list_pool_workspaces(pool.inventory, "av01", workspace_type)
+        assert len(idle) == 2
+        assert all(roles(workspace_id) == {ENGINEERS: "Admin"} for workspace_id in idle.values())
+
+
+def test_refill_deletes_a_workspace_whose_permissions_fail_and_carries_on(simulator, monkeypatch, capsys):
+    add_dev_capacities(simulator)
+    assign_permissions = workspace_pool.assign_permissions
+
+    def failing_for_consumption(workspace_id, permissions, security_groups, workspace_name=None):
+        if workspace_name.startswith("av01-pool-consumption-"):
+            raise RuntimeError("principal not found")
+        assign_permissions(workspace_id, permissions, security_groups, workspace_name=workspace_name)
+
+    monkeypatch.setattr(workspace_pool, "assign_permissions", failing_for_consumption)
+    pool = make_pool()
+
+    assert pool.refill() == 2
+    assert list_pool_workspaces(pool.inventory, "av01", "consumption") == {}
+    assert not any(name.startswith("av01-pool-consumption-") for name in names(simulator))
+    assert "Could not assign permissions to av01-pool-consumption-" in capsys.readouterr().out
+
+
+def test_claim_renames_pool_workspaces_and_restores_their_permissions(simulator):
+    add_dev_capacities(simulator)
+    pool = make_pool()
+    pool.refill(("processing", "datastores"))
+    processing_id = next(iter(list_pool_workspaces(pool.inventory, "av01", "processing").values()))
+    with simulator.lock:
+        simulator.role_assignments[processing_id].clear()  # e.g. removed by hand while the workspace was idle
+
+    results, refill_thread = pool.claim("feature-a", ("processing", "datastores"), refill=False)
+
+    assert refill_thread is None
+    assert [(result.workspace_name, result.from_pool, result.error) for result in results] == [
+        ("av01-feature-a-processing", True, None), ("av01-feature-a-datastores", True, None)]
+    assert all(result.synced for result in results)
+    assert results[0].workspace_id == processing_id
+    assert roles(processing_id) == {ENGINEERS: "Admin"}
+    assert not any(name.startswith("av01-pool-") for name in names(simulator))
+
+    results, _ = pool.claim("feature-b", ("processing",), refill=False)  # the pool is empty now
+    assert results[0].from_pool is False and results[0].error is None
+    assert roles(results[0].workspace_id) == {ENGINEERS: "Admin"}
+
+
+def test_collect_garbage_deletes_workspaces_of_deleted_and_merged_branches(simulator, capsys):
+    add_dev_capacities(simulator)
+    pool = make_pool()
+    for branch in ("feature-a", "feature-b", "feature-c"):
+        pool.claim(branch, ("processing",), refill=False)
+    pool.refill(("processing",))
+
+    stale = pool.collect_garbage({"feature-a", "feature-c"}, dry_run=True,
+                                 merged_branches=lambda in_use: {"feature-c"} & in_use)
+    assert sorted(stale) == ["av01-feature-b-processing", "av01-feature-c-processing"]
+    assert "(dry run) Stale feature workspace av01-feature-b-processing (branch feature-b deleted)" in \
+        capsys.readouterr().out
+    assert "av01-feature-b-processing" in names(simulator)
+
+    pool.collect_garbage({"feature-a", "feature-c"}, merged_branches=lambda in_use: {"feature-c"} & in_use)
+    remaining = names(simulator)
+    assert "av01-feature-a-processing" in remaining
+    assert not {"av01-feature-b-processing", "av01-feature-c-processing"} & remaining
+    assert any(name.startswith("av01-pool-processing-") for name in remaining)  # idle pool workspaces stay